@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Нагрузочный замер веб-API: запросов в секунду на основных списках
+
+    python benchmark_web_api.py --url http://localhost:8080 --concurrency 16 --requests 2000
+
+Каждый эндпоинт замеряется дважды: полный ответ (gzip) и повторный
+запрос с If-None-Match, на который сервер отвечает 304.
+
+Замер без сервера и сети, с базовыми результатами и поиском регрессий -
+python -m benchmarks -k web (см. пакет benchmarks).
+"""
+
+import time
+import argparse
+import statistics
+import concurrent.futures
+
+import requests
+
+DEFAULT_ENDPOINTS = ['/api/accounts', '/api/proxies', '/api/posts', '/api/follow/tasks']
+
+
+def run_endpoint(base_url: str, endpoint: str, total: int, concurrency: int, conditional: bool):
+    """Выполнить total запросов к эндпоинту, вернуть (запросов/с, p50 мс, p95 мс, ошибок)"""
+    headers = {'Accept-Encoding': 'gzip'}
+    if conditional:
+        etag = requests.get(base_url + endpoint, headers=headers).headers.get('ETag')
+        if etag:
+            headers['If-None-Match'] = etag
+
+    session_pool = [requests.Session() for _ in range(concurrency)]
+    latencies = []
+    errors = 0
+
+    def worker(index):
+        session = session_pool[index % concurrency]
+        started = time.perf_counter()
+        try:
+            status = session.get(base_url + endpoint, headers=headers).status_code
+        except requests.RequestException:
+            status = 599
+        return time.perf_counter() - started, status
+
+    started = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for duration, status in executor.map(worker, range(total)):
+            latencies.append(duration)
+            if status >= 400:
+                errors += 1
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return (
+        total / elapsed,
+        statistics.median(latencies) * 1000,
+        latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        errors,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Замер запросов в секунду веб-API')
+    parser.add_argument('--url', default='http://localhost:8080')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--endpoints', nargs='*', default=DEFAULT_ENDPOINTS)
+    args = parser.parse_args()
+
+    print(f"{'Эндпоинт':<22} {'режим':<8} {'req/s':>8} {'p50 мс':>8} {'p95 мс':>8} {'ошибок':>7}")
+    for endpoint in args.endpoints:
+        for conditional in (False, True):
+            rps, p50, p95, errors = run_endpoint(args.url, endpoint, args.requests, args.concurrency, conditional)
+            mode = '304' if conditional else 'полный'
+            print(f"{endpoint:<22} {mode:<8} {rps:>8.0f} {p50:>8.1f} {p95:>8.1f} {errors:>7}")
+
+
+if __name__ == '__main__':
+    main()
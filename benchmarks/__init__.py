@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарки горячих путей платформы
+
+Повторяемая замена разовым скриптам test_real_memory_comparison.py,
+test_lazy_loading.py, test_optimized_logging.py и т.п.: все замеры идут
+офлайн, на временной SQLite-базе и сгенерированных медиафайлах с
+фиксированным зерном, без Telegram, Instagram и прокси.
+
+    python -m benchmarks                         # все бенчмарки, сравнение с базовыми
+    python -m benchmarks -k 'db/*' -k media      # по шаблону имени или группе
+    python -m benchmarks --save-baseline         # записать результаты как базовые
+    python -m benchmarks --threshold 0.3         # регрессия - медленнее на 30%
+
+Базовые результаты хранятся в benchmarks/baselines/<имя>.json и имеют
+смысл только для той машины, где записаны. Код возврата 1 - есть регрессии.
+"""
+
+import os
+import sys
+import tempfile
+import importlib
+
+# Модули с бенчмарками (регистрируются при импорте)
+SUITES = (
+    'benchmarks.bench_db',
+    'benchmarks.bench_task_queue',
+    'benchmarks.bench_rate_limiter',
+    'benchmarks.bench_logging',
+    'benchmarks.bench_media',
+    'benchmarks.bench_web',
+)
+
+
+def prepare_environment(workdir: str = None) -> str:
+    """
+    Направить приложение на временную базу до импорта config
+
+    Returns:
+        Каталог с временной базой
+    """
+    if 'config' in sys.modules:
+        raise RuntimeError("config уже импортирован - бенчмарки должны подготовить окружение первыми")
+    workdir = workdir or tempfile.mkdtemp(prefix='benchmarks-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'benchmark.sqlite')}"
+    return workdir
+
+
+def load_suites(names=SUITES):
+    """Импортировать модули бенчмарков"""
+    for name in names:
+        importlib.import_module(name)
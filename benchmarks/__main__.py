@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Запуск бенчмарков: python -m benchmarks --help
+"""
+
+import os
+import sys
+import json
+import shutil
+import logging
+import argparse
+
+from benchmarks import prepare_environment, load_suites
+from benchmarks import core
+
+BASELINES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+STATUS_MARKS = {
+    'regression': '🔴 медленнее',
+    'improvement': '🟢 быстрее',
+    'ok': 'ok',
+    'new': 'новый',
+    'missing': 'не запускался',
+    'skipped': 'пропущен',
+    'error': '❌ ошибка',
+}
+
+
+def print_report(results, comparisons, threshold):
+    by_name = {comparison.name: comparison for comparison in comparisons}
+    print(f"\n{'Бенчмарк':<40} {'медиана':>10} {'p95':>10} {'оп/с':>10} {'база':>10} {'изм.':>8}  статус")
+    for result in results:
+        comparison = by_name[result.name]
+        if result.skipped or result.error:
+            print(f"{result.name:<40} {'':>10} {'':>10} {'':>10} {'':>10} {'':>8}  "
+                  f"{STATUS_MARKS[comparison.status]}: {result.skipped or result.error}")
+            continue
+        change = f"{comparison.change * 100:+.0f}%" if comparison.change is not None else '-'
+        print(f"{result.name:<40} {core.format_duration(result.median):>10} {core.format_duration(result.p95):>10} "
+              f"{result.ops_per_sec:>10.0f} {core.format_duration(comparison.baseline):>10} {change:>8}  "
+              f"{STATUS_MARKS[comparison.status]}")
+
+    regressions = [comparison for comparison in comparisons if comparison.status == 'regression']
+    if regressions:
+        print(f"\n🔴 Регрессий (медленнее базы больше чем на {threshold * 100:.0f}%): {len(regressions)}")
+        for comparison in regressions:
+            print(f"   {comparison.name}: {core.format_duration(comparison.baseline)} → "
+                  f"{core.format_duration(comparison.current)} ({comparison.change * 100:+.0f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Бенчмарки горячих путей платформы')
+    parser.add_argument('-k', '--filter', action='append', default=[],
+                        help='Шаблон имени или группы (db, media, web/posts*); можно несколько')
+    parser.add_argument('--list', action='store_true', help='Показать бенчмарки и выйти')
+    parser.add_argument('--baseline', default='default',
+                        help='Имя базовых результатов в benchmarks/baselines или путь к JSON')
+    parser.add_argument('--save-baseline', action='store_true', help='Записать результаты как базовые')
+    parser.add_argument('--threshold', type=float, default=core.DEFAULT_THRESHOLD,
+                        help='Допустимое замедление медианы (0.2 = 20%%)')
+    parser.add_argument('--repeat', type=int, default=core.REPEATS, help='Число замеров')
+    parser.add_argument('--min-time', type=float, default=core.MIN_TIME, help='Минимальная длительность замера (с)')
+    parser.add_argument('--seed', type=int, default=core.DEFAULT_SEED, help='Зерно случайных данных')
+    parser.add_argument('--json', dest='json_path', help='Сохранить результаты и сравнение в файл')
+    parser.add_argument('--verbose', action='store_true', help='Не глушить логи приложения')
+    args = parser.parse_args(argv)
+
+    workdir = prepare_environment()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+    if not args.verbose:
+        # Модули приложения логируют каждую задачу - в замер это не входит
+        logging.disable(logging.WARNING)
+
+    try:
+        load_suites()
+        benchmarks = core.get_benchmarks(args.filter)
+        if args.list:
+            for bench in benchmarks:
+                print(f"{bench.name:<40} {bench.description.splitlines()[0] if bench.description else ''}")
+            return 0
+        if not benchmarks:
+            print(f"Нет бенчмарков по шаблонам: {', '.join(args.filter)}")
+            return 2
+
+        baseline_path = args.baseline
+        if not baseline_path.endswith('.json'):
+            baseline_path = os.path.join(BASELINES_DIR, f"{baseline_path}.json")
+        baseline = core.load_baseline(baseline_path)
+
+        def progress(result):
+            status = result.skipped and 'пропущен' or result.error and 'ошибка' or core.format_duration(result.median)
+            print(f"  {result.name}: {status}", file=sys.stderr)
+
+        print(f"⏱  Бенчмарков: {len(benchmarks)}, замеров: {args.repeat}, зерно: {args.seed}", file=sys.stderr)
+        results = core.run_benchmarks(benchmarks, repeats=args.repeat, min_time=args.min_time,
+                                      seed=args.seed, on_result=progress)
+        comparisons = core.compare_results(results, baseline, args.threshold)
+        print_report(results, comparisons, args.threshold)
+
+        if baseline is None:
+            print(f"\nБазовых результатов нет ({baseline_path}) - сравнивать не с чем")
+        elif baseline.get('machine') != core.machine_info():
+            print("\n⚠️ Базовые результаты записаны на другой машине или версии Python - сравнение ориентировочное")
+
+        if args.json_path:
+            with open(args.json_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'machine': core.machine_info(),
+                    'threshold': args.threshold,
+                    'results': [result.to_dict() for result in results],
+                    'comparisons': [comparison.__dict__ for comparison in comparisons],
+                }, f, ensure_ascii=False, indent=2)
+
+        if args.save_baseline:
+            core.save_baseline(baseline_path, results)
+            print(f"\n💾 Базовые результаты сохранены: {baseline_path}")
+            return 0
+
+        return 1 if any(comparison.status == 'regression' for comparison in comparisons) else 0
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарки db_manager: чтение списков и точечные чтения/записи задач
+"""
+
+from benchmarks.core import benchmark
+from benchmarks.fixtures import seed_database
+
+
+@benchmark('db/get_instagram_accounts', 'db')
+def bench_get_instagram_accounts(ctx):
+    """Список аккаунтов с группами и прокси (joinedload)"""
+    from database.db_manager import get_instagram_accounts
+    seed_database(ctx.seed)
+    return get_instagram_accounts
+
+
+@benchmark('db/get_instagram_account', 'db')
+def bench_get_instagram_account(ctx):
+    """Аккаунт по id"""
+    from database.db_manager import get_instagram_account
+    ids = list(seed_database(ctx.seed)['accounts'])
+    ctx.rng.shuffle(ids)
+    position = [0]
+
+    def run():
+        position[0] = (position[0] + 1) % len(ids)
+        return get_instagram_account(ids[position[0]])
+    return run
+
+
+@benchmark('db/get_publish_task', 'db')
+def bench_get_publish_task(ctx):
+    """Задача публикации по id вместе с аккаунтом"""
+    from database.db_manager import get_publish_task
+    ids = list(seed_database(ctx.seed)['tasks'])
+    ctx.rng.shuffle(ids)
+    position = [0]
+
+    def run():
+        position[0] = (position[0] + 1) % len(ids)
+        return get_publish_task(ids[position[0]])
+    return run
+
+
+@benchmark('db/get_proxies', 'db')
+def bench_get_proxies(ctx):
+    """Список прокси"""
+    from database.db_manager import get_proxies
+    seed_database(ctx.seed)
+    return get_proxies
+
+
+@benchmark('db/update_publish_task_status', 'db')
+def bench_update_publish_task_status(ctx):
+    """Смена статуса существующей задачи (чтение + commit)"""
+    from database.db_manager import update_publish_task_status
+    from database.models import TaskStatus
+    ids = list(seed_database(ctx.seed)['tasks'])
+    ctx.rng.shuffle(ids)
+    position = [0]
+
+    def run():
+        position[0] = (position[0] + 1) % len(ids)
+        return update_publish_task_status(ids[position[0]], TaskStatus.PENDING)
+    return run
+
+
+@benchmark('db/create_publish_task', 'db')
+def bench_create_publish_task(ctx):
+    """Создание задачи публикации (созданные задачи удаляются после замера)"""
+    from database.db_manager import create_publish_task, get_session
+    from database.models import PublishTask, TaskType
+    seeded = seed_database(ctx.seed)
+    accounts = seeded['accounts']
+    last_seeded = max(seeded['tasks'])
+
+    def cleanup():
+        session = get_session()
+        try:
+            session.query(PublishTask).filter(PublishTask.id > last_seeded).delete(synchronize_session=False)
+            session.commit()
+        finally:
+            session.close()
+    ctx.add_cleanup(cleanup)
+
+    def run():
+        return create_publish_task(ctx.rng.choice(accounts), TaskType.PHOTO, '/media/bench/new.jpg',
+                                   caption='бенчмарк', additional_data={'post_type': 'feed'})
+    return run
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарки StructuredLogger: пропускная способность с сэмплингом и без
+"""
+
+import os
+import logging
+
+from benchmarks.core import benchmark
+
+CATEGORIES = ('instagram', 'telegram', 'task_queue', 'proxy')
+
+
+def _structured_logger(ctx, strategy):
+    from utils.structured_logger import StructuredLogger, SamplingConfig
+
+    structured = StructuredLogger(f"benchmark.{ctx.name}", SamplingConfig(strategy=strategy))
+    # Запись идет в настоящий обработчик с форматированием, но в /dev/null
+    stream = open(os.devnull, 'w')
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    structured.logger.addHandler(handler)
+    structured.logger.setLevel(logging.DEBUG)
+    structured.logger.propagate = False
+
+    def cleanup():
+        structured.logger.removeHandler(handler)
+        stream.close()
+    ctx.add_cleanup(cleanup)
+    return structured
+
+
+def _messages(ctx, count=256):
+    return [
+        (ctx.rng.choice([logging.DEBUG, logging.INFO, logging.INFO, logging.WARNING]),
+         f"Действие {ctx.rng.randint(1, 10 ** 6)} для аккаунта {ctx.rng.randint(1, 200)}",
+         ctx.rng.choice(CATEGORIES),
+         {'account_id': ctx.rng.randint(1, 200), 'duration_ms': round(ctx.rng.uniform(1, 900), 1)})
+        for _ in range(count)
+    ]
+
+
+@benchmark('logging/structured_no_sampling', 'logging')
+def bench_structured_no_sampling(ctx):
+    """Каждая запись: JSON, форматирование, обработчик, статистика"""
+    from utils.structured_logger import SamplingStrategy
+    structured = _structured_logger(ctx, SamplingStrategy.NONE)
+    messages = _messages(ctx)
+    position = [0]
+
+    def run():
+        position[0] = (position[0] + 1) % len(messages)
+        level, message, category, data = messages[position[0]]
+        return structured.log_structured(level, message, category, data)
+    return run
+
+
+@benchmark('logging/structured_adaptive', 'logging')
+def bench_structured_adaptive(ctx):
+    """Адаптивный сэмплинг (по умолчанию): большая часть записей отбрасывается"""
+    from utils.structured_logger import SamplingStrategy
+    structured = _structured_logger(ctx, SamplingStrategy.ADAPTIVE)
+    messages = _messages(ctx)
+    position = [0]
+
+    def run():
+        position[0] = (position[0] + 1) % len(messages)
+        level, message, category, data = messages[position[0]]
+        return structured.log_structured(level, message, category, data)
+    return run
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарки подготовки медиа: нарезка мозаики, разбор видео, обложки
+
+Файлы генерируются во временном каталоге бенчмарка с фиксированным зерном.
+"""
+
+from benchmarks.core import benchmark, SkipBenchmark
+from benchmarks.fixtures import make_image, make_video
+
+
+def _require(module):
+    try:
+        return __import__(module)
+    except ImportError:
+        raise SkipBenchmark(f"{module} не установлен")
+
+
+def _video(ctx):
+    _require('cv2')
+    _require('numpy')
+    try:
+        return make_video(ctx.path('clip.mp4'), seed=ctx.seed)
+    except RuntimeError as e:
+        raise SkipBenchmark(str(e))
+
+
+@benchmark('media/mosaic_split', 'media')
+def bench_mosaic_split(ctx):
+    """Нарезка фото 3240x2160 на 6 частей мозаики в буферы"""
+    _require('numpy')
+    from utils.image_splitter import split_image_for_mosaic
+    image_path = make_image(ctx.path('mosaic.jpg'), seed=ctx.seed)
+
+    def run():
+        parts = split_image_for_mosaic(image_path, rows=2, cols=3, as_buffers=True)
+        if not parts:
+            raise RuntimeError("мозаика не нарезана")
+        return parts
+    return run
+
+
+@benchmark('media/mosaic_split_size_limit', 'media')
+def bench_mosaic_split_size_limit(ctx):
+    """Нарезка мозаики с подбором качества под лимит 150 КБ на часть"""
+    _require('numpy')
+    from utils.image_splitter import split_image_for_mosaic
+    image_path = make_image(ctx.path('mosaic.jpg'), seed=ctx.seed)
+
+    def run():
+        return split_image_for_mosaic(image_path, rows=2, cols=3, max_size_kb=150, as_buffers=True)
+    return run
+
+
+@benchmark('media/video_probe', 'media')
+def bench_video_probe(ctx):
+    """Полный разбор видео: размеры, fps, кодек и стандартные обложки"""
+    from utils.media_metadata import MediaMetadataCache
+    video_path = _video(ctx)
+    cache = MediaMetadataCache()
+
+    def run():
+        cache.invalidate(video_path, remove_files=True)
+        meta = cache.probe(video_path)
+        if meta is None:
+            raise RuntimeError("видео не разобрано")
+        return meta
+    return run
+
+
+@benchmark('media/video_probe_sidecar', 'media')
+def bench_video_probe_sidecar(ctx):
+    """Метаданные из sidecar-файла после перезапуска (пустой кэш в памяти)"""
+    from utils.media_metadata import MediaMetadataCache
+    video_path = _video(ctx)
+    MediaMetadataCache().probe(video_path)
+
+    def run():
+        return MediaMetadataCache().get(video_path)
+    return run
+
+
+@benchmark('media/thumbnail', 'media')
+def bench_thumbnail(ctx):
+    """Извлечение обложки reels на произвольной секунде"""
+    from utils.media_metadata import MediaMetadataCache
+    video_path = _video(ctx)
+    cache = MediaMetadataCache(poster_offsets=())
+    meta = cache.probe(video_path)
+    offsets = [round(ctx.rng.uniform(0.1, 2.9), 3) for _ in range(64)]
+    position = [0]
+
+    def run():
+        position[0] = (position[0] + 1) % len(offsets)
+        offset = offsets[position[0]]
+        # Забываем обложку, чтобы каждый раз извлекать кадр заново
+        meta.posters.pop(f"{offset:.3f}", None)
+        thumbnail = cache.get_thumbnail(video_path, offset)
+        if not thumbnail:
+            raise RuntimeError("обложка не извлечена")
+        return thumbnail
+    return run
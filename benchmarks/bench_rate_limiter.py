@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарки RateLimiter: проверка лимитов при заполненной истории действий
+"""
+
+import time
+
+from benchmarks.core import benchmark
+from benchmarks.fixtures import seed_database
+
+# Действий в истории каждого аккаунта (за последние сутки)
+HISTORY_PER_ACCOUNT = 150
+
+
+def _limiter_with_history(ctx, accounts):
+    from services.rate_limiter import RateLimiter, ActionType
+
+    limiter = RateLimiter()
+    now = time.time()
+    for account_id in accounts:
+        for action in (ActionType.LIKE, ActionType.FOLLOW):
+            limiter._actions[account_id][action] = sorted(
+                now - ctx.rng.uniform(10, 86000) for _ in range(HISTORY_PER_ACCOUNT)
+            )
+    return limiter
+
+
+@benchmark('rate_limiter/can_perform_action', 'rate_limiter')
+def bench_can_perform_action(ctx):
+    """Проверка лимита: блокировки, очистка истории, возраст аккаунта из БД, подсчет"""
+    from services.rate_limiter import ActionType
+    accounts = seed_database(ctx.seed)['accounts'][:50]
+    limiter = _limiter_with_history(ctx, accounts)
+    actions = [ActionType.LIKE, ActionType.FOLLOW, ActionType.COMMENT]
+
+    def run():
+        return limiter.can_perform_action(ctx.rng.choice(accounts), ctx.rng.choice(actions))
+    return run
+
+
+@benchmark('rate_limiter/get_action_stats', 'rate_limiter')
+def bench_get_action_stats(ctx):
+    """Статистика действий аккаунта по всем типам"""
+    accounts = seed_database(ctx.seed)['accounts'][:50]
+    limiter = _limiter_with_history(ctx, accounts)
+
+    def run():
+        return limiter.get_action_stats(ctx.rng.choice(accounts))
+    return run
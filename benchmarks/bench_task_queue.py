@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарки очереди публикаций: постановка задачи и передача ее в пул потоков
+"""
+
+import queue
+from unittest import mock
+
+from benchmarks.core import benchmark
+from benchmarks.fixtures import seed_database
+
+
+def _drain(task_queue):
+    while True:
+        try:
+            task_queue.get_nowait()
+            task_queue.task_done()
+        except queue.Empty:
+            return
+
+
+@benchmark('task_queue/enqueue', 'task_queue')
+def bench_enqueue(ctx):
+    """add_task_to_queue: проверка задачи в БД, статус PROCESSING, событие, постановка"""
+    from utils import task_queue
+    ids = list(seed_database(ctx.seed)['tasks'])
+    ctx.rng.shuffle(ids)
+    position = [0]
+    ctx.add_cleanup(lambda: _drain(task_queue.task_queue))
+
+    def run():
+        position[0] = (position[0] + 1) % len(ids)
+        task_queue.add_task_to_queue(ids[position[0]])
+        if task_queue.task_queue.qsize() > 1000:
+            _drain(task_queue.task_queue)
+    return run
+
+
+@benchmark('task_queue/dispatch', 'task_queue')
+def bench_dispatch(ctx):
+    """
+    Путь задачи от очереди до завершения в пуле потоков: get, submit,
+    трасса этапов и гистограмма времени. Сама публикация заменена
+    заглушкой - замеряются только накладные расходы диспетчера.
+    """
+    from utils import task_queue
+    ids = seed_database(ctx.seed)['tasks']
+    patcher = mock.patch.object(task_queue, 'process_task', lambda task_id, chat_id, bot: True)
+    patcher.start()
+    ctx.add_cleanup(patcher.stop)
+    ctx.add_cleanup(lambda: _drain(task_queue.task_queue))
+
+    def run():
+        task_queue.task_queue.put((ctx.rng.choice(ids), None, None))
+        task_id, chat_id, bot = task_queue.task_queue.get()
+        future = task_queue.executor.submit(task_queue._run_task, task_id, chat_id, bot)
+        task_queue.task_queue.task_done()
+        return future.result()
+    return run
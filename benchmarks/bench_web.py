@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарки списков веб-API через тестовый клиент Flask
+
+Тот же набор эндпоинтов, что и в benchmark_web_api.py, но без сервера
+и сети: замеряется обработка запроса приложением - полный ответ со
+сжатием и повторный запрос с If-None-Match (304).
+"""
+
+from benchmarks.core import benchmark
+from benchmarks.fixtures import seed_database
+
+ENDPOINTS = {
+    'accounts': '/api/accounts',
+    'proxies': '/api/proxies',
+    'posts': '/api/posts',
+    'follow_tasks': '/api/follow/tasks',
+}
+
+_app = None
+
+
+def _client(ctx):
+    global _app
+    seed_database(ctx.seed)
+    if _app is None:
+        from web_api import create_app
+        _app = create_app()
+    return _app.test_client()
+
+
+def _register(key, path):
+    @benchmark(f"web/{key}", 'web', description=f"GET {path}: полный ответ со сжатием")
+    def bench_full(ctx):
+        client = _client(ctx)
+
+        def run():
+            response = client.get(path, headers={'Accept-Encoding': 'gzip'})
+            if response.status_code != 200:
+                raise RuntimeError(f"{path}: HTTP {response.status_code}")
+            return response
+        return run
+
+    @benchmark(f"web/{key}_not_modified", 'web', description=f"GET {path} с If-None-Match: ответ 304")
+    def bench_not_modified(ctx):
+        client = _client(ctx)
+        etag = client.get(path).headers.get('ETag')
+        if not etag:
+            raise RuntimeError(f"{path}: нет ETag")
+        headers = {'Accept-Encoding': 'gzip', 'If-None-Match': etag}
+
+        def run():
+            response = client.get(path, headers=headers)
+            if response.status_code != 304:
+                raise RuntimeError(f"{path}: ожидался 304, получен {response.status_code}")
+            return response
+        return run
+
+
+for _key, _path in ENDPOINTS.items():
+    _register(_key, _path)
@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+Ядро бенчмарков: реестр, замер, базовые результаты и сравнение
+
+Бенчмарк - фабрика, которая получает BenchContext (временный каталог
+и генератор случайных чисел с фиксированным зерном), готовит данные и
+возвращает функцию без аргументов - ее и замеряет runner. Если для
+замера не хватает инструмента (нет ffmpeg, нет зависимости),
+фабрика бросает SkipBenchmark с причиной.
+
+Замер как в timeit: число повторов внутри одного замера подбирается так,
+чтобы замер шел не меньше min_time, затем делается repeats замеров.
+В результат идет время одной операции: медиана, минимум и p95.
+"""
+
+import os
+import json
+import time
+import random
+import fnmatch
+import platform
+import tempfile
+import statistics
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.metrics import percentile
+
+# Зерно случайных данных по умолчанию - одинаковые данные от запуска к запуску
+DEFAULT_SEED = 1234
+
+# Минимальная длительность одного замера (с) и число замеров
+MIN_TIME = 0.05
+REPEATS = 5
+
+# Замедление медианы относительно базовой, после которого это регрессия
+DEFAULT_THRESHOLD = 0.2
+
+
+class SkipBenchmark(Exception):
+    """Бенчмарк нельзя выполнить в этом окружении"""
+
+
+@dataclass
+class BenchContext:
+    """Окружение одного бенчмарка"""
+    name: str
+    tmpdir: str
+    seed: int = DEFAULT_SEED
+    rng: random.Random = field(default=None)
+    cleanups: List[Callable[[], None]] = field(default_factory=list)
+
+    def __post_init__(self):
+        if self.rng is None:
+            self.rng = random.Random(self.seed)
+
+    def path(self, *parts: str) -> str:
+        """Путь внутри временного каталога бенчмарка"""
+        return os.path.join(self.tmpdir, *parts)
+
+    def add_cleanup(self, func: Callable[[], None]):
+        """Выполнить func после замера (в обратном порядке)"""
+        self.cleanups.append(func)
+
+
+@dataclass
+class Benchmark:
+    """Зарегистрированный бенчмарк"""
+    name: str
+    group: str
+    factory: Callable[[BenchContext], Callable[[], Any]]
+    description: str = ''
+
+
+@dataclass
+class BenchResult:
+    """Результат замера: время одной операции в секундах"""
+    name: str
+    group: str
+    median: float = 0.0
+    min: float = 0.0
+    p95: float = 0.0
+    ops_per_sec: float = 0.0
+    loops: int = 0
+    repeats: int = 0
+    skipped: Optional[str] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'BenchResult':
+        known = {k: v for k, v in data.items() if k in cls.__dataclass_fields__}
+        return cls(**known)
+
+
+@dataclass
+class Comparison:
+    """Сравнение результата с базовым"""
+    name: str
+    status: str  # regression, improvement, ok, new, missing, skipped, error
+    baseline: Optional[float] = None
+    current: Optional[float] = None
+    change: Optional[float] = None  # (current - baseline) / baseline
+
+
+_registry: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, group: str, description: str = ''):
+    """Декоратор регистрации фабрики бенчмарка"""
+    def decorator(factory):
+        if name in _registry:
+            raise ValueError(f"Бенчмарк {name} уже зарегистрирован")
+        _registry[name] = Benchmark(name=name, group=group, factory=factory,
+                                    description=description or (factory.__doc__ or '').strip())
+        return factory
+    return decorator
+
+
+def get_benchmarks(patterns: Optional[List[str]] = None) -> List[Benchmark]:
+    """Бенчмарки по порядку регистрации; patterns - шаблоны имени или группы (fnmatch)"""
+    benchmarks = list(_registry.values())
+    if not patterns:
+        return benchmarks
+    return [
+        bench for bench in benchmarks
+        if any(fnmatch.fnmatch(bench.name, pattern) or fnmatch.fnmatch(bench.group, pattern)
+               for pattern in patterns)
+    ]
+
+
+def _seed_all(seed: int):
+    random.seed(seed)
+    try:
+        import numpy
+        numpy.random.seed(seed)
+    except ImportError:
+        pass
+
+
+def _calibrate(func: Callable[[], Any], min_time: float) -> int:
+    """Подобрать число повторов, при котором замер идет не меньше min_time"""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or loops >= 1_000_000:
+            return loops
+        if elapsed <= 0:
+            loops *= 10
+        else:
+            loops = max(loops * 2, int(loops * min_time / elapsed * 1.2))
+
+
+def run_benchmark(bench: Benchmark, repeats: int = REPEATS, min_time: float = MIN_TIME,
+                  seed: int = DEFAULT_SEED) -> BenchResult:
+    """Подготовить и замерить один бенчмарк"""
+    result = BenchResult(name=bench.name, group=bench.group)
+    _seed_all(seed)
+
+    with tempfile.TemporaryDirectory(prefix=f"bench-{bench.name.replace('/', '-')}-") as tmpdir:
+        context = BenchContext(name=bench.name, tmpdir=tmpdir, seed=seed)
+        try:
+            try:
+                func = bench.factory(context)
+            except SkipBenchmark as e:
+                result.skipped = str(e) or 'пропущен'
+                return result
+
+            # Прогрев: ленивые импорты, кэши, первое соединение с БД
+            func()
+            loops = _calibrate(func, min_time)
+
+            samples = []
+            for _ in range(max(1, repeats)):
+                started = time.perf_counter()
+                for _ in range(loops):
+                    func()
+                samples.append((time.perf_counter() - started) / loops)
+        except Exception as e:
+            result.error = f"{type(e).__name__}: {e}"
+            return result
+        finally:
+            for cleanup in reversed(context.cleanups):
+                cleanup()
+
+    result.median = statistics.median(samples)
+    result.min = min(samples)
+    result.p95 = percentile(sorted(samples), 95)
+    result.ops_per_sec = 1.0 / result.median if result.median > 0 else 0.0
+    result.loops = loops
+    result.repeats = len(samples)
+    return result
+
+
+def run_benchmarks(benchmarks: List[Benchmark], repeats: int = REPEATS, min_time: float = MIN_TIME,
+                   seed: int = DEFAULT_SEED, on_result: Optional[Callable[[BenchResult], None]] = None
+                   ) -> List[BenchResult]:
+    """Выполнить бенчмарки по очереди"""
+    results = []
+    for bench in benchmarks:
+        result = run_benchmark(bench, repeats=repeats, min_time=min_time, seed=seed)
+        results.append(result)
+        if on_result:
+            on_result(result)
+    return results
+
+
+# ----------------------------------------------------------------------
+# Базовые результаты
+# ----------------------------------------------------------------------
+
+def machine_info() -> Dict[str, Any]:
+    """Описание машины: сравнивать имеет смысл только результаты одной машины"""
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def save_baseline(path: str, results: List[BenchResult], merge: bool = True) -> Dict[str, Any]:
+    """
+    Сохранить результаты как базовые
+
+    Args:
+        merge: Оставить в файле базовые результаты бенчмарков, которые не запускались
+    """
+    data = load_baseline(path) if merge else None
+    if not data:
+        data = {'results': {}}
+    data['saved_at'] = datetime.now().isoformat(timespec='seconds')
+    data['machine'] = machine_info()
+    for result in results:
+        if not result.skipped and not result.error:
+            data['results'][result.name] = result.to_dict()
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    return data
+
+
+def load_baseline(path: str) -> Optional[Dict[str, Any]]:
+    """Прочитать файл базовых результатов (None, если его нет)"""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_results(results: List[BenchResult], baseline: Optional[Dict[str, Any]],
+                    threshold: float = DEFAULT_THRESHOLD) -> List[Comparison]:
+    """
+    Сравнить медианы с базовыми
+
+    Регрессия - медиана выросла больше чем на threshold (0.2 = 20%),
+    улучшение - уменьшилась больше чем на threshold.
+    """
+    stored = (baseline or {}).get('results', {})
+    comparisons = []
+    for result in results:
+        if result.skipped or result.error:
+            comparisons.append(Comparison(name=result.name, status='error' if result.error else 'skipped'))
+            continue
+        base = stored.get(result.name)
+        if not base or not base.get('median'):
+            comparisons.append(Comparison(name=result.name, status='new', current=result.median))
+            continue
+
+        change = (result.median - base['median']) / base['median']
+        if change > threshold:
+            status = 'regression'
+        elif change < -threshold:
+            status = 'improvement'
+        else:
+            status = 'ok'
+        comparisons.append(Comparison(name=result.name, status=status, baseline=base['median'],
+                                      current=result.median, change=change))
+
+    ran = {result.name for result in results}
+    for name, base in stored.items():
+        if name not in ran:
+            comparisons.append(Comparison(name=name, status='missing', baseline=base.get('median')))
+    return comparisons
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    """Время операции в удобных единицах"""
+    if seconds is None:
+        return '-'
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    if seconds >= 1e-6:
+        return f"{seconds * 1e6:.1f} µs"
+    return f"{seconds * 1e9:.0f} ns"
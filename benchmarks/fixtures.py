@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Данные для бенчмарков: временная база и медиафайлы
+
+База заполняется один раз на процесс (аккаунты, прокси, задачи
+публикации и подписок) генератором с фиксированным зерном, поэтому
+объем и состав данных одинаковы от запуска к запуску.
+"""
+
+import random
+import threading
+from datetime import datetime, timedelta
+
+# Объем данных в базе
+ACCOUNTS = 200
+PROXIES = 50
+PUBLISH_TASKS = 2000
+FOLLOW_TASKS = 100
+
+# Фиксированная точка отсчета для дат
+EPOCH = datetime(2024, 1, 1)
+
+_seeded = None
+_seed_lock = threading.Lock()
+
+
+def seed_database(seed: int = 1234) -> dict:
+    """
+    Создать схему и заполнить временную базу (один раз)
+
+    Returns:
+        {'accounts': [id], 'proxies': [id], 'tasks': [id]}
+    """
+    global _seeded
+    with _seed_lock:
+        if _seeded is not None:
+            return _seeded
+
+        from config import DATABASE_URL
+        if 'benchmark' not in DATABASE_URL:
+            raise RuntimeError(f"Бенчмарки не пишут в рабочую базу: {DATABASE_URL}")
+
+        from database.db_manager import init_db, get_session
+        from database.models import (
+            InstagramAccount, Proxy, PublishTask, TaskStatus, TaskType,
+            FollowTask, FollowSourceType, FollowTaskStatus
+        )
+
+        init_db()
+        rng = random.Random(seed)
+        session = get_session()
+        try:
+            proxies = [
+                Proxy(id=i, protocol='http', host=f"10.0.{i // 250}.{i % 250}", port=8000 + i,
+                      username=f"user{i}", password='secret', created_at=EPOCH)
+                for i in range(1, PROXIES + 1)
+            ]
+            accounts = [
+                InstagramAccount(
+                    id=i, username=f"bench_account_{i:04d}", password='secret',
+                    email=f"bench{i}@example.com", full_name=f"Bench Account {i}",
+                    status=rng.choice(['active', 'active', 'active', 'inactive', 'banned']),
+                    proxy_id=rng.randint(1, PROXIES),
+                    created_at=EPOCH - timedelta(days=rng.randint(0, 120)),
+                )
+                for i in range(1, ACCOUNTS + 1)
+            ]
+            task_types = [TaskType.PHOTO, TaskType.VIDEO, TaskType.REEL, TaskType.STORY, TaskType.CAROUSEL]
+            statuses = [TaskStatus.COMPLETED] * 6 + [TaskStatus.FAILED, TaskStatus.PENDING, TaskStatus.SCHEDULED]
+            tasks = []
+            for i in range(1, PUBLISH_TASKS + 1):
+                created = EPOCH + timedelta(minutes=rng.randint(0, 60 * 24 * 60))
+                tasks.append(PublishTask(
+                    id=i, account_id=rng.randint(1, ACCOUNTS), task_type=rng.choice(task_types),
+                    status=rng.choice(statuses), media_path=f"/media/bench/{i}.jpg",
+                    caption=' '.join(rng.choice(['утро', 'кофе', 'город', 'море', '#travel', '#photo'])
+                                     for _ in range(rng.randint(3, 20))),
+                    created_at=created, updated_at=created + timedelta(minutes=5),
+                    options={'post_type': 'feed', 'batch_id': f"b{i // 50}"},
+                ))
+            follow_tasks = [
+                FollowTask(
+                    id=i, account_id=rng.randint(1, ACCOUNTS), name=f"Подписки {i}",
+                    source_type=FollowSourceType.HASHTAG, source_value=f"tag{i}",
+                    status=rng.choice(list(FollowTaskStatus)), followed_count=rng.randint(0, 500),
+                    created_at=EPOCH,
+                )
+                for i in range(1, FOLLOW_TASKS + 1)
+            ]
+            session.add_all(proxies)
+            session.add_all(accounts)
+            session.flush()
+            session.add_all(tasks)
+            session.add_all(follow_tasks)
+            session.commit()
+        finally:
+            session.close()
+
+        _seeded = {
+            'accounts': list(range(1, ACCOUNTS + 1)),
+            'proxies': list(range(1, PROXIES + 1)),
+            'tasks': list(range(1, PUBLISH_TASKS + 1)),
+        }
+        return _seeded
+
+
+def make_image(path: str, size=(3240, 2160), seed: int = 1234) -> str:
+    """JPEG с шумом и градиентом (сжимается как фотография, а не как заливка)"""
+    import numpy
+    from PIL import Image
+
+    rng = numpy.random.RandomState(seed)
+    width, height = size
+    gradient = numpy.linspace(0, 255, width, dtype=numpy.float32)[None, :, None]
+    noise = rng.randint(0, 64, size=(height, width, 3)).astype(numpy.float32)
+    pixels = numpy.clip(gradient * 0.75 + noise, 0, 255).astype(numpy.uint8)
+    Image.fromarray(pixels, 'RGB').save(path, 'JPEG', quality=90)
+    return path
+
+
+def make_video(path: str, size=(640, 360), fps: int = 30, seconds: int = 3, seed: int = 1234) -> str:
+    """Короткий MP4 с движущейся полосой через OpenCV"""
+    import cv2
+    import numpy
+
+    rng = numpy.random.RandomState(seed)
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError("OpenCV не может записать mp4")
+    try:
+        background = rng.randint(0, 255, size=(height, width, 3)).astype(numpy.uint8)
+        for index in range(fps * seconds):
+            frame = background.copy()
+            x = (index * 7) % width
+            frame[:, x:x + 40] = (255, 255, 255)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Сборка веб-дашборда: ассеты с хешем в имени и сжатые копии в web-dashboard/dist
+
+web_api отдает файлы из сборки, если она есть, иначе из web-dashboard.
+Запускать после изменения HTML/CSS/JS дашборда.
+"""
+
+import sys
+import logging
+
+from utils.web_response import build_dashboard_assets
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+if __name__ == '__main__':
+    source_dir = sys.argv[1] if len(sys.argv) > 1 else 'web-dashboard'
+    build_dashboard_assets(source_dir)
@@ -29,8 +29,14 @@ ADMIN_USER_IDS = [6499246016]  # Замените на ваш Telegram ID
 WEB_TELEGRAM_BOT_TOKEN = os.getenv("WEB_TELEGRAM_BOT_TOKEN", '7966714751:AAEXhWtUxU4Hp9nnlEN1EUjK8wiYkwJmMfw')  # Добавьте полный токен!
 # Например: WEB_TELEGRAM_BOT_TOKEN = os.getenv("WEB_TELEGRAM_BOT_TOKEN", '1234567890:ABCdefGHIjklMNOpqrsTUVwxyz')
 
-# Настройки базы данных
-DATABASE_URL = f'sqlite:///{DATA_DIR}/database.sqlite'
+# Токен для служебных эндпоинтов веб-API (заголовок X-Admin-Token); пустой - эндпоинты отключены
+WEB_ADMIN_TOKEN = os.getenv("WEB_ADMIN_TOKEN", "")
+
+# Настройки базы данных (переопределяется окружением, например для бенчмарков на временной БД)
+DATABASE_URL = os.getenv("DATABASE_URL", f'sqlite:///{DATA_DIR}/database.sqlite')
+
+# Завершенные задачи публикации старше этого срока (дней) переносятся в архив
+PUBLISH_ARCHIVE_RETENTION_DAYS = int(os.getenv("PUBLISH_ARCHIVE_RETENTION_DAYS", "30"))
 
 # Настройки многопоточности
 MAX_WORKERS = 50  # Максимальное количество одновременных потоков
@@ -54,6 +60,8 @@ VERIFICATION_BOT_ADMIN_ID = 6499246016  # Ваш ID в Telegram
 
 # Добавьте в config.py
 TELEGRAM_ERROR_LOG = LOGS_DIR / 'telegram_errors.log'
+# Сводка ошибок по отпечаткам (счетчики, первое/последнее появление, примеры)
+ERROR_AGGREGATE_FILE = LOGS_DIR / 'errors.json'
 
 # EMAIL_SETTINGS для продвинутых систем
 EMAIL_SETTINGS = {
@@ -20,6 +20,9 @@ from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 
+from database.query_stats import install_query_stats
+from utils.metrics import get_metrics_registry
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -98,6 +101,9 @@ class DatabaseConnectionPool:
     def _setup_events(self):
         """Настройка событий для мониторинга"""
         
+        # Время и частота запросов по отпечаткам, журнал медленных запросов
+        install_query_stats(self.engine)
+        
         @event.listens_for(self.engine, "connect")
         def on_connect(dbapi_conn, connection_record):
             with self._lock:
@@ -324,4 +330,23 @@ def dispose_db_pool():
         _db_pool.dispose()
         _db_pool = None
 
+def dispose_db_connections():
+    """Закрыть соединения глобального пула, сохранив сам пул (например, перед fork)"""
+    if _db_pool:
+        _db_pool.dispose()
+
+def _collect_metrics(output):
+    """Метрики пула соединений для реестра"""
+    pool = _db_pool
+    if pool is None:
+        return
+    stats = pool.stats
+    output.gauge('db_pool_active_sessions', stats.active_sessions, 'Соединений выдано из пула')
+    output.gauge('db_pool_peak_sessions', stats.peak_sessions, 'Пик одновременных соединений')
+    output.counter('db_pool_sessions', stats.total_sessions, 'Создано сессий')
+    output.counter('db_pool_connection_errors', stats.connection_errors, 'Ошибок в сессиях')
+    output.gauge('db_pool_avg_session_seconds', stats.avg_session_time, 'Среднее время сессии')
+
+get_metrics_registry().register_collector('db_pool', _collect_metrics)
+
 logger.info("📦 Database Connection Pool модуль загружен") 
\ No newline at end of file
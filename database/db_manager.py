@@ -13,13 +13,15 @@ from database.models import Base, InstagramAccount, Proxy, PublishTask, TaskStat
 logger = logging.getLogger(__name__)
 
 # Импорт Database Connection Pool
-from database.connection_pool import init_db_pool, get_session_direct, get_db_stats, dispose_db_pool
+from database.connection_pool import init_db_pool, get_session_direct, get_db_stats, dispose_db_pool, dispose_db_connections
+from database.query_stats import install_query_stats
 
 # Создаем директорию для базы данных, если она не существует
 os.makedirs(os.path.dirname(DATABASE_URL.replace("sqlite:///", "")), exist_ok=True)
 
 # Создаем движок SQLAlchemy
 engine = create_engine(DATABASE_URL)
+install_query_stats(engine)
 
 # Создаем фабрику сессий
 Session = sessionmaker(bind=engine)
@@ -33,6 +35,8 @@ def init_db():
     
     # Создаем таблицы
     Base.metadata.create_all(engine)
+    from database.publish_archive import ensure_publish_task_autoincrement
+    ensure_publish_task_autoincrement(engine)
     logger.info("База данных инициализирована")
     
     # Инициализируем Connection Pool
@@ -51,6 +55,11 @@ def init_db():
             logger.warning(f"⚠️ Не удалось инициализировать Database Connection Pool: {e}")
             logger.info("🔄 Используется стандартный механизм сессий")
 
+def dispose_connections():
+    """Закрыть открытые соединения с БД (в мастере Gunicorn перед запуском воркеров)"""
+    engine.dispose()
+    dispose_db_connections()
+
 def get_session():
     """Возвращает новую сессию базы данных (с поддержкой Connection Pool)"""
     global _pool_initialized
@@ -627,6 +636,62 @@ def update_task_status(task_id, status, error_message=None, media_id=None):
     """
     return update_publish_task_status(task_id, status, error_message, media_id)
 
+def update_publish_task_options(task_id, **values):
+    """
+    Объединяет переданные значения с options задачи публикации
+    (например, тайминги этапов или прогресс загрузки)
+    """
+    try:
+        import json
+        session = get_session()
+        task = session.query(PublishTask).filter_by(id=task_id).first()
+
+        if not task:
+            session.close()
+            return False, "Задача не найдена"
+
+        options = json.loads(task.options) if task.options and isinstance(task.options, str) else dict(task.options or {})
+        options.update(values)
+        task.options = json.dumps(options)
+
+        session.commit()
+        session.close()
+        return True, None
+    except Exception as e:
+        logger.error(f"Ошибка при обновлении options задачи {task_id}: {e}")
+        return False, str(e)
+
+def get_publish_task_traces(limit=500, task_type=None):
+    """
+    Трассы этапов последних задач публикации (из options)
+    
+    Returns:
+        Список (task_id, трасса), новые задачи первыми
+    """
+    try:
+        import json
+        session = get_session()
+        query = session.query(PublishTask.id, PublishTask.options).filter(PublishTask.options.isnot(None))
+        if task_type:
+            query = query.filter(PublishTask.task_type == task_type)
+        rows = query.order_by(PublishTask.id.desc()).limit(limit).all()
+        session.close()
+
+        traces = []
+        for task_id, options in rows:
+            if isinstance(options, str):
+                try:
+                    options = json.loads(options)
+                except ValueError:
+                    continue
+            trace = (options or {}).get('trace')
+            if trace:
+                traces.append((task_id, trace))
+        return traces
+    except Exception as e:
+        logger.error(f"Ошибка при получении трасс этапов задач: {e}")
+        return []
+
 def get_publish_task(task_id):
     """Получает задачу на публикацию по ID"""
     try:
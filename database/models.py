@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Float, JSON, Enum, Table
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, Text, Float, JSON, Enum, Table, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -97,6 +97,8 @@ class InstagramAccount(Base):
 
 class PublishTask(Base):
     __tablename__ = 'publish_tasks'
+    # Id задач уходят в архив (publish_task_archive) - SQLite не должен выдавать их заново
+    __table_args__ = {'sqlite_autoincrement': True}
 
     id = Column(Integer, primary_key=True)
     account_id = Column(Integer, ForeignKey('instagram_accounts.id'), nullable=False)
@@ -133,6 +135,31 @@ class PublishTask(Base):
     # Отношения
     account = relationship("InstagramAccount", back_populates="tasks")
 
+class PublishTaskArchiveBatch(Base):
+    """Пачка архивных задач публикации: колонки в JSON, сжатые zlib"""
+    __tablename__ = 'publish_task_archive'
+
+    id = Column(Integer, primary_key=True)
+    min_task_id = Column(Integer, nullable=False, index=True)
+    max_task_id = Column(Integer, nullable=False, index=True)
+    min_finished_at = Column(DateTime, nullable=False)
+    max_finished_at = Column(DateTime, nullable=False, index=True)
+    row_count = Column(Integer, nullable=False)
+    account_ids = Column(JSON, nullable=False)  # Аккаунты в пачке - для пропуска пачек при фильтре
+    payload = Column(LargeBinary, nullable=False)
+    raw_size = Column(Integer, nullable=False)  # Размер до сжатия
+    archived_at = Column(DateTime, default=datetime.now)
+
+class PublishDailyStats(Base):
+    """Итоги архивных задач публикации по аккаунту, дню и типу"""
+    __tablename__ = 'publish_daily_stats'
+
+    account_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    task_type = Column(String(20), primary_key=True)
+    completed = Column(Integer, default=0, nullable=False)
+    failed = Column(Integer, default=0, nullable=False)
+
 class TelegramUser(Base):
     __tablename__ = 'telegram_users'
 
@@ -0,0 +1,477 @@
+# -*- coding: utf-8 -*-
+"""
+Publish Archive - Архив завершенных задач публикации
+
+Таблица publish_tasks растет бесконечно: завершенные и неудачные задачи
+хранят подписи, JSON options и пути к медиа, и каждый запрос статусов
+или истории читает все более крупную таблицу. Архивация раз в сутки:
+
+- задачи COMPLETED/FAILED, завершенные раньше срока хранения
+  (PUBLISH_ARCHIVE_RETENTION_DAYS), переносятся пачками в
+  publish_task_archive: значения одной колонки лежат подряд (JSON по
+  колонкам), пачка сжата zlib - однотипные значения сжимаются в разы
+- итоги по аккаунту, дню и типу переносятся в publish_daily_stats,
+  поэтому дневная статистика не требует распаковки архива
+- перенос пачки, итоги и удаление из publish_tasks - одна транзакция
+- publish_tasks объявлена с AUTOINCREMENT: без него SQLite выдает новой
+  задаче max(id) + 1 и повторно использует id, уже лежащие в архиве.
+  Старые базы перестраиваются при запуске (ensure_publish_task_autoincrement)
+
+История публикаций читает архив только по явному запросу
+(include_archive=True); архивные задачи возвращаются как
+ArchivedPublishTask с теми же полями, что у PublishTask.
+"""
+
+import json
+import zlib
+import logging
+import threading
+from dataclasses import dataclass, fields
+from datetime import datetime, date, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, inspect, text
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.orm import joinedload
+
+from config import PUBLISH_ARCHIVE_RETENTION_DAYS
+from database.models import (
+    PublishTask, PublishTaskArchiveBatch, PublishDailyStats, TaskStatus, TaskType
+)
+from utils.metrics import get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+# Задач в одной пачке архива
+ARCHIVE_BATCH_SIZE = 500
+
+# Версия формата пачки
+ARCHIVE_FORMAT_VERSION = 1
+
+# Статусы, которые переносятся в архив
+FINISHED_STATUSES = (TaskStatus.COMPLETED, TaskStatus.FAILED)
+
+_DATETIME_COLUMNS = ('scheduled_time', 'completed_time', 'created_at', 'updated_at')
+
+_finished_at = func.coalesce(PublishTask.completed_time, PublishTask.updated_at, PublishTask.created_at)
+
+
+@dataclass
+class ArchivedPublishTask:
+    """Задача публикации из архива (поля как у PublishTask)"""
+    id: int
+    account_id: int
+    user_id: Optional[int] = None
+    task_type: Optional[TaskType] = None
+    status: Optional[TaskStatus] = None
+    media_path: Optional[str] = None
+    caption: Optional[str] = None
+    hashtags: Optional[str] = None
+    scheduled_time: Optional[datetime] = None
+    completed_time: Optional[datetime] = None
+    error_message: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    location: Optional[str] = None
+    first_comment: Optional[str] = None
+    options: Any = None
+    media_paths: Any = None
+    story_options: Any = None
+    audio_path: Optional[str] = None
+    audio_start_time: Optional[float] = None
+    media_id: Optional[str] = None
+
+    archived = True
+    account = None
+
+    @property
+    def finished_at(self) -> Optional[datetime]:
+        return self.completed_time or self.updated_at or self.created_at
+
+
+ARCHIVE_COLUMNS = tuple(item.name for item in fields(ArchivedPublishTask))
+
+
+def finished_at(task) -> Optional[datetime]:
+    """Время завершения задачи (completed_time заполняется не везде)"""
+    return task.completed_time or task.updated_at or task.created_at
+
+
+def _encode_value(value):
+    if isinstance(value, (TaskType, TaskStatus)):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def encode_batch(tasks: Sequence[Any]) -> Tuple[bytes, int]:
+    """Пачка задач в сжатый JSON по колонкам: (сжатые данные, размер до сжатия)"""
+    columns = {
+        name: [_encode_value(getattr(task, name, None)) for task in tasks]
+        for name in ARCHIVE_COLUMNS
+    }
+    raw = json.dumps(
+        {'v': ARCHIVE_FORMAT_VERSION, 'rows': len(tasks), 'columns': columns},
+        ensure_ascii=False, separators=(',', ':'), default=str
+    ).encode('utf-8')
+    return zlib.compress(raw, 9), len(raw)
+
+
+def decode_batch(payload: bytes) -> List[ArchivedPublishTask]:
+    """Распаковать пачку архива"""
+    data = json.loads(zlib.decompress(payload).decode('utf-8'))
+    if data.get('v') != ARCHIVE_FORMAT_VERSION:
+        raise ValueError(f"Неизвестная версия пачки архива: {data.get('v')}")
+    columns = data['columns']
+    tasks = []
+    for index in range(data['rows']):
+        values = {name: columns[name][index] for name in ARCHIVE_COLUMNS if name in columns}
+        for name in _DATETIME_COLUMNS:
+            if values.get(name):
+                values[name] = datetime.fromisoformat(values[name])
+        if values.get('task_type'):
+            values['task_type'] = TaskType(values['task_type'])
+        if values.get('status'):
+            values['status'] = TaskStatus(values['status'])
+        tasks.append(ArchivedPublishTask(**values))
+    return tasks
+
+
+def _day_key(value) -> str:
+    # func.date() возвращает строку в SQLite и date в PostgreSQL
+    return value.isoformat() if isinstance(value, date) else str(value)[:10]
+
+
+def _type_key(value) -> str:
+    return value.value if isinstance(value, TaskType) else str(value)
+
+
+class PublishArchiver:
+    """Перенос завершенных задач публикации в архив и чтение истории"""
+
+    def __init__(self, session_factory=None, retention_days: int = PUBLISH_ARCHIVE_RETENTION_DAYS,
+                 batch_size: int = ARCHIVE_BATCH_SIZE):
+        if session_factory is None:
+            from database.db_manager import get_session
+            session_factory = get_session
+        self.session_factory = session_factory
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self._archive_lock = threading.Lock()
+        self.stats = {
+            'runs': 0,
+            'batches': 0,
+            'rows': 0,
+            'raw_bytes': 0,
+            'compressed_bytes': 0,
+            'last_run': None,
+            'last_duration': None,
+        }
+
+    # ------------------------------------------------------------------
+    # Архивация
+    # ------------------------------------------------------------------
+
+    def archive(self, now: Optional[datetime] = None, max_batches: Optional[int] = None,
+                should_stop=None) -> Dict[str, Any]:
+        """
+        Перенести задачи старше срока хранения в архив
+
+        Args:
+            now: Текущее время (для тестов)
+            max_batches: Ограничение числа пачек за запуск
+            should_stop: Функция, вернувшая True, прерывает перенос между пачками
+
+        Returns:
+            Итоги запуска: пачки, строки, размер до и после сжатия
+        """
+        if not self._archive_lock.acquire(blocking=False):
+            return {'skipped': True, 'batches': 0, 'rows': 0}
+        started = datetime.now()
+        cutoff = (now or started) - timedelta(days=self.retention_days)
+        result = {'batches': 0, 'rows': 0, 'raw_bytes': 0, 'compressed_bytes': 0, 'cutoff': cutoff.isoformat()}
+        try:
+            while max_batches is None or result['batches'] < max_batches:
+                if should_stop and should_stop():
+                    break
+                moved = self._archive_batch(cutoff)
+                if not moved:
+                    break
+                rows, raw_size, compressed_size = moved
+                result['batches'] += 1
+                result['rows'] += rows
+                result['raw_bytes'] += raw_size
+                result['compressed_bytes'] += compressed_size
+        finally:
+            self._archive_lock.release()
+
+        duration = (datetime.now() - started).total_seconds()
+        self.stats['runs'] += 1
+        for key in ('batches', 'rows', 'raw_bytes', 'compressed_bytes'):
+            self.stats[key] += result[key]
+        self.stats['last_run'] = started.isoformat()
+        self.stats['last_duration'] = round(duration, 3)
+        if result['rows']:
+            logger.info(
+                f"📦 В архив перенесено задач публикации: {result['rows']} "
+                f"({result['batches']} пачек, {result['raw_bytes'] / 1024:.0f} КБ → "
+                f"{result['compressed_bytes'] / 1024:.0f} КБ) за {duration:.1f}с"
+            )
+        return result
+
+    def _archive_batch(self, cutoff: datetime):
+        session = self.session_factory()
+        try:
+            tasks = session.query(PublishTask).filter(
+                PublishTask.status.in_(FINISHED_STATUSES),
+                _finished_at < cutoff
+            ).order_by(PublishTask.id).limit(self.batch_size).all()
+            if not tasks:
+                return None
+
+            payload, raw_size = encode_batch(tasks)
+            finished = [finished_at(task) for task in tasks]
+            session.add(PublishTaskArchiveBatch(
+                min_task_id=tasks[0].id,
+                max_task_id=tasks[-1].id,
+                min_finished_at=min(finished),
+                max_finished_at=max(finished),
+                row_count=len(tasks),
+                account_ids=sorted({task.account_id for task in tasks}),
+                payload=payload,
+                raw_size=raw_size,
+            ))
+
+            # Итоги по аккаунту, дню и типу остаются доступными без распаковки
+            totals: Dict[tuple, List[int]] = {}
+            for task, moment in zip(tasks, finished):
+                key = (task.account_id, moment.date(), _type_key(task.task_type))
+                counts = totals.setdefault(key, [0, 0])
+                counts[0 if task.status == TaskStatus.COMPLETED else 1] += 1
+            for (account_id, day, task_type), (completed, failed) in totals.items():
+                row = session.get(PublishDailyStats, (account_id, day, task_type))
+                if row is None:
+                    row = PublishDailyStats(account_id=account_id, day=day, task_type=task_type,
+                                            completed=0, failed=0)
+                    session.add(row)
+                row.completed += completed
+                row.failed += failed
+
+            session.query(PublishTask).filter(
+                PublishTask.id.in_([task.id for task in tasks])
+            ).delete(synchronize_session=False)
+            session.commit()
+            return len(tasks), raw_size, len(payload)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    # ------------------------------------------------------------------
+    # Чтение
+    # ------------------------------------------------------------------
+
+    def iter_archived(self, account_id: Optional[int] = None,
+                      statuses: Optional[Sequence[TaskStatus]] = None) -> Iterator[ArchivedPublishTask]:
+        """Архивные задачи, новые первыми (пачки распаковываются по мере чтения)"""
+        session = self.session_factory()
+        try:
+            batch_ids = [
+                row.id for row in session.query(PublishTaskArchiveBatch.id)
+                .order_by(PublishTaskArchiveBatch.max_finished_at.desc()).all()
+            ]
+        finally:
+            session.close()
+
+        for batch_id in batch_ids:
+            session = self.session_factory()
+            try:
+                batch = session.get(PublishTaskArchiveBatch, batch_id)
+                if batch is None or (account_id is not None and account_id not in (batch.account_ids or [])):
+                    continue
+                tasks = decode_batch(batch.payload)
+            finally:
+                session.close()
+            tasks.sort(key=lambda task: task.finished_at or datetime.min, reverse=True)
+            for task in tasks:
+                if account_id is not None and task.account_id != account_id:
+                    continue
+                if statuses and task.status not in statuses:
+                    continue
+                yield task
+
+    def get_history(self, limit: int = 10, include_archive: bool = False,
+                    account_id: Optional[int] = None,
+                    statuses: Sequence[TaskStatus] = FINISHED_STATUSES) -> list:
+        """
+        Последние завершенные задачи, новые первыми
+
+        Архив читается только при include_archive=True и только если
+        живых задач меньше limit.
+        """
+        session = self.session_factory()
+        try:
+            query = session.query(PublishTask).options(joinedload(PublishTask.account))
+            if statuses:
+                query = query.filter(PublishTask.status.in_(statuses))
+            if account_id is not None:
+                query = query.filter(PublishTask.account_id == account_id)
+            tasks = query.order_by(_finished_at.desc()).limit(limit).all()
+        finally:
+            session.close()
+
+        if include_archive and len(tasks) < limit:
+            for task in self.iter_archived(account_id, statuses):
+                tasks.append(task)
+                if len(tasks) >= limit:
+                    break
+        return tasks
+
+    def get_daily_stats(self, account_id: Optional[int] = None, days: int = 30,
+                        now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Завершенные и неудачные публикации по аккаунту, дню и типу (архив и живые задачи)"""
+        since = ((now or datetime.now()) - timedelta(days=days)).date()
+        totals: Dict[tuple, Dict[str, int]] = {}
+
+        def add(account, day, task_type, completed, failed):
+            counts = totals.setdefault((account, _day_key(day), _type_key(task_type)), {'completed': 0, 'failed': 0})
+            counts['completed'] += completed or 0
+            counts['failed'] += failed or 0
+
+        session = self.session_factory()
+        try:
+            archived = session.query(PublishDailyStats).filter(PublishDailyStats.day >= since)
+            if account_id is not None:
+                archived = archived.filter(PublishDailyStats.account_id == account_id)
+            for row in archived.all():
+                add(row.account_id, row.day, row.task_type, row.completed, row.failed)
+
+            day = func.date(_finished_at)
+            live = session.query(
+                PublishTask.account_id, day, PublishTask.task_type, PublishTask.status, func.count()
+            ).filter(
+                PublishTask.status.in_(FINISHED_STATUSES),
+                _finished_at >= datetime.combine(since, datetime.min.time())
+            )
+            if account_id is not None:
+                live = live.filter(PublishTask.account_id == account_id)
+            for account, task_day, task_type, status, count in live.group_by(
+                PublishTask.account_id, day, PublishTask.task_type, PublishTask.status
+            ).all():
+                completed = count if status == TaskStatus.COMPLETED else 0
+                add(account, task_day, task_type, completed, count - completed)
+        finally:
+            session.close()
+
+        return [
+            {'account_id': account, 'day': day, 'task_type': task_type, **counts}
+            for (account, day, task_type), counts in sorted(totals.items(), key=lambda item: (item[0][1], item[0][0]), reverse=True)
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Размер архива в БД и итоги запусков в этом процессе"""
+        session = self.session_factory()
+        try:
+            batches, rows, raw_size, compressed = session.query(
+                func.count(PublishTaskArchiveBatch.id),
+                func.coalesce(func.sum(PublishTaskArchiveBatch.row_count), 0),
+                func.coalesce(func.sum(PublishTaskArchiveBatch.raw_size), 0),
+                func.coalesce(func.sum(func.length(PublishTaskArchiveBatch.payload)), 0),
+            ).one()
+        finally:
+            session.close()
+        return {
+            'retention_days': self.retention_days,
+            'batch_size': self.batch_size,
+            'archive': {
+                'batches': batches,
+                'rows': rows,
+                'raw_mb': round(raw_size / (1024 * 1024), 2),
+                'compressed_mb': round(compressed / (1024 * 1024), 2),
+                'ratio': round(raw_size / compressed, 1) if compressed else None,
+            },
+            'process': dict(self.stats),
+        }
+
+
+def ensure_publish_task_autoincrement(engine) -> bool:
+    """
+    Перестроить publish_tasks в SQLite-базе, созданной без AUTOINCREMENT
+
+    SQLite не умеет менять ключ через ALTER TABLE, поэтому таблица
+    создается заново, строки копируются, а счетчик в sqlite_sequence
+    ставится не ниже наибольшего id в живых задачах и в архиве.
+
+    Returns:
+        True, если таблица перестроена
+    """
+    if engine.dialect.name != 'sqlite':
+        return False
+    table = PublishTask.__table__
+    with engine.begin() as conn:
+        sql = conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE type='table' AND name=:name"), {'name': table.name}
+        ).scalar()
+        if not sql or 'AUTOINCREMENT' in sql.upper():
+            return False
+
+        existing = {column['name'] for column in inspect(conn).get_columns(table.name)}
+        columns = ', '.join(f'"{column.name}"' for column in table.columns if column.name in existing)
+        tmp_name = f"{table.name}_autoincrement"
+        create_sql = str(CreateTable(table).compile(dialect=engine.dialect)).replace(
+            f"TABLE {table.name} ", f"TABLE {tmp_name} ", 1
+        )
+        conn.execute(text(f"DROP TABLE IF EXISTS {tmp_name}"))
+        conn.execute(text(create_sql))
+        conn.execute(text(f"INSERT INTO {tmp_name} ({columns}) SELECT {columns} FROM {table.name}"))
+        conn.execute(text(f"DROP TABLE {table.name}"))
+        conn.execute(text(f"ALTER TABLE {tmp_name} RENAME TO {table.name}"))
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+        high_water = max(
+            conn.execute(text(f"SELECT COALESCE(MAX(id), 0) FROM {table.name}")).scalar(),
+            conn.execute(text("SELECT COALESCE(MAX(max_task_id), 0) FROM publish_task_archive")).scalar()
+            if inspect(conn).has_table('publish_task_archive') else 0
+        )
+        conn.execute(text("DELETE FROM sqlite_sequence WHERE name = :name"), {'name': table.name})
+        conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"),
+                     {'name': table.name, 'seq': high_water})
+    logger.info(f"🔧 Таблица {table.name} перестроена с AUTOINCREMENT (счетчик id: {high_water})")
+    return True
+
+
+# Глобальный экземпляр
+_archiver: Optional[PublishArchiver] = None
+_archiver_lock = threading.Lock()
+
+
+def get_publish_archiver() -> PublishArchiver:
+    """Получить глобальный архиватор задач публикации"""
+    global _archiver
+    if _archiver is None:
+        with _archiver_lock:
+            if _archiver is None:
+                _archiver = PublishArchiver()
+    return _archiver
+
+
+def archive_publish_tasks() -> Dict[str, Any]:
+    """Задача фоновой среды: перенос старых задач в архив"""
+    from utils.background_runtime import get_background_runtime
+    runtime = get_background_runtime()
+    return get_publish_archiver().archive(should_stop=lambda: runtime.stopping)
+
+
+def _collect_metrics(output):
+    """Итоги архивации для реестра"""
+    if _archiver is None:
+        return
+    stats = _archiver.stats
+    output.counter('publish_archive_rows', stats['rows'], 'Задач публикации перенесено в архив')
+    output.counter('publish_archive_compressed_bytes', stats['compressed_bytes'], 'Размер перенесенных пачек после сжатия')
+
+
+get_metrics_registry().register_collector('publish_archive', _collect_metrics)
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+Query Stats - Статистика SQL-запросов и журнал медленных запросов
+
+ConnectionStats считает только сессии. Здесь события SQLAlchemy
+before/after_cursor_execute замеряют каждый запрос:
+
+- запрос нормализуется в отпечаток (литералы и списки IN заменяются на ?)
+- по отпечатку считаются вызовы, суммарное время, p50/p95/p99, строки
+- запросы дольше SQL_SLOW_QUERY_MS попадают в журнал медленных запросов
+  вместе с функцией db_manager, из которой они выполнены
+
+Строки берутся из cursor.rowcount: для INSERT/UPDATE/DELETE это число
+затронутых строк, для SELECT - только если драйвер его сообщает
+(psycopg2 сообщает, sqlite3 - нет).
+"""
+
+import os
+import re
+import sys
+import time
+import logging
+import threading
+import functools
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+from sqlalchemy import event
+
+from utils.metrics import get_metrics_registry, percentile
+
+logger = logging.getLogger(__name__)
+
+# Порог медленного запроса (мс)
+SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))
+
+# Последних замеров на отпечаток для перцентилей
+QUERY_SAMPLES = 512
+
+# Размер журнала медленных запросов
+SLOW_QUERY_LOG_SIZE = 100
+
+# Сверх этого числа отпечатков запросы учитываются в общей строке
+MAX_FINGERPRINTS = 2000
+OTHER_FINGERPRINT = '<прочие запросы>'
+
+_START_KEY = 'query_stats_start'
+_DB_MANAGER_FILE = os.path.join('database', 'db_manager.py')
+_SKIP_FRAMES = (os.sep + 'sqlalchemy' + os.sep, os.path.join('database', 'query_stats.py'))
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_PARAM_RE = re.compile(r"%\([^)]+\)s|(?<![:\w]):[A-Za-z_]\w*|\$\d+|%s")
+_WS_RE = re.compile(r"\s+")
+
+_query_seconds = get_metrics_registry().histogram(
+    'db_query_seconds', 'Время выполнения SQL-запросов',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize_statement(statement: str) -> str:
+    """Отпечаток запроса: без литералов, параметров и лишних пробелов"""
+    text = _STRING_RE.sub('?', statement)
+    text = _PARAM_RE.sub('?', text)
+    text = _NUMBER_RE.sub('?', text)
+    text = _WS_RE.sub(' ', text).strip()
+    return _IN_LIST_RE.sub('(?...)', text)
+
+
+def find_query_origin() -> str:
+    """Функция db_manager, из которой выполнен запрос (или первый кадр вне SQLAlchemy)"""
+    frame = sys._getframe(1)
+    fallback = None
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.endswith(_DB_MANAGER_FILE):
+            return f"db_manager.{frame.f_code.co_name}:{frame.f_lineno}"
+        if fallback is None and not any(part in filename for part in _SKIP_FRAMES):
+            fallback = f"{os.path.basename(filename)}:{frame.f_code.co_name}:{frame.f_lineno}"
+        frame = frame.f_back
+    return fallback or 'unknown'
+
+
+@dataclass
+class QueryStat:
+    """Статистика одного отпечатка запроса"""
+    fingerprint: str
+    calls: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+    rows: int = 0
+    errors: int = 0
+    slow_calls: int = 0
+    last_origin: Optional[str] = None
+    samples: Deque[float] = field(default_factory=lambda: deque(maxlen=QUERY_SAMPLES))
+
+    def to_dict(self) -> Dict[str, Any]:
+        samples = sorted(self.samples)
+        return {
+            'fingerprint': self.fingerprint,
+            'calls': self.calls,
+            'total_ms': round(self.total_time * 1000, 2),
+            'avg_ms': round(self.total_time / self.calls * 1000, 3) if self.calls else 0.0,
+            'p50_ms': round(percentile(samples, 50) * 1000, 3),
+            'p95_ms': round(percentile(samples, 95) * 1000, 3),
+            'p99_ms': round(percentile(samples, 99) * 1000, 3),
+            'max_ms': round(self.max_time * 1000, 3),
+            'rows': self.rows,
+            'errors': self.errors,
+            'slow_calls': self.slow_calls,
+            'last_origin': self.last_origin,
+        }
+
+
+class QueryStats:
+    """Сбор статистики запросов с одного или нескольких engine"""
+
+    SORT_KEYS = {
+        'total': lambda s: s.total_time,
+        'calls': lambda s: s.calls,
+        'max': lambda s: s.max_time,
+        'avg': lambda s: s.total_time / s.calls if s.calls else 0.0,
+    }
+
+    def __init__(self, slow_threshold_ms: float = SLOW_QUERY_MS):
+        self.slow_threshold = slow_threshold_ms / 1000
+        self._stats: Dict[str, QueryStat] = {}
+        self._slow_log: Deque[Dict[str, Any]] = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+        self._engines: List[Any] = []
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def install(self, engine):
+        """Подключить события к engine (повторный вызов ничего не делает)"""
+        with self._lock:
+            if any(existing is engine for existing in self._engines):
+                return
+            self._engines.append(engine)
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(engine, 'handle_error', self._handle_error)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault(_START_KEY, []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get(_START_KEY)
+        if not starts:
+            return
+        duration = time.perf_counter() - starts.pop()
+        _query_seconds.observe(duration)
+        rowcount = getattr(cursor, 'rowcount', -1)
+        self.record(statement, duration, rowcount if rowcount and rowcount > 0 else 0)
+
+    def _handle_error(self, context):
+        connection = context.connection
+        starts = connection.info.get(_START_KEY) if connection is not None else None
+        if starts:
+            starts.pop()
+        if context.statement:
+            self.record(context.statement, 0.0, error=True)
+
+    def record(self, statement: str, duration: float, rows: int = 0, error: bool = False):
+        """Учесть выполнение запроса"""
+        fingerprint = normalize_statement(statement)
+        slow = not error and duration >= self.slow_threshold
+        origin = find_query_origin() if slow else None
+
+        with self._lock:
+            stat = self._stats.get(fingerprint)
+            if stat is None:
+                if len(self._stats) >= MAX_FINGERPRINTS:
+                    fingerprint = OTHER_FINGERPRINT
+                    stat = self._stats.get(fingerprint)
+                if stat is None:
+                    stat = self._stats[fingerprint] = QueryStat(fingerprint)
+
+            if error:
+                stat.errors += 1
+                return
+
+            stat.calls += 1
+            stat.total_time += duration
+            stat.rows += rows
+            stat.samples.append(duration)
+            if duration > stat.max_time:
+                stat.max_time = duration
+            if slow:
+                stat.slow_calls += 1
+                stat.last_origin = origin
+                self._slow_log.append({
+                    'time': time.time(),
+                    'duration_ms': round(duration * 1000, 2),
+                    'fingerprint': fingerprint,
+                    'origin': origin,
+                    'rows': rows,
+                })
+
+        if slow:
+            logger.warning(f"🐢 Медленный запрос {duration * 1000:.0f}мс ({origin}): {fingerprint[:200]}")
+
+    def get_top(self, limit: int = 10, sort: str = 'total') -> List[Dict[str, Any]]:
+        """Топ отпечатков по суммарному (или другому) времени"""
+        key = self.SORT_KEYS.get(sort, self.SORT_KEYS['total'])
+        with self._lock:
+            stats = sorted(self._stats.values(), key=key, reverse=True)[:limit]
+            return [stat.to_dict() for stat in stats]
+
+    def get_slow_queries(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Последние медленные запросы, новые первыми"""
+        with self._lock:
+            return list(self._slow_log)[::-1][:limit]
+
+    def get_stats(self, limit: int = 10, sort: str = 'total') -> Dict[str, Any]:
+        with self._lock:
+            total_calls = sum(s.calls for s in self._stats.values())
+            total_time = sum(s.total_time for s in self._stats.values())
+            statements = len(self._stats)
+            slow_count = sum(s.slow_calls for s in self._stats.values())
+        return {
+            'since': self.started_at,
+            'statements': statements,
+            'total_calls': total_calls,
+            'total_time_ms': round(total_time * 1000, 2),
+            'slow_threshold_ms': self.slow_threshold * 1000,
+            'slow_calls': slow_count,
+            'top': self.get_top(limit, sort),
+            'slow': self.get_slow_queries(limit),
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow_log.clear()
+            self.started_at = time.time()
+        logger.info("📊 Статистика SQL-запросов сброшена")
+
+
+# Глобальный экземпляр
+_query_stats = QueryStats()
+
+
+def get_query_stats() -> QueryStats:
+    """Получить глобальную статистику SQL-запросов"""
+    return _query_stats
+
+
+def install_query_stats(engine):
+    """Подключить глобальную статистику запросов к engine"""
+    _query_stats.install(engine)
+
+
+def _collect_metrics(output):
+    """Сводка статистики запросов для реестра метрик"""
+    with _query_stats._lock:
+        stats = list(_query_stats._stats.values())
+    output.gauge('db_query_fingerprints', len(stats), 'Различных отпечатков SQL-запросов')
+    output.counter('db_query_errors', sum(s.errors for s in stats), 'Запросов с ошибкой')
+    output.counter('db_slow_queries', sum(s.slow_calls for s in stats), 'Медленных запросов')
+
+
+get_metrics_registry().register_collector('db_queries', _collect_metrics)
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Конфигурация Gunicorn для веб-API
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Плавная перезагрузка:
+- kill -HUP <master>   - перечитать конфиг и заменить воркеры; текущие
+  запросы и публикации дорабатывают graceful_timeout секунд, после чего
+  мастер убивает воркер (SIGKILL) - публикация обрывается на середине
+- kill -USR2 <master>, затем kill -QUIT <старый master> - обновление кода
+  (при preload_app код загружен в мастере и HUP его не перечитывает)
+"""
+
+import os
+import fcntl
+import threading
+import multiprocessing
+
+CPU_COUNT = multiprocessing.cpu_count()
+
+bind = os.getenv("WEB_BIND", "0.0.0.0:8080")
+
+# Фоновые задачи веб-API, поток событий SSE и очередь публикаций живут
+# в памяти процесса, поэтому по умолчанию один воркер, а параллельность
+# дают потоки. Каждый SSE-клиент занимает поток, отсюда запас по потокам.
+workers = int(os.getenv("WEB_WORKERS", "1"))
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", str(min(max(8, CPU_COUNT * 4), 64))))
+
+# Один раз импортируем приложение и неизменяемые данные (патчи instagrapi,
+# модели, конфиги устройств) в мастере, воркеры получают их через fork
+preload_app = os.getenv("WEB_PRELOAD", "1") == "1"
+
+timeout = 60
+# При выходе воркер ждет текущие публикации (stop_task_queue(wait=True)), а мастер
+# убивает его через graceful_timeout. Значение должно быть больше самой долгой
+# публикации: загрузка Reels до 650 MB и ожидание перекодирования (до 50 попыток configure)
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "600"))
+keepalive = 5
+
+accesslog = os.getenv("WEB_ACCESS_LOG", "-")
+loglevel = os.getenv("WEB_LOG_LEVEL", "info")
+
+# Очередь публикаций и умный валидатор (0 - только обслуживание запросов)
+BACKGROUND_SERVICES = os.getenv("WEB_BACKGROUND_SERVICES", "1") == "1"
+BACKGROUND_LOCK_FILE = os.getenv("WEB_BACKGROUND_LOCK", os.path.join("data", "web_background.lock"))
+
+_background_lock = None
+_background_state = threading.Lock()
+_worker_exiting = False
+
+
+def when_ready(server):
+    """Мастер не работает с БД: закрываем соединения, открытые при загрузке"""
+    if preload_app:
+        from database.db_manager import dispose_connections
+        dispose_connections()
+
+
+def _start_background(worker, lock):
+    """Запустить фоновые сервисы под взятой блокировкой (если воркер еще не выходит)"""
+    global _background_lock
+
+    with _background_state:
+        if _worker_exiting:
+            lock.close()
+            return
+        _background_lock = lock
+        from web_api import start_background_services
+        start_background_services()
+    worker.log.info(f"Воркер {worker.pid}: фоновые сервисы запущены")
+
+
+def _wait_background_lock(worker, lock):
+    """Дождаться, пока воркер-владелец блокировки выйдет (HUP, USR2), и забрать сервисы"""
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+    except OSError as e:
+        lock.close()
+        worker.log.warning(f"Воркер {worker.pid}: не удалось дождаться блокировки фоновых сервисов: {e}")
+        return
+    _start_background(worker, lock)
+
+
+def post_worker_init(worker):
+    """
+    Фоновые сервисы запускаются только в воркере, взявшем блокировку
+
+    При HUP и USR2 новые воркеры стартуют, пока старый еще держит
+    блокировку, поэтому остальные воркеры ждут ее в фоновом потоке и
+    первый дождавшийся запускает сервисы.
+    """
+    if not BACKGROUND_SERVICES:
+        return
+    os.makedirs(os.path.dirname(BACKGROUND_LOCK_FILE) or '.', exist_ok=True)
+    lock = open(BACKGROUND_LOCK_FILE, 'w')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        worker.log.info(f"Воркер {worker.pid}: фоновые сервисы запущены в другом воркере, ждем блокировку")
+        threading.Thread(target=_wait_background_lock, args=(worker, lock),
+                         name="background-lock", daemon=True).start()
+        return
+    _start_background(worker, lock)
+
+
+def worker_exit(server, worker):
+    """Даем текущим публикациям и задачам завершиться и освобождаем блокировку"""
+    global _background_lock, _worker_exiting
+
+    with _background_state:
+        _worker_exiting = True
+        lock, _background_lock = _background_lock, None
+    if lock is None:
+        return
+    from web_api import stop_background_services
+    worker.log.info(f"Воркер {worker.pid}: ждем текущие публикации (не дольше {graceful_timeout} с)")
+    stop_background_services()
+    lock.close()
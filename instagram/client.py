@@ -8,10 +8,12 @@ from .custom_client import CustomClient as Client
 from instagrapi.exceptions import LoginRequired, BadPassword, ChallengeRequired
 from .email_utils import get_verification_code_from_email, cleanup_email_logs
 from config import ACCOUNTS_DIR
-from database.db_manager import get_instagram_account, update_account_session_data, get_proxy_for_account, get_instagram_account_by_username
+from database.db_manager import get_instagram_account, get_proxy_for_account, get_instagram_account_by_username
 from device_manager import generate_device_settings, get_or_create_device_settings
 from .client_patch import *
 from utils.rotating_proxy_manager import get_rotating_proxy_url
+from .session_liveness import verify_session
+from .session_store import get_session_store
 #from instagram.clip_upload_patch import *
 import builtins
 import sys
@@ -88,8 +90,8 @@ class InstagramClient:
             # Проверяем, не вошли ли мы уже
             if self.is_logged_in:
                 try:
-                    # Проверяем, активна ли сессия
-                    self.client.get_timeline_feed()
+                    # Проверяем, активна ли сессия (свежая сессия - без запроса)
+                    verify_session(self.client)
                     return True
                 except:
                     # Если сессия не активна, продолжаем вход
@@ -112,19 +114,18 @@ class InstagramClient:
 
             try:
                 # Пытаемся использовать сохраненную сессию
-                session_file = os.path.join(ACCOUNTS_DIR, str(self.account_id), "session.json")
+                session_store = get_session_store()
 
-                if os.path.exists(session_file):
+                if session_store.exists(self.account_id):
                     logger.info(f"Найден файл сессии для аккаунта {self.account.username}")
 
                     try:
                         # Загружаем данные сессии
-                        with open(session_file, 'r') as f:
-                            session_data = json.load(f)
+                        settings = session_store.load_settings(self.account_id)
 
                         # Устанавливаем настройки клиента из сессии
-                        if 'settings' in session_data:
-                            self.client.set_settings(session_data['settings'])
+                        if settings:
+                            self.client.set_settings(settings)
                             logger.info(f"Загружены сохраненные настройки устройства для {self.account.username}")
 
                             # Пытаемся использовать сохраненную сессию
@@ -431,30 +432,9 @@ class InstagramClient:
     def _save_session(self):
         """Сохраняет данные сессии"""
         try:
-            # Создаем директорию для аккаунта, если она не существует
-            account_dir = os.path.join(ACCOUNTS_DIR, str(self.account_id))
-            os.makedirs(account_dir, exist_ok=True)
-
-            # Получаем настройки клиента
-            settings = self.client.get_settings()
-
-            # Формируем данные сессии
-            session_data = {
-                'username': self.account.username,
-                'account_id': self.account_id,
-                'last_login': time.strftime('%Y-%m-%d %H:%M:%S'),
-                'settings': settings
-            }
-
-            # Сохраняем в файл
-            session_file = os.path.join(account_dir, "session.json")
-            with open(session_file, 'w') as f:
-                json.dump(session_data, f)
-
-            # Обновляем данные сессии в базе данных
-            update_account_session_data(self.account_id, json.dumps(session_data))
-
-            logger.info(f"Сессия сохранена для пользователя {self.account.username}")
+            # Файл перезаписывается только при изменении настроек, копия в БД обновляется в фоне
+            if get_session_store().save_client(self.account_id, self.client, self.account.username):
+                logger.info(f"Сессия сохранена для пользователя {self.account.username}")
 
         except Exception as e:
             logger.error(f"Ошибка при сохранении сессии для {self.account.username}: {e}")
@@ -470,8 +450,8 @@ class InstagramClient:
             return self.login()
 
         try:
-            # Проверяем, активна ли сессия
-            self.client.get_timeline_feed()
+            # Проверяем, активна ли сессия (свежая сессия - без запроса)
+            verify_session(self.client)
             return True
         except Exception:
             # Если сессия не активна, пытаемся войти снова
@@ -623,23 +603,22 @@ def test_instagram_login_with_proxy(account_id, username, password, email=None,
             logger.warning("Сервис instagram_service недоступен, используется оригинальный пароль")
 
         # Проверяем наличие файла сессии
-        session_file = os.path.join(ACCOUNTS_DIR, str(account_id), "session.json")
+        session_store = get_session_store()
 
         # Создаем клиент Instagram с пустыми настройками (избегаем None)
         client = Client(settings={})
         logger.info(f"Создан клиент Instagram для {username}")
 
         # Проверяем существующую сессию
-        if os.path.exists(session_file):
+        if session_store.exists(account_id):
             logger.info(f"Найден файл сессии для аккаунта {username}")
             try:
                 # Загружаем данные сессии
-                with open(session_file, 'r') as f:
-                    session_data = json.load(f)
+                settings = session_store.load_settings(account_id)
 
                 # Устанавливаем настройки клиента из сессии
-                if 'settings' in session_data:
-                    client.set_settings(session_data['settings'])
+                if settings:
+                    client.set_settings(settings)
                     logger.info(f"Загружены сохраненные настройки устройства для {username}")
 
                 # Получаем прокси для аккаунта с ротацией IP
@@ -681,7 +660,7 @@ def test_instagram_login_with_proxy(account_id, username, password, email=None,
                 logger.warning(f"Не удалось использовать сохраненную сессию для {username}: {e}")
                 # Удаляем недействительный файл сессии
                 try:
-                    os.remove(session_file)
+                    session_store.delete(account_id)
                     logger.info(f"Удален недействительный файл сессии для {username}")
                 except Exception as del_error:
                     logger.warning(f"Не удалось удалить файл сессии для {username}: {del_error}")
@@ -925,20 +904,9 @@ def test_instagram_login_with_proxy(account_id, username, password, email=None,
             
             return False
         elif login_success:
-            # Сохраняем сессию
-            account_dir = os.path.join(ACCOUNTS_DIR, str(account_id))
-            os.makedirs(account_dir, exist_ok=True)
-
-            session_data = {
-                'username': username,
-                'account_id': account_id,
-                'last_login': time.strftime('%Y-%m-%d %H:%M:%S'),
-                'settings': client.get_settings()
-            }
-
-            with open(session_file, 'w') as f:
-                json.dump(session_data, f)
-            logger.info(f"Сохранена сессия для {username}")
+            # Сохраняем сессию (копия в БД обновляется в фоне)
+            if session_store.save_client(account_id, client, username):
+                logger.info(f"Сохранена сессия для {username}")
 
             # Обновляем статус аккаунта в базе данных как активный
             from database.db_manager import update_instagram_account
@@ -967,9 +935,9 @@ def test_instagram_login_with_proxy(account_id, username, password, email=None,
         logger.error(f"Ошибка при входе для пользователя {username}: {error_msg}")
         logger.error(f"📍 TRACEBACK ДЛЯ ОТЛАДКИ: {traceback.format_exc()}")
         # Если файл сессии существует, удаляем его
-        if os.path.exists(session_file):
+        if get_session_store().exists(account_id):
             try:
-                os.remove(session_file)
+                get_session_store().delete(account_id)
                 logger.info(f"Удален файл сессии после ошибки входа для {username}")
             except Exception as del_error:
                 logger.warning(f"Не удалось удалить файл сессии для {username}: {del_error}")
@@ -1065,19 +1033,18 @@ def login_with_session(username, password, account_id, email=None, email_passwor
             logger.info(f"🚫 Пустой challenge handler установлен (нет email данных)")
 
         # Проверяем наличие файла сессии
-        session_file = os.path.join(ACCOUNTS_DIR, str(account_id), "session.json")
+        session_store = get_session_store()
 
-        if os.path.exists(session_file):
+        if session_store.exists(account_id):
             logger.info(f"Найден файл сессии для аккаунта {username}")
 
             try:
                 # Загружаем данные сессии
-                with open(session_file, 'r') as f:
-                    session_data = json.load(f)
+                settings = session_store.load_settings(account_id)
 
                 # Устанавливаем настройки клиента из сессии
-                if 'settings' in session_data:
-                    client.set_settings(session_data['settings'])
+                if settings:
+                    client.set_settings(settings)
                     logger.info(f"Загружены сохраненные настройки устройства для {username}")
 
                 # Пытаемся использовать сохраненную сессию
@@ -1112,28 +1079,9 @@ def login_with_session(username, password, account_id, email=None, email_passwor
         # Сохраняем сессию
         try:
             # Создаем директорию для аккаунта, если она не существует
-            account_dir = os.path.join(ACCOUNTS_DIR, str(account_id))
-            os.makedirs(account_dir, exist_ok=True)
-
-            # Получаем настройки клиента
-            settings = client.get_settings()
-
-            # Формируем данные сессии
-            session_data = {
-                'username': username,
-                'account_id': account_id,
-                'last_login': time.strftime('%Y-%m-%d %H:%M:%S'),
-                'settings': settings
-            }
-
-            # Сохраняем в файл
-            with open(session_file, 'w') as f:
-                json.dump(session_data, f)
-
-            # Обновляем данные сессии в базе данных
-            update_account_session_data(account_id, json.dumps(session_data))
-
-            logger.info(f"Сессия сохранена для пользователя {username}")
+            # Файл перезаписывается только при изменении настроек, копия в БД обновляется в фоне
+            if session_store.save_client(account_id, client, username):
+                logger.info(f"Сессия сохранена для пользователя {username}")
 
         except Exception as e:
             logger.error(f"Ошибка при сохранении сессии для {username}: {e}")
@@ -1322,9 +1270,10 @@ def get_instagram_client(account_id, skip_recovery=False, force_login=False):
     # Проверяем, есть ли клиент в кэше
     if account_id in _instagram_clients and not force_login:
         client = _instagram_clients[account_id]
-        # Проверяем, активна ли сессия
+        # Проверяем, активна ли сессия: недавний успешный запрос подтверждает ее
+        # без сетевого вызова, иначе - легкий проверочный запрос
         try:
-            client.get_timeline_feed()
+            verify_session(client)
             logger.info(f"Используем кэшированный клиент для аккаунта {account_id}")
             return client
         except Exception as e:
@@ -1346,25 +1295,22 @@ def get_instagram_client(account_id, skip_recovery=False, force_login=False):
     # Если skip_recovery, пробуем только использовать существующую сессию
     if skip_recovery:
         try:
-            session_file = os.path.join(ACCOUNTS_DIR, str(account_id), "session.json")
-            if os.path.exists(session_file):
+            settings = get_session_store().load_settings(account_id)
+            if settings:
                 client = Client(settings={})
                 
                 # Применяем патч для обработки ошибок публичных запросов
                 patch_public_graphql_request(client)
                 
-                with open(session_file, 'r') as f:
-                    session_data = json.load(f)
-                if 'settings' in session_data:
-                    client.set_settings(session_data['settings'])
-                    # Пробуем использовать сессию без восстановления
-                    try:
-                        client.login(account.username, account.password)
-                        client.get_timeline_feed()  # Проверяем что работает
-                        _instagram_clients[account_id] = client
-                        return client
-                    except:
-                        return None
+                client.set_settings(settings)
+                # Пробуем использовать сессию без восстановления
+                try:
+                    client.login(account.username, account.password)
+                    verify_session(client)  # Проверяем что работает
+                    _instagram_clients[account_id] = client
+                    return client
+                except:
+                    return None
         except:
             return None
 
@@ -1408,16 +1354,10 @@ def refresh_instagram_sessions():
                     client.get_timeline_feed()
                     logger.info(f"Сессия обновлена для аккаунта {account.username}")
 
-                    # Обновляем время последнего входа в session.json
-                    session_file = os.path.join(ACCOUNTS_DIR, str(account.id), "session.json")
-                    if os.path.exists(session_file):
-                        with open(session_file, 'r') as f:
-                            session_data = json.load(f)
-
-                        session_data['last_login'] = time.strftime('%Y-%m-%d %H:%M:%S')
-
-                        with open(session_file, 'w') as f:
-                            json.dump(session_data, f)
+                    # Сохраняем сессию: если настройки не изменились, файл не перезаписывается
+                    session_store = get_session_store()
+                    session_store.touch(account.id)
+                    session_store.save_client(account.id, client, account.username)
                 except Exception as e:
                     logger.warning(f"Ошибка при обновлении сессии для {account.username}: {e}")
                     # Удаляем из кэша и пробуем войти заново
@@ -1455,6 +1395,7 @@ def remove_instagram_account(account_id):
             del _instagram_clients[account_id]
 
         # Удаляем файлы сессии
+        get_session_store().delete(account_id)
         session_dir = os.path.join(ACCOUNTS_DIR, str(account_id))
         if os.path.exists(session_dir):
             import shutil
@@ -1563,11 +1504,14 @@ get_instagram_client = get_instagram_client_with_adapter
 # Функция для получения статистики клиентов
 def get_instagram_client_stats():
     """Получает статистику работы Instagram клиентов"""
+    from .session_liveness import get_liveness_stats
     try:
         from instagram.client_adapter import get_client_stats
-        return get_client_stats()
+        stats = get_client_stats()
     except ImportError:
-        return {'mode': 'normal', 'adapter_not_available': True}
+        stats = {'mode': 'normal', 'adapter_not_available': True}
+    stats['session_liveness'] = get_liveness_stats()
+    return stats
 
 
 # Функция для очистки клиентов
@@ -1,10 +1,12 @@
 from instagrapi import Client
 from instagrapi.mixins.private import PrivateRequestMixin
+from instagrapi.exceptions import LoginRequired, ChallengeRequired
 import logging
 import builtins
 import re
 from instagram.email_utils import get_verification_code_from_email
 from database.db_manager import get_instagram_account
+from instagram.session_liveness import mark_session_alive, mark_session_dead
 
 logger = logging.getLogger(__name__)
 
@@ -38,8 +40,17 @@ def patched_send_private_request(self, *args, **kwargs):
         if "device_name" in self.settings:
             logger.info(f"📱 УСТРОЙСТВО: {self.settings['device_name']}")
 
-    # Вызываем оригинальный метод
-    return original_send_private_request(self, *args, **kwargs)
+    # Вызываем оригинальный метод и отмечаем живость сессии
+    try:
+        result = original_send_private_request(self, *args, **kwargs)
+    except LoginRequired:
+        mark_session_dead(self, 'login_required')
+        raise
+    except ChallengeRequired:
+        mark_session_dead(self, 'challenge_required')
+        raise
+    mark_session_alive(self)
+    return result
 
 # Применяем патч
 PrivateRequestMixin._send_private_request = patched_send_private_request
@@ -17,6 +17,11 @@ from dataclasses import dataclass
 from instagrapi import Client
 from database.db_manager import get_instagram_account
 from utils.encryption import encryption
+from utils.metrics import get_metrics_registry
+from utils.memory_accounting import (
+    get_item_mb, register_memory_group, ACTIVE_CLIENTS_GROUP, SLEEPING_CLIENTS_GROUP,
+    DEFAULT_ACTIVE_CLIENT_MB, DEFAULT_SLEEPING_CLIENT_MB
+)
 
 logger = logging.getLogger(__name__)
 
@@ -385,7 +390,11 @@ class InstagramClientPool:
                 'clients_put_to_sleep': getattr(self._pool_stats, 'clients_put_to_sleep', 0),
                 'clients_woken_up': getattr(self._pool_stats, 'clients_woken_up', 0),
                 'memory_saved_by_sleep_mb': getattr(self._pool_stats, 'memory_saved_by_sleep', 0),
-                'total_memory_usage_mb': (len(self._clients) * 4) + (len(self.sleeping_clients) * 0.8),  # 4MB active + 0.8MB sleeping
+                # Средний размер клиента по последнему замеру графа объектов (до замера - оценка)
+                'total_memory_usage_mb': round(
+                    len(self._clients) * get_item_mb(ACTIVE_CLIENTS_GROUP, DEFAULT_ACTIVE_CLIENT_MB)
+                    + len(self.sleeping_clients) * get_item_mb(SLEEPING_CLIENTS_GROUP, DEFAULT_SLEEPING_CLIENT_MB), 2
+                ),
             }
     
     def shutdown(self):
@@ -400,6 +409,10 @@ class InstagramClientPool:
 # Глобальный экземпляр пула
 _client_pool: Optional[InstagramClientPool] = None
 
+_get_client_seconds = get_metrics_registry().histogram(
+    'client_pool_get_client_seconds', 'Время получения клиента из пула (с созданием нового)'
+)
+
 def init_client_pool(initial_max_clients: int = 50,
                     max_clients_limit: int = 300, 
                     adaptive_scaling: bool = True,
@@ -430,7 +443,8 @@ def get_instagram_client(account_id: int, force_new: bool = False) -> Optional[C
         # Автоматическая инициализация если пул не создан
         init_client_pool()
     
-    return _client_pool.get_client(account_id, force_new)
+    with _get_client_seconds.time():
+        return _client_pool.get_client(account_id, force_new)
 
 def release_instagram_client(account_id: int):
     """Освободить клиент в глобальном пуле"""
@@ -460,6 +474,24 @@ def shutdown_client_pool():
         _client_pool.shutdown()
         _client_pool = None
 
+def _collect_metrics(output):
+    """Метрики пула для реестра (без обхода client_details)"""
+    pool = _client_pool
+    if pool is None:
+        return
+    stats = pool._pool_stats
+    output.gauge('client_pool_clients', len(pool._clients), 'Клиентов в пуле')
+    output.gauge('client_pool_sleeping_clients', len(pool.sleeping_clients), 'Спящих клиентов')
+    output.gauge('client_pool_max_clients', pool.current_max_clients, 'Текущий лимит пула')
+    output.counter('client_pool_created', stats.created_count, 'Создано клиентов')
+    output.counter('client_pool_removed', stats.removed_count, 'Удалено клиентов')
+    output.counter('client_pool_cache_hits', stats.cache_hits, 'Клиент взят из пула')
+    output.counter('client_pool_cache_misses', stats.cache_misses, 'Клиента не было в пуле')
+
+get_metrics_registry().register_collector('client_pool', _collect_metrics)
+register_memory_group(ACTIVE_CLIENTS_GROUP, lambda: list(_client_pool._clients.values()) if _client_pool else [])
+register_memory_group(SLEEPING_CLIENTS_GROUP, lambda: list(_client_pool.sleeping_clients.values()) if _client_pool else [])
+
 # Автоматическая инициализация при импорте
 init_client_pool()
 
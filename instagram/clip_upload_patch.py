@@ -1,11 +1,152 @@
 """
-Патч для метода clip_upload в instagrapi (УДАЛЕН)
-Instagram автоматически разделяет Reels и обычные посты в разные разделы.
-Дополнительная логика скрытия/показа в ленте больше не требуется.
+Патч для instagrapi: докачиваемая загрузка Reels
+
+Старый патч clip_upload удален - Instagram автоматически разделяет Reels и
+обычные посты в разные разделы, дополнительная логика скрытия не требуется.
+
+Добавляет метод Client.clip_upload_resumable: видео отправляется чанками
+через ResumableUploader, обрыв соединения приводит к повтору одного чанка,
+а сохраненное состояние (upload_id, upload_name, offset) позволяет
+повторной задаче продолжить загрузку вместо повторной отправки всего файла.
 """
+import json
+import os
+import random
+import time
 import logging
+from pathlib import Path
+from uuid import uuid4
+
+from instagrapi import Client, config
+from instagrapi.extractors import extract_media_v1
+
+from instagram.resumable_upload import ResumableUploader, DEFAULT_CHUNK_SIZE
+from utils.media_metadata import get_media_metadata, get_media_thumbnail
 
 logger = logging.getLogger(__name__)
 
-# Патч удален - Instagram автоматически управляет отображением Reels
-logger.info("Патч clip_upload не применяется - Instagram автоматически разделяет Reels и посты")
\ No newline at end of file
+__all__ = ['clip_upload_resumable']
+
+
+def _new_upload_state(path: Path) -> dict:
+    """Новое состояние загрузки для файла"""
+    st = os.stat(path)
+    upload_id = str(int(time.time() * 1000))
+    return {
+        'upload_id': upload_id,
+        'upload_name': f"{upload_id}_0_{random.randint(1000000000, 9999999999)}",
+        'waterfall_id': str(uuid4()),
+        'file_size': st.st_size,
+        'file_mtime': st.st_mtime,
+        'offset': 0,
+    }
+
+
+def _state_matches(state, path: Path) -> bool:
+    """Сохраненное состояние относится к этому же файлу"""
+    if not state or not state.get('upload_name'):
+        return False
+    st = os.stat(path)
+    return state.get('file_size') == st.st_size and state.get('file_mtime') == st.st_mtime
+
+
+def clip_upload_resumable(self, path, caption: str, thumbnail=None, usertags=[], location=None,
+                          configure_timeout: int = 10, feed_show: str = "1", extra_data: dict = {},
+                          resume_state: dict = None, on_progress=None,
+                          chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Загрузка Reels частями с докачкой
+
+    Args:
+        path: Путь к видео
+        caption: Подпись
+        thumbnail: Обложка (по умолчанию - первый кадр из кэша метаданных,
+                   если его не извлечь - обложка instagrapi)
+        resume_state: Сохраненное состояние предыдущей попытки
+        on_progress: Колбэк (state) после каждого подтвержденного чанка
+        chunk_size: Размер чанка
+
+    Returns:
+        Media
+    """
+    path = Path(path)
+
+    meta = get_media_metadata(str(path))
+    if not meta or not meta.duration:
+        raise ValueError(f"Не удалось определить параметры видео: {path}")
+    width, height = meta.display_size
+    duration = meta.duration
+
+    if thumbnail is None:
+        thumbnail = get_media_thumbnail(str(path), 0.0)
+    if thumbnail is None:
+        # Кэш метаданных не смог извлечь кадр - обложку делает сам instagrapi (moviepy).
+        # Проверяем до загрузки: без обложки configure упадет уже после отправки всего видео
+        logger.warning(f"⚠️ Нет обложки из кэша метаданных для {path.name}, создаем средствами instagrapi")
+        try:
+            from instagrapi.mixins.clip import analyze_video
+            thumbnail = analyze_video(path)[0]
+        except Exception as e:
+            raise ValueError(f"Не удалось получить обложку для Reels {path}: {e}") from e
+
+    state = dict(resume_state) if _state_matches(resume_state, path) else _new_upload_state(path)
+    if state.get('offset'):
+        logger.info(f"⏯️ Возобновляем загрузку Reels {path.name} (upload_id={state['upload_id']})")
+
+    rupload_params = {
+        "retry_context": '{"num_step_auto_retry":0,"num_reupload":0,"num_step_manual_retry":0}',
+        "media_type": "2",
+        "xsharing_user_ids": "[]",
+        "upload_id": state['upload_id'],
+        "upload_media_duration_ms": str(int(duration * 1000)),
+        "upload_media_width": str(width),
+        "upload_media_height": str(height),
+        "is_clips_video": "1",
+    }
+    headers = {
+        "Accept-Encoding": "gzip",
+        "X-Instagram-Rupload-Params": json.dumps(rupload_params),
+        "X_FB_VIDEO_WATERFALL_ID": state['waterfall_id'],
+        "X-Entity-Type": "video/mp4",
+        "X-Entity-Name": state['upload_name'],
+        "Segment-Start-Offset": "0",
+        "Segment-Type": "3",
+    }
+
+    def progress(offset, total):
+        state['offset'] = offset
+        if on_progress:
+            on_progress(dict(state))
+
+    uploader = ResumableUploader(
+        self.private,
+        f"https://{config.API_DOMAIN}/rupload_igvideo/{state['upload_name']}",
+        headers=headers,
+        chunk_size=chunk_size,
+        progress_callback=progress
+    )
+    try:
+        uploader.upload(str(path), start_offset=state.get('offset'))
+    finally:
+        self.last_upload_stats = uploader.stats.to_dict()
+
+    for attempt in range(50):
+        time.sleep(configure_timeout)
+        try:
+            configured = self.clip_configure(
+                state['upload_id'], Path(thumbnail), width, height, duration, caption,
+                usertags, location, feed_show, extra_data=extra_data
+            )
+        except Exception as e:
+            if "Transcode not finished yet" in str(e):
+                continue
+            raise
+        if configured:
+            return extract_media_v1(configured.get("media"))
+
+    raise RuntimeError("Instagram не подтвердил публикацию Reels после загрузки")
+
+
+Client.clip_upload_resumable = clip_upload_resumable
+
+logger.info("Патч clip_upload_resumable применен")
@@ -8,7 +8,6 @@ import logging
 import os
 import sys
 import asyncio
-import aiohttp
 import time
 from config import VERIFICATION_BOT_TOKEN, VERIFICATION_BOT_ADMIN_ID
 from concurrent.futures import ThreadPoolExecutor
@@ -20,6 +19,10 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import smtplib
 from pathlib import Path
+from utils.lazy_imports import lazy_import
+
+# aiohttp нужен только для отправки писем в Telegram
+aiohttp = lazy_import('aiohttp')
 
 logger = logging.getLogger(__name__)
 
@@ -1,15 +1,21 @@
 import logging
 import imaplib
 import threading
-import time
 from typing import Optional, Dict, Set, Tuple, List
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from queue import Queue, Empty
 from contextlib import contextmanager
 
+from utils.metrics import get_metrics_registry
+from utils.background_runtime import get_background_runtime
+
 logger = logging.getLogger(__name__)
 
+_acquire_seconds = get_metrics_registry().histogram(
+    'imap_pool_acquire_seconds', 'Время получения IMAP соединения (с подключением нового)'
+)
+
 @dataclass
 class IMAPConnection:
     """Представляет одно IMAP соединение"""
@@ -44,10 +50,9 @@ class IMAPConnectionPool:
         self._cleanup_lock = threading.Lock()
         
         # Фоновая очистка
-        self._cleanup_thread = None
         self._shutdown = False
-        # Отложенный запуск cleanup thread - только когда нужен
-        self._cleanup_thread_started = False
+        # Отложенный запуск очистки - только когда нужна
+        self._cleanup_started = False
         
         # Статистика
         self.stats = {
@@ -57,19 +62,11 @@ class IMAPConnectionPool:
             'cleanup_runs': 0
         }
     
-    def _start_cleanup_thread(self):
-        """Запускает фоновый поток очистки"""
-        def cleanup_worker():
-            while not self._shutdown:
-                try:
-                    time.sleep(self.cleanup_interval.total_seconds())
-                    if not self._shutdown:
-                        self._cleanup_expired_connections()
-                except Exception as e:
-                    logger.error(f"Ошибка в cleanup_worker: {e}")
-        
-        self._cleanup_thread = threading.Thread(target=cleanup_worker, daemon=True)
-        self._cleanup_thread.start()
+    def _start_cleanup_job(self):
+        """Регистрирует периодическую очистку в фоновой среде"""
+        get_background_runtime().every(
+            'imap_pool_cleanup', self.cleanup_interval.total_seconds(), self._cleanup_expired_connections
+        )
         logger.info(f"🔄 Запущена автоочистка пула IMAP (интервал: {self.cleanup_interval})")
     
     def _get_imap_server(self, email: str) -> str:
@@ -118,15 +115,16 @@ class IMAPConnectionPool:
     def get_connection(self, email: str, password: str):
         """Контекстный менеджер для получения IMAP соединения из пула"""
         # Ленивый запуск cleanup thread при первом использовании
-        if not self._cleanup_thread_started:
-            self._start_cleanup_thread()
-            self._cleanup_thread_started = True
+        if not self._cleanup_started:
+            self._start_cleanup_job()
+            self._cleanup_started = True
             
         connection = None
         
         try:
             # Пытаемся получить из пула
-            connection = self._get_from_pool(email, password)
+            with _acquire_seconds.time():
+                connection = self._get_from_pool(email, password)
             
             if connection:
                 connection.is_busy = True
@@ -285,9 +283,8 @@ class IMAPConnectionPool:
         
         self._shutdown = True
         
-        # Ждем завершения cleanup thread
-        if self._cleanup_thread:
-            self._cleanup_thread.join(timeout=5)
+        # Снимаем очистку с расписания
+        get_background_runtime().cancel('imap_pool_cleanup')
         
         # Закрываем все соединения
         with self._pool_lock:
@@ -307,6 +304,16 @@ class IMAPConnectionPool:
 # Глобальный экземпляр пула
 imap_pool = IMAPConnectionPool()
 
+def _collect_metrics(output):
+    """Метрики IMAP пула для реестра"""
+    stats = imap_pool.get_stats()
+    for key in ('connections_created', 'connections_reused', 'connections_expired', 'cleanup_runs'):
+        output.counter(f'imap_pool_{key}', stats.get(key))
+    output.gauge('imap_pool_active_connections', stats['active_connections_total'], 'Открытых IMAP соединений')
+    output.gauge('imap_pool_mailboxes', stats['pools_count'], 'Почтовых ящиков в пуле')
+
+get_metrics_registry().register_collector('imap_pool', _collect_metrics)
+
 # Функция для получения соединения (совместимость с существующим кодом)
 def get_imap_connection(email: str, password: str):
     """Получает IMAP соединение из пула"""
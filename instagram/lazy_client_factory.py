@@ -13,7 +13,10 @@ from dataclasses import dataclass
 from contextlib import contextmanager
 
 from instagrapi import Client as InstagrapiClient
-from database.db_manager import get_instagram_account, update_account_session_data
+from database.db_manager import get_instagram_account
+from instagram.session_store import get_session_store
+from utils.metrics import get_metrics_registry
+from utils.background_runtime import get_background_runtime
 
 
 logger = logging.getLogger(__name__)
@@ -132,57 +135,25 @@ class LazyInstagramClient:
                 raise
     
     def _load_session(self):
-        """Загружает сессию из файла"""
+        """Загружает сессию из хранилища (файл, при его отсутствии - копия в БД)"""
         try:
-            if os.path.exists(self.session_file):
-                with open(self.session_file, 'r') as f:
-                    session_data = json.load(f)
-                
-                if 'settings' in session_data:
-                    self._real_client.set_settings(session_data['settings'])
-                    self._is_logged_in = True
-                    logger.debug(f"Сессия загружена для аккаунта {self.account_id}")
-            
-            # Также пробуем загрузить из базы данных
-            if self.account.session_data:
-                try:
-                    db_session = json.loads(self.account.session_data)
-                    if 'settings' in db_session:
-                        self._real_client.set_settings(db_session['settings'])
-                        self._is_logged_in = True
-                        logger.debug(f"Сессия из БД загружена для аккаунта {self.account_id}")
-                except json.JSONDecodeError:
-                    logger.warning(f"Некорректные данные сессии в БД для аккаунта {self.account_id}")
+            settings = get_session_store().load_settings(self.account_id, use_db=True)
+            if settings:
+                self._real_client.set_settings(settings)
+                self._is_logged_in = True
+                logger.debug(f"Сессия загружена для аккаунта {self.account_id}")
                     
         except Exception as e:
             logger.error(f"Ошибка загрузки сессии для аккаунта {self.account_id}: {e}")
     
     def _save_session(self):
-        """Сохраняет сессию в файл и БД"""
+        """Сохраняет сессию в хранилище (копия в БД обновляется в фоне)"""
         if self._real_client is None:
             return
         
         try:
-            # Создаем директорию если нужно
-            os.makedirs(os.path.dirname(self.session_file), exist_ok=True)
-            
-            # Получаем настройки
-            settings = self._real_client.get_settings()
-            session_data = {
-                'username': self.account.username,
-                'account_id': self.account_id,
-                'last_login': time.strftime('%Y-%m-%d %H:%M:%S'),
-                'settings': settings
-            }
-            
-            # Сохраняем в файл
-            with open(self.session_file, 'w') as f:
-                json.dump(session_data, f)
-            
-            # Сохраняем в БД
-            update_account_session_data(self.account_id, json.dumps(session_data))
-            
-            logger.debug(f"Сессия сохранена для аккаунта {self.account_id}")
+            if get_session_store().save_client(self.account_id, self._real_client, self.account.username):
+                logger.debug(f"Сессия сохранена для аккаунта {self.account_id}")
             
         except Exception as e:
             logger.error(f"Ошибка сохранения сессии для аккаунта {self.account_id}: {e}")
@@ -267,8 +238,7 @@ class LazyClientFactory:
         self._lock = threading.Lock()
         
         # Запускаем фоновую очистку
-        self._cleanup_thread = None
-        self._start_cleanup_thread()
+        self._start_cleanup_job()
         
         logger.info(f"LazyClientFactory инициализирована: max_clients={max_active_clients}")
     
@@ -300,19 +270,10 @@ class LazyClientFactory:
                 client.destroy()
                 logger.info(f"Принудительно очищен клиент {client.account_id} (превышен лимит)")
     
-    def _start_cleanup_thread(self):
-        """Запускает фоновый поток очистки"""
-        def cleanup_worker():
-            while True:
-                try:
-                    time.sleep(self.cleanup_interval)
-                    self.cleanup_inactive_clients()
-                except Exception as e:
-                    logger.error(f"Ошибка в потоке очистки: {e}")
-        
-        self._cleanup_thread = threading.Thread(target=cleanup_worker, daemon=True)
-        self._cleanup_thread.start()
-        logger.info("Фоновый поток очистки запущен")
+    def _start_cleanup_job(self):
+        """Регистрирует периодическую очистку в фоновой среде"""
+        get_background_runtime().every('lazy_client_cleanup', self.cleanup_interval, self.cleanup_inactive_clients)
+        logger.info("Фоновая очистка запущена")
     
     def cleanup_inactive_clients(self, max_inactive_time: int = 3600):
         """Очищает неактивные клиенты (по умолчанию старше 1 часа)"""
@@ -350,6 +311,7 @@ class LazyClientFactory:
             self._stats.currently_active = max(0, self._stats.currently_active - 1)
         
         elif event_type == 'operation_completed':
+            _operation_seconds.observe(value)
             if self._stats.avg_operation_time == 0:
                 self._stats.avg_operation_time = value
             else:
@@ -381,6 +343,7 @@ class LazyClientFactory:
     def shutdown(self):
         """Корректное завершение работы фабрики"""
         logger.info("Завершение работы LazyClientFactory...")
+        get_background_runtime().cancel('lazy_client_cleanup')
         
         with self._lock:
             for client in self._clients.values():
@@ -393,6 +356,10 @@ class LazyClientFactory:
 # Глобальная фабрика
 _lazy_factory: Optional[LazyClientFactory] = None
 
+_operation_seconds = get_metrics_registry().histogram(
+    'lazy_client_operation_seconds', 'Время операций через lazy клиентов'
+)
+
 
 def init_lazy_factory(max_active_clients: int = 1000, cleanup_interval: int = 1800):
     """Инициализирует глобальную фабрику lazy клиентов"""
@@ -426,4 +393,18 @@ def shutdown_lazy_factory():
     global _lazy_factory
     if _lazy_factory is not None:
         _lazy_factory.shutdown()
-        _lazy_factory = None 
\ No newline at end of file
+        _lazy_factory = None
+
+
+def _collect_metrics(output):
+    """Метрики lazy фабрики для реестра"""
+    stats = get_lazy_factory_stats()
+    output.counter('lazy_clients_created', stats.total_created, 'Создано реальных клиентов')
+    output.counter('lazy_clients_destroyed', stats.total_destroyed, 'Уничтожено клиентов')
+    output.gauge('lazy_clients_active', stats.currently_active, 'Активных lazy клиентов')
+    output.gauge('lazy_clients_memory_saved_mb', stats.memory_saved_mb, 'Сэкономлено памяти, МБ')
+    output.counter('lazy_clients_cache_hits', stats.cache_hits)
+    output.counter('lazy_clients_cache_misses', stats.cache_misses)
+
+
+get_metrics_registry().register_collector('lazy_client_factory', _collect_metrics)
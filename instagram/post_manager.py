@@ -2,6 +2,7 @@ import logging
 import os
 import traceback
 import time
+import json
 from pathlib import Path
 from datetime import datetime
 
@@ -11,13 +12,20 @@ from utils.image_splitter import split_image_for_mosaic
 from database.models import TaskStatus
 from instagram.email_utils_optimized import get_verification_code_from_email
 from instagram.email_utils import mark_account_problematic
+from instagram.upload_pipeline import run_pipeline, prepare_media_item, PHOTO_EXTENSIONS, ALBUM_VIDEO_EXTENSIONS
+from utils.stage_trace import traced, trace_stage
+from instagrapi.extractors import extract_media_v1
+from instagrapi.exceptions import AlbumConfigureError, AlbumUnknownFormat
 
 logger = logging.getLogger(__name__)
 
 class PostManager:
     def __init__(self, account_id):
         self.instagram = InstagramClient(account_id)
+        # Тайминги этапов последней конвейерной загрузки (для записи в задачу)
+        self.last_stage_timings = None
 
+    @traced('login')
     def _ensure_login_with_recovery(self, max_attempts=3):
         """Обеспечивает вход в аккаунт с IMAP восстановлением и обновлением статуса"""
         account = self.instagram.account
@@ -251,10 +259,11 @@ class PostManager:
                 full_caption = f"{caption}\n\n{hashtags}" if caption else hashtags
 
             # Публикуем фото
-            media = self.instagram.client.photo_upload(
-                image_path,
-                caption=full_caption
-            )
+            with trace_stage('upload'):
+                media = self.instagram.client.photo_upload(
+                    image_path,
+                    caption=full_caption
+                )
             
             if media:
                 logger.info(f"Фото успешно опубликовано: {media.id}")
@@ -418,7 +427,90 @@ class PostManager:
             
             return False, f"ERROR - {error_msg}"
 
-    def publish_carousel(self, media_paths, caption="", hashtags="", hide_from_feed=False):
+    def _album_upload_pipelined(self, media_paths, caption, configure_timeout=3):
+        """
+        Загрузка альбома с конвейером: подготовка элемента n+1 идет
+        параллельно с загрузкой элемента n (не более двух подготовленных элементов)
+        """
+        client = self.instagram.client
+
+        # Те же форматы, что и в instagrapi.album_upload: проверяем до загрузки первого элемента
+        for media_path in media_paths:
+            ext = os.path.splitext(media_path)[1].lower()
+            if ext not in PHOTO_EXTENSIONS + ALBUM_VIDEO_EXTENSIONS:
+                raise AlbumUnknownFormat(
+                    f'Unsupported album media format "{ext}" for "{os.path.basename(media_path)}".'
+                )
+
+        def upload(prepared):
+            if prepared.is_video:
+                thumbnail = Path(prepared.thumbnail_path) if prepared.thumbnail_path else None
+                upload_id, width, height, duration, thumbnail = client.video_rupload(
+                    Path(prepared.path), thumbnail=thumbnail, to_album=True
+                )
+                client.photo_rupload(Path(thumbnail), upload_id)
+                return {
+                    "upload_id": upload_id,
+                    "clips": json.dumps([{"length": duration, "source_type": "4"}]),
+                    "extra": json.dumps({"source_width": width, "source_height": height}),
+                    "length": duration,
+                    "poster_frame_index": "0",
+                    "filter_type": "0",
+                    "video_result": "",
+                    "date_time_original": time.strftime("%Y%m%dT%H%M%S.000Z", time.localtime()),
+                    "audio_muted": "false",
+                }
+
+            upload_id, width, height = client.photo_rupload(Path(prepared.path), to_album=True)
+            return {
+                "upload_id": upload_id,
+                "edits": json.dumps({
+                    "crop_original_size": [width, height],
+                    "crop_center": [0.0, -0.0],
+                    "crop_zoom": 1.0,
+                }),
+                "extra": json.dumps({"source_width": width, "source_height": height}),
+                "scene_capture_type": "",
+                "scene_type": None,
+            }
+
+        with trace_stage('upload'):
+            children, timings = run_pipeline(
+                media_paths, prepare_media_item, upload,
+                max_in_flight=2, cleanup=lambda prepared: prepared.cleanup()
+            )
+        self.last_stage_timings = timings.to_dict()
+
+        # Конфигурируем альбом (Instagram может еще перекодировать видео)
+        configure_started = time.time()
+        with trace_stage('configure'):
+            for attempt in range(50):
+                time.sleep(configure_timeout)
+                try:
+                    configured = client.album_configure(children, caption)
+                except Exception as e:
+                    if "Transcode not finished yet" in str(e):
+                        continue
+                    raise
+                if configured:
+                    self.last_stage_timings['configure_time'] = round(time.time() - configure_started, 3)
+                    return extract_media_v1(configured.get("media"))
+        # Как в instagrapi.album_upload: перекодирование не закончилось - ошибка, а не None
+        last_json = getattr(client, 'last_json', None)
+        raise AlbumConfigureError(
+            "Album configure failed: transcode not finished",
+            response=getattr(client, 'last_response', None),
+            **(last_json if isinstance(last_json, dict) else {})
+        )
+
+    def _upload_album(self, media_paths, caption, pipelined=True):
+        """Загрузка альбома в конвейерном или обычном режиме"""
+        if pipelined:
+            return self._album_upload_pipelined(media_paths, caption)
+        with trace_stage('upload'):
+            return self.instagram.client.album_upload(media_paths, caption=caption)
+
+    def publish_carousel(self, media_paths, caption="", hashtags="", hide_from_feed=False, pipelined=True):
         """
         Публикует карусель (альбом) из нескольких изображений
         
@@ -427,6 +519,7 @@ class PostManager:
             caption (str): Подпись к посту
             hashtags (str): Хештеги
             hide_from_feed (bool): Скрыть из основной ленты
+            pipelined (bool): Подготавливать следующий элемент во время загрузки текущего
         
         Returns:
             tuple: (success, media_id)
@@ -455,10 +548,7 @@ class PostManager:
             logger.info(f"📤 Отправляю {len(media_paths)} файлов в Instagram API")
             
             # Публикуем карусель
-            media = self.instagram.client.album_upload(
-                media_paths,
-                caption=full_caption
-            )
+            media = self._upload_album(media_paths, full_caption, pipelined)
             
             if media:
                 logger.info(f"Карусель успешно опубликована: {media.id}")
@@ -523,10 +613,7 @@ class PostManager:
                                     
                                     try:
                                         logger.info(f"📤 Повторная отправка {len(media_paths)} файлов в Instagram API после IMAP")
-                                        media = self.instagram.client.album_upload(
-                                            media_paths,
-                                            caption=full_caption
-                                        )
+                                        media = self._upload_album(media_paths, full_caption, pipelined)
                                         
                                         if media:
                                             logger.info(f"Карусель успешно опубликована после IMAP восстановления: {media.id}")
@@ -592,10 +679,7 @@ class PostManager:
                     
                     try:
                         logger.info(f"📤 Повторная отправка {len(media_paths)} файлов в Instagram API")
-                        media = self.instagram.client.album_upload(
-                            media_paths,
-                            caption=full_caption
-                        )
+                        media = self._upload_album(media_paths, full_caption, pipelined)
                         
                         if media:
                             logger.info(f"Карусель успешно опубликована после повторной попытки: {media.id}")
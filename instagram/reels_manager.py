@@ -6,11 +6,14 @@ import concurrent.futures
 from typing import List, Dict, Optional, Tuple
 
 from instagram.client import InstagramClient
-from database.db_manager import update_task_status, get_instagram_accounts
+from database.db_manager import update_task_status, get_instagram_accounts, get_publish_task, update_publish_task_options
 from config import MAX_WORKERS
 from instagram.clip_upload_patch import *  # Импортируем патч
+from instagram.resumable_upload import RESUMABLE_UPLOAD_THRESHOLD
 from database.models import TaskStatus
 from utils.content_uniquifier import ContentUniquifier
+from utils.media_metadata import get_media_thumbnail
+from utils.stage_trace import traced, trace_stage
 from instagrapi.types import Usertag, Location
 
 logger = logging.getLogger(__name__)
@@ -22,7 +25,7 @@ class ReelsManager:
         self.uniquifier = ContentUniquifier()
 
     def publish_reel(self, video_path, caption=None, thumbnail_path=None, 
-                    usertags=None, location=None, hashtags=None, cover_time=0):
+                    usertags=None, location=None, hashtags=None, cover_time=0, task_id=None):
         """
         Публикация видео в Reels с расширенными возможностями
         
@@ -34,6 +37,7 @@ class ReelsManager:
             location: Геолокация
             hashtags: Список хештегов
             cover_time: Время в секундах для выбора кадра обложки (игнорируется если есть thumbnail_path)
+            task_id: ID задачи публикации - для сохранения прогресса загрузки больших видео
         """
         try:
             # Проверяем статус входа с восстановлением
@@ -69,12 +73,16 @@ class ReelsManager:
                     final_thumbnail_path = generated_thumbnail
                     logger.info(f"Сгенерирована обложка на {cover_time} секунд: {generated_thumbnail}")
             
-            # Публикуем Reels
-            media = self.instagram.client.clip_upload(
-                Path(video_path),
-                caption=full_caption,
-                thumbnail=Path(final_thumbnail_path) if final_thumbnail_path else None
-            )
+            # Публикуем Reels (большие видео - частями с докачкой)
+            with trace_stage('upload'):
+                if os.path.getsize(video_path) >= RESUMABLE_UPLOAD_THRESHOLD:
+                    media = self._clip_upload_resumable(video_path, full_caption, final_thumbnail_path, task_id)
+                else:
+                    media = self.instagram.client.clip_upload(
+                        Path(video_path),
+                        caption=full_caption,
+                        thumbnail=Path(final_thumbnail_path) if final_thumbnail_path else None
+                    )
             
             # Добавляем пользовательские теги и локацию после публикации
             if media:
@@ -94,12 +102,8 @@ class ReelsManager:
                     except Exception as e:
                         logger.warning(f"Не удалось добавить локацию: {e}")
 
-            # Очищаем временную обложку
-            if generated_thumbnail and os.path.exists(generated_thumbnail):
-                try:
-                    os.remove(generated_thumbnail)
-                except:
-                    pass
+            # Сгенерированная обложка хранится в кэше метаданных рядом с видео
+            # и переиспользуется при публикации того же файла в другие аккаунты
 
             logger.info(f"Reels успешно опубликован: {media.pk}")
             return True, media.pk
@@ -387,6 +391,7 @@ class ReelsManager:
             logger.error(f"Ошибка при поиске локации '{name}': {e}")
             return None
 
+    @traced('login')
     def _ensure_login_with_recovery(self, max_attempts=3):
         """Обеспечивает вход в аккаунт с IMAP восстановлением и обновлением статуса"""
         from instagram.email_utils_optimized import get_verification_code_from_email
@@ -666,45 +671,53 @@ class ReelsManager:
             logger.error(f"Ошибка при подготовке локации: {e}")
             return None
 
+    def _clip_upload_resumable(self, video_path: str, caption: str,
+                               thumbnail_path: Optional[str] = None, task_id: Optional[int] = None):
+        """
+        Загрузка Reels частями. Прогресс сохраняется в options задачи,
+        поэтому повторная попытка задачи продолжит загрузку с подтвержденного места.
+        """
+        resume_state = None
+        if task_id:
+            task = get_publish_task(task_id)
+            options = task.get('options') if task else None
+            if isinstance(options, str):
+                try:
+                    options = json.loads(options)
+                except Exception:
+                    options = None
+            resume_state = (options or {}).get('upload_progress')
+
+        def save_progress(state):
+            if task_id:
+                update_publish_task_options(task_id, upload_progress=state)
+
+        media = self.instagram.client.clip_upload_resumable(
+            Path(video_path),
+            caption,
+            thumbnail=Path(thumbnail_path) if thumbnail_path else None,
+            resume_state=resume_state,
+            on_progress=save_progress
+        )
+
+        upload_stats = getattr(self.instagram.client, 'last_upload_stats', None)
+        if task_id:
+            # Загрузка завершена - прогресс больше не нужен, оставляем статистику
+            update_publish_task_options(task_id, upload_progress=None, upload_stats=upload_stats)
+        return media
+
+    @traced('thumbnail')
     def _generate_thumbnail(self, video_path: str, cover_time: float) -> Optional[str]:
-        """Генерация обложки из видео"""
+        """Обложка из видео (из кэша метаданных, кадр извлекается один раз на файл)"""
         try:
-            import cv2
-            import tempfile
-            
-            # Открываем видео
-            cap = cv2.VideoCapture(video_path)
-            if not cap.isOpened():
-                logger.error(f"Не удалось открыть видео: {video_path}")
-                return None
-            
-            # Получаем FPS видео
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            if fps <= 0:
-                fps = 30  # Fallback FPS
-            
-            # Вычисляем номер кадра
-            frame_number = int(cover_time * fps)
-            
-            # Устанавливаем позицию
-            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-            
-            # Читаем кадр
-            ret, frame = cap.read()
-            cap.release()
-            
-            if not ret:
+            thumbnail_path = get_media_thumbnail(video_path, cover_time)
+            if not thumbnail_path:
                 logger.error(f"Не удалось извлечь кадр на {cover_time} секунде")
                 return None
-            
-            # Сохраняем кадр как временный файл
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-                thumbnail_path = temp_file.name
-            
-            cv2.imwrite(thumbnail_path, frame)
-            logger.info(f"Обложка создана: {thumbnail_path} (время: {cover_time}с)")
+
+            logger.info(f"Обложка получена: {thumbnail_path} (время: {cover_time}с)")
             return thumbnail_path
-            
+
         except ImportError:
             logger.warning("OpenCV не установлен, обложка не будет создана")
             return None
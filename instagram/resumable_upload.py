@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Resumable Upload - Загрузка больших видео частями с докачкой
+
+Обеспечивает:
+- Загрузку файла чанками по протоколу rupload (заголовки Offset / X-Entity-Length)
+- Повтор отдельного чанка при обрыве соединения
+- Продолжение с последнего подтвержденного сервером смещения
+- Колбэк прогресса для сохранения состояния в задаче публикации
+- Счетчики пропускной способности и повторно отправленных байт
+"""
+
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Видео больше этого размера загружаются частями
+RESUMABLE_UPLOAD_THRESHOLD = 10 * 1024 * 1024  # 10 MB
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024  # 4 MB
+
+
+class ResumableUploadError(Exception):
+    """Загрузка не завершена после всех повторов"""
+
+
+@dataclass
+class UploadStats:
+    """Статистика одной загрузки"""
+    total_bytes: int = 0
+    start_offset: int = 0
+    bytes_sent: int = 0
+    bytes_resent: int = 0
+    chunks_sent: int = 0
+    chunk_retries: int = 0
+    resumes: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def throughput_bps(self) -> float:
+        return self.bytes_sent / self.elapsed if self.elapsed > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            'total_bytes': self.total_bytes,
+            'start_offset': self.start_offset,
+            'bytes_sent': self.bytes_sent,
+            'bytes_resent': self.bytes_resent,
+            'chunks_sent': self.chunks_sent,
+            'chunk_retries': self.chunk_retries,
+            'resumes': self.resumes,
+            'elapsed': round(self.elapsed, 3),
+            'throughput_bps': round(self.throughput_bps, 1),
+        }
+
+
+# Суммарные счетчики по всем загрузкам процесса
+_global_stats = {
+    'uploads_started': 0,
+    'uploads_completed': 0,
+    'uploads_failed': 0,
+    'uploads_resumed': 0,
+    'bytes_sent': 0,
+    'bytes_resent': 0,
+    'chunk_retries': 0,
+    'upload_time': 0.0,
+}
+_global_stats_lock = threading.Lock()
+
+
+def _record_global(stats: UploadStats, outcome: str):
+    with _global_stats_lock:
+        _global_stats[f'uploads_{outcome}'] += 1
+        if stats.start_offset > 0:
+            _global_stats['uploads_resumed'] += 1
+        _global_stats['bytes_sent'] += stats.bytes_sent
+        _global_stats['bytes_resent'] += stats.bytes_resent
+        _global_stats['chunk_retries'] += stats.chunk_retries
+        _global_stats['upload_time'] += stats.elapsed
+
+
+def get_upload_stats() -> dict:
+    """Суммарная статистика chunked-загрузок"""
+    with _global_stats_lock:
+        stats = dict(_global_stats)
+    stats['throughput_bps'] = round(stats['bytes_sent'] / stats['upload_time'], 1) if stats['upload_time'] else 0.0
+    return stats
+
+
+class ResumableUploader:
+    """Загрузчик файла частями с докачкой с подтвержденного смещения"""
+
+    def __init__(self, session, url: str, headers: Optional[Dict[str, str]] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 max_retries: int = 5,
+                 retry_delay: float = 1.0,
+                 timeout: float = 60,
+                 progress_callback: Optional[Callable[[int, int], None]] = None):
+        """
+        Args:
+            session: Объект с методами get/post как у requests.Session
+            url: Адрес rupload
+            headers: Общие заголовки (X-Instagram-Rupload-Params и т.д.)
+            chunk_size: Размер одного чанка в байтах
+            max_retries: Повторов на один чанк
+            retry_delay: Базовая задержка между повторами (растет линейно)
+            timeout: Таймаут одного запроса
+            progress_callback: Вызывается как (offset, total) после каждого подтвержденного чанка
+        """
+        self.session = session
+        self.url = url
+        self.headers = dict(headers or {})
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.progress_callback = progress_callback
+        self.stats = UploadStats()
+
+    def query_offset(self) -> Optional[int]:
+        """Спросить у сервера, сколько байт уже получено"""
+        try:
+            response = self.session.get(self.url, headers=self.headers, timeout=self.timeout)
+            if response.status_code != 200:
+                return None
+            return int(response.json().get('offset', 0))
+        except Exception as e:
+            logger.debug(f"Не удалось получить смещение загрузки: {e}")
+            return None
+
+    def upload(self, path: str, start_offset: Optional[int] = None):
+        """
+        Загрузить файл, начиная с подтвержденного сервером смещения
+
+        Args:
+            path: Путь к файлу
+            start_offset: Смещение из сохраненного прогресса (используется, если сервер его не сообщил)
+
+        Returns:
+            Ответ сервера на последний чанк
+        """
+        total = os.path.getsize(path)
+        self.stats = UploadStats(total_bytes=total)
+        started = time.time()
+        with _global_stats_lock:
+            _global_stats['uploads_started'] += 1
+
+        offset = self.query_offset()
+        if offset is None:
+            offset = start_offset or 0
+        offset = min(max(0, offset), total)
+        self.stats.start_offset = offset
+        if offset:
+            logger.info(f"⏯️ Продолжаем загрузку {os.path.basename(path)} с {offset}/{total} байт")
+
+        last_response = None
+        try:
+            with open(path, 'rb') as f:
+                while offset < total or last_response is None:
+                    f.seek(offset)
+                    chunk = f.read(self.chunk_size)
+                    offset, last_response = self._send_chunk(chunk, offset, total)
+                    if self.progress_callback:
+                        try:
+                            self.progress_callback(offset, total)
+                        except Exception as e:
+                            logger.debug(f"Ошибка колбэка прогресса: {e}")
+                    if not chunk:
+                        break
+        except Exception:
+            self.stats.elapsed = time.time() - started
+            _record_global(self.stats, 'failed')
+            raise
+
+        self.stats.elapsed = time.time() - started
+        _record_global(self.stats, 'completed')
+        logger.info(f"📤 Загрузка завершена: {self.stats.bytes_sent} байт за {self.stats.elapsed:.1f}с "
+                    f"({self.stats.throughput_bps / 1024:.0f} KB/s, повторно {self.stats.bytes_resent} байт)")
+        return last_response
+
+    def _send_chunk(self, chunk: bytes, offset: int, total: int):
+        """Отправить один чанк с повторами. Возвращает (новое смещение, ответ)"""
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            headers = {
+                **self.headers,
+                'Offset': str(offset),
+                'X-Entity-Length': str(total),
+                'Content-Type': 'application/octet-stream',
+                'Content-Length': str(len(chunk)),
+            }
+            try:
+                response = self.session.post(self.url, data=chunk, headers=headers, timeout=self.timeout)
+                self.stats.bytes_sent += len(chunk)
+                if response.status_code == 200:
+                    self.stats.chunks_sent += 1
+                    try:
+                        acknowledged = int(response.json().get('offset', offset + len(chunk)))
+                    except Exception:
+                        acknowledged = offset + len(chunk)
+                    return min(max(acknowledged, offset), total), response
+                last_error = ResumableUploadError(f"HTTP {response.status_code}: {response.text[:200]}")
+                if 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+                    raise last_error
+            except ResumableUploadError:
+                raise
+            except Exception as e:
+                self.stats.bytes_sent += len(chunk)
+                last_error = e
+
+            # Чанк не подтвержден - узнаем, что сервер успел принять
+            self.stats.chunk_retries += 1
+            server_offset = self.query_offset()
+            if server_offset is not None and offset <= server_offset <= offset + len(chunk):
+                accepted = server_offset - offset
+                self.stats.bytes_resent += len(chunk) - accepted
+                if accepted:
+                    self.stats.resumes += 1
+                    logger.info(f"⏯️ Сервер подтвердил {server_offset}/{total} байт, продолжаем с этого места")
+                    return server_offset, None
+            else:
+                self.stats.bytes_resent += len(chunk)
+
+            logger.warning(f"⚠️ Ошибка отправки чанка {offset}-{offset + len(chunk)} "
+                           f"(попытка {attempt + 1}/{self.max_retries + 1}): {last_error}")
+            time.sleep(self.retry_delay * (attempt + 1))
+
+        raise ResumableUploadError(f"Чанк со смещения {offset} не загружен: {last_error}")
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Session Liveness - Учет живости сессий Instagram клиентов
+
+Каждый успешный приватный запрос отмечает клиент как живой. Сессия, у которой
+был успешный запрос в пределах окна свежести, считается рабочей без отдельной
+проверки. Проверочный запрос выполняется только после истечения окна или после
+ошибки login_required / challenge, полученной любым вызовом.
+"""
+
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Сколько секунд доверяем сессии после последнего успешного запроса
+SESSION_FRESHNESS_SECONDS = int(os.getenv("INSTAGRAM_SESSION_FRESHNESS", "600"))
+
+_ALIVE_ATTR = '_liveness_last_success'
+_DEAD_ATTR = '_liveness_dead_reason'
+
+_stats = {
+    'probes': 0,
+    'probes_avoided': 0,
+    'probe_failures': 0,
+    'reactive_invalidations': 0,
+}
+_stats_lock = threading.Lock()
+
+
+def _count(key: str):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def mark_session_alive(client):
+    """Отметить успешный запрос клиента"""
+    try:
+        setattr(client, _ALIVE_ATTR, time.time())
+        if getattr(client, _DEAD_ATTR, None):
+            setattr(client, _DEAD_ATTR, None)
+    except AttributeError:
+        pass
+
+
+def mark_session_dead(client, reason: str = 'login_required'):
+    """Отметить, что запрос клиента получил ошибку авторизации"""
+    try:
+        if not getattr(client, _DEAD_ATTR, None):
+            _count('reactive_invalidations')
+        setattr(client, _DEAD_ATTR, reason)
+        setattr(client, _ALIVE_ATTR, 0.0)
+    except AttributeError:
+        pass
+
+
+def last_success_age(client):
+    """Секунд с последнего успешного запроса (None - запросов еще не было)"""
+    last_success = getattr(client, _ALIVE_ATTR, 0.0)
+    return time.time() - last_success if last_success else None
+
+
+def is_session_fresh(client, max_age: float = None) -> bool:
+    """Сессия подтверждена успешным запросом в пределах окна свежести"""
+    if getattr(client, _DEAD_ATTR, None):
+        return False
+    age = last_success_age(client)
+    limit = SESSION_FRESHNESS_SECONDS if max_age is None else max_age
+    return age is not None and age <= limit
+
+
+def verify_session(client, force: bool = False) -> bool:
+    """
+    Убедиться, что сессия клиента рабочая
+
+    Свежая сессия принимается без запроса. Иначе выполняется легкий
+    запрос текущего аккаунта; успешный запрос сам обновит отметку живости.
+
+    Raises:
+        Исключение проверочного запроса (как и прежняя проверка через ленту)
+    """
+    if not force and is_session_fresh(client):
+        _count('probes_avoided')
+        return True
+
+    _count('probes')
+    try:
+        client.account_info()
+    except Exception:
+        _count('probe_failures')
+        raise
+    mark_session_alive(client)
+    return True
+
+
+def get_liveness_stats() -> dict:
+    """Статистика проверок живости сессий"""
+    with _stats_lock:
+        stats = dict(_stats)
+    total = stats['probes'] + stats['probes_avoided']
+    stats['freshness_seconds'] = SESSION_FRESHNESS_SECONDS
+    stats['avoided_ratio'] = round(stats['probes_avoided'] / total, 3) if total else 0.0
+    return stats
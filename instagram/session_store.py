@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+"""
+Session Store - Единое хранилище сессий Instagram аккаунтов
+
+Источник истины - файл data/accounts/<id>/session.json (или session.json.gz).
+Обеспечивает:
+- Атомарную запись через временный файл и os.replace
+- Необязательное сжатие gzip (SESSION_STORE_COMPRESS=1)
+- Кэш чтения в памяти; файл перечитывается, только если изменилась его
+  версия (mtime, размер) - сессию мог обновить другой процесс (бот и веб-API)
+- Отслеживание изменений: сессия с неизменными настройками не перезаписывается
+- Копию в InstagramAccount.session_data, синхронизируемую лениво в фоне
+"""
+
+import os
+import gzip
+import json
+import time
+import atexit
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Any, Dict, Optional, Set, Tuple
+
+from config import ACCOUNTS_DIR
+
+logger = logging.getLogger(__name__)
+
+SESSION_FILENAME = 'session.json'
+COMPRESSED_SUFFIX = '.gz'
+
+# Поля, изменение которых само по себе не требует перезаписи
+VOLATILE_FIELDS = ('last_login',)
+
+
+def _fingerprint(data: Dict[str, Any]) -> str:
+    stable = {k: v for k, v in data.items() if k not in VOLATILE_FIELDS}
+    return hashlib.sha1(json.dumps(stable, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class SessionStore:
+    """Хранилище сессий с кэшем, отслеживанием изменений и ленивой копией в БД"""
+
+    def __init__(self, base_dir: str = str(ACCOUNTS_DIR),
+                 compress: bool = False,
+                 db_sync_delay: float = 30.0):
+        """
+        Args:
+            base_dir: Каталог с подкаталогами аккаунтов
+            compress: Сохранять сессии в gzip
+            db_sync_delay: Через сколько секунд после изменения обновлять копию в БД
+        """
+        self.base_dir = base_dir
+        self.compress = compress
+        self.db_sync_delay = db_sync_delay
+
+        self._cache: Dict[int, Dict[str, Any]] = {}
+        self._fingerprints: Dict[int, str] = {}
+        self._versions: Dict[int, Optional[Tuple[str, int, int]]] = {}
+        self._db_dirty: Set[int] = set()
+        self._lock = threading.RLock()
+        self._sync_timer: Optional[threading.Timer] = None
+
+        self.stats = {
+            'reads': 0,
+            'cache_hits': 0,
+            'reloads': 0,
+            'db_fallbacks': 0,
+            'writes': 0,
+            'writes_skipped': 0,
+            'db_syncs': 0,
+            'db_sync_errors': 0,
+        }
+
+    # ---------- пути ----------
+
+    def _path(self, account_id: int, compressed: bool) -> str:
+        name = SESSION_FILENAME + (COMPRESSED_SUFFIX if compressed else '')
+        return os.path.join(self.base_dir, str(account_id), name)
+
+    def _existing_path(self, account_id: int) -> Optional[str]:
+        """Самый свежий из существующих файлов сессии"""
+        candidates = [p for p in (self._path(account_id, False), self._path(account_id, True)) if os.path.exists(p)]
+        if not candidates:
+            return None
+        return max(candidates, key=os.path.getmtime)
+
+    def _file_version(self, account_id: int) -> Optional[Tuple[str, int, int]]:
+        """Версия файла сессии - (путь, mtime в нс, размер); None, если файла нет"""
+        path = self._existing_path(account_id)
+        if not path:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return path, stat.st_mtime_ns, stat.st_size
+
+    # ---------- чтение ----------
+
+    def exists(self, account_id: int) -> bool:
+        """Есть ли сохраненная сессия"""
+        with self._lock:
+            if account_id in self._cache:
+                return True
+        return self._existing_path(account_id) is not None
+
+    def load(self, account_id: int, use_db: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Получить данные сессии
+
+        Args:
+            account_id: ID аккаунта
+            use_db: Если файла нет - взять копию из БД и восстановить файл
+                    (например, после переноса на новый сервер без data/accounts)
+
+        Returns:
+            Копия данных сессии или None
+        """
+        version = self._file_version(account_id)
+        with self._lock:
+            cached = self._cache.get(account_id)
+            if cached is not None:
+                if version is None or self._versions.get(account_id) == version:
+                    self.stats['cache_hits'] += 1
+                    return dict(cached)
+                # Файл перезаписал другой процесс - кэш устарел
+                self.stats['reloads'] += 1
+
+        data = self._read_file(account_id)
+        if data is None and use_db:
+            data = self._read_db(account_id)
+            if data is not None:
+                self.stats['db_fallbacks'] += 1
+                self._write_file(account_id, data)
+
+        if data is None:
+            return None
+
+        with self._lock:
+            self._cache[account_id] = data
+            self._fingerprints[account_id] = _fingerprint(data)
+            self._versions[account_id] = self._file_version(account_id)
+        return dict(data)
+
+    def load_settings(self, account_id: int, use_db: bool = False) -> Optional[Dict[str, Any]]:
+        """Настройки клиента instagrapi из сохраненной сессии"""
+        data = self.load(account_id, use_db=use_db)
+        if data and 'settings' in data:
+            return data['settings']
+        return None
+
+    def _read_file(self, account_id: int) -> Optional[Dict[str, Any]]:
+        path = self._existing_path(account_id)
+        if not path:
+            return None
+        self.stats['reads'] += 1
+        try:
+            opener = gzip.open if path.endswith(COMPRESSED_SUFFIX) else open
+            with opener(path, 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Поврежден файл сессии {path}: {e}")
+            return None
+
+    @staticmethod
+    def _read_db(account_id: int) -> Optional[Dict[str, Any]]:
+        try:
+            from database.db_manager import get_instagram_account
+            account = get_instagram_account(account_id)
+            if account and account.session_data:
+                return json.loads(account.session_data)
+        except Exception as e:
+            logger.debug(f"Нет копии сессии в БД для аккаунта {account_id}: {e}")
+        return None
+
+    # ---------- запись ----------
+
+    def save(self, account_id: int, data: Dict[str, Any], force: bool = False) -> bool:
+        """
+        Сохранить данные сессии
+
+        Args:
+            account_id: ID аккаунта
+            data: Данные сессии ({'username', 'account_id', 'last_login', 'settings'})
+            force: Записать, даже если настройки не изменились
+
+        Returns:
+            True, если файл был перезаписан
+        """
+        fingerprint = _fingerprint(data)
+        with self._lock:
+            # Сравниваем с тем, что сейчас лежит на диске (файл мог обновить другой процесс)
+            self.load(account_id, use_db=False)
+            unchanged = self._fingerprints.get(account_id) == fingerprint
+            self._cache[account_id] = dict(data)
+            if unchanged and not force:
+                self.stats['writes_skipped'] += 1
+                return False
+            self._fingerprints[account_id] = fingerprint
+
+        self._write_file(account_id, data)
+        self._mark_db_dirty(account_id)
+        return True
+
+    def save_client(self, account_id: int, client, username: Optional[str] = None,
+                    force: bool = False) -> bool:
+        """Сохранить сессию по текущим настройкам клиента instagrapi"""
+        if username is None:
+            username = getattr(client, 'username', None) or (self.load(account_id) or {}).get('username')
+        return self.save(account_id, {
+            'username': username,
+            'account_id': account_id,
+            'last_login': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'settings': client.get_settings()
+        }, force=force)
+
+    def touch(self, account_id: int):
+        """Обновить время последнего входа без перезаписи файла"""
+        with self._lock:
+            cached = self._cache.get(account_id)
+            if cached is not None:
+                cached['last_login'] = time.strftime('%Y-%m-%d %H:%M:%S')
+
+    def _write_file(self, account_id: int, data: Dict[str, Any]):
+        path = self._path(account_id, self.compress)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.session.', suffix='.tmp')
+        try:
+            payload = json.dumps(data).encode('utf-8')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(gzip.compress(payload) if self.compress else payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            stat = os.stat(path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        # Второй формат больше не актуален
+        stale = self._path(account_id, not self.compress)
+        if os.path.exists(stale):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+        with self._lock:
+            self._versions[account_id] = (path, stat.st_mtime_ns, stat.st_size)
+        self.stats['writes'] += 1
+
+    # ---------- копия в БД ----------
+
+    def _mark_db_dirty(self, account_id: int):
+        with self._lock:
+            self._db_dirty.add(account_id)
+            if self._sync_timer is None:
+                self._sync_timer = threading.Timer(self.db_sync_delay, self.flush_db)
+                self._sync_timer.daemon = True
+                self._sync_timer.start()
+
+    def flush_db(self, account_id: Optional[int] = None) -> int:
+        """
+        Обновить копии сессий в БД
+
+        Args:
+            account_id: Только этот аккаунт (по умолчанию - все измененные)
+
+        Returns:
+            Количество обновленных записей
+        """
+        from database.db_manager import update_account_session_data
+
+        with self._lock:
+            if account_id is None:
+                pending = list(self._db_dirty)
+                self._db_dirty.clear()
+                if self._sync_timer is not None:
+                    self._sync_timer.cancel()
+                    self._sync_timer = None
+            elif account_id in self._db_dirty:
+                pending = [account_id]
+                self._db_dirty.discard(account_id)
+            else:
+                pending = []
+            snapshots = {aid: self._cache.get(aid) for aid in pending}
+
+        synced = 0
+        for aid, data in snapshots.items():
+            if data is None:
+                continue
+            success, error = update_account_session_data(aid, json.dumps(data))
+            if success:
+                synced += 1
+            else:
+                self.stats['db_sync_errors'] += 1
+                logger.warning(f"Не удалось обновить копию сессии в БД для аккаунта {aid}: {error}")
+        self.stats['db_syncs'] += synced
+        return synced
+
+    # ---------- удаление ----------
+
+    def invalidate(self, account_id: int):
+        """Забыть сессию в памяти (файл остается)"""
+        with self._lock:
+            self._cache.pop(account_id, None)
+            self._fingerprints.pop(account_id, None)
+            self._versions.pop(account_id, None)
+
+    def delete(self, account_id: int):
+        """Удалить сессию из памяти и с диска"""
+        with self._lock:
+            self.invalidate(account_id)
+            self._db_dirty.discard(account_id)
+        for compressed in (False, True):
+            path = self._path(account_id, compressed)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.stats,
+                'cached_sessions': len(self._cache),
+                'pending_db_syncs': len(self._db_dirty),
+                'compress': self.compress,
+            }
+
+
+# Глобальный экземпляр
+_session_store: Optional[SessionStore] = None
+_session_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Получить глобальное хранилище сессий"""
+    global _session_store
+    if _session_store is None:
+        with _session_store_lock:
+            if _session_store is None:
+                _session_store = SessionStore(
+                    compress=os.getenv('SESSION_STORE_COMPRESS', '0') == '1'
+                )
+                atexit.register(_session_store.flush_db)
+    return _session_store
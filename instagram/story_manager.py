@@ -13,13 +13,18 @@ from database.db_manager import update_task_status, get_instagram_accounts, upda
 from config import MAX_WORKERS
 from database.models import TaskStatus
 from instagram.email_utils import get_verification_code_from_email, mark_account_problematic
+from instagram.upload_pipeline import run_pipeline, prepare_media_item
+from utils.stage_trace import traced, trace_stage
 
 logger = logging.getLogger(__name__)
 
 class StoryManager:
     def __init__(self, account_id):
         self.instagram = InstagramClient(account_id)
+        # Тайминги этапов последней конвейерной загрузки (для записи в задачу)
+        self.last_stage_timings = None
 
+    @traced('login')
     def _ensure_login_with_recovery(self, max_attempts=3):
         """Обеспечивает вход в аккаунт с IMAP восстановлением и обновлением статуса"""
         account = self.instagram.account
@@ -356,16 +361,17 @@ class StoryManager:
                 kwargs['caption'] = final_caption
 
             # Публикуем в зависимости от типа
-            if is_video:
-                media = self.instagram.client.video_upload_to_story(
-                    Path(media_path),
-                    **kwargs
-                )
-            else:
-                media = self.instagram.client.photo_upload_to_story(
-                    Path(media_path),
-                    **kwargs
-                )
+            with trace_stage('upload'):
+                if is_video:
+                    media = self.instagram.client.video_upload_to_story(
+                        Path(media_path),
+                        **kwargs
+                    )
+                else:
+                    media = self.instagram.client.photo_upload_to_story(
+                        Path(media_path),
+                        **kwargs
+                    )
 
             logger.info(f"Story успешно опубликована: {media.pk}")
             return True, media.pk
@@ -533,13 +539,15 @@ class StoryManager:
             
             return False, f"ERROR - {error_msg}"
 
-    def publish_story_album(self, media_paths: List[str], caption: Optional[str] = None, **kwargs) -> Tuple[bool, Union[str, List[int]]]:
+    def publish_story_album(self, media_paths: List[str], caption: Optional[str] = None,
+                            pipelined: bool = True, **kwargs) -> Tuple[bool, Union[str, List[int]]]:
         """
         Публикация нескольких фото/видео в Stories последовательно
         
         Args:
             media_paths: Список путей к файлам
             caption: Текст для всех историй
+            pipelined: Подготавливать следующую историю во время загрузки текущей
             
         Returns:
             Tuple[bool, Union[str, List[int]]]: (успех, список media_id или сообщение об ошибке)
@@ -547,8 +555,23 @@ class StoryManager:
         try:
             media_ids = []
             
-            for media_path in media_paths:
-                success, result = self.publish_story(media_path, caption, **kwargs)
+            if pipelined:
+                def upload(prepared):
+                    return prepared.source_path, self.publish_story(prepared.path, caption, **kwargs)
+
+                results, timings = run_pipeline(
+                    media_paths, prepare_media_item, upload,
+                    max_in_flight=2, cleanup=lambda prepared: prepared.cleanup(), stop_on_error=False
+                )
+                self.last_stage_timings = timings.to_dict()
+            else:
+                results = [(media_path, self.publish_story(media_path, caption, **kwargs)) for media_path in media_paths]
+            
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.warning(f"Не удалось подготовить историю: {result}")
+                    continue
+                media_path, (success, result) = result
                 if success:
                     media_ids.append(result)
                 else:
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Upload Pipeline - Конвейерная подготовка и загрузка медиа
+
+Пока загружается элемент n, в фоновом потоке готовится элемент n+1.
+Одновременно подготовлено не более max_in_flight элементов, поэтому
+память ограничена даже для больших каруселей и альбомов историй.
+"""
+
+import os
+import time
+import queue
+import logging
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv', '.webm')
+
+# В альбом instagrapi принимает видео только в .mp4 (остальное - AlbumUnknownFormat)
+ALBUM_VIDEO_EXTENSIONS = ('.mp4',)
+
+# Instagram хранит фото не шире 1080 px
+INSTAGRAM_MAX_WIDTH = 1080
+
+
+@dataclass
+class PipelineTimings:
+    """Тайминги этапов конвейера"""
+    items: List[Dict[str, float]] = field(default_factory=list)
+    total_time: float = 0.0
+
+    @property
+    def prepare_time(self) -> float:
+        return sum(item.get('prepare', 0.0) for item in self.items)
+
+    @property
+    def upload_time(self) -> float:
+        return sum(item.get('upload', 0.0) for item in self.items)
+
+    @property
+    def overlap_saved(self) -> float:
+        """Сколько секунд сэкономлено за счет перекрытия этапов"""
+        return max(0.0, self.prepare_time + self.upload_time - self.total_time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'items': [{k: round(v, 3) for k, v in item.items()} for item in self.items],
+            'prepare_time': round(self.prepare_time, 3),
+            'upload_time': round(self.upload_time, 3),
+            'total_time': round(self.total_time, 3),
+            'overlap_saved': round(self.overlap_saved, 3),
+        }
+
+
+@dataclass
+class PreparedMedia:
+    """Подготовленный к загрузке элемент"""
+    source_path: str
+    path: str
+    is_video: bool = False
+    thumbnail_path: Optional[str] = None
+    temp_files: List[str] = field(default_factory=list)
+
+    def cleanup(self):
+        for temp_path in self.temp_files:
+            try:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            except Exception as e:
+                logger.debug(f"Не удалось удалить временный файл {temp_path}: {e}")
+
+
+def prepare_media_item(media_path: str) -> PreparedMedia:
+    """
+    Локальная подготовка элемента перед загрузкой:
+    - фото: поворот по EXIF, конвертация в RGB JPEG, уменьшение до 1080 px
+    - видео: метаданные и обложка из кэша метаданных
+    Если фото уже подходит, файл не перекодируется.
+    """
+    ext = os.path.splitext(media_path)[1].lower()
+
+    if ext in VIDEO_EXTENSIONS:
+        from utils.media_metadata import get_media_thumbnail
+        return PreparedMedia(
+            source_path=media_path,
+            path=media_path,
+            is_video=True,
+            thumbnail_path=get_media_thumbnail(media_path, 0.0)
+        )
+
+    from PIL import Image, ImageOps
+
+    with Image.open(media_path) as img:
+        needs_transpose = bool(img.getexif().get(0x0112, 1) not in (0, 1))
+        needs_convert = img.format != 'JPEG' or img.mode != 'RGB'
+        needs_resize = img.width > INSTAGRAM_MAX_WIDTH
+
+        if not (needs_transpose or needs_convert or needs_resize):
+            return PreparedMedia(source_path=media_path, path=media_path)
+
+        prepared = ImageOps.exif_transpose(img) if needs_transpose else img
+        if prepared.mode != 'RGB':
+            prepared = prepared.convert('RGB')
+        if prepared.width > INSTAGRAM_MAX_WIDTH:
+            ratio = INSTAGRAM_MAX_WIDTH / prepared.width
+            prepared = prepared.resize((INSTAGRAM_MAX_WIDTH, int(prepared.height * ratio)), Image.LANCZOS)
+
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg')
+        temp_file.close()
+        prepared.save(temp_file.name, format='JPEG', quality=95)
+
+    return PreparedMedia(source_path=media_path, path=temp_file.name, temp_files=[temp_file.name])
+
+
+def run_pipeline(items: Sequence[Any],
+                 prepare: Callable[[Any], Any],
+                 upload: Callable[[Any], Any],
+                 max_in_flight: int = 2,
+                 cleanup: Optional[Callable[[Any], None]] = None,
+                 stop_on_error: bool = True) -> Tuple[List[Any], PipelineTimings]:
+    """
+    Выполняет prepare/upload для списка элементов с перекрытием этапов.
+
+    Args:
+        items: Исходные элементы (например, пути к файлам)
+        prepare: Функция подготовки (выполняется в фоновом потоке)
+        upload: Функция загрузки (выполняется в вызывающем потоке, по порядку)
+        max_in_flight: Максимум одновременно подготовленных элементов
+        cleanup: Вызывается для подготовленного элемента после загрузки
+        stop_on_error: Прервать конвейер при первой ошибке
+
+    Returns:
+        Tuple[список результатов upload (или исключений), тайминги]
+    """
+    timings = PipelineTimings(items=[{} for _ in items])
+    results: List[Any] = []
+    slots = threading.Semaphore(max(1, max_in_flight))
+    ready: queue.Queue = queue.Queue()
+    stop_event = threading.Event()
+    started = time.time()
+
+    def producer():
+        for index, item in enumerate(items):
+            # Ждем, пока освободится место для подготовленного элемента
+            while not slots.acquire(timeout=0.5):
+                if stop_event.is_set():
+                    return
+            if stop_event.is_set():
+                slots.release()
+                return
+
+            prepare_started = time.time()
+            try:
+                prepared, error = prepare(item), None
+            except Exception as e:
+                prepared, error = None, e
+            timings.items[index]['prepare'] = time.time() - prepare_started
+            ready.put((index, prepared, error))
+
+    producer_thread = threading.Thread(target=producer, name="upload-pipeline-prepare", daemon=True)
+    producer_thread.start()
+
+    try:
+        for _ in range(len(items)):
+            index, prepared, error = ready.get()
+            try:
+                if error is not None:
+                    raise error
+
+                upload_started = time.time()
+                try:
+                    results.append(upload(prepared))
+                finally:
+                    timings.items[index]['upload'] = time.time() - upload_started
+            except Exception as e:
+                logger.warning(f"Ошибка конвейера на элементе {index + 1}/{len(items)}: {e}")
+                if stop_on_error:
+                    raise
+                results.append(e)
+            finally:
+                if cleanup and prepared is not None:
+                    try:
+                        cleanup(prepared)
+                    except Exception as cleanup_error:
+                        logger.debug(f"Ошибка очистки элемента конвейера: {cleanup_error}")
+                slots.release()
+    finally:
+        stop_event.set()
+        producer_thread.join(timeout=5)
+
+        # Освобождаем элементы, подготовленные после ошибки
+        while not ready.empty():
+            _, prepared, _ = ready.get_nowait()
+            if cleanup and prepared is not None:
+                try:
+                    cleanup(prepared)
+                except Exception:
+                    pass
+
+        timings.total_time = time.time() - started
+
+    logger.info(f"⏱️ Конвейер: {len(items)} элементов за {timings.total_time:.2f}с "
+                f"(подготовка {timings.prepare_time:.2f}с, загрузка {timings.upload_time:.2f}с, "
+                f"перекрытие {timings.overlap_saved:.2f}с)")
+    return results, timings
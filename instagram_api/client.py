@@ -8,7 +8,8 @@ from instagrapi import Client
 from instagrapi.exceptions import LoginRequired, BadPassword, ChallengeRequired
 
 from config import ACCOUNTS_DIR
-from database.db_manager import get_instagram_account, update_account_session_data
+from database.db_manager import get_instagram_account
+from instagram.session_store import get_session_store
 
 logger = logging.getLogger(__name__)
 
@@ -41,19 +42,18 @@ class InstagramClient:
 
         try:
             # Пытаемся использовать сохраненную сессию
-            session_file = os.path.join(ACCOUNTS_DIR, str(self.account_id), "session.json")
+            session_store = get_session_store()
 
-            if os.path.exists(session_file):
+            if session_store.exists(self.account_id):
                 logger.info(f"Найден файл сессии для аккаунта {self.account.username}")
 
                 try:
                     # Загружаем данные сессии
-                    with open(session_file, 'r') as f:
-                        session_data = json.load(f)
+                    settings = session_store.load_settings(self.account_id)
 
                     # Устанавливаем настройки клиента из сессии
-                    if 'settings' in session_data:
-                        self.client.set_settings(session_data['settings'])
+                    if settings:
+                        self.client.set_settings(settings)
 
                     # Пытаемся использовать сохраненную сессию
                     self.client.login(self.account.username, self.account.password)
@@ -116,30 +116,9 @@ class InstagramClient:
     def _save_session(self):
         """Сохраняет данные сессии"""
         try:
-            # Создаем директорию для аккаунта, если она не существует
-            account_dir = os.path.join(ACCOUNTS_DIR, str(self.account_id))
-            os.makedirs(account_dir, exist_ok=True)
-
-            # Получаем настройки клиента
-            settings = self.client.get_settings()
-
-            # Формируем данные сессии
-            session_data = {
-                'username': self.account.username,
-                'account_id': self.account_id,
-                'last_login': time.strftime('%Y-%m-%d %H:%M:%S'),
-                'settings': settings
-            }
-
-            # Сохраняем в файл
-            session_file = os.path.join(account_dir, "session.json")
-            with open(session_file, 'w') as f:
-                json.dump(session_data, f)
-
-            # Обновляем данные сессии в базе данных
-            update_account_session_data(self.account_id, json.dumps(session_data))
-
-            logger.info(f"Сессия сохранена для пользователя {self.account.username}")
+            # Файл перезаписывается только при изменении настроек, копия в БД обновляется в фоне
+            if get_session_store().save_client(self.account_id, self.client, self.account.username):
+                logger.info(f"Сессия сохранена для пользователя {self.account.username}")
 
         except Exception as e:
             logger.error(f"Ошибка при сохранении сессии для {self.account.username}: {e}")
@@ -279,19 +258,18 @@ def login_with_session(username, password, account_id, email=None, email_passwor
             client.challenge_code_handler = auto_challenge_code_handler
 
         # Проверяем наличие файла сессии
-        session_file = os.path.join(ACCOUNTS_DIR, str(account_id), "session.json")
+        session_store = get_session_store()
 
-        if os.path.exists(session_file):
+        if session_store.exists(account_id):
             logger.info(f"Найден файл сессии для аккаунта {username}")
 
             try:
                 # Загружаем данные сессии
-                with open(session_file, 'r') as f:
-                    session_data = json.load(f)
+                settings = session_store.load_settings(account_id)
 
                 # Устанавливаем настройки клиента из сессии
-                if 'settings' in session_data:
-                    client.set_settings(session_data['settings'])
+                if settings:
+                    client.set_settings(settings)
 
                 # Пытаемся использовать сохраненную сессию
                 client.login(username, password)
@@ -306,29 +284,9 @@ def login_with_session(username, password, account_id, email=None, email_passwor
 
         # Сохраняем сессию
         try:
-            # Создаем директорию для аккаунта, если она не существует
-            account_dir = os.path.join(ACCOUNTS_DIR, str(account_id))
-            os.makedirs(account_dir, exist_ok=True)
-
-            # Получаем настройки клиента
-            settings = client.get_settings()
-
-            # Формируем данные сессии
-            session_data = {
-                'username': username,
-                'account_id': account_id,
-                'last_login': time.strftime('%Y-%m-%d %H:%M:%S'),
-                'settings': settings
-            }
-
-            # Сохраняем в файл
-            with open(session_file, 'w') as f:
-                json.dump(session_data, f)
-
-            # Обновляем данные сессии в базе данных
-            update_account_session_data(account_id, json.dumps(session_data))
-
-            logger.info(f"Сессия сохранена для пользователя {username}")
+            # Файл перезаписывается только при изменении настроек, копия в БД обновляется в фоне
+            if session_store.save_client(account_id, client, username):
+                logger.info(f"Сессия сохранена для пользователя {username}")
 
         except Exception as e:
             logger.error(f"Ошибка при сохранении сессии для {username}: {e}")
@@ -6,21 +6,20 @@ from datetime import datetime
 
 from instagrapi import Client
 
-# Правильный импорт MoviePy для версии 2.1.2
-try:
-    from moviepy.video.io.VideoFileClip import VideoFileClip
-    MOVIEPY_AVAILABLE = True
-except ImportError:
-    MOVIEPY_AVAILABLE = False
-    logger.warning("MoviePy не установлен. Обработка видео будет отключена.")
-
-from config import ACCOUNTS_DIR
 from database.db_manager import get_session, get_instagram_account, update_publish_task_status, get_publish_task
 from database.models import PublishTask, TaskStatus
 from instagram.reels_manager import ReelsManager
+from instagram.session_store import get_session_store
+from utils.media_metadata import get_media_metadata
+from utils.lazy_imports import module_available
 
 logger = logging.getLogger(__name__)
 
+# MoviePy (вместе с numpy) импортируется при первой обработке видео
+MOVIEPY_AVAILABLE = module_available('moviepy')
+if not MOVIEPY_AVAILABLE:
+    logger.warning("MoviePy не установлен. Обработка видео будет отключена.")
+
 def get_instagram_client(account_id):
     """Получает клиент Instagram для указанного аккаунта"""
     session = get_session()
@@ -33,10 +32,10 @@ def get_instagram_client(account_id):
     client = Client()
 
     # Проверяем наличие сессии
-    session_file = os.path.join(ACCOUNTS_DIR, str(account_id), 'session.json')
-    if os.path.exists(session_file):
+    settings = get_session_store().load_settings(account_id)
+    if settings:
         try:
-            client.load_settings(session_file)
+            client.set_settings(settings)
             logger.info(f"Загружены настройки для аккаунта {account.username}")
         except Exception as e:
             logger.error(f"Ошибка при загрузке настроек: {e}")
@@ -73,9 +72,8 @@ def get_instagram_client(account_id):
         client.login(account.username, account.password)
         logger.info(f"Успешный вход в аккаунт {account.username}")
 
-        # Сохраняем сессию
-        os.makedirs(os.path.join(ACCOUNTS_DIR, str(account_id)), exist_ok=True)
-        client.dump_settings(session_file)
+        # Сохраняем сессию в общем формате хранилища
+        get_session_store().save_client(account_id, client, account.username)
 
         return client, None
     except Exception as e:
@@ -89,20 +87,29 @@ def process_video(video_path):
         return video_path, None
         
     try:
+        # Для Reels рекомендуется соотношение 9:16
+        target_ratio = 9/16
+
+        # Сначала смотрим кэшированные метаданные: если видео уже подходит,
+        # перекодирование не нужно и контейнер не открывается
+        meta = get_media_metadata(video_path)
+        if (meta and meta.is_h264 and meta.duration and meta.duration <= 90
+                and abs(meta.aspect_ratio - target_ratio) <= 0.1):
+            logger.info("Видео уже соответствует требованиям Reels, обработка не требуется")
+            return video_path, None
+
         # Создаем временный файл для обработанного видео
         with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as temp_file:
             processed_path = temp_file.name
 
         # Загружаем видео
+        from moviepy.video.io.VideoFileClip import VideoFileClip
         video = VideoFileClip(video_path)
 
         # Проверяем соотношение сторон
         width, height = video.size
         aspect_ratio = width / height
 
-        # Для Reels рекомендуется соотношение 9:16
-        target_ratio = 9/16
-
         # Если соотношение сторон не соответствует требуемому, обрезаем видео
         if abs(aspect_ratio - target_ratio) > 0.1:
             logger.info(f"Обрезаем видео с соотношением {aspect_ratio} до {target_ratio}")
@@ -1,8 +1,9 @@
-import logging
-import threading
 import time
+# Отсчет времени запуска начинается до тяжелых импортов
+_STARTED = time.perf_counter()
+
+import logging
 import sys
-from datetime import datetime
 from telegram.ext import Updater
 from instagram.monkey_patch import *
 from instagram.client_patch import *  # Импортируем усиленные патчи устройств
@@ -10,68 +11,44 @@ from instagram.client_patch import *  # Импортируем усиленны
 # Импортируем наши модули
 from config import (
     TELEGRAM_TOKEN, LOG_LEVEL, LOG_FORMAT, LOG_FILE,
-    TELEGRAM_READ_TIMEOUT, TELEGRAM_CONNECT_TIMEOUT,
-    TELEGRAM_ERROR_LOG,
-    # Lazy Loading конфигурация
-    USE_LAZY_LOADING, LAZY_MAX_ACTIVE_CLIENTS, LAZY_CLEANUP_INTERVAL,
-    LAZY_FALLBACK_TO_NORMAL, LAZY_INACTIVE_THRESHOLD,
-    LAZY_ENABLE_STATS_LOGGING, LAZY_STATS_LOG_INTERVAL
+    TELEGRAM_READ_TIMEOUT, TELEGRAM_CONNECT_TIMEOUT
 )
 from database.db_manager import init_db
 from telegram_bot.bot import setup_bot
 from utils.scheduler import start_scheduler
-from utils.task_queue import start_task_queue  # Добавляем импорт
+from utils.task_queue import start_task_queue, stop_task_queue  # Добавляем импорт
 from utils.system_monitor import start_system_monitoring, stop_system_monitoring
+from utils.startup_profile import StartupTimer
+from utils.metrics import start_metrics_history
+from utils.background_runtime import shutdown_background_runtime
+from utils.error_aggregator import get_error_aggregator, record_error
 
-print(f"Python version: {sys.version}")
-print(f"Python executable: {sys.executable}")
-print(f"Python path: {sys.path}")
-
-# Настраиваем логирование
-logging.basicConfig(
-    format=LOG_FORMAT,
-    level=getattr(logging, LOG_LEVEL),
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
-def error_callback(update, context):
-    """Логирование ошибок Telegram"""
-    logger.error(f'Update "{update}" caused error "{context.error}"')
-
-    # Записываем ошибку в отдельный файл
-    with open(TELEGRAM_ERROR_LOG, 'a') as f:
-        f.write(f'{datetime.now()} - Update: {update} - Error: {context.error}\n')
-
-def main():
-    # Инициализируем базу данных
-    logger.info("Инициализация базы данных...")
-    init_db()
-
-    # Запускаем планировщик задач в отдельном потоке
-    logger.info("Запуск планировщика задач...")
-    scheduler_thread = threading.Thread(target=start_scheduler, daemon=True)
-    scheduler_thread.start()
-
-    # Запускаем обработчик очереди задач
-    logger.info("Запуск обработчика очереди задач...")
-    start_task_queue()  # Добавляем запуск очереди задач
-
-    # Запускаем мониторинг системы
-    logger.info("Запуск мониторинга системных ресурсов...")
-    start_system_monitoring()
-    
-    # Запуск умного валидатора аккаунтов
-    logger.info("Запуск умного валидатора аккаунтов...")
-    from utils.smart_validator_service import get_smart_validator
-    smart_validator = get_smart_validator()
-    smart_validator.start()
+def setup_logging():
+    """Настраиваем логирование (при запуске, а не при импорте модуля)"""
+    logging.basicConfig(
+        format=LOG_FORMAT,
+        level=getattr(logging, LOG_LEVEL),
+        handlers=[
+            logging.FileHandler(LOG_FILE),
+            logging.StreamHandler()
+        ]
+    )
 
-    # Инициализация Universal Client Adapter (Lazy Loading + обратная совместимость)
-    logger.info("🚀 Инициализация Universal Client Adapter с Lazy Loading...")
+def error_callback(update, context):
+    """Учет ошибок Telegram в сводке по отпечаткам (файл пишется в фоне)"""
+    error = context.error
+    fingerprint = record_error(error, payload=update)
+
+    # Полный стек - только при первом появлении, повторы видны в /errors
+    if get_error_aggregator().is_new(fingerprint):
+        logger.error(f'Новая ошибка [{fingerprint}] при обработке update: {error}', exc_info=error)
+    else:
+        logger.error(f'Ошибка [{fingerprint}]: {error}')
+
+def init_client_adapter_subsystem():
+    """Universal Client Adapter (Lazy Loading + обратная совместимость)"""
     from instagram.client_adapter import init_client_adapter, ClientConfig
     
     # Конфигурация для оптимального использования памяти
@@ -84,8 +61,8 @@ def main():
     init_client_adapter(client_config)
     logger.info("✅ Universal Client Adapter готов (экономия памяти: ~98%)")
 
-    # Инициализация Instagram Client Pool (для fallback режима)
-    logger.info("🏊‍♂️ Готовим Instagram Client Pool для fallback режима...")
+def init_client_pool_subsystem():
+    """Instagram Client Pool для fallback режима"""
     from instagram.client_pool import init_client_pool
     init_client_pool(
         initial_max_clients=50,      # Уменьшаем т.к. основное - lazy клиенты
@@ -96,8 +73,8 @@ def main():
     )
     logger.info("✅ Instagram Client Pool готов к работе")
 
-    # Инициализация Structured Logging с Sampling
-    logger.info("📝 Готовим Structured Logging для оптимизации логов...")
+def init_structured_logging_subsystem():
+    """Structured Logging с Sampling"""
     from utils.structured_logger import init_structured_logging, SamplingConfig, SamplingStrategy
     
     # Настройка специализированных логгеров
@@ -106,32 +83,68 @@ def main():
         "telegram": SamplingConfig(SamplingStrategy.TIME_WINDOW, time_window=60, max_logs_per_window=100),
         "performance": SamplingConfig(SamplingStrategy.FREQUENCY, frequency=10),
         "database": SamplingConfig(SamplingStrategy.TIME_WINDOW, time_window=120, max_logs_per_window=50),
-        "warmup": SamplingConfig(SamplingStrategy.HASH_BASED, hash_percentage=25),
+        "warmup": SamplingConfig(SamplingStrategy.HASH_BASED, hash_sample_rate=0.25),
         "publish": SamplingConfig(SamplingStrategy.FREQUENCY, frequency=5)
     }
     
     init_structured_logging(configs)
     logger.info("✅ Structured Logging готов к работе")
 
-    # Создаем и настраиваем Telegram бота
-    logger.info("Создание Telegram бота...")
-    updater = Updater(
-        TELEGRAM_TOKEN,
-        use_context=True,
-        read_timeout=TELEGRAM_READ_TIMEOUT,
-        connect_timeout=TELEGRAM_CONNECT_TIMEOUT
-    )
+def start_smart_validator():
+    """Умный валидатор аккаунтов"""
+    from utils.smart_validator_service import get_smart_validator
+    get_smart_validator().start()
 
-    # Регистрируем обработчики
-    setup_bot(updater.dispatcher)
+def main():
+    setup_logging()
+    startup = StartupTimer(started=_STARTED)
+    logger.info(f"Python {sys.version.split()[0]} ({sys.executable})")
 
-    # Добавляем обработчик ошибок
-    updater.dispatcher.add_error_handler(error_callback)
+    # Инициализируем базу данных: от нее зависят все подсистемы
+    logger.info("Инициализация базы данных...")
+    with startup.phase('database'):
+        init_db()
+
+    # Логгеры настраиваем до того, как подсистемы начнут писать в них
+    with startup.phase('structured_logging'):
+        init_structured_logging_subsystem()
+
+    # Создаем и настраиваем Telegram бота
+    logger.info("Создание Telegram бота...")
+    with startup.phase('telegram_bot'):
+        updater = Updater(
+            TELEGRAM_TOKEN,
+            use_context=True,
+            request_kwargs={
+                'read_timeout': TELEGRAM_READ_TIMEOUT,
+                'connect_timeout': TELEGRAM_CONNECT_TIMEOUT
+            }
+        )
+
+        # Регистрируем обработчики
+        setup_bot(updater)
+
+        # Добавляем обработчик ошибок
+        updater.dispatcher.add_error_handler(error_callback)
 
     try:
         logger.info("Запуск бота...")
         updater.start_polling()
-        logger.info("Бот запущен и готов к работе!")
+        ready = startup.mark('polling')
+        logger.info(f"Бот запущен и принимает обновления через {ready:.1f}с после старта")
+
+        # Независимые подсистемы прогреваются параллельно, бот уже отвечает.
+        # До готовности адаптера клиентов используется обычный клиент.
+        startup.run_parallel_async({
+            'scheduler': lambda: start_scheduler(updater.bot),
+            'task_queue': start_task_queue,
+            'system_monitor': start_system_monitoring,
+            'smart_validator': start_smart_validator,
+            'client_adapter': init_client_adapter_subsystem,
+            'client_pool': init_client_pool_subsystem,
+            'metrics_history': start_metrics_history,
+        }, on_done=lambda errors: logger.info(startup.report()))
+
         updater.idle()
     except KeyboardInterrupt:
         logger.info("Получен сигнал остановки...")
@@ -141,6 +154,9 @@ def main():
         logger.info("Остановка бота...")
         stop_system_monitoring()
         updater.stop()
+        # Останавливаем очередь публикаций и дожидаемся текущих фоновых задач
+        stop_task_queue(wait=True)
+        shutdown_background_runtime(timeout=30)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -110,6 +110,12 @@ def main():
         logger.error("Файл web_api.py не найден!")
         sys.exit(1)
     
+    # Собираем ассеты дашборда (хеш в имени, сжатые копии)
+    try:
+        subprocess.run([python_path, 'build_dashboard.py'], check=True)
+    except subprocess.CalledProcessError as e:
+        logger.warning(f"⚠️ Сборка дашборда не удалась, файлы будут отдаваться без сборки: {e}")
+    
     logger.info("✅ Все проверки пройдены")
     logger.info("🌐 Запуск веб-сервера на http://localhost:5000")
     logger.info("📱 Веб-дашборд будет доступен по адресу: http://localhost:5000")
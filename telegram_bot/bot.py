@@ -676,7 +676,7 @@ def callback_handler(update, context):
         from telegram_bot.handlers.publish import show_scheduled_posts
         return show_scheduled_posts(update, context)
     
-    elif query.data == "publication_history":
+    elif query.data in ("publication_history", "publication_history_archive"):
         from telegram_bot.handlers.publish import show_publication_history
         return show_publication_history(update, context)
     
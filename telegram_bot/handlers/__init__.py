@@ -3,6 +3,7 @@ from telegram_bot.handlers.publish_handlers import get_publish_handlers
 from telegram_bot.handlers.task_handlers import get_task_handlers
 from telegram_bot.handlers.group_handlers import get_group_handlers
 from telegram_bot.handlers.analytics_handlers import get_analytics_handlers
+from telegram_bot.handlers.system_handlers import get_system_handlers
 
 def get_all_handlers():
     """Возвращает все обработчики"""
@@ -13,4 +14,5 @@ def get_all_handlers():
     handlers.extend(get_task_handlers())
     handlers.extend(get_group_handlers())
     handlers.extend(get_analytics_handlers())
+    handlers.extend(get_system_handlers())
     return handlers
\ No newline at end of file
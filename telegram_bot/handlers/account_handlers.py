@@ -27,6 +27,7 @@ from database.models import Proxy
 from utils.proxy_manager import assign_proxy_to_account
 from instagram.client import check_login_challenge, submit_challenge_code, test_instagram_login_with_proxy
 from utils.system_monitor import get_adaptive_limits, get_system_status
+from utils.notification_outbox import notify
 
 # Импорт middleware для проверки подписок
 from telegram_bot.middleware import subscription_required, trial_allowed, premium_only
@@ -43,6 +44,9 @@ ENTER_USERNAME, ENTER_PASSWORD, ENTER_EMAIL, ENTER_EMAIL_PASSWORD, CONFIRM_ACCOU
 # Состояние для ожидания файла с аккаунтами
 WAITING_ACCOUNTS_FILE = 10
 
+# Ключ объединения уведомлений о результатах прогрева в одном чате
+WARMUP_RESULT_KEY = 'warmup_result'
+
 @trial_allowed
 def save_account_from_telegram(update, context):
     """Добавляет аккаунт Instagram в базу данных из Telegram-бота"""
@@ -1059,14 +1063,14 @@ def check_accounts_validity_handler(update, context):
                         client = Client()
 
                         # Проверяем наличие сессии
-                        session_file = os.path.join(ACCOUNTS_DIR, str(account.id), 'session.json')
-                        if os.path.exists(session_file):
+                        from instagram.session_store import get_session_store
+                        session_store = get_session_store()
+                        if session_store.exists(account.id):
                             try:
-                                with open(session_file, 'r') as f:
-                                    session_data = json.load(f)
+                                settings = session_store.load_settings(account.id)
 
-                                if 'settings' in session_data:
-                                    client.set_settings(session_data['settings'])
+                                if settings:
+                                    client.set_settings(settings)
 
                                 # Проверяем валидность сессии
                                 try:
@@ -1087,15 +1091,7 @@ def check_accounts_validity_handler(update, context):
                             client.login(account.username, account.password)
 
                             # Сохраняем обновленную сессию
-                            os.makedirs(os.path.join(ACCOUNTS_DIR, str(account.id)), exist_ok=True)
-                            session_data = {
-                                'username': account.username,
-                                'account_id': account.id,
-                                'updated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
-                                'settings': client.get_settings()
-                            }
-                            with open(session_file, 'w') as f:
-                                json.dump(session_data, f)
+                            session_store.save_client(account.id, client, account.username)
 
                             # ✅ ОБНОВЛЯЕМ СТАТУС В БАЗЕ ДАННЫХ
                             from database.db_manager import update_instagram_account
@@ -2514,8 +2510,9 @@ def quick_warmup_handler(update, context):
         reply_markup=reply_markup
     )
     
-    # Запускаем прогрев в фоне
+    # Запускаем прогрев в фоне, отчет уходит через очередь уведомлений
     from threading import Thread
+    chat_id = update.effective_chat.id
     def run_warmup():
         try:
             success, report = advanced_warmup.start_warmup(
@@ -2524,20 +2521,11 @@ def quick_warmup_handler(update, context):
             )
             # Отправляем отчет пользователю
             if success:
-                context.bot.send_message(
-                    chat_id=update.effective_chat.id,
-                    text=f"✅ Быстрый прогрев завершен!\n\n{report}"
-                )
+                notify(context.bot, chat_id, f"✅ Быстрый прогрев завершен!\n\n{report}", key=WARMUP_RESULT_KEY)
             else:
-                context.bot.send_message(
-                    chat_id=update.effective_chat.id,
-                    text=f"❌ Ошибка прогрева: {report}"
-                )
+                notify(context.bot, chat_id, f"❌ Ошибка прогрева: {report}", key=WARMUP_RESULT_KEY)
         except Exception as e:
-            context.bot.send_message(
-                chat_id=update.effective_chat.id,
-                text=f"❌ Ошибка: {str(e)}"
-            )
+            notify(context.bot, chat_id, f"❌ Ошибка: {str(e)}", key=WARMUP_RESULT_KEY)
         
     thread = Thread(target=run_warmup)
     thread.start()
@@ -2568,27 +2556,19 @@ def smart_warmup_handler(update, context):
     
     query.edit_message_text(text, reply_markup=reply_markup)
     
-    # Запускаем умный прогрев в фоне
+    # Запускаем умный прогрев в фоне, результат уходит через очередь уведомлений
     from threading import Thread
+    chat_id = update.effective_chat.id
     def run_smart_warmup():
         try:
             success, message = automation_service.smart_warm_account(account_id)
             # Отправляем результат пользователю
             if success:
-                context.bot.send_message(
-                    chat_id=update.effective_chat.id,
-                    text=f"✅ Умный прогрев завершен!\n\n{message}"
-                )
+                notify(context.bot, chat_id, f"✅ Умный прогрев завершен!\n\n{message}", key=WARMUP_RESULT_KEY)
             else:
-                context.bot.send_message(
-                    chat_id=update.effective_chat.id,
-                    text=f"❌ Ошибка прогрева: {message}"
-                )
+                notify(context.bot, chat_id, f"❌ Ошибка прогрева: {message}", key=WARMUP_RESULT_KEY)
         except Exception as e:
-            context.bot.send_message(
-                chat_id=update.effective_chat.id,
-                text=f"❌ Ошибка: {str(e)}"
-            )
+            notify(context.bot, chat_id, f"❌ Ошибка: {str(e)}", key=WARMUP_RESULT_KEY)
         
     thread = Thread(target=run_smart_warmup)
     thread.start()
@@ -11,6 +11,7 @@ from telegram.ext import CallbackContext, ConversationHandler
 
 from database.db_manager import get_instagram_accounts, get_instagram_account
 from telegram_bot.utils.account_selection import create_account_selector
+from instagram.session_store import get_session_store
 
 logger = logging.getLogger(__name__)
 
@@ -299,8 +300,7 @@ def get_authorized_client():
         # Пытаемся найти аккаунт с рабочей сессией
         for account in active_accounts:
             try:
-                session_path = f"data/accounts/{account.id}/session.json"
-                if os.path.exists(session_path):
+                if get_session_store().exists(account.id):
                     # Используем функцию get_instagram_client с skip_recovery для быстрой проверки
                     client = get_instagram_client(account.id, skip_recovery=True)
                     
@@ -659,8 +659,7 @@ def start_accounts_analytics(update: Update, context: CallbackContext):
                     report += f"     📅 Добавлен: {acc.created_at.strftime('%d.%m.%Y')}\n"
                     
                     # Проверяем наличие сессии
-                    session_path = f"data/accounts/{acc.id}/session.json"
-                    if os.path.exists(session_path):
+                    if get_session_store().exists(acc.id):
                         report += f"     🔐 Сессия: ✅ Сохранена\n"
                     else:
                         report += f"     🔐 Сессия: ❌ Отсутствует\n"
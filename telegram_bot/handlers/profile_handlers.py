@@ -10,6 +10,7 @@ from instagram.profile_manager import ProfileManager
 from telegram_bot.keyboards import get_main_menu_keyboard
 from telegram_bot.states import ProfileStates
 from telegram_bot.utils.account_selection import AccountSelector
+from utils.media_metadata import remove_media_file
 from profile_setup.name_manager import edit_profile_name, save_profile_name
 from profile_setup.username_manager import edit_profile_username, save_profile_username
 from profile_setup.bio_manager import edit_profile_bio, save_profile_bio
@@ -637,9 +638,8 @@ def save_post(update: Update, context: CallbackContext) -> int:
             message.delete()
             return ConversationHandler.END
 
-        # Удаляем временный файл
-        if os.path.exists(media_path):
-            os.remove(media_path)
+        # Удаляем временный файл вместе с кэшированными метаданными
+        remove_media_file(media_path)
 
         if success:
             # Отправляем сообщение об успехе
@@ -1917,7 +1917,7 @@ def handle_bulk_profile_action(update: Update, context: CallbackContext) -> int:
             )
             
             # Формируем список ошибок для отчета
-            errors = [f"@{err.get('username', f'ID {err.get("account_id")}')}: {err.get('error')}" 
+            errors = [f"@{err.get('username', 'ID ' + str(err.get('account_id')))}: {err.get('error')}" 
                      for err in error_list]
             
             # Удаляем сообщение о прогрессе
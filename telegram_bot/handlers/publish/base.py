@@ -17,6 +17,8 @@ from database.models import TaskType, TaskStatus
 from utils.task_queue import add_task_to_queue
 from telegram_bot.utils.account_selection import AccountSelector
 from utils.content_uniquifier import ContentUniquifier
+from utils.media_ingest import ingest_telegram_media, MediaIngestError
+from utils.media_metadata import remove_media_file
 
 logger = logging.getLogger(__name__)
 
@@ -115,28 +117,25 @@ class BasePublishHandler(ABC):
         # Скачиваем файлы
         media_paths = []
         for media_file in media_files:
-            file_id = media_file.file_id
-            media = context.bot.get_file(file_id)
-            
-            # Определяем расширение
-            file_extension = '.mp4' if media_type == 'VIDEO' else '.jpg'
-            
-            # Создаем временный файл
-            with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
-                media_path = temp_file.name
-            
-            # Скачиваем
-            media.download(media_path)
+            # Скачиваем потоково, формат и размер проверяются при скачивании
+            try:
+                media_path = ingest_telegram_media(
+                    context.bot, media_file, allowed_types=(media_type,)
+                ).path
+            except MediaIngestError as e:
+                update.message.reply_text(f"❌ {e}")
+                for path in media_paths:
+                    remove_media_file(path)
+                return None
             
             # Валидируем
             is_valid, error_msg = self.validate_media(media_path, media_type)
             if not is_valid:
-                os.unlink(media_path)
+                remove_media_file(media_path)
                 update.message.reply_text(f"❌ {error_msg}")
                 # Удаляем уже скачанные файлы
                 for path in media_paths:
-                    if os.path.exists(path):
-                        os.unlink(path)
+                    remove_media_file(path)
                 return None
             
             media_paths.append(media_path)
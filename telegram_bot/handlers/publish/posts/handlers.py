@@ -16,6 +16,8 @@ from database.db_manager import get_instagram_account, get_instagram_accounts, c
 from database.models import TaskType, TaskStatus
 from utils.task_queue import add_task_to_queue, get_task_status
 from telegram_bot.utils.account_selection import create_account_selector
+from utils.media_ingest import ingest_telegram_media, MediaIngestError
+from utils.media_metadata import remove_media_file
 
 # Добавляем импорт для uuid
 import uuid
@@ -280,82 +282,37 @@ def handle_post_media_upload(update, context):
         
         # Проверяем тип сообщения
         if update.message.photo:
-            # Фото
-            photo = update.message.photo[-1]
-            file_obj = context.bot.get_file(photo.file_id)
-            
-            # Создаем уникальное имя файла
-            import uuid
-            filename = f"photo_{uuid.uuid4().hex[:8]}.jpg"
-            file_path = os.path.join("media", filename)
-            
-            # Создаем папку если нужно
-            os.makedirs("media", exist_ok=True)
-            
-            # Скачиваем файл
-            file_obj.download(file_path)
-            
-            media_files.append({
-                'type': 'photo',
-                'path': file_path,
-                'original_filename': filename
-            })
-            
+            tg_media = update.message.photo[-1]  # Берем самое большое разрешение
         elif update.message.video:
-            # Видео
-            video = update.message.video
-            file_obj = context.bot.get_file(video.file_id)
-            
-            # Создаем уникальное имя файла
-            import uuid
-            filename = f"video_{uuid.uuid4().hex[:8]}.mp4"
-            file_path = os.path.join("media", filename)
-            
-            # Создаем папку если нужно
-            os.makedirs("media", exist_ok=True)
-            
-            # Скачиваем файл
-            file_obj.download(file_path)
-            
-            media_files.append({
-                'type': 'video',
-                'path': file_path,
-                'original_filename': filename
-            })
-            
+            tg_media = update.message.video
         elif update.message.document:
-            # Документ (может быть медиа файлом)
-            document = update.message.document
-            file_name = document.file_name or "unknown"
-            file_ext = os.path.splitext(file_name)[1].lower()
-            
-            # Проверяем, что это медиа файл
-            if file_ext in ['.jpg', '.jpeg', '.png', '.webp', '.mp4', '.mov', '.avi', '.mkv']:
-                file_obj = context.bot.get_file(document.file_id)
-                
-                # Создаем уникальное имя файла
-                import uuid
-                filename = f"media_{uuid.uuid4().hex[:8]}{file_ext}"
-                file_path = os.path.join("media", filename)
-                
-                # Создаем папку если нужно
-                os.makedirs("media", exist_ok=True)
-                
-                # Скачиваем файл
-                file_obj.download(file_path)
-                
-                media_type = 'photo' if file_ext in ['.jpg', '.jpeg', '.png', '.webp'] else 'video'
-                media_files.append({
-                    'type': media_type,
-                    'path': file_path,
-                    'original_filename': file_name
-                })
-            else:
-                update.message.reply_text("❌ Неподдерживаемый формат файла. Поддерживаются: JPG, PNG, MP4, MOV")
-                return PostStates.MEDIA_UPLOAD
+            # Документ (может быть медиа файлом) - формат определяется по содержимому
+            tg_media = update.message.document
         else:
             update.message.reply_text("❌ Отправьте фото, видео или медиа файл")
             return PostStates.MEDIA_UPLOAD
+
+        # Скачиваем потоково: хэш, формат и лимиты проверяются в том же проходе
+        try:
+            media = ingest_telegram_media(context.bot, tg_media, dest_dir="media")
+        except MediaIngestError as e:
+            update.message.reply_text(f"❌ {e}. Поддерживаются: JPG, PNG, WEBP, MP4, MOV")
+            return PostStates.MEDIA_UPLOAD
+
+        if any(item.get('sha256') == media.sha256 for item in media_files):
+            remove_media_file(media.path)
+            update.message.reply_text("⚠️ Этот файл уже загружен")
+            return PostStates.MEDIA_UPLOAD
+
+        media_files.append({
+            'type': media.media_type.lower(),
+            'path': media.path,
+            'original_filename': getattr(tg_media, 'file_name', None) or os.path.basename(media.path),
+            'mime_type': media.mime_type,
+            'sha256': media.sha256,
+            'file_size': media.file_size
+        })
+        logger.info(f"Загружен медиа файл: {media.path}")
         
         # Обновляем список медиа файлов
         context.user_data['media_files'] = media_files
@@ -10,6 +10,8 @@ from telegram.ext import ConversationHandler
 from database.db_manager import get_instagram_account, get_instagram_accounts
 from telegram_bot.handlers.publish.states import ReelsStates
 from utils.content_uniquifier import ContentUniquifier
+from utils.media_ingest import ingest_telegram_media, MediaIngestError, MAX_REELS_DURATION
+from utils.media_metadata import remove_media_file
 
 logger = logging.getLogger(__name__)
 
@@ -252,37 +254,26 @@ def handle_reels_media_upload(update, context):
     """Обработка загрузки видео"""
     try:
         # Получаем информацию о видео
-        media_file = None
-        file_extension = '.mp4'
-        
-        if update.message.video:
-            media_file = update.message.video
-        elif update.message.document:
-            media_file = update.message.document
-            if not media_file.mime_type.startswith('video/'):
-                update.message.reply_text("❌ Для Reels нужно отправить видео")
-                return ReelsStates.MEDIA_UPLOAD
+        media_file = update.message.video or update.message.document
         
         if not media_file:
             update.message.reply_text("❌ Отправьте видео для Reels")
             return ReelsStates.MEDIA_UPLOAD
         
-        # Скачиваем видео
-        file_obj = context.bot.get_file(media_file.file_id)
-        
-        # Создаем уникальное имя файла
-        import uuid
-        filename = f"reels_{uuid.uuid4().hex[:8]}.mp4"
-        file_path = os.path.join("media", filename)
-        
-        # Создаем папку если нужно
-        os.makedirs("media", exist_ok=True)
-        
-        # Скачиваем файл
-        file_obj.download(file_path)
+        # Скачиваем видео потоково: формат и длительность проверяются при скачивании
+        try:
+            media = ingest_telegram_media(
+                context.bot, media_file,
+                dest_dir="media",
+                max_duration=MAX_REELS_DURATION,
+                allowed_types=('VIDEO',)
+            )
+        except MediaIngestError as e:
+            update.message.reply_text(f"❌ {e}")
+            return ReelsStates.MEDIA_UPLOAD
         
         # Сохраняем путь к видео
-        context.user_data['media_path'] = file_path
+        context.user_data['media_path'] = media.path
         context.user_data['media_type'] = 'VIDEO'
         
         # Переходим к вводу подписи
@@ -598,9 +589,10 @@ def cleanup_reels_data(context):
     try:
         # Удаляем видео файл
         media_path = context.user_data.get('media_path')
-        if media_path and os.path.exists(media_path):
+        if media_path:
             try:
-                os.remove(media_path)
+                # Вместе с sidecar метаданных и обложками
+                remove_media_file(media_path)
             except:
                 pass
         
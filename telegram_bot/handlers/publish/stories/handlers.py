@@ -10,6 +10,8 @@ from telegram.ext import ConversationHandler
 from database.db_manager import get_instagram_account, get_instagram_accounts
 from telegram_bot.handlers.publish.states import StoryStates
 from utils.content_uniquifier import ContentUniquifier
+from utils.media_ingest import ingest_telegram_media, MediaIngestError, MAX_STORY_VIDEO_DURATION
+from utils.media_metadata import remove_media_file
 
 logger = logging.getLogger(__name__)
 
@@ -253,47 +255,32 @@ def handle_story_media_upload(update, context):
     try:
         # Получаем информацию о медиа
         media_file = None
-        media_type = None
-        file_extension = '.jpg'
         
         if update.message.photo:
             media_file = update.message.photo[-1]
-            media_type = 'PHOTO'
-            file_extension = '.jpg'
         elif update.message.video:
             media_file = update.message.video
-            media_type = 'VIDEO'
-            file_extension = '.mp4'
         elif update.message.document:
             media_file = update.message.document
-            if media_file.mime_type.startswith('video/'):
-                media_type = 'VIDEO'
-                file_extension = '.mp4'
-            else:
-                media_type = 'PHOTO'
-                file_extension = '.jpg'
         
         if not media_file:
             update.message.reply_text("❌ Отправьте фото или видео для истории")
             return StoryStates.MEDIA_UPLOAD
         
-        # Скачиваем медиа
-        file_obj = context.bot.get_file(media_file.file_id)
-        
-        # Создаем уникальное имя файла
-        import uuid
-        filename = f"story_{uuid.uuid4().hex[:8]}{file_extension}"
-        file_path = os.path.join("media", filename)
-        
-        # Создаем папку если нужно
-        os.makedirs("media", exist_ok=True)
-        
-        # Скачиваем файл
-        file_obj.download(file_path)
+        # Скачиваем медиа потоково: тип определяется по содержимому
+        try:
+            media = ingest_telegram_media(
+                context.bot, media_file,
+                dest_dir="media",
+                max_duration=MAX_STORY_VIDEO_DURATION
+            )
+        except MediaIngestError as e:
+            update.message.reply_text(f"❌ {e}")
+            return StoryStates.MEDIA_UPLOAD
         
         # Сохраняем путь к медиа
-        context.user_data['media_path'] = file_path
-        context.user_data['media_type'] = media_type
+        context.user_data['media_path'] = media.path
+        context.user_data['media_type'] = media.media_type
         
         # Переходим к вводу подписи
         return show_story_caption_input(update, context)
@@ -610,9 +597,10 @@ def cleanup_story_data(context):
     try:
         # Удаляем медиа файл
         media_path = context.user_data.get('media_path')
-        if media_path and os.path.exists(media_path):
+        if media_path:
             try:
-                os.remove(media_path)
+                # Вместе с sidecar метаданных и обложками
+                remove_media_file(media_path)
             except:
                 pass
         
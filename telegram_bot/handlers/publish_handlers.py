@@ -20,6 +20,10 @@ from database.models import TaskType, TaskStatus
 from instagram.reels_manager import publish_reels_in_parallel
 from utils.task_queue import add_task_to_queue, get_task_status
 from telegram_bot.utils.account_selection import create_account_selector
+from utils.media_metadata import get_media_metadata, remove_media_file
+from utils.media_ingest import (
+    ingest_telegram_media, MediaIngestError, MAX_REELS_DURATION, MAX_STORY_VIDEO_DURATION
+)
 
 # Добавляем импорт для uuid
 import uuid
@@ -283,48 +287,33 @@ def old_media_upload_handler(update, context):
 
     # Получаем информацию о медиа
     media_file = None
-    media_type = None
-    file_extension = '.jpg'
     
     if update.message.photo:
         media_file = update.message.photo[-1]
-        media_type = 'PHOTO'
-        file_extension = '.jpg'
     elif update.message.video:
         media_file = update.message.video
-        media_type = 'VIDEO'
-        file_extension = '.mp4'
     elif update.message.document:
         media_file = update.message.document
-        if media_file.mime_type.startswith('video/'):
-            media_type = 'VIDEO'
-            file_extension = '.mp4'
-        else:
-            media_type = 'PHOTO'
-            file_extension = '.jpg'
     
     if not media_file:
         update.message.reply_text("Пожалуйста, отправьте фото или видео.")
         return
 
-    file_id = media_file.file_id
-
-    # Скачиваем медиа
-    media = context.bot.get_file(file_id)
-
-    # Создаем временный файл для сохранения медиа
-    with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
-        media_path = temp_file.name
+    publish_type = context.user_data.get('publish_type', 'post')
+    max_duration = {'reels': MAX_REELS_DURATION, 'story': MAX_STORY_VIDEO_DURATION}.get(publish_type)
 
-    # Скачиваем медиа во временный файл
-    media.download(media_path)
+    # Скачиваем медиа потоково во временный файл; тип определяется по содержимому
+    try:
+        media = ingest_telegram_media(context.bot, media_file, max_duration=max_duration)
+    except MediaIngestError as e:
+        update.message.reply_text(f"❌ {e}")
+        return
 
     # Сохраняем путь к медиа и тип медиа
-    context.user_data['publish_media_path'] = media_path
-    context.user_data['publish_media_type'] = media_type
+    context.user_data['publish_media_path'] = media.path
+    context.user_data['publish_media_type'] = media.media_type
 
     # Запрашиваем подпись
-    publish_type = context.user_data.get('publish_type', 'post')
     
     if publish_type == 'story':
         update.message.reply_text(
@@ -944,9 +933,9 @@ def cancel_publish(update, context):
     if 'selected_accounts' in context.user_data:
         del context.user_data['selected_accounts']
     if 'publish_media_path' in context.user_data:
-        # Удаляем временный файл
+        # Удаляем временный файл вместе с кэшированными метаданными
         try:
-            os.remove(context.user_data['publish_media_path'])
+            remove_media_file(context.user_data['publish_media_path'])
         except:
             pass
         del context.user_data['publish_media_path']
@@ -1575,22 +1564,22 @@ def show_publication_history(update, context):
     query = update.callback_query
     query.answer()
     
-    from database.db_manager import get_session
-    from database.models import PublishTask, TaskStatus
+    from database.models import TaskStatus
+    from database.publish_archive import get_publish_archiver
     
-    session = get_session()
+    # Архив читается только по кнопке "Включая архив"
+    include_archive = query.data == "publication_history_archive"
     try:
         # Получаем последние выполненные задачи
-        completed_tasks = session.query(PublishTask).filter(
-            PublishTask.status.in_([TaskStatus.COMPLETED, TaskStatus.FAILED])
-        ).order_by(PublishTask.completed_time.desc()).limit(10).all()
+        completed_tasks = get_publish_archiver().get_history(limit=10, include_archive=include_archive)
         
         if not completed_tasks:
+            keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="menu_publications")]]
+            if not include_archive:
+                keyboard.insert(0, [InlineKeyboardButton("📦 Включая архив", callback_data="publication_history_archive")])
             query.edit_message_text(
                 "📊 История публикаций пуста",
-                reply_markup=InlineKeyboardMarkup([
-                    [InlineKeyboardButton("🔙 Назад", callback_data="menu_publications")]
-                ])
+                reply_markup=InlineKeyboardMarkup(keyboard)
             )
             return
         
@@ -1600,12 +1589,13 @@ def show_publication_history(update, context):
             from database.db_manager import get_instagram_account
             account = get_instagram_account(task.account_id)
             
-            completed_time = task.completed_time.strftime("%d.%m.%Y %H:%M") if task.completed_time else "Не завершена"
+            finished = task.completed_time or task.updated_at
+            completed_time = finished.strftime("%d.%m.%Y %H:%M") if finished else "Не завершена"
             task_type = task.task_type.value if hasattr(task.task_type, 'value') else str(task.task_type)
             status_emoji = "✅" if task.status == TaskStatus.COMPLETED else "❌"
             
             message += f"{status_emoji} *{task_type.upper()}* в @{account.username if account else 'Unknown'}\n"
-            message += f"  📅 {completed_time}\n"
+            message += f"  📅 {completed_time}{' 📦' if getattr(task, 'archived', False) else ''}\n"
             
             if task.status == TaskStatus.FAILED and task.error_message:
                 message += f"  ❌ {task.error_message[:50]}{'...' if len(task.error_message) > 50 else ''}\n"
@@ -1615,7 +1605,11 @@ def show_publication_history(update, context):
             message += "\n"
         
         keyboard = [
-            [InlineKeyboardButton("🔄 Обновить", callback_data="publication_history")],
+            [InlineKeyboardButton("🔄 Обновить", callback_data=query.data)],
+            [InlineKeyboardButton(
+                "📋 Только текущие" if include_archive else "📦 Включая архив",
+                callback_data="publication_history" if include_archive else "publication_history_archive"
+            )],
             [InlineKeyboardButton("🔙 Назад", callback_data="menu_publications")]
         ]
         
@@ -1633,8 +1627,6 @@ def show_publication_history(update, context):
                 [InlineKeyboardButton("🔙 Назад", callback_data="menu_publications")]
             ])
         )
-    finally:
-        session.close()
 
 # Обработчики выбора аккаунтов для публикации постов
 
@@ -1996,88 +1988,37 @@ def handle_media_upload(update, context):
         
         # Проверяем тип сообщения
         if update.message.photo:
-            # Фото
-            photo = update.message.photo[-1]  # Берем самое большое разрешение
-            file_obj = context.bot.get_file(photo.file_id)
-            
-            # Создаем уникальное имя файла
-            import uuid
-            filename = f"photo_{uuid.uuid4().hex[:8]}.jpg"
-            file_path = os.path.join("media", filename)
-            
-            # Создаем папку если нужно
-            os.makedirs("media", exist_ok=True)
-            
-            # Скачиваем файл
-            file_obj.download(file_path)
-            
-            media_files.append({
-                'type': 'photo',
-                'path': file_path,
-                'original_filename': filename
-            })
-            
-            logger.info(f"Загружено фото: {file_path}")
-            
+            tg_media = update.message.photo[-1]  # Берем самое большое разрешение
         elif update.message.video:
-            # Видео
-            video = update.message.video
-            file_obj = context.bot.get_file(video.file_id)
-            
-            # Создаем уникальное имя файла
-            import uuid
-            filename = f"video_{uuid.uuid4().hex[:8]}.mp4"
-            file_path = os.path.join("media", filename)
-            
-            # Создаем папку если нужно
-            os.makedirs("media", exist_ok=True)
-            
-            # Скачиваем файл
-            file_obj.download(file_path)
-            
-            media_files.append({
-                'type': 'video',
-                'path': file_path,
-                'original_filename': filename
-            })
-            
-            logger.info(f"Загружено видео: {file_path}")
-            
+            tg_media = update.message.video
         elif update.message.document:
-            # Документ (может быть медиа файлом)
-            document = update.message.document
-            file_name = document.file_name or "unknown"
-            file_ext = os.path.splitext(file_name)[1].lower()
-            
-            # Проверяем, что это медиа файл
-            if file_ext in ['.jpg', '.jpeg', '.png', '.webp', '.mp4', '.mov', '.avi', '.mkv']:
-                file_obj = context.bot.get_file(document.file_id)
-                
-                # Создаем уникальное имя файла
-                import uuid
-                filename = f"media_{uuid.uuid4().hex[:8]}{file_ext}"
-                file_path = os.path.join("media", filename)
-                
-                # Создаем папку если нужно
-                os.makedirs("media", exist_ok=True)
-                
-                # Скачиваем файл
-                file_obj.download(file_path)
-                
-                media_type = 'photo' if file_ext in ['.jpg', '.jpeg', '.png', '.webp'] else 'video'
-                media_files.append({
-                    'type': media_type,
-                    'path': file_path,
-                    'original_filename': file_name
-                })
-                
-                logger.info(f"Загружен медиа файл: {file_path}")
-            else:
-                update.message.reply_text("❌ Неподдерживаемый формат файла. Поддерживаются: JPG, PNG, MP4, MOV")
-                return UPLOAD_MEDIA
+            # Документ (может быть медиа файлом) - формат определяется по содержимому
+            tg_media = update.message.document
         else:
             update.message.reply_text("❌ Отправьте фото, видео или медиа файл")
             return UPLOAD_MEDIA
+
+        # Скачиваем потоково: хэш, формат и лимиты проверяются в том же проходе
+        try:
+            media = ingest_telegram_media(context.bot, tg_media, dest_dir="media")
+        except MediaIngestError as e:
+            update.message.reply_text(f"❌ {e}. Поддерживаются: JPG, PNG, WEBP, MP4, MOV")
+            return UPLOAD_MEDIA
+
+        if any(item.get('sha256') == media.sha256 for item in media_files):
+            remove_media_file(media.path)
+            update.message.reply_text("⚠️ Этот файл уже загружен")
+            return UPLOAD_MEDIA
+
+        media_files.append({
+            'type': media.media_type.lower(),
+            'path': media.path,
+            'original_filename': getattr(tg_media, 'file_name', None) or os.path.basename(media.path),
+            'mime_type': media.mime_type,
+            'sha256': media.sha256,
+            'file_size': media.file_size
+        })
+        logger.info(f"Загружен медиа файл: {media.path}")
         
         # Обновляем список медиа файлов
         context.user_data['media_files'] = media_files
@@ -2766,41 +2707,27 @@ def handle_story_media_upload(update, context):
         return None
 
     # Получаем информацию о медиа
-    media_file = None
-    media_type = None
-    file_extension = '.jpg'
-
     if update.message.photo:
         media_file = update.message.photo[-1]
-        media_type = 'PHOTO'
-        file_extension = '.jpg'
     elif update.message.video:
         media_file = update.message.video
-        media_type = 'VIDEO'
-        file_extension = '.mp4'
     elif update.message.document:
         media_file = update.message.document
-        if media_file.mime_type and media_file.mime_type.startswith('video/'):
-            media_type = 'VIDEO'
-            file_extension = '.mp4'
-        else:
-            media_type = 'PHOTO'
-            file_extension = '.jpg'
     else:
         update.message.reply_text("❌ Пожалуйста, отправьте фото или видео для истории.")
         return ConversationHandler.END
 
-    # Скачиваем медиафайл
-    import tempfile
-    with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
-        media_path = temp_file.name
+    # Скачиваем медиафайл потоково, длительность видео проверяется при скачивании
+    try:
+        media = ingest_telegram_media(context.bot, media_file, max_duration=MAX_STORY_VIDEO_DURATION)
+    except MediaIngestError as e:
+        update.message.reply_text(f"❌ {e}")
+        return None
 
-    # Получаем файл и скачиваем его
-    file = media_file.get_file()
-    file.download(media_path)
+    media_type = media.media_type
 
     # Сохраняем данные
-    context.user_data['publish_media_path'] = media_path
+    context.user_data['publish_media_path'] = media.path
     context.user_data['publish_media_type'] = media_type
 
     # Показываем меню дополнительных возможностей (упрощенный интерфейс)
@@ -3336,23 +3263,28 @@ def handle_reels_media_upload(update, context):
         logger.info(f"🎥 REELS: Устанавливаем publish_type = 'reels'")
         context.user_data['publish_type'] = 'reels'
 
-    # Проверяем длительность видео (должно быть до 90 секунд)
-    if hasattr(video_file, 'duration') and video_file.duration > 90:
-        update.message.reply_text("❌ Видео слишком длинное. Максимальная длительность для Reels - 90 секунд.")
-        return ConversationHandler.END
-
     try:
-        # Скачиваем видео
-        file_id = video_file.file_id
-        media = context.bot.get_file(file_id)
-
-        # Создаем временный файл для сохранения видео
-        import tempfile
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as temp_file:
-            video_path = temp_file.name
-
-        # Скачиваем видео во временный файл
-        media.download(video_path)
+        # Скачиваем видео потоково: длительность из данных Telegram и атома mvhd
+        # проверяется до и во время скачивания
+        try:
+            media = ingest_telegram_media(
+                context.bot, video_file,
+                max_duration=MAX_REELS_DURATION,
+                allowed_types=('VIDEO',)
+            )
+        except MediaIngestError as e:
+            update.message.reply_text(f"❌ {e}. Максимальная длительность для Reels - {MAX_REELS_DURATION} секунд.")
+            return ConversationHandler.END
+        video_path = media.path
+
+        # Если длительность не видна в потоке (moov в конце файла), разбираем видео
+        # один раз: метаданные и обложки кэшируются рядом с файлом
+        if not media.duration:
+            meta = get_media_metadata(video_path)
+            if meta and meta.duration > MAX_REELS_DURATION:
+                remove_media_file(video_path)
+                update.message.reply_text("❌ Видео слишком длинное. Максимальная длительность для Reels - 90 секунд.")
+                return ConversationHandler.END
 
         # Сохраняем путь к видео
         context.user_data['reels_video_path'] = video_path
@@ -3694,14 +3626,20 @@ def handle_reels_cover_input(update, context):
     else:
         try:
             cover_time = float(update.message.text.strip())
-            if 0 <= cover_time <= 90:
+            # Ограничиваем время обложки реальной длительностью видео из кэша метаданных
+            max_cover_time = 90
+            video_path = context.user_data.get('reels_video_path')
+            meta = get_media_metadata(video_path) if video_path else None
+            if meta and meta.duration > 0:
+                max_cover_time = min(max_cover_time, meta.duration)
+            if 0 <= cover_time <= max_cover_time:
                 if 'reels_options' not in context.user_data:
                     context.user_data['reels_options'] = {}
                 context.user_data['reels_options']['cover_time'] = cover_time
                 context.user_data['reels_options']['thumbnail_path'] = None  # Сбрасываем загруженную обложку
                 update.message.reply_text(f"✅ Обложка установлена на {cover_time} секунд.")
             else:
-                update.message.reply_text("❌ Время должно быть от 0 до 90 секунд.")
+                update.message.reply_text(f"❌ Время должно быть от 0 до {max_cover_time:g} секунд.")
                 from telegram_bot.states import REELS_TIME_COVER
                 return REELS_TIME_COVER
         except ValueError:
@@ -3721,16 +3659,9 @@ def handle_reels_cover_upload(update, context):
     try:
         # Получаем фото с наибольшим разрешением
         photo_file = update.message.photo[-1]
-        file_id = photo_file.file_id
-        media = context.bot.get_file(file_id)
-        
-        # Создаем временный файл для сохранения обложки
-        import tempfile
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-            thumbnail_path = temp_file.name
         
         # Скачиваем фото во временный файл
-        media.download(thumbnail_path)
+        thumbnail_path = ingest_telegram_media(context.bot, photo_file, allowed_types=('PHOTO',)).path
         
         # Сохраняем путь к обложке
         if 'reels_options' not in context.user_data:
@@ -3,7 +3,10 @@
 Обработчики команд для мониторинга системы
 """
 
+import io
 import logging
+import threading
+from datetime import datetime
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ParseMode
 from telegram.ext import CommandHandler, CallbackQueryHandler
 from config import ADMIN_USER_IDS
@@ -11,6 +14,11 @@ from utils.system_monitor import (
     get_system_status, get_adaptive_limits, get_system_load_percentage,
     set_hardware_profile, system_monitor
 )
+from database.query_stats import get_query_stats
+from utils.metrics import get_metrics_registry, get_metrics_history
+from utils.sampling_profiler import run_profile, is_profiling, ProfilerBusyError, MAX_DURATION
+from utils.memory_accounting import get_memory_accounting
+from utils.error_aggregator import get_error_aggregator
 
 logger = logging.getLogger(__name__)
 
@@ -51,6 +59,7 @@ def system_status_handler(update, context):
              InlineKeyboardButton("🔧 Настройки", callback_data='system_settings')],
             [InlineKeyboardButton("📊 Все уровни", callback_data='system_levels'),
              InlineKeyboardButton("🖥️ Профили", callback_data='system_profiles')],
+            [InlineKeyboardButton("🗄️ SQL-запросы", callback_data='system_db_queries')],
             [InlineKeyboardButton("🔙 Назад", callback_data='main_menu')]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
@@ -178,10 +187,278 @@ def set_hardware_profile_handler(update, context):
         parse_mode=ParseMode.MARKDOWN
     )
 
+def format_db_queries_report(limit=10):
+    """Текст отчета: топ SQL-запросов по суммарному времени"""
+    stats = get_query_stats().get_stats(limit=limit)
+    
+    report = "🗄️ SQL-ЗАПРОСЫ (топ по суммарному времени)\n\n"
+    report += f"Запросов: {stats['total_calls']}, отпечатков: {stats['statements']}\n"
+    report += f"Суммарно: {stats['total_time_ms'] / 1000:.1f}с, "
+    report += f"медленных (>{stats['slow_threshold_ms']:.0f}мс): {stats['slow_calls']}\n\n"
+    
+    for i, item in enumerate(stats['top'], 1):
+        report += f"{i}. {item['total_ms']:.0f}мс | {item['calls']} выз. | "
+        report += f"p50 {item['p50_ms']:.1f} / p95 {item['p95_ms']:.1f} / p99 {item['p99_ms']:.1f} мс\n"
+        report += f"   {item['fingerprint'][:150]}\n"
+        if item['last_origin']:
+            report += f"   ↳ {item['last_origin']}\n"
+    
+    if stats['slow']:
+        report += "\n🐢 Последние медленные:\n"
+        for item in stats['slow'][:5]:
+            report += f"• {item['duration_ms']:.0f}мс {item['origin']}\n"
+    
+    # Ограничение Telegram на длину сообщения
+    return report[:4000]
+
+def db_queries_handler(update, context):
+    """Обработчик команды /db_queries - топ SQL-запросов (только для администраторов)"""
+    user_id = update.effective_user.id
+    if not is_admin(user_id):
+        if update.callback_query:
+            update.callback_query.answer("⛔ Только для администраторов", show_alert=True)
+        else:
+            update.message.reply_text("⛔ Только для администраторов")
+        return
+    
+    report = format_db_queries_report()
+    
+    if update.callback_query:
+        query = update.callback_query
+        query.answer()
+        
+        keyboard = [
+            [InlineKeyboardButton("🔄 Обновить", callback_data='system_db_queries')],
+            [InlineKeyboardButton("🔙 К статусу", callback_data='system_status')]
+        ]
+        # Текст запросов содержит символы разметки Markdown, поэтому без parse_mode
+        query.edit_message_text(report, reply_markup=InlineKeyboardMarkup(keyboard))
+    else:
+        update.message.reply_text(report)
+
+def format_metrics_summary(rate_window=300):
+    """Компактная сводка реестра метрик: значение по каждой метрике, у счетчиков - скорость"""
+    rates = get_metrics_history().rates(rate_window)
+    
+    report = "📈 МЕТРИКИ\n"
+    current_group = None
+    for family in get_metrics_registry().collect():
+        group = family.name.split('_')[0]
+        if group != current_group:
+            report += f"\n[{group}]\n"
+            current_group = group
+        
+        if family.type == 'histogram':
+            count = sum(v for suffix, _, v in family.samples if suffix == '_count')
+            total = sum(v for suffix, _, v in family.samples if suffix == '_sum')
+            avg_ms = total / count * 1000 if count else 0.0
+            report += f"• {family.name}: {count:.0f} шт, среднее {avg_ms:.2f}мс\n"
+            continue
+        
+        value = sum(v for _, _, v in family.samples)
+        line = f"• {family.name}: {value:g}"
+        if family.type == 'counter' and rates:
+            rate = sum(
+                rates.get(key, 0.0) for key in rates
+                if key.split('{')[0] in (family.name, family.name + '_total')
+            )
+            if rate:
+                line += f" (+{rate * 60:.1f}/мин)"
+        report += line + "\n"
+    
+    # Ограничение Telegram на длину сообщения
+    return report[:4000]
+
+def metrics_handler(update, context):
+    """Обработчик команды /metrics - сводка метрик подсистем (только для администраторов)"""
+    if not is_admin(update.effective_user.id):
+        update.message.reply_text("⛔ Только для администраторов")
+        return
+    
+    update.message.reply_text(format_metrics_summary())
+
+def format_profile_report(result, limit=10):
+    """Сводка профилирования: топ функций по собственному времени и по ролям потоков"""
+    report = f"🔬 ПРОФИЛЬ ({result.duration:.1f}с, {result.samples} выборок)\n"
+    
+    report += "\n🔥 Собственное время:\n"
+    for item in result.top_self(limit):
+        report += f"• {item['percent']:.1f}% {item['function']}\n"
+    
+    report += "\n🧵 По потокам:\n"
+    for role, count in result.role_samples().items():
+        top = result.top_self(1, role=role)
+        leader = f" → {top[0]['function']}" if top else ""
+        report += f"• {role} ({len(result.thread_names.get(role, ()))}): {count}{leader}\n"
+    
+    # Ограничение Telegram на длину сообщения
+    return report[:4000]
+
+def sampling_profile_handler(update, context):
+    """Обработчик команды /sample_profile [секунды] - профилирование бота (только для администраторов)"""
+    if not is_admin(update.effective_user.id):
+        update.message.reply_text("⛔ Только для администраторов")
+        return
+    
+    if is_profiling():
+        update.message.reply_text("⏳ Профилирование уже выполняется")
+        return
+    
+    try:
+        seconds = min(max(float(context.args[0]), 1), MAX_DURATION) if context.args else 10
+    except ValueError:
+        update.message.reply_text("Использование: /sample_profile [секунды]")
+        return
+    
+    chat_id = update.effective_chat.id
+    update.message.reply_text(f"🔬 Профилирую процесс {seconds:.0f}с...")
+    
+    # Выборка идет в отдельном потоке, чтобы не занимать dispatcher
+    def run():
+        try:
+            result = run_profile(seconds)
+        except ProfilerBusyError:
+            context.bot.send_message(chat_id, "⏳ Профилирование уже выполняется")
+            return
+        except Exception as e:
+            logger.error(f"Ошибка профилирования: {e}")
+            context.bot.send_message(chat_id, f"❌ Ошибка профилирования: {e}")
+            return
+        
+        context.bot.send_message(chat_id, format_profile_report(result))
+        collapsed = io.BytesIO(result.collapsed().encode('utf-8'))
+        context.bot.send_document(
+            chat_id, document=collapsed,
+            filename=f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.collapsed.txt",
+            caption="Свернутые стеки для flamegraph.pl / speedscope"
+        )
+    
+    threading.Thread(target=run, name='profiler', daemon=True).start()
+
+def format_memory_report():
+    """Память процесса и размеры групп объектов (замер групп не чаще раза в минуту)"""
+    accounting = get_memory_accounting()
+    accounting.measure()
+    stats = accounting.get_stats()
+    process = stats['process']
+    
+    report = "🧠 ПАМЯТЬ\n"
+    report += f"\nПроцесс {process['pid']}: RSS {process['rss_mb']}MB"
+    if process['uss_mb'] is not None:
+        report += f", USS {process['uss_mb']}MB"
+    report += "\n"
+    if process['children']:
+        report += f"Дочерних процессов: {process['children']}, RSS {process['children_rss_mb']}MB\n"
+    
+    if stats['groups']:
+        report += "\n📏 Группы объектов:\n"
+        for name, group in stats['groups'].items():
+            marker = " (обход прерван)" if group['truncated'] else ""
+            report += f"• {name}: {group['items']} шт, {group['mb']}MB, {group['item_mb']}MB/шт{marker}\n"
+    
+    tracing = stats['tracemalloc']
+    if tracing['tracing']:
+        report += f"\n🔎 tracemalloc: {tracing['current_mb']}MB (пик {tracing['peak_mb']}MB)\n"
+    return report
+
+def format_memory_diff(limit=10):
+    """Рост памяти с базового снимка tracemalloc по traceback"""
+    diffs = get_memory_accounting().snapshot_diff(limit=limit)
+    report = "🔎 РОСТ ПАМЯТИ С БАЗОВОГО СНИМКА\n"
+    if not diffs:
+        return report + "\nИзменений нет"
+    for item in diffs:
+        # Последний кадр - место выделения, выше - вызывающий код
+        where = " ← ".join(item['traceback'][-1:-4:-1])
+        report += f"\n{item['size_diff_kb']:+.1f}KB ({item['count_diff']:+d} блоков)\n{where}\n"
+    # Ограничение Telegram на длину сообщения
+    return report[:4000]
+
+def memory_handler(update, context):
+    """Обработчик команды /memory [trace|diff|stop] - учет памяти (только для администраторов)"""
+    if not is_admin(update.effective_user.id):
+        update.message.reply_text("⛔ Только для администраторов")
+        return
+    
+    action = context.args[0].lower() if context.args else ''
+    accounting = get_memory_accounting()
+    try:
+        if action == 'trace':
+            if accounting.start_tracing():
+                update.message.reply_text("🔎 tracemalloc включен, базовый снимок снят. Рост: /memory diff")
+            else:
+                update.message.reply_text("🔎 tracemalloc уже включен")
+        elif action == 'diff':
+            update.message.reply_text(format_memory_diff())
+        elif action == 'stop':
+            accounting.stop_tracing()
+            update.message.reply_text("🔎 tracemalloc выключен")
+        else:
+            update.message.reply_text(format_memory_report())
+    except RuntimeError as e:
+        update.message.reply_text(f"⚠️ {e}. Включите: /memory trace")
+
+def format_errors_report(limit=10, sort='count'):
+    """Самые частые (или самые свежие) ошибки из сводки по отпечаткам"""
+    aggregator = get_error_aggregator()
+    stats = aggregator.get_stats()
+    title = "ЧАСТЫЕ" if sort == 'count' else "ПОСЛЕДНИЕ"
+    report = f"🐞 {title} ОШИБКИ\n"
+    report += f"\nРазных: {stats['fingerprints']}, всего: {stats['occurrences']}\n"
+    
+    errors = aggregator.top(limit, sort=sort)
+    if not errors:
+        return report + "\nОшибок нет"
+    for item in errors:
+        report += f"\n[{item['fingerprint']}] ×{item['count']} {item['type'].rsplit('.', 1)[-1]}\n"
+        report += f"  {item['message'][:120]}\n"
+        report += f"  📍 {item['where'] or '-'} | {item['last_seen'].replace('T', ' ')}\n"
+    report += "\nПодробности: /errors <отпечаток>"
+    return report[:4000]
+
+def format_error_details(error):
+    """Стек и примеры данных по одному отпечатку"""
+    report = f"🐞 [{error['fingerprint']}] {error['type']}\n"
+    report += f"Повторов: {error['count']}, первое: {error['first_seen']}, последнее: {error['last_seen']}\n"
+    report += f"\n{error['message']}\n"
+    report += f"\n{error['traceback'][-2000:]}"
+    for sample in error['samples'][-1:]:
+        report += f"\nПример данных:\n{sample[:800]}"
+    return report[:4000]
+
+def errors_handler(update, context):
+    """Обработчик команды /errors [recent|<отпечаток>|clear [отпечаток]] - сводка ошибок (только для администраторов)"""
+    if not is_admin(update.effective_user.id):
+        update.message.reply_text("⛔ Только для администраторов")
+        return
+    
+    args = context.args or []
+    action = args[0].lower() if args else ''
+    aggregator = get_error_aggregator()
+    if not action:
+        update.message.reply_text(format_errors_report())
+    elif action == 'recent':
+        update.message.reply_text(format_errors_report(sort='last_seen'))
+    elif action == 'clear':
+        removed = aggregator.clear(args[1] if len(args) > 1 else None)
+        update.message.reply_text(f"🧹 Удалено из сводки: {removed}")
+    else:
+        error = aggregator.get(action)
+        if error:
+            update.message.reply_text(format_error_details(error))
+        else:
+            update.message.reply_text(f"❓ Ошибка {action} не найдена")
+
 def get_system_handlers():
     """Возвращает обработчики для системного мониторинга"""
     return [
         CommandHandler("system_status", system_status_handler),
+        CommandHandler("db_queries", db_queries_handler),
+        CommandHandler("metrics", metrics_handler),
+        CommandHandler("sample_profile", sampling_profile_handler),
+        CommandHandler("memory", memory_handler),
+        CommandHandler("errors", errors_handler),
+        CallbackQueryHandler(db_queries_handler, pattern='^system_db_queries$'),
         CallbackQueryHandler(system_levels_handler, pattern='^system_levels$'),
         CallbackQueryHandler(system_profiles_handler, pattern='^system_profiles$'),
         CallbackQueryHandler(set_hardware_profile_handler, pattern='^set_profile_'),
@@ -14,6 +14,7 @@ from telegram.ext import (
 )
 from database.db_manager import get_instagram_accounts
 from utils.interest_based_warmup import InterestCategory
+from utils.settings_service import get_settings_service
 
 logger = logging.getLogger(__name__)
 
@@ -456,21 +457,9 @@ def save_interest_settings(update: Update, context: CallbackContext) -> None:
         query.edit_message_text("❌ Настройки не найдены. Попробуйте заново.", parse_mode=None)
         return
     
-    # Сохраняем в файл (можно заменить на базу данных)
+    # Сохраняем через сервис настроек (кеш + атомарная запись файла)
     try:
-        # Загружаем существующие настройки
-        try:
-            with open('interest_warmup_settings.json', 'r', encoding='utf-8') as f:
-                all_settings = json.load(f)
-        except FileNotFoundError:
-            all_settings = {}
-        
-        # Добавляем настройки пользователя
-        all_settings[str(user_id)] = settings
-        
-        # Сохраняем обратно
-        with open('interest_warmup_settings.json', 'w', encoding='utf-8') as f:
-            json.dump(all_settings, f, ensure_ascii=False, indent=2)
+        get_settings_service().update('interest_warmup', {str(user_id): settings})
         
         # Очищаем временные настройки
         if user_id in user_interest_settings:
@@ -554,6 +543,7 @@ from telegram.ext import (
 )
 from database.db_manager import get_instagram_accounts
 from utils.interest_based_warmup import InterestCategory
+from utils.settings_service import get_settings_service
 
 logger = logging.getLogger(__name__)
 
@@ -996,21 +986,9 @@ def save_interest_settings(update: Update, context: CallbackContext) -> None:
         query.edit_message_text("❌ Настройки не найдены. Попробуйте заново.", parse_mode=None)
         return
     
-    # Сохраняем в файл (можно заменить на базу данных)
+    # Сохраняем через сервис настроек (кеш + атомарная запись файла)
     try:
-        # Загружаем существующие настройки
-        try:
-            with open('interest_warmup_settings.json', 'r', encoding='utf-8') as f:
-                all_settings = json.load(f)
-        except FileNotFoundError:
-            all_settings = {}
-        
-        # Добавляем настройки пользователя
-        all_settings[str(user_id)] = settings
-        
-        # Сохраняем обратно
-        with open('interest_warmup_settings.json', 'w', encoding='utf-8') as f:
-            json.dump(all_settings, f, ensure_ascii=False, indent=2)
+        get_settings_service().update('interest_warmup', {str(user_id): settings})
         
         # Очищаем временные настройки
         if user_id in user_interest_settings:
@@ -1097,6 +1075,7 @@ from telegram.ext import (
 )
 from database.db_manager import get_instagram_accounts
 from utils.interest_based_warmup import InterestCategory
+from utils.settings_service import get_settings_service
 
 logger = logging.getLogger(__name__)
 
@@ -1539,21 +1518,9 @@ def save_interest_settings(update: Update, context: CallbackContext) -> None:
         query.edit_message_text("❌ Настройки не найдены. Попробуйте заново.", parse_mode=None)
         return
     
-    # Сохраняем в файл (можно заменить на базу данных)
+    # Сохраняем через сервис настроек (кеш + атомарная запись файла)
     try:
-        # Загружаем существующие настройки
-        try:
-            with open('interest_warmup_settings.json', 'r', encoding='utf-8') as f:
-                all_settings = json.load(f)
-        except FileNotFoundError:
-            all_settings = {}
-        
-        # Добавляем настройки пользователя
-        all_settings[str(user_id)] = settings
-        
-        # Сохраняем обратно
-        with open('interest_warmup_settings.json', 'w', encoding='utf-8') as f:
-            json.dump(all_settings, f, ensure_ascii=False, indent=2)
+        get_settings_service().update('interest_warmup', {str(user_id): settings})
         
         # Очищаем временные настройки
         if user_id in user_interest_settings:
@@ -1637,6 +1604,7 @@ from telegram.ext import (
 )
 from database.db_manager import get_instagram_accounts
 from utils.interest_based_warmup import InterestCategory
+from utils.settings_service import get_settings_service
 
 logger = logging.getLogger(__name__)
 
@@ -2079,21 +2047,9 @@ def save_interest_settings(update: Update, context: CallbackContext) -> None:
         query.edit_message_text("❌ Настройки не найдены. Попробуйте заново.", parse_mode=None)
         return
     
-    # Сохраняем в файл (можно заменить на базу данных)
+    # Сохраняем через сервис настроек (кеш + атомарная запись файла)
     try:
-        # Загружаем существующие настройки
-        try:
-            with open('interest_warmup_settings.json', 'r', encoding='utf-8') as f:
-                all_settings = json.load(f)
-        except FileNotFoundError:
-            all_settings = {}
-        
-        # Добавляем настройки пользователя
-        all_settings[str(user_id)] = settings
-        
-        # Сохраняем обратно
-        with open('interest_warmup_settings.json', 'w', encoding='utf-8') as f:
-            json.dump(all_settings, f, ensure_ascii=False, indent=2)
+        get_settings_service().update('interest_warmup', {str(user_id): settings})
         
         # Очищаем временные настройки
         if user_id in user_interest_settings:
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для единой фоновой среды
+"""
+
+import threading
+import time
+import unittest
+from datetime import datetime
+
+from utils.background_runtime import BackgroundRuntime, CronSchedule
+
+
+class TestBackgroundRuntime(unittest.TestCase):
+    """Тесты для расписаний, защиты от наложения и остановки"""
+
+    def setUp(self):
+        self.runtime = BackgroundRuntime(max_workers=2, name='test-background')
+
+    def tearDown(self):
+        self.runtime.shutdown(timeout=2)
+
+    def test_interval_and_overlap(self):
+        """Задача запускается по интервалу, пока идет прошлый запуск - пропускается"""
+        runs = []
+        release = threading.Event()
+
+        def slow():
+            runs.append(time.time())
+            release.wait(2)
+
+        self.runtime.every('slow', 0.1, slow, jitter=0, initial_delay=0)
+        time.sleep(0.35)
+        job = self.runtime.get_jobs()[0]
+        self.assertEqual(len(runs), 1)
+        self.assertGreaterEqual(job['skipped_overlap'], 1)
+        self.assertEqual(job['running'], 1)
+
+        release.set()
+        time.sleep(0.3)
+        self.assertGreaterEqual(len(runs), 2)
+        self.assertEqual(self.runtime.get_stats()['jobs'], 1)
+
+    def test_replace_while_running(self):
+        """Задача, замененная во время запуска, снова запускается после его завершения"""
+        release = threading.Event()
+        started = threading.Event()
+        replaced = []
+
+        def slow():
+            started.set()
+            release.wait(2)
+
+        self.runtime.every('job', 0.05, slow, jitter=0, initial_delay=0)
+        self.assertTrue(started.wait(1))
+        self.runtime.every('job', 0.05, replaced.append, 1, jitter=0, initial_delay=0)
+        time.sleep(0.2)
+        self.assertEqual(replaced, [])
+        self.assertEqual(self.runtime.get_jobs()[0]['running'], 1)
+
+        release.set()
+        time.sleep(0.3)
+        self.assertGreaterEqual(len(replaced), 1)
+        self.assertEqual(self.runtime.get_stats()['running'], 0)
+
+    def test_long_running_pool(self):
+        """Долгая задача идет в отдельном пуле и не занимает потоки коротких"""
+        runtime = BackgroundRuntime(max_workers=1, long_max_workers=1, name='test-long')
+        release = threading.Event()
+        started = threading.Event()
+        short = threading.Event()
+        try:
+            runtime.every('long', 3600, lambda: (started.set(), release.wait(2)), initial_delay=0, long_running=True)
+            self.assertTrue(started.wait(1))
+            runtime.once('short', 0, short.set)
+            self.assertTrue(short.wait(1))
+            self.assertTrue(runtime.get_jobs()[0]['long_running'])
+        finally:
+            release.set()
+            runtime.shutdown(timeout=2)
+
+    def test_cron_next_run(self):
+        """Ближайшее время по cron-выражению"""
+        moment = datetime(2024, 1, 31, 23, 58, 30)
+        self.assertEqual(CronSchedule('*/15 * * * *').next_after(moment), datetime(2024, 2, 1, 0, 0))
+        self.assertEqual(CronSchedule('30 4 * * *').next_after(moment), datetime(2024, 2, 1, 4, 30))
+        # 1 января 2024 - понедельник
+        self.assertEqual(CronSchedule('0 9 * * 1-5').next_after(datetime(2024, 1, 6, 10, 0)),
+                         datetime(2024, 1, 8, 9, 0))
+        self.assertEqual(CronSchedule('0 0 1 3 *').next_after(moment), datetime(2024, 3, 1, 0, 0))
+        with self.assertRaises(ValueError):
+            CronSchedule('61 * * * *')
+        with self.assertRaises(ValueError):
+            CronSchedule('* * *')
+
+    def test_once_cancel_and_reschedule(self):
+        """Однократная задача выполняется один раз, отмененная - ни разу"""
+        done = threading.Event()
+        cancelled = []
+        self.runtime.once('once', 0, done.set)
+        self.runtime.once('cancelled', 0.3, cancelled.append, 1)
+        self.assertTrue(self.runtime.cancel('cancelled'))
+        self.assertFalse(self.runtime.cancel('missing'))
+
+        self.assertTrue(done.wait(1))
+        time.sleep(0.5)
+        self.assertEqual(cancelled, [])
+        self.assertFalse(self.runtime.has_job('once'))
+
+        later = threading.Event()
+        self.runtime.every('later', 3600, later.set)
+        self.assertTrue(self.runtime.run_now('later'))
+        self.assertTrue(later.wait(1))
+        self.assertTrue(self.runtime.has_job('later'))
+
+    def test_shutdown_drains_jobs(self):
+        """Остановка будит ожидающие задачи, дожидается их и вызывает хуки"""
+        started = threading.Event()
+        finished = []
+        hooks = []
+
+        def long_job():
+            started.set()
+            # Задача ждет через среду и выходит раньше при остановке
+            if self.runtime.wait(10):
+                finished.append('stopped')
+
+        self.runtime.every('long', 60, long_job, initial_delay=0)
+        self.runtime.add_shutdown_hook('hook', lambda: hooks.append(list(finished)))
+        self.assertTrue(started.wait(1))
+
+        began = time.monotonic()
+        self.assertTrue(self.runtime.shutdown(timeout=5))
+        self.assertLess(time.monotonic() - began, 2)
+        self.assertEqual(finished, ['stopped'])
+        self.assertEqual(hooks, [['stopped']])
+        with self.assertRaises(RuntimeError):
+            self.runtime.once('late', 0, finished.clear)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для учета прогресса пакетов задач
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils.batch_tracker import BatchTracker
+
+
+class TestBatchTracker(unittest.TestCase):
+    """Тесты для BatchTracker"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'task_batches.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_batch_finished_by_last_task(self):
+        """Пакет завершается последней задачей и удаляется из активных"""
+        tracker = BatchTracker(path=None)
+        batch_id = tracker.register([1, 2, 3], chat_id=100, bot='bot')
+
+        self.assertIsNone(tracker.record(1, True))
+        self.assertIsNone(tracker.record(2, False))
+        self.assertEqual(tracker.get_progress(batch_id)['pending'], 1)
+
+        batch = tracker.record(3, True)
+        self.assertEqual(batch.batch_id, batch_id)
+        self.assertEqual(batch.completed_tasks, {1, 3})
+        self.assertEqual(batch.failed_tasks, {2})
+        self.assertEqual(tracker.pop_bot(batch_id), 'bot')
+        self.assertEqual(len(tracker), 0)
+        self.assertIsNone(tracker.record(3, True))
+
+    def test_repeated_result_not_double_counted(self):
+        """Повторный результат задачи заменяет прежний"""
+        tracker = BatchTracker(path=None)
+        batch_id = tracker.register([1, 2], chat_id=100)
+
+        tracker.record(1, False)
+        tracker.record(1, True)
+        progress = tracker.get_progress(batch_id)
+        self.assertEqual((progress['completed'], progress['failed'], progress['pending']), (1, 0, 1))
+
+    def test_same_second_batches_do_not_collide(self):
+        """Два пакета одного чата в одну секунду получают разные ID"""
+        tracker = BatchTracker(path=None)
+        first = tracker.register([1], chat_id=100)
+        second = tracker.register([2], chat_id=100)
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(len(tracker.list_progress(chat_id=100)), 2)
+        self.assertEqual(tracker.list_progress(chat_id=200), [])
+
+    def test_state_survives_restart(self):
+        """Прогресс восстанавливается из файла после перезапуска"""
+        tracker = BatchTracker(path=self.path)
+        batch_id = tracker.register([1, 2], chat_id=100, bot='bot')
+        tracker.record(1, True)
+
+        restored = BatchTracker(path=self.path)
+        self.assertEqual(restored.get_progress(batch_id)['completed'], 1)
+        self.assertIsNone(restored.pop_bot(batch_id))
+
+        batch = restored.record(2, False)
+        self.assertEqual(batch.chat_id, 100)
+        self.assertEqual(len(BatchTracker(path=self.path)), 0)
+
+
+    def test_processes_share_file(self):
+        """Пакеты и прогресс другого процесса видны после изменения файла"""
+        bot_tracker = BatchTracker(path=self.path)
+        web_tracker = BatchTracker(path=self.path)
+
+        bot_batch = bot_tracker.register([1, 2], chat_id=100)
+        web_batch = web_tracker.register([3], chat_id=200)
+        self.assertEqual(web_tracker.get_progress(bot_batch)['pending'], 2)
+
+        bot_tracker.record(1, True)
+        self.assertEqual(web_tracker.get_progress(bot_batch)['completed'], 1)
+        # Запись бота не затерла пакет веб-процесса
+        self.assertEqual(bot_tracker.get_progress(web_batch)['total'], 1)
+
+        self.assertIsNotNone(bot_tracker.record(2, False))
+        self.assertIsNone(web_tracker.get_progress(bot_batch))
+        self.assertEqual([item['batch_id'] for item in web_tracker.list_progress()], [web_batch])
+        self.assertGreaterEqual(web_tracker.stats['reloads'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
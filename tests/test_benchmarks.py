@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для ядра бенчмарков
+"""
+
+import os
+import tempfile
+import unittest
+
+from benchmarks.core import (
+    Benchmark, BenchResult, SkipBenchmark, run_benchmark, save_baseline, load_baseline, compare_results
+)
+
+
+def result(name, median):
+    return BenchResult(name=name, group='test', median=median, min=median, p95=median,
+                       ops_per_sec=1 / median, loops=1, repeats=1)
+
+
+class TestBenchmarkCore(unittest.TestCase):
+    """Тесты для замера, базовых результатов и сравнения"""
+
+    def test_run_calibrates_and_seeds(self):
+        """Замер подбирает число повторов, данные одинаковы при одном зерне, очистка выполняется"""
+        seen = []
+        cleaned = []
+
+        def factory(ctx):
+            seen.append([ctx.rng.random() for _ in range(3)])
+            ctx.add_cleanup(lambda: cleaned.append(os.path.isdir(ctx.tmpdir)))
+            return lambda: sum(range(100))
+
+        bench = Benchmark(name='test/sum', group='test', factory=factory)
+        first = run_benchmark(bench, repeats=3, min_time=0.005, seed=7)
+        second = run_benchmark(bench, repeats=3, min_time=0.005, seed=7)
+
+        self.assertEqual(seen[0], seen[1])
+        self.assertEqual(cleaned, [True, True])
+        self.assertEqual(first.repeats, 3)
+        self.assertGreater(first.loops, 1)
+        self.assertGreater(first.median, 0)
+        self.assertLessEqual(first.min, first.median)
+        self.assertLessEqual(first.median, first.p95)
+        self.assertIsNone(second.error)
+
+    def test_skip_and_error(self):
+        """Недоступный инструмент - пропуск с причиной, исключение - ошибка, а не падение"""
+        def skipped(ctx):
+            raise SkipBenchmark('нет ffmpeg')
+
+        def broken(ctx):
+            def run():
+                raise ValueError('сломано')
+            return run
+
+        skip = run_benchmark(Benchmark('test/skip', 'test', skipped), repeats=1, min_time=0)
+        error = run_benchmark(Benchmark('test/error', 'test', broken), repeats=1, min_time=0)
+        self.assertEqual(skip.skipped, 'нет ffmpeg')
+        self.assertEqual(error.error, 'ValueError: сломано')
+
+        statuses = {item.name: item.status for item in compare_results([skip, error], None)}
+        self.assertEqual(statuses, {'test/skip': 'skipped', 'test/error': 'error'})
+
+    def test_compare_with_threshold(self):
+        """Регрессия и улучшение - только за пределами порога; новые и пропавшие отмечаются"""
+        baseline = {'results': {
+            'a': result('a', 1.0).to_dict(),
+            'b': result('b', 1.0).to_dict(),
+            'c': result('c', 1.0).to_dict(),
+            'gone': result('gone', 1.0).to_dict(),
+        }}
+        current = [result('a', 1.3), result('b', 1.1), result('c', 0.5), result('new', 1.0)]
+        comparisons = {item.name: item for item in compare_results(current, baseline, threshold=0.2)}
+
+        self.assertEqual(comparisons['a'].status, 'regression')
+        self.assertAlmostEqual(comparisons['a'].change, 0.3)
+        self.assertEqual(comparisons['b'].status, 'ok')
+        self.assertEqual(comparisons['c'].status, 'improvement')
+        self.assertEqual(comparisons['new'].status, 'new')
+        self.assertEqual(comparisons['gone'].status, 'missing')
+        self.assertEqual(compare_results([result('a', 1.3)], baseline, threshold=0.5)[0].status, 'ok')
+
+    def test_baseline_roundtrip_merges(self):
+        """Базовые результаты сохраняются в JSON и дополняются, пропуски не записываются"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'baselines', 'default.json')
+            self.assertIsNone(load_baseline(path))
+
+            save_baseline(path, [result('a', 1.0), BenchResult('skip', 'test', skipped='нет cv2')])
+            save_baseline(path, [result('b', 2.0)])
+            data = load_baseline(path)
+
+            self.assertEqual(sorted(data['results']), ['a', 'b'])
+            self.assertEqual(BenchResult.from_dict(data['results']['b']).median, 2.0)
+            self.assertIn('python', data['machine'])
+
+            save_baseline(path, [result('c', 3.0)], merge=False)
+            self.assertEqual(sorted(load_baseline(path)['results']), ['c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
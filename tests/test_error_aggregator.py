@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для сводки ошибок по отпечаткам
+"""
+
+import os
+import json
+import tempfile
+import unittest
+
+from utils.error_aggregator import ErrorAggregator, fingerprint_error, normalize_message
+
+
+def fail_lookup(user_id):
+    raise KeyError(f"user {user_id} not found")
+
+
+def fail_parse(value):
+    return int(value)
+
+
+def capture(func, *args):
+    try:
+        func(*args)
+    except Exception as e:
+        return e
+
+
+class TestErrorAggregator(unittest.TestCase):
+    """Тесты для отпечатков, счетчиков, вытеснения и файла сводки"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'errors.json')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_fingerprint_ignores_values(self):
+        """Отпечаток зависит от типа и стека, а не от значений в сообщении"""
+        first = capture(fail_lookup, 1)
+        second = capture(fail_lookup, 987654)
+        other = capture(fail_parse, 'x')
+        self.assertEqual(fingerprint_error(first), fingerprint_error(second))
+        self.assertNotEqual(fingerprint_error(first), fingerprint_error(other))
+
+        # Без стека отпечаток строится по нормализованному сообщению
+        self.assertEqual(fingerprint_error(TimeoutError('timed out after 30s')),
+                         fingerprint_error(TimeoutError('timed out after 45s')))
+        self.assertEqual(normalize_message("Chat 12345 'abc' at 0x7f3a"), "Chat N ? at <hex>")
+
+    def test_counts_samples_and_top(self):
+        """Повторы считаются, примеры данных ограничены, топ по частоте и свежести"""
+        aggregator = ErrorAggregator(self.path, schedule_flush=False)
+        for i in range(5):
+            fingerprint = aggregator.record(capture(fail_lookup, i), payload={'update_id': i})
+        self.assertFalse(aggregator.is_new(fingerprint))
+        other = aggregator.record(capture(fail_parse, 'x'))
+        self.assertTrue(aggregator.is_new(other))
+
+        top = aggregator.top(limit=5)
+        self.assertEqual([item['count'] for item in top], [5, 1])
+        self.assertEqual(top[0]['where'], 'test_error_aggregator:fail_lookup')
+        self.assertEqual(aggregator.top(limit=1, sort='last_seen')[0]['fingerprint'], other)
+
+        details = aggregator.get(fingerprint[:6])
+        self.assertEqual(len(details['samples']), 3)
+        self.assertIn("'update_id': 4", details['samples'][-1])
+        self.assertIn('KeyError', details['traceback'])
+        self.assertEqual(aggregator.get_stats()['occurrences'], 6)
+
+    def test_flush_reload_and_eviction(self):
+        """Сводка пишется только при изменениях, переживает перезапуск, старые вытесняются"""
+        aggregator = ErrorAggregator(self.path, schedule_flush=False, max_fingerprints=2)
+        self.assertFalse(aggregator.flush())
+        first = aggregator.record(capture(fail_lookup, 1))
+        aggregator.record(capture(fail_parse, 'x'))
+        aggregator.record(ValueError('third'))
+        self.assertEqual(aggregator.get_stats()['evicted'], 1)
+        self.assertIsNone(aggregator.get(first))
+
+        self.assertTrue(aggregator.flush())
+        self.assertFalse(aggregator.flush())
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual(len(json.load(f)['errors']), 2)
+
+        restored = ErrorAggregator(self.path, schedule_flush=False)
+        self.assertEqual(restored.get_stats()['fingerprints'], 2)
+        self.assertEqual(restored.clear(), 2)
+        self.assertEqual(ErrorAggregator(self.path, schedule_flush=False).get_stats()['fingerprints'], 0)
+
+
+    def test_reader_sees_other_process_writes(self):
+        """Читающий процесс перечитывает сводку, когда ее переписал другой процесс"""
+        writer = ErrorAggregator(self.path, schedule_flush=False)
+        reader = ErrorAggregator(self.path, schedule_flush=False)
+        self.assertEqual(reader.top(), [])
+
+        fingerprint = writer.record(capture(fail_lookup, 1))
+        writer.flush()
+        self.assertEqual([item['fingerprint'] for item in reader.top()], [fingerprint])
+
+        writer.record(capture(fail_lookup, 2))
+        writer.flush()
+        self.assertEqual(reader.get(fingerprint)['count'], 2)
+        self.assertEqual(reader.get_stats()['reloads'], 2)
+
+        # Без изменений файла повторно не читаем
+        reader.top()
+        self.assertEqual(reader.get_stats()['reloads'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
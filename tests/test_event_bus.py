@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для шины событий и потока SSE
+"""
+
+import json
+import threading
+import unittest
+
+from utils.event_bus import EventBus
+
+
+def parse_event(chunk):
+    """Разобрать одно SSE-сообщение в словарь полей"""
+    fields = {}
+    for line in chunk.strip().split('\n'):
+        name, _, value = line.partition(': ')
+        fields[name] = value
+    return fields
+
+
+class TestEventBus(unittest.TestCase):
+    """Тесты для EventBus"""
+
+    def setUp(self):
+        self.bus = EventBus(buffer_size=5)
+        self.stop = threading.Event()
+
+    def tearDown(self):
+        self.stop.set()
+
+    def test_topic_filter(self):
+        """Подписчик получает только события своих тем"""
+        stream = self.bus.stream(topics=['task'], stop=self.stop, heartbeat=1)
+        self.assertTrue(next(stream).startswith('retry:'))
+
+        self.bus.publish('job.status', job_id='a')
+        self.bus.publish('task.status', task_id=7, status='completed')
+
+        event = parse_event(next(stream))
+        self.assertEqual(event['event'], 'task.status')
+        self.assertEqual(json.loads(event['data'])['data'], {'task_id': 7, 'status': 'completed'})
+        self.assertEqual(self.bus.get_stats()['subscribers'], 1)
+        stream.close()
+        self.assertEqual(self.bus.get_stats()['subscribers'], 0)
+
+    def test_resume_from_last_event_id(self):
+        """После переподключения пропущенные события досылаются по Last-Event-ID"""
+        first = self.bus.publish('task.status', task_id=1)
+        self.bus.publish('task.status', task_id=2)
+        self.bus.publish('task.status', task_id=3)
+
+        stream = self.bus.stream(last_event_id=first, stop=self.stop, heartbeat=1)
+        next(stream)
+        events = [parse_event(next(stream)) for _ in range(2)]
+        self.assertEqual([json.loads(event['data'])['data']['task_id'] for event in events], [2, 3])
+        self.assertEqual(self.bus.get_stats()['resumed'], 1)
+
+        # Клиент присылает ID в том виде, в каком получил его из потока
+        stream = self.bus.stream(last_event_id=events[0]['id'], stop=self.stop, heartbeat=1)
+        next(stream)
+        self.assertEqual(json.loads(parse_event(next(stream))['data'])['data']['task_id'], 3)
+
+    def test_reset_when_buffer_overrun(self):
+        """Если пропущенное уже вытеснено из буфера, клиент получает reset"""
+        for i in range(10):
+            self.bus.publish('task.status', task_id=i)
+
+        stream = self.bus.stream(last_event_id=1, stop=self.stop, heartbeat=1)
+        next(stream)
+        event = parse_event(next(stream))
+        self.assertEqual(event['event'], 'reset')
+        self.assertEqual(event['id'], f"{self.bus.boot_id}-{self.bus.last_event_id}")
+
+    def test_reset_after_server_restart(self):
+        """ID прошлого запуска или больше текущего счетчика дает reset, поток идет с текущего события"""
+        self.bus.publish('task.status', task_id=1)
+        for last_event_id in (50, 'oldboot-1', f"{self.bus.boot_id}-50"):
+            stream = self.bus.stream(last_event_id=last_event_id, stop=self.stop, heartbeat=1)
+            next(stream)
+            event = parse_event(next(stream))
+            self.assertEqual(event['event'], 'reset')
+            self.assertEqual(event['id'], f"{self.bus.boot_id}-{self.bus.last_event_id}")
+
+            self.bus.publish('task.status', task_id=2)
+            event = parse_event(next(stream))
+            self.assertEqual(json.loads(event['data'])['data'], {'task_id': 2})
+            stream.close()
+        self.assertEqual(self.bus.get_stats()['resets'], 3)
+        self.assertEqual(self.bus.get_stats()['resumed'], 0)
+
+    def test_heartbeat_when_idle(self):
+        """Без событий в поток уходит heartbeat"""
+        stream = self.bus.stream(stop=self.stop, heartbeat=0.05)
+        next(stream)
+        self.assertEqual(next(stream), ": heartbeat\n\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
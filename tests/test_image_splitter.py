@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для разделения изображений на мозаику
+"""
+
+import io
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from PIL import Image
+
+from utils.image_splitter import split_image_for_mosaic, encode_to_budget
+
+
+def _noise_image(width, height, seed=42):
+    rnd = random.Random(seed)
+    data = bytes(rnd.getrandbits(8) for _ in range(width * height * 3))
+    return Image.frombytes('RGB', (width, height), data)
+
+
+class TestImageSplitter(unittest.TestCase):
+    """Тесты для split_image_for_mosaic и encode_to_budget"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.image_path = os.path.join(self.tmp_dir, 'source.jpg')
+        _noise_image(300, 200).save(self.image_path, quality=95)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_split_as_buffers(self):
+        """Части возвращаются в памяти в порядке строк"""
+        parts = split_image_for_mosaic(self.image_path, rows=2, cols=3, as_buffers=True)
+        self.assertEqual(len(parts), 6)
+        for part in parts:
+            self.assertIsInstance(part, io.BytesIO)
+            self.assertEqual(Image.open(part).size, (100, 100))
+
+    def test_split_respects_size_budget(self):
+        """Каждая часть укладывается в max_size_kb"""
+        parts = split_image_for_mosaic(self.image_path, rows=2, cols=3, max_size_kb=8, as_buffers=True)
+        for part in parts:
+            self.assertLessEqual(part.getbuffer().nbytes, 8 * 1024)
+
+    def test_encode_to_budget_keeps_best_quality(self):
+        """Бинарный поиск выбирает максимальное качество в пределах лимита"""
+        img = _noise_image(120, 120)
+        buffer, quality = encode_to_budget(img, max_size_kb=10)
+        self.assertLessEqual(buffer.getbuffer().nbytes, 10 * 1024)
+
+        higher = io.BytesIO()
+        img.save(higher, format='JPEG', quality=quality + 1)
+        if quality < 95:
+            self.assertGreater(higher.tell(), 10 * 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для фоновых задач веб-API
+"""
+
+import threading
+import time
+import unittest
+
+from utils.job_manager import JobManager, JobStatus, JobQueueFull
+
+
+class TestJobManager(unittest.TestCase):
+    """Тесты для JobManager"""
+
+    def setUp(self):
+        self.manager = JobManager(max_workers=1, max_queued=2, result_ttl=60)
+
+    def tearDown(self):
+        self.manager.shutdown()
+
+    def test_progress_and_result(self):
+        """Задача сообщает прогресс и сохраняет результат"""
+        def work(ctx, numbers):
+            return ctx.map(lambda n: n % 2 == 0, numbers, parallel=2)
+
+        job = self.manager.submit('demo', work, [1, 2, 3, 4])
+        self.assertTrue(job.wait(5))
+
+        self.assertEqual(job.status, JobStatus.COMPLETED)
+        self.assertEqual(job.result, [False, True, False, True])
+        progress = job.to_dict()['progress']
+        self.assertEqual((progress['done'], progress['succeeded'], progress['failed']), (4, 2, 2))
+        self.assertIs(self.manager.get(job.job_id), job)
+
+    def test_burst_queued_then_rejected(self):
+        """Всплеск запросов ждет в очереди, переполнение отклоняется"""
+        release, started = threading.Event(), threading.Event()
+        running = self.manager.submit('slow', lambda ctx: started.set() or release.wait(5))
+        started.wait(5)
+        queued = [self.manager.submit('slow', lambda ctx: True) for _ in range(2)]
+
+        with self.assertRaises(JobQueueFull):
+            self.manager.submit('slow', lambda ctx: True)
+        self.assertTrue(all(job.status == JobStatus.QUEUED for job in queued))
+
+        release.set()
+        for job in [running] + queued:
+            self.assertTrue(job.wait(5))
+        self.assertEqual(self.manager.get_stats()['rejected'], 1)
+
+    def test_cancel_running_and_queued(self):
+        """Отмена останавливает выполняющуюся задачу и снимает ожидающую"""
+        started = threading.Event()
+
+        def work(ctx):
+            started.set()
+            return ctx.map(lambda n: time.sleep(0.05) or True, range(100))
+
+        running = self.manager.submit('long', work)
+        queued = self.manager.submit('long', work)
+        started.wait(5)
+
+        self.manager.cancel(queued.job_id)
+        self.assertEqual(queued.status, JobStatus.CANCELLED)
+
+        self.manager.cancel(running.job_id)
+        self.assertTrue(running.wait(5))
+        self.assertEqual(running.status, JobStatus.CANCELLED)
+        self.assertLess(running.done, 100)
+
+    def test_failed_job_and_ttl(self):
+        """Ошибка исполнителя сохраняется, результат удаляется по истечении TTL"""
+        def work(ctx):
+            raise ValueError("boom")
+
+        job = self.manager.submit('broken', work)
+        job.wait(5)
+        self.assertEqual(job.status, JobStatus.FAILED)
+        self.assertEqual(job.error, "boom")
+        self.assertEqual([j.job_id for j in self.manager.list(status=JobStatus.FAILED)], [job.job_id])
+
+        self.manager.result_ttl = 0
+        time.sleep(0.01)
+        self.assertIsNone(self.manager.get(job.job_id))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для потокового приема медиа
+"""
+
+import hashlib
+import io
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from PIL import Image
+
+from utils.media_ingest import (
+    MediaIngestError, ingest_stream, ingest_telegram_media, get_ingest_stats, sniff_mime
+)
+
+
+def _box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def make_mp4(duration_sec: int, mdat_size: int = 300 * 1024, moov_first: bool = True) -> bytes:
+    """Минимальный MP4: ftyp + moov/mvhd + mdat"""
+    ftyp = _box(b'ftyp', b'isom\x00\x00\x02\x00isomiso2mp41')
+    # mvhd версии 0: version/flags, created, modified, timescale, duration, ...
+    mvhd = _box(b'mvhd', struct.pack('>IIIII', 0, 0, 0, 1000, duration_sec * 1000) + b'\x00' * 80)
+    moov = _box(b'moov', mvhd)
+    mdat = _box(b'mdat', os.urandom(mdat_size))
+    return ftyp + moov + mdat if moov_first else ftyp + mdat + moov
+
+
+def chunked(data: bytes, size: int = 7000):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+class TestIngestStream(unittest.TestCase):
+    """Тесты для ingest_stream"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_photo_record_from_single_pass(self):
+        """Хэш, MIME и размеры определяются при записи"""
+        buffer = io.BytesIO()
+        Image.new('RGB', (640, 480), 'red').save(buffer, format='JPEG')
+        data = buffer.getvalue()
+
+        media = ingest_stream(chunked(data, 100), dest_dir=self.tmp_dir)
+
+        self.assertEqual(media.media_type, 'PHOTO')
+        self.assertEqual(media.mime_type, 'image/jpeg')
+        self.assertEqual((media.width, media.height), (640, 480))
+        self.assertEqual(media.sha256, hashlib.sha256(data).hexdigest())
+        self.assertEqual(media.file_size, len(data))
+        self.assertTrue(media.path.endswith('.jpg'))
+        with open(media.path, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_video_duration_from_stream(self):
+        """Длительность берется из mvhd, в том числе когда moov в конце"""
+        for moov_first in (True, False):
+            media = ingest_stream(chunked(make_mp4(42, moov_first=moov_first)), dest_dir=self.tmp_dir)
+            self.assertEqual(media.media_type, 'VIDEO')
+            self.assertEqual(media.mime_type, 'video/mp4')
+            self.assertAlmostEqual(media.duration, 42.0)
+
+    def test_duration_limit_aborts_early(self):
+        """Слишком длинное видео отклоняется до конца загрузки"""
+        consumed = []
+
+        def stream():
+            for chunk in chunked(make_mp4(120)):
+                consumed.append(len(chunk))
+                yield chunk
+
+        with self.assertRaises(MediaIngestError):
+            ingest_stream(stream(), dest_dir=self.tmp_dir, max_duration=90)
+        self.assertEqual(len(consumed), 1)
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+    def test_size_limit_and_type_rejected(self):
+        """Превышение размера и неподдерживаемые данные отклоняются, частичный файл удаляется"""
+        with self.assertRaises(MediaIngestError):
+            ingest_stream(chunked(make_mp4(10)), dest_dir=self.tmp_dir, max_size=100 * 1024)
+        with self.assertRaises(MediaIngestError):
+            ingest_stream(chunked(b'plain text, not media' * 10), dest_dir=self.tmp_dir)
+        with self.assertRaises(MediaIngestError):
+            ingest_stream(chunked(make_mp4(10)), dest_dir=self.tmp_dir, allowed_types=('PHOTO',))
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+    def test_iso_bmff_brand_decides_photo_or_video(self):
+        """ftyp с брендом HEIC/AVIF - фото (не принимается), а не видео"""
+        def ftyp(brand):
+            return _box(b'ftyp', brand + b'\x00\x00\x00\x00' + brand + b'mif1') + b'\x00' * 64
+
+        self.assertEqual(sniff_mime(ftyp(b'heic')), 'image/heic')
+        self.assertEqual(sniff_mime(ftyp(b'mif1')), 'image/heic')
+        self.assertEqual(sniff_mime(ftyp(b'avif')), 'image/avif')
+        self.assertEqual(sniff_mime(ftyp(b'qt  ')), 'video/quicktime')
+        self.assertEqual(sniff_mime(ftyp(b'mp42')), 'video/mp4')
+        self.assertEqual(sniff_mime(ftyp(b'M4V ')), 'video/mp4')
+        self.assertIsNone(sniff_mime(ftyp(b'M4A ')))
+
+        with self.assertRaisesRegex(MediaIngestError, 'HEIC'):
+            ingest_stream(chunked(ftyp(b'heic') + os.urandom(50 * 1024)), dest_dir=self.tmp_dir,
+                          allowed_types=('VIDEO',))
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+
+class TestIngestTelegramMedia(unittest.TestCase):
+    """Тесты для ingest_telegram_media"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmp_dir, 'source.mp4')
+        with open(self.source, 'wb') as f:
+            f.write(make_mp4(15))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _bot(self):
+        # Локальный Bot API сервер отдает путь к файлу на диске
+        return SimpleNamespace(get_file=lambda file_id: SimpleNamespace(file_path=self.source))
+
+    def test_downloads_to_requested_path(self):
+        """Файл сохраняется по указанному пути, счетчики обновляются"""
+        before = get_ingest_stats()['downloads']
+        dest = os.path.join(self.tmp_dir, 'out', 'reel.mp4')
+        media = ingest_telegram_media(self._bot(), SimpleNamespace(file_id='abc'), dest_path=dest)
+
+        self.assertEqual(media.path, dest)
+        self.assertEqual(media.file_id, 'abc')
+        self.assertAlmostEqual(media.duration, 15.0)
+        self.assertEqual(get_ingest_stats()['downloads'], before + 1)
+        self.assertEqual(get_ingest_stats()['active'], 0)
+
+    def test_declared_limits_checked_before_download(self):
+        """Лимиты по данным Telegram проверяются без скачивания"""
+        def fail_get_file(file_id):
+            raise AssertionError("файл не должен скачиваться")
+
+        bot = SimpleNamespace(get_file=fail_get_file)
+        with self.assertRaises(MediaIngestError):
+            ingest_telegram_media(bot, SimpleNamespace(file_id='x', duration=200), max_duration=90)
+        with self.assertRaises(MediaIngestError):
+            ingest_telegram_media(bot, SimpleNamespace(file_id='x', file_size=10 ** 9), max_size=10 ** 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для кэша метаданных медиафайлов
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+from utils.media_metadata import MediaMetadataCache, META_SUFFIX, POSTERS_SUFFIX, get_media_metadata, remove_media_file
+
+
+def _write_test_video(path, frames=30, fps=10, size=(64, 48)):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    for i in range(frames):
+        frame = np.full((size[1], size[0], 3), i * 8 % 255, dtype=np.uint8)
+        writer.write(frame)
+    writer.release()
+
+
+class TestMediaMetadataCache(unittest.TestCase):
+    """Тесты для MediaMetadataCache"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.video_path = os.path.join(self.tmp_dir, 'clip.mp4')
+        _write_test_video(self.video_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_probe_once_and_serve_from_memory(self):
+        """Повторный запрос не открывает контейнер"""
+        cache = MediaMetadataCache(probe_keyframes=False)
+
+        meta = cache.get(self.video_path)
+        self.assertEqual((meta.width, meta.height), (64, 48))
+        self.assertAlmostEqual(meta.fps, 10, places=1)
+        self.assertAlmostEqual(meta.duration, 3.0, places=1)
+        self.assertTrue(os.path.exists(self.video_path + META_SUFFIX))
+
+        cache.get(self.video_path)
+        stats = cache.get_stats()
+        self.assertEqual(stats['probes'], 1)
+        self.assertEqual(stats['hits'], 1)
+
+    def test_sidecar_survives_new_cache(self):
+        """Новый экземпляр кэша читает sidecar вместо разбора видео"""
+        MediaMetadataCache(probe_keyframes=False).get(self.video_path)
+
+        cache = MediaMetadataCache(probe_keyframes=False)
+        meta = cache.get(self.video_path)
+        self.assertEqual(meta.width, 64)
+        self.assertEqual(cache.get_stats()['probes'], 0)
+        self.assertEqual(cache.get_stats()['sidecar_loads'], 1)
+
+    def test_thumbnails(self):
+        """Стандартные обложки создаются при разборе, остальные - по запросу один раз"""
+        cache = MediaMetadataCache(probe_keyframes=False)
+
+        poster = cache.get_thumbnail(self.video_path, 1.0)
+        self.assertTrue(os.path.exists(poster))
+        self.assertEqual(cache.get_stats()['posters_served'], 1)
+
+        custom = cache.get_thumbnail(self.video_path, 2.0)
+        self.assertTrue(os.path.exists(custom))
+        extracted = cache.get_stats()['posters_extracted']
+        self.assertEqual(cache.get_thumbnail(self.video_path, 2.0), custom)
+        self.assertEqual(cache.get_stats()['posters_extracted'], extracted)
+
+    def test_modified_file_is_reprobed(self):
+        """Изменение файла инвалидирует запись"""
+        cache = MediaMetadataCache(probe_keyframes=False)
+        cache.get(self.video_path)
+
+        _write_test_video(self.video_path, frames=50, size=(80, 40))
+        os.utime(self.video_path, (1, 1))
+        meta = cache.get(self.video_path)
+        self.assertEqual((meta.width, meta.height), (80, 40))
+        self.assertEqual(cache.get_stats()['probes'], 2)
+
+    def test_invalidate_removes_files(self):
+        """invalidate(remove_files=True) удаляет sidecar и обложки"""
+        cache = MediaMetadataCache(probe_keyframes=False)
+        cache.get(self.video_path)
+        cache.invalidate(self.video_path, remove_files=True)
+        self.assertFalse(os.path.exists(self.video_path + META_SUFFIX))
+        self.assertEqual(cache.get_stats()['entries'], 0)
+
+    def test_remove_media_file_leaves_nothing_behind(self):
+        """Удаление медиафайла убирает и sidecar, и каталог обложек"""
+        self.assertIsNotNone(get_media_metadata(self.video_path))
+        self.assertTrue(os.path.isdir(self.video_path + POSTERS_SUFFIX))
+
+        self.assertTrue(remove_media_file(self.video_path))
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+        self.assertFalse(remove_media_file(self.video_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для учета памяти
+"""
+
+import logging
+import unittest
+
+from utils.memory_accounting import MemoryAccounting, deep_sizeof
+
+
+class FakeClient:
+    def __init__(self, payload_size, shared):
+        self.payload = bytearray(payload_size)
+        self.shared = shared
+        self.logger = logging.getLogger('fake')
+
+
+class TestMemoryAccounting(unittest.TestCase):
+    """Тесты для размера графа объектов, групп и tracemalloc"""
+
+    def setUp(self):
+        self.accounting = MemoryAccounting(group_ttl=60)
+
+    def tearDown(self):
+        self.accounting.stop_tracing()
+
+    def test_deep_sizeof_counts_shared_once(self):
+        """Вложенные объекты учитываются, общие - один раз, логгеры не обходятся"""
+        shared = bytearray(50_000)
+        seen = set()
+        # Оба клиента живы до конца замера: иначе id второго может совпасть с id первого
+        first_client = FakeClient(100_000, shared)
+        second_client = FakeClient(100_000, shared)
+        first, _, truncated = deep_sizeof(first_client, seen)
+        second, _, _ = deep_sizeof(second_client, seen)
+
+        self.assertFalse(truncated)
+        self.assertGreater(first, 150_000)
+        self.assertLess(first, 170_000)
+        self.assertGreater(second, 100_000)
+        self.assertLess(second, 120_000)
+
+        _, objects, truncated = deep_sizeof(list(range(1000)), max_objects=10)
+        self.assertTrue(truncated)
+        self.assertEqual(objects, 10)
+
+    def test_group_measurement_and_ttl(self):
+        """Замер группы кэшируется на TTL, средний размер берется из замера"""
+        clients = [FakeClient(1024 * 1024, None) for _ in range(3)]
+        self.accounting.register('clients', lambda: clients)
+
+        self.assertEqual(self.accounting.get_item_mb('clients', 4.0), 4.0)
+        measurement = self.accounting.measure()['clients']
+        self.assertEqual(measurement.items, 3)
+        self.assertAlmostEqual(self.accounting.get_item_mb('clients', 4.0), 1.0, delta=0.05)
+
+        clients.append(FakeClient(1024 * 1024, None))
+        self.accounting.measure()
+        self.assertEqual(self.accounting.get_measurement('clients').items, 3)
+        self.accounting.measure(force=True)
+        self.assertEqual(self.accounting.get_measurement('clients').items, 4)
+
+    def test_tracemalloc_diff(self):
+        """Рост памяти после базового снимка виден по traceback"""
+        with self.assertRaises(RuntimeError):
+            self.accounting.snapshot_diff()
+
+        self.assertTrue(self.accounting.start_tracing(frames=5))
+        self.assertFalse(self.accounting.start_tracing())
+        retained = [bytearray(1024) for _ in range(2000)]
+        diffs = self.accounting.snapshot_diff(limit=5)
+        self.assertTrue(any(
+            'test_memory_accounting.py' in ''.join(item['traceback']) and item['size_diff_kb'] > 1000
+            for item in diffs
+        ))
+        self.assertEqual(len(retained), 2000)
+
+        stats = self.accounting.get_stats()
+        self.assertTrue(stats['tracemalloc']['tracing'])
+        self.assertIsNotNone(stats['process']['rss_mb'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для реестра метрик
+"""
+
+import threading
+import unittest
+
+from utils.metrics import MetricsRegistry, MetricsHistory
+
+
+class TestMetrics(unittest.TestCase):
+    """Тесты для счетчиков, гистограмм, коллекторов и истории"""
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter_from_many_threads(self):
+        """Записи из разных потоков не теряются, в том числе после их завершения"""
+        counter = self.registry.counter('jobs', 'Задачи', labelnames=('kind',))
+
+        def work():
+            child = counter.labels(kind='a')
+            for _ in range(1000):
+                child.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(counter.labels(kind='a').value, 8000)
+        # Повторное чтение после сворачивания ячеек завершенных потоков
+        self.assertEqual(counter.labels(kind='a').value, 8000)
+        self.assertIs(self.registry.counter('jobs', labelnames=('kind',)), counter)
+        with self.assertRaises(ValueError):
+            self.registry.gauge('jobs')
+
+    def test_prometheus_histogram(self):
+        """Гистограмма выводится накопительными корзинами с _sum и _count"""
+        histogram = self.registry.histogram('request_seconds', 'Время', buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 3.0):
+            histogram.observe(value)
+        self.registry.gauge('queue_size', 'Очередь').set(7)
+
+        text = self.registry.render_prometheus()
+        self.assertIn('# TYPE request_seconds histogram', text)
+        self.assertIn('request_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('request_seconds_bucket{le="1.0"} 3', text)
+        self.assertIn('request_seconds_bucket{le="+Inf"} 4', text)
+        self.assertIn('request_seconds_count 4', text)
+        self.assertIn('request_seconds_sum 4.25', text)
+        self.assertIn('queue_size 7', text)
+
+    def test_collectors_are_isolated(self):
+        """Ошибка одного коллектора не ломает съем остальных метрик"""
+        def good(output):
+            output.counter('pool_created', 5, 'Создано', pool='main')
+            output.gauge('pool_clients', 2)
+
+        def broken(output):
+            raise RuntimeError('boom')
+
+        self.registry.register_collector('good', good)
+        self.registry.register_collector('broken', broken)
+
+        snapshot = self.registry.snapshot()
+        self.assertEqual(snapshot['pool_created_total{pool="main"}'], 5)
+        self.assertEqual(snapshot['pool_clients'], 2)
+        self.assertEqual(snapshot['metrics_collector_up{collector="good"}'], 1)
+        self.assertEqual(snapshot['metrics_collector_up{collector="broken"}'], 0)
+
+    def test_history_rates(self):
+        """Скорость счетчика считается по снимкам истории"""
+        counter = self.registry.counter('events_total', 'События')
+        history = MetricsHistory(self.registry, interval=60, size=10)
+
+        history.record()
+        counter.inc(30)
+        history.record()
+        first_time, first = history.samples[0]
+        history.samples[0] = (first_time - 60, first)
+
+        rates = history.rates(window=300)
+        self.assertAlmostEqual(rates['events_total'], 0.5, places=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для очереди Telegram уведомлений
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from telegram.error import RetryAfter, BadRequest
+
+from utils.notification_outbox import NotificationOutbox
+
+
+class FakeBot:
+    def __init__(self, failures=None):
+        self.sent = []
+        self.edited = []
+        self.failures = list(failures or [])
+
+    def send_message(self, chat_id, text, **kwargs):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.sent.append((chat_id, text))
+        return SimpleNamespace(message_id=len(self.sent))
+
+    def edit_message_text(self, text, chat_id, message_id, **kwargs):
+        self.edited.append((chat_id, message_id, text))
+
+
+class TestNotificationOutbox(unittest.TestCase):
+    """Тесты для NotificationOutbox"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'outbox.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _outbox(self, bot, **kwargs):
+        kwargs.setdefault('path', None)
+        kwargs.setdefault('global_rate', 0)
+        kwargs.setdefault('per_chat_interval', 0)
+        return NotificationOutbox(bot=bot, **kwargs)
+
+    def test_same_key_coalesced_into_summary(self):
+        """События с одним ключом в чате уходят одним сообщением"""
+        bot = FakeBot()
+        outbox = self._outbox(bot)
+        for i in range(40):
+            outbox.enqueue(100, f"✅ Задача #{i}", key='publish_result')
+        outbox.enqueue(200, "✅ Другой чат", key='publish_result')
+
+        self.assertTrue(outbox.flush(timeout=2))
+        self.assertEqual(len(bot.sent), 2)
+        self.assertIn("Уведомлений: 40", bot.sent[0][1])
+        self.assertEqual(outbox.get_stats()['coalesced'], 39)
+
+    def test_late_events_edit_sent_summary(self):
+        """События после отправки дополняют уже отправленную сводку"""
+        bot = FakeBot()
+        outbox = self._outbox(bot)
+        outbox.enqueue(100, "первое", key='publish_result')
+        outbox.flush(timeout=2)
+        outbox.enqueue(100, "второе", key='publish_result')
+        outbox.flush(timeout=2)
+
+        self.assertEqual(len(bot.sent), 1)
+        self.assertEqual(len(bot.edited), 1)
+        chat_id, message_id, text = bot.edited[0]
+        self.assertEqual((chat_id, message_id), (100, 1))
+        self.assertIn("первое", text)
+        self.assertIn("второе", text)
+
+    def test_retry_after_respected(self):
+        """RetryAfter откладывает отправку в чат, сообщение не теряется"""
+        bot = FakeBot(failures=[RetryAfter(0.2)])
+        outbox = self._outbox(bot)
+        outbox.enqueue(100, "отчет")
+
+        self.assertTrue(outbox.flush(timeout=3))
+        self.assertEqual(bot.sent, [(100, "отчет")])
+        stats = outbox.get_stats()
+        self.assertEqual(stats['rate_limited'], 1)
+        self.assertGreaterEqual(stats['latency_max'], 0.2)
+
+    def test_permanent_error_dropped_and_counted(self):
+        """Постоянная ошибка не повторяется, но учитывается"""
+        bot = FakeBot(failures=[BadRequest("Chat not found")])
+        outbox = self._outbox(bot)
+        outbox.enqueue(100, "отчет")
+
+        self.assertTrue(outbox.flush(timeout=2))
+        self.assertEqual(bot.sent, [])
+        self.assertEqual(outbox.get_stats()['dropped'], 1)
+
+    def test_undelivered_persisted(self):
+        """Недоставленные сообщения восстанавливаются после перезапуска"""
+        outbox = self._outbox(None, path=self.path)
+        outbox.enqueue(100, "первое", key='publish_result')
+        outbox.enqueue(100, "второе", key='publish_result')
+
+        bot = FakeBot()
+        restored = self._outbox(bot, path=self.path)
+        self.assertEqual(restored.get_stats()['pending_events'], 2)
+        self.assertTrue(restored.flush(timeout=2))
+        self.assertEqual(len(bot.sent), 1)
+        self.assertEqual(self._outbox(None, path=self.path).get_stats()['pending'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для архива задач публикации
+"""
+
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database.models import (
+    Base, InstagramAccount, PublishTask, PublishTaskArchiveBatch, PublishDailyStats, TaskStatus, TaskType
+)
+from database.publish_archive import (
+    PublishArchiver, ArchivedPublishTask, encode_batch, decode_batch, ensure_publish_task_autoincrement
+)
+
+NOW = datetime(2024, 6, 30, 12, 0)
+
+
+class TestPublishArchive(unittest.TestCase):
+    """Тесты для переноса в архив, дневных итогов и истории"""
+
+    def setUp(self):
+        engine = create_engine('sqlite://')
+        Base.metadata.create_all(engine)
+        self.Session = sessionmaker(bind=engine)
+        self.archiver = PublishArchiver(session_factory=self.Session, retention_days=30, batch_size=3)
+
+        session = self.Session()
+        session.add_all([
+            InstagramAccount(id=1, username='first', password='x'),
+            InstagramAccount(id=2, username='second', password='x'),
+        ])
+        tasks = []
+        # 5 старых задач аккаунта 1 и 2 старые аккаунта 2 (одна неудачная)
+        for i in range(5):
+            tasks.append(self._task(1, TaskStatus.COMPLETED, NOW - timedelta(days=40, hours=i), caption=f'старая {i}'))
+        tasks.append(self._task(2, TaskStatus.COMPLETED, NOW - timedelta(days=45)))
+        tasks.append(self._task(2, TaskStatus.FAILED, NOW - timedelta(days=45), error_message='login_required'))
+        # Свежая и незавершенная задачи остаются
+        tasks.append(self._task(1, TaskStatus.COMPLETED, NOW - timedelta(days=2), caption='свежая'))
+        tasks.append(self._task(1, TaskStatus.PENDING, NOW - timedelta(days=60)))
+        session.add_all(tasks)
+        session.commit()
+        session.close()
+
+    @staticmethod
+    def _task(account_id, status, finished, **values):
+        return PublishTask(
+            account_id=account_id, task_type=TaskType.PHOTO, status=status,
+            media_path='/media/photo.jpg', created_at=finished - timedelta(minutes=5),
+            updated_at=finished, options={'post_type': 'feed'}, **values
+        )
+
+    def test_encode_decode_roundtrip(self):
+        """Пачка по колонкам сжимается и восстанавливается с типами"""
+        task = ArchivedPublishTask(
+            id=7, account_id=1, task_type=TaskType.REEL, status=TaskStatus.FAILED,
+            caption='подпись ' * 50, completed_time=NOW, options={'batch_id': 'b1'}
+        )
+        payload, raw_size = encode_batch([task] * 20)
+        self.assertLess(len(payload) * 5, raw_size)
+
+        restored = decode_batch(payload)
+        self.assertEqual(len(restored), 20)
+        self.assertEqual(restored[0], task)
+        self.assertTrue(restored[0].archived)
+
+    def test_archive_moves_old_finished_tasks(self):
+        """Старые завершенные задачи уходят в архив пачками, итоги по дням сохраняются"""
+        result = self.archiver.archive(now=NOW)
+        self.assertEqual(result['rows'], 7)
+        self.assertEqual(result['batches'], 3)
+
+        session = self.Session()
+        remaining = session.query(PublishTask).order_by(PublishTask.id).all()
+        self.assertEqual([task.caption for task in remaining], ['свежая', None])
+        self.assertEqual(session.query(PublishTaskArchiveBatch).count(), 3)
+        self.assertEqual(sum(row.failed for row in session.query(PublishDailyStats).all()), 1)
+        session.close()
+
+        self.assertEqual(self.archiver.archive(now=NOW)['rows'], 0)
+        stats = self.archiver.get_stats()
+        self.assertEqual(stats['archive']['rows'], 7)
+        self.assertEqual(stats['process']['runs'], 2)
+
+    def test_archived_ids_not_reused(self):
+        """После архивации и удаления последней задачи новые задачи не получают архивные id"""
+        self.assertEqual(self.archiver.archive(now=NOW)['rows'], 7)
+        session = self.Session()
+        session.query(PublishTask).delete()
+        session.commit()
+        session.add(self._task(1, TaskStatus.PENDING, NOW))
+        session.commit()
+        archived_ids = {task.id for task in self.archiver.iter_archived()}
+        new_id = session.query(func.max(PublishTask.id)).scalar()
+        session.close()
+
+        self.assertEqual(len(archived_ids), 7)
+        self.assertGreater(new_id, 9)
+        self.assertNotIn(new_id, archived_ids)
+
+    def test_migrate_table_without_autoincrement(self):
+        """Старая таблица без AUTOINCREMENT перестраивается с сохранением строк и счетчика id"""
+        engine = create_engine('sqlite://', poolclass=StaticPool)
+        Base.metadata.create_all(engine, tables=[t for t in Base.metadata.sorted_tables if t.name != 'publish_tasks'])
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE publish_tasks (id INTEGER NOT NULL PRIMARY KEY, account_id INTEGER NOT NULL, "
+                "task_type VARCHAR(8) NOT NULL, status VARCHAR(9), caption TEXT)"
+            ))
+            conn.execute(text("INSERT INTO publish_tasks (id, account_id, task_type, status, caption) "
+                              "VALUES (3, 1, 'PHOTO', 'PENDING', 'живая')"))
+            conn.execute(text("INSERT INTO publish_task_archive (min_task_id, max_task_id, min_finished_at, "
+                              "max_finished_at, row_count, account_ids, payload, raw_size) "
+                              "VALUES (4, 10, '2024-01-01', '2024-01-01', 7, '[1]', x'00', 1)"))
+
+        self.assertTrue(ensure_publish_task_autoincrement(engine))
+        self.assertFalse(ensure_publish_task_autoincrement(engine))
+
+        session = sessionmaker(bind=engine)()
+        self.assertEqual(session.get(PublishTask, 3).caption, 'живая')
+        session.query(PublishTask).delete()
+        session.add(self._task(1, TaskStatus.PENDING, NOW))
+        session.commit()
+        self.assertEqual(session.query(func.max(PublishTask.id)).scalar(), 11)
+        session.close()
+
+    def test_history_spans_archive_on_request(self):
+        """История читает архив только по запросу и с фильтром по аккаунту"""
+        self.archiver.archive(now=NOW)
+
+        live = self.archiver.get_history(limit=10)
+        self.assertEqual([task.caption for task in live], ['свежая'])
+
+        history = self.archiver.get_history(limit=10, include_archive=True)
+        self.assertEqual(len(history), 8)
+        self.assertEqual(history[0].caption, 'свежая')
+        self.assertEqual([task.caption for task in history[1:6]], [f'старая {i}' for i in range(5)])
+
+        second = self.archiver.get_history(limit=10, include_archive=True, account_id=2)
+        self.assertEqual({task.status for task in second}, {TaskStatus.COMPLETED, TaskStatus.FAILED})
+        self.assertTrue(all(isinstance(task, ArchivedPublishTask) for task in second))
+
+    def test_daily_stats_combine_archive_and_live(self):
+        """Дневные итоги складываются из архива и живых задач"""
+        before = self.archiver.get_daily_stats(days=90, now=NOW)
+        self.archiver.archive(now=NOW)
+        after = self.archiver.get_daily_stats(days=90, now=NOW)
+        self.assertEqual(before, after)
+
+        first = self.archiver.get_daily_stats(account_id=1, days=90, now=NOW)
+        self.assertEqual(sum(row['completed'] for row in first), 6)
+        self.assertEqual(first[0]['day'], (NOW - timedelta(days=2)).date().isoformat())
+        self.assertEqual(first[0]['task_type'], 'photo')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для статистики SQL-запросов
+"""
+
+import unittest
+
+from sqlalchemy import create_engine, text
+
+from database.query_stats import QueryStats, normalize_statement
+
+
+class TestQueryStats(unittest.TestCase):
+    """Тесты для отпечатков, перцентилей и журнала медленных запросов"""
+
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        with self.engine.begin() as conn:
+            conn.execute(text('CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)'))
+
+    def test_normalize_statement(self):
+        """Литералы, параметры и списки IN сворачиваются в один отпечаток"""
+        first = normalize_statement("SELECT * FROM items WHERE id IN (1, 2, 3) AND name = 'a'")
+        second = normalize_statement("SELECT *  FROM items\n WHERE id IN (?, ?) AND name = :name_1")
+        self.assertEqual(first, second)
+        self.assertEqual(first, "SELECT * FROM items WHERE id IN (?...) AND name = ?")
+        self.assertEqual(normalize_statement("SELECT anon_1.id LIMIT 10"), "SELECT anon_1.id LIMIT ?")
+
+    def test_counts_latency_and_rows(self):
+        """Вызовы, строки и перцентили считаются по отпечатку"""
+        stats = QueryStats(slow_threshold_ms=10000)
+        stats.install(self.engine)
+        stats.install(self.engine)
+
+        with self.engine.begin() as conn:
+            for i in range(5):
+                conn.execute(text('INSERT INTO items (name) VALUES (:name)'), {'name': f'n{i}'})
+            conn.execute(text("UPDATE items SET name = 'x'"))
+
+        top = stats.get_top(limit=10, sort='calls')
+        insert = next(item for item in top if item['fingerprint'].startswith('INSERT'))
+        self.assertEqual(insert['calls'], 5)
+        self.assertEqual(insert['rows'], 5)
+        self.assertLessEqual(insert['p50_ms'], insert['p99_ms'])
+        update = next(item for item in top if item['fingerprint'].startswith('UPDATE'))
+        self.assertEqual(update['rows'], 5)
+        self.assertEqual(stats.get_stats()['slow_calls'], 0)
+
+    def test_slow_query_log_and_errors(self):
+        """Медленные запросы попадают в журнал с источником, ошибки считаются"""
+        stats = QueryStats(slow_threshold_ms=0)
+        stats.install(self.engine)
+
+        def load_items():
+            with self.engine.connect() as conn:
+                return conn.execute(text('SELECT * FROM items')).fetchall()
+
+        with self.assertLogs('database.query_stats', level='WARNING'):
+            load_items()
+        slow = stats.get_slow_queries()
+        self.assertEqual(slow[0]['fingerprint'], 'SELECT * FROM items')
+        self.assertIn('load_items', slow[0]['origin'])
+
+        with self.engine.connect() as conn:
+            with self.assertRaises(Exception):
+                conn.execute(text('SELECT * FROM missing_table'))
+        errors = [item for item in stats.get_top() if item['errors']]
+        self.assertEqual(errors[0]['fingerprint'], 'SELECT * FROM missing_table')
+
+        stats.reset()
+        self.assertEqual(stats.get_stats()['total_calls'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для докачиваемой загрузки на локальном HTTP-стенде,
+который обрывает соединение посреди передачи
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from instagram.resumable_upload import ResumableUploader, ResumableUploadError
+
+
+class RuploadStandIn:
+    """Имитация rupload: хранит принятые байты, умеет обрывать передачу"""
+
+    def __init__(self):
+        self.received = bytearray()
+        self.fail_at = []  # смещения, на которых нужно оборвать соединение
+        self.unavailable = False  # отвечать 503 на каждый чанк
+        self.post_count = 0
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._reply({'offset': len(stand_in.received)})
+
+            def do_POST(self):
+                stand_in.post_count += 1
+                offset = int(self.headers['Offset'])
+                length = int(self.headers['Content-Length'])
+                if offset != len(stand_in.received):
+                    self.send_response(400)
+                    self.end_headers()
+                    return
+                if stand_in.unavailable:
+                    self.rfile.read(length)
+                    self.send_response(503)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                for fail_offset in list(stand_in.fail_at):
+                    if offset <= fail_offset < offset + length:
+                        # Принимаем часть чанка и рвем соединение без ответа
+                        stand_in.fail_at.remove(fail_offset)
+                        stand_in.received += self.rfile.read(fail_offset - offset)
+                        self.close_connection = True
+                        self.connection.shutdown(2)
+                        return
+
+                stand_in.received += self.rfile.read(length)
+                self._reply({'offset': len(stand_in.received)})
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/rupload_igvideo/test"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TestResumableUploader(unittest.TestCase):
+    """Тесты для ResumableUploader"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'video.mp4')
+        self.data = os.urandom(100 * 1024)
+        with open(self.path, 'wb') as f:
+            f.write(self.data)
+        self.stand_in = RuploadStandIn()
+        self.session = requests.Session()
+
+    def tearDown(self):
+        self.session.close()
+        self.stand_in.stop()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _uploader(self, **kwargs):
+        kwargs.setdefault('chunk_size', 16 * 1024)
+        kwargs.setdefault('retry_delay', 0)
+        kwargs.setdefault('timeout', 5)
+        return ResumableUploader(self.session, self.stand_in.url, **kwargs)
+
+    def test_upload_in_chunks(self):
+        """Файл передается чанками и собирается без искажений"""
+        uploader = self._uploader()
+        uploader.upload(self.path)
+
+        self.assertEqual(bytes(self.stand_in.received), self.data)
+        self.assertEqual(uploader.stats.chunks_sent, 7)
+        self.assertEqual(uploader.stats.bytes_resent, 0)
+
+    def test_resume_after_mid_transfer_drop(self):
+        """После обрыва отправка продолжается с подтвержденного смещения"""
+        self.stand_in.fail_at = [90 * 1024]
+        progress = []
+        uploader = self._uploader(progress_callback=lambda offset, total: progress.append(offset))
+        uploader.upload(self.path)
+
+        self.assertEqual(bytes(self.stand_in.received), self.data)
+        self.assertEqual(uploader.stats.chunk_retries, 1)
+        self.assertEqual(uploader.stats.resumes, 1)
+        # Повторно отправлен только неподтвержденный хвост чанка, а не весь файл
+        self.assertLess(uploader.stats.bytes_resent, 16 * 1024)
+        self.assertIn(90 * 1024, progress)
+        self.assertEqual(progress[-1], len(self.data))
+
+    def test_new_uploader_continues_from_server_offset(self):
+        """Повторная задача продолжает загрузку, а не начинает заново"""
+        self.stand_in.received += self.data[:64 * 1024]
+
+        uploader = self._uploader()
+        uploader.upload(self.path, start_offset=64 * 1024)
+
+        self.assertEqual(bytes(self.stand_in.received), self.data)
+        self.assertEqual(uploader.stats.start_offset, 64 * 1024)
+        self.assertEqual(uploader.stats.bytes_sent, 36 * 1024)
+
+    def test_gives_up_after_retries(self):
+        """Постоянные ошибки приводят к ResumableUploadError"""
+        self.stand_in.unavailable = True
+        uploader = self._uploader(max_retries=2)
+        with self.assertRaises(ResumableUploadError):
+            uploader.upload(self.path)
+        self.assertEqual(self.stand_in.post_count, 3)
+        self.assertEqual(uploader.stats.chunk_retries, 3)
+
+
+
+class TestClipUploadThumbnail(unittest.TestCase):
+    """Тесты для обложки в clip_upload_resumable"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.video = os.path.join(self.tmp_dir, 'clip.mp4')
+        with open(self.video, 'wb') as f:
+            f.write(b'\x00' * 1024)
+        meta = SimpleNamespace(duration=5.0, display_size=(720, 1280))
+        patcher = mock.patch('instagram.clip_upload_patch.get_media_metadata', return_value=meta)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('instagram.clip_upload_patch.get_media_thumbnail', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_missing_thumbnail_fails_before_upload(self):
+        """Без обложки загрузка не начинается, ошибка понятная"""
+        from instagram.clip_upload_patch import clip_upload_resumable
+
+        with mock.patch('instagrapi.mixins.clip.analyze_video', side_effect=OSError('no frames')), \
+                mock.patch('instagram.clip_upload_patch.ResumableUploader') as uploader:
+            with self.assertRaisesRegex(ValueError, 'обложку'):
+                clip_upload_resumable(mock.Mock(), self.video, 'caption')
+        uploader.assert_not_called()
+
+    def test_falls_back_to_instagrapi_thumbnail(self):
+        """Обложку, которую не извлек кэш метаданных, создает instagrapi"""
+        from instagram.clip_upload_patch import clip_upload_resumable
+
+        client = mock.Mock()
+        client.clip_configure.return_value = None
+        thumbnail = os.path.join(self.tmp_dir, 'clip.mp4.jpg')
+        with mock.patch('instagrapi.mixins.clip.analyze_video', return_value=(thumbnail, 720, 1280, 5.0)), \
+                mock.patch('instagram.clip_upload_patch.ResumableUploader'), \
+                mock.patch('instagram.clip_upload_patch.time.sleep'):
+            with self.assertRaises(RuntimeError):
+                clip_upload_resumable(client, self.video, 'caption')
+        self.assertEqual(str(client.clip_configure.call_args[0][1]), thumbnail)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для профилировщика по выборкам стеков
+"""
+
+import threading
+import time
+import unittest
+
+from utils.sampling_profiler import (
+    SamplingProfiler, ProfileResult, ProfilerBusyError, run_profile, thread_role, _profile_lock
+)
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(200))
+
+
+class TestSamplingProfiler(unittest.TestCase):
+    """Тесты для выборки стеков, ролей потоков и свернутых стеков"""
+
+    def test_samples_labeled_threads(self):
+        """Занятый поток попадает в стеки со своей ролью, ожидающий - нет"""
+        stop = threading.Event()
+        busy = threading.Thread(target=busy_loop, args=(stop,), name='task_queue_0', daemon=True)
+        idle = threading.Thread(target=stop.wait, name='validator_check_0', daemon=True)
+        busy.start()
+        idle.start()
+        try:
+            result = SamplingProfiler(interval=0.002).run(0.2)
+        finally:
+            stop.set()
+            busy.join()
+            idle.join()
+
+        self.assertGreater(result.samples, 10)
+        roles = result.role_samples()
+        self.assertIn('task_queue', roles)
+        self.assertNotIn('validator', roles)
+        self.assertIn('task_queue_0', result.thread_names['task_queue'])
+        busy_stacks = [stack for stack in result.stacks if stack[0] == 'task_queue']
+        self.assertTrue(all('test_sampling_profiler:busy_loop' in stack for stack in busy_stacks))
+
+    def test_collapsed_and_tops(self):
+        """Свернутые стеки и топы считаются по листьям и по всем кадрам"""
+        result = ProfileResult(duration=1.0, interval=0.01, samples=4)
+        result.stacks[('main', 'app:run', 'db:query')] = 3
+        result.stacks[('telegram_worker', 'app:run', 'api:send')] = 1
+
+        lines = result.collapsed().splitlines()
+        self.assertEqual(lines[0], 'main;app:run;db:query 3')
+        self.assertEqual(result.top_self(1)[0], {
+            'function': 'db:query', 'samples': 3, 'percent': 75.0, 'seconds': 0.03
+        })
+        self.assertEqual(result.top_total(1)[0]['function'], 'app:run')
+        self.assertEqual(result.top_self(5, role='telegram_worker')[0]['function'], 'api:send')
+        self.assertIn('collapsed', result.to_dict())
+
+    def test_thread_roles_and_busy(self):
+        """Роли по именам потоков; второе профилирование одновременно запрещено"""
+        self.assertEqual(thread_role('Bot:123:dispatcher'), 'telegram_dispatcher')
+        self.assertEqual(thread_role('Bot:123:worker:abc_0'), 'telegram_worker')
+        self.assertEqual(thread_role('validator_recovery_1'), 'validator')
+        self.assertEqual(thread_role('Thread-5'), 'other')
+
+        with _profile_lock:
+            with self.assertRaises(ProfilerBusyError):
+                run_profile(0.01)
+        self.assertGreaterEqual(run_profile(0.01, interval=0.005).samples, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для учета живости сессий Instagram
+"""
+
+import unittest
+from unittest import mock
+
+from instagrapi.exceptions import LoginRequired
+
+import instagram.client_patch as client_patch
+from instagram import session_liveness
+from instagram.session_liveness import (
+    mark_session_alive, mark_session_dead, is_session_fresh, verify_session, get_liveness_stats
+)
+
+
+class FakeClient:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.probes = 0
+
+    def account_info(self):
+        self.probes += 1
+        if self.fail:
+            raise LoginRequired("login_required")
+        return {}
+
+
+class TestSessionLiveness(unittest.TestCase):
+    """Тесты для verify_session"""
+
+    def test_fresh_session_skips_probe(self):
+        """Недавний успешный запрос подтверждает сессию без сетевого вызова"""
+        client = FakeClient()
+        mark_session_alive(client)
+        avoided = get_liveness_stats()['probes_avoided']
+
+        self.assertTrue(verify_session(client))
+        self.assertEqual(client.probes, 0)
+        self.assertEqual(get_liveness_stats()['probes_avoided'], avoided + 1)
+
+    def test_probe_after_window(self):
+        """После окна свежести выполняется проверочный запрос"""
+        client = FakeClient()
+        mark_session_alive(client)
+        with mock.patch.object(session_liveness, 'SESSION_FRESHNESS_SECONDS', 0):
+            with mock.patch('instagram.session_liveness.time.time', return_value=10 ** 10):
+                self.assertFalse(is_session_fresh(client))
+                verify_session(client)
+        self.assertEqual(client.probes, 1)
+
+    def test_login_required_forces_reverification(self):
+        """Ошибка авторизации в любом вызове снимает доверие к сессии"""
+        client = FakeClient(fail=True)
+        mark_session_alive(client)
+        mark_session_dead(client)
+
+        self.assertFalse(is_session_fresh(client))
+        with self.assertRaises(LoginRequired):
+            verify_session(client)
+        self.assertEqual(client.probes, 1)
+
+    def test_private_requests_update_liveness(self):
+        """Патч приватных запросов отмечает успех и login_required"""
+        client = FakeClient()
+        with mock.patch.object(client_patch, 'original_send_private_request', return_value={'status': 'ok'}):
+            client_patch.patched_send_private_request(client, 'feed/timeline/')
+        self.assertTrue(is_session_fresh(client))
+
+        invalidations = get_liveness_stats()['reactive_invalidations']
+        with mock.patch.object(client_patch, 'original_send_private_request', side_effect=LoginRequired("expired")):
+            with self.assertRaises(LoginRequired):
+                client_patch.patched_send_private_request(client, 'feed/timeline/')
+        self.assertFalse(is_session_fresh(client))
+        self.assertEqual(get_liveness_stats()['reactive_invalidations'], invalidations + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для единого хранилища сессий
+"""
+
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from instagram.session_store import SessionStore
+
+
+class FakeClient:
+    def __init__(self, settings):
+        self.settings = settings
+
+    def get_settings(self):
+        return dict(self.settings)
+
+
+class TestSessionStore(unittest.TestCase):
+    """Тесты для SessionStore"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_writes = []
+        patcher = mock.patch(
+            'database.db_manager.update_account_session_data',
+            side_effect=lambda account_id, data, *args: self.db_writes.append((account_id, data)) or (True, None)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Большая задержка, чтобы фоновая синхронизация не срабатывала в тестах
+        self.store = SessionStore(base_dir=self.tmp_dir, db_sync_delay=3600)
+        self.addCleanup(self.store.flush_db)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _session_path(self, account_id, name='session.json'):
+        return os.path.join(self.tmp_dir, str(account_id), name)
+
+    def test_round_trip_atomic_write(self):
+        """Сессия сохраняется целиком, временные файлы не остаются"""
+        self.assertTrue(self.store.save_client(1, FakeClient({'uuid': 'a'}), 'user1'))
+
+        self.assertEqual(os.listdir(os.path.join(self.tmp_dir, '1')), ['session.json'])
+        with open(self._session_path(1)) as f:
+            self.assertEqual(json.load(f)['settings'], {'uuid': 'a'})
+
+        fresh = SessionStore(base_dir=self.tmp_dir)
+        self.assertTrue(fresh.exists(1))
+        self.assertEqual(fresh.load_settings(1), {'uuid': 'a'})
+        self.assertEqual(fresh.load(1)['username'], 'user1')
+
+    def test_unchanged_session_not_rewritten(self):
+        """Повторное сохранение тех же настроек не трогает диск"""
+        client = FakeClient({'uuid': 'a'})
+        self.store.save_client(1, client, 'user1')
+        mtime = os.path.getmtime(self._session_path(1))
+
+        self.assertFalse(self.store.save_client(1, client, 'user1'))
+        self.assertEqual(os.path.getmtime(self._session_path(1)), mtime)
+        self.assertEqual(self.store.get_stats()['writes_skipped'], 1)
+
+        client.settings['uuid'] = 'b'
+        self.assertTrue(self.store.save_client(1, client, 'user1'))
+        self.assertEqual(self.store.get_stats()['writes'], 2)
+
+    def test_compressed_sessions(self):
+        """Сжатый формат читается и заменяет несжатый файл"""
+        self.store.save_client(2, FakeClient({'uuid': 'plain'}), 'user2')
+
+        compressed = SessionStore(base_dir=self.tmp_dir, compress=True)
+        compressed.save_client(2, FakeClient({'uuid': 'gz'}), 'user2')
+
+        self.assertFalse(os.path.exists(self._session_path(2)))
+        with gzip.open(self._session_path(2, 'session.json.gz'), 'rt') as f:
+            self.assertEqual(json.load(f)['settings'], {'uuid': 'gz'})
+        self.assertEqual(SessionStore(base_dir=self.tmp_dir).load_settings(2), {'uuid': 'gz'})
+
+    def test_reads_served_from_cache(self):
+        """Файл читается один раз, дальше данные берутся из памяти"""
+        self.store.save_client(3, FakeClient({'uuid': 'a'}), 'user3')
+        fresh = SessionStore(base_dir=self.tmp_dir)
+        for _ in range(5):
+            fresh.load_settings(3)
+
+        stats = fresh.get_stats()
+        self.assertEqual(stats['reads'], 1)
+        self.assertEqual(stats['cache_hits'], 4)
+
+    def test_reload_after_other_process_writes(self):
+        """Сессию, перезаписанную другим процессом, кэш перечитывает и не затирает"""
+        self.store.save_client(4, FakeClient({'uuid': 'a', 'cookies': {'sessionid': 'old'}}), 'user4')
+        other = SessionStore(base_dir=self.tmp_dir, db_sync_delay=3600)
+        self.addCleanup(other.flush_db)
+        self.assertEqual(other.load_settings(4)['cookies'], {'sessionid': 'old'})
+
+        self.store.save_client(4, FakeClient({'uuid': 'a', 'cookies': {'sessionid': 'new', 'csrftoken': 'x'}}), 'user4')
+        self.assertEqual(other.load_settings(4)['cookies']['sessionid'], 'new')
+        self.assertEqual(other.get_stats()['reloads'], 1)
+
+        # Сохранение тех же настроек сравнивается со свежим файлом, а не со старым кэшем
+        self.assertFalse(other.save_client(4, FakeClient(other.load_settings(4)), 'user4'))
+        with open(self._session_path(4)) as f:
+            self.assertEqual(json.load(f)['settings']['cookies']['sessionid'], 'new')
+
+    def test_db_mirror_flushed_once(self):
+        """Несколько изменений аккаунта дают одну запись в БД при синхронизации"""
+        client = FakeClient({'uuid': 'a'})
+        self.store.save_client(4, client, 'user4')
+        client.settings['uuid'] = 'b'
+        self.store.save_client(4, client, 'user4')
+        self.assertEqual(self.db_writes, [])
+
+        self.assertEqual(self.store.flush_db(), 1)
+        self.assertEqual(len(self.db_writes), 1)
+        self.assertEqual(json.loads(self.db_writes[0][1])['settings'], {'uuid': 'b'})
+        self.assertEqual(self.store.flush_db(), 0)
+
+    def test_db_fallback_restores_file(self):
+        """При отсутствии файла копия из БД используется по запросу и восстанавливает файл"""
+        session_data = json.dumps({'username': 'user5', 'account_id': 5, 'settings': {'uuid': 'db'}})
+        account = SimpleNamespace(id=5, session_data=session_data)
+        with mock.patch('database.db_manager.get_instagram_account', return_value=account):
+            self.assertIsNone(self.store.load_settings(5))
+            self.assertEqual(self.store.load_settings(5, use_db=True), {'uuid': 'db'})
+
+        self.assertTrue(os.path.exists(self._session_path(5)))
+        self.assertEqual(self.store.get_stats()['db_fallbacks'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для сервиса настроек
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database.models import Setting
+from utils.settings_service import (
+    SettingsSection, SettingsSchema, SettingField, SettingsValidationError,
+    JsonFileStore, DbSettingStore
+)
+
+
+class TestSettingsService(unittest.TestCase):
+    """Тесты для схемы, кеша, записи и подписчиков"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'settings.json')
+        self.schema = SettingsSchema({
+            'delay': SettingField(30, min_value=0),
+            'enabled': SettingField(True),
+            'start': SettingField('09:00'),
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_schema_defaults_and_types(self):
+        """Недостающие ключи берутся по умолчанию, типы приводятся"""
+        data = self.schema.validate({'delay': '45', 'enabled': 'false', 'extra': [1]})
+        self.assertEqual(data, {'delay': 45, 'enabled': False, 'start': '09:00', 'extra': [1]})
+
+        with self.assertRaises(SettingsValidationError):
+            self.schema.validate({'delay': 'abc'})
+        with self.assertRaises(SettingsValidationError):
+            self.schema.validate({'delay': -1})
+
+    def test_atomic_write_and_cache(self):
+        """Запись заменяет файл целиком, чтение идет из кеша"""
+        section = SettingsSection('test', JsonFileStore(self.path), self.schema, check_interval=60)
+        self.assertEqual(section.get()['delay'], 30)
+        self.assertFalse(section.exists())
+
+        section.update({'delay': 10})
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['delay'], 10)
+        self.assertEqual(os.listdir(self.tmp_dir), ['settings.json'])
+
+        for _ in range(5):
+            section.value('delay')
+        self.assertEqual(section.stats['loads'], 1)
+        self.assertTrue(section.exists())
+
+        with self.assertRaises(SettingsValidationError):
+            section.update({'delay': -5})
+        self.assertEqual(section.value('delay'), 10)
+
+    def test_external_change_notifies_subscribers(self):
+        """Изменение файла другим процессом замечается по mtime"""
+        section = SettingsSection('test', JsonFileStore(self.path), self.schema, check_interval=0)
+        received = []
+        unsubscribe = section.subscribe(received.append)
+
+        section.update({'start': '10:00'})
+        self.assertEqual(received[-1]['start'], '10:00')
+
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'delay': 99, 'start': '11:00'}, f)
+        os.utime(self.path, ns=(0, 10 ** 18))
+
+        self.assertTrue(section.refresh())
+        self.assertEqual(received[-1]['delay'], 99)
+        self.assertEqual(section.stats['external_changes'], 1)
+
+        unsubscribe()
+        section.update({'delay': 1})
+        self.assertEqual(len(received), 2)
+
+    def test_db_store_round_trip(self):
+        """Раздел в таблице settings: версия меняется после записи"""
+        engine = create_engine('sqlite://', poolclass=StaticPool,
+                               connect_args={'check_same_thread': False})
+        Setting.__table__.create(engine)
+        store = DbSettingStore('warmup', session_factory=sessionmaker(bind=engine))
+
+        section = SettingsSection('db', store, self.schema, check_interval=0)
+        self.assertIsNone(store.version())
+        section.replace({'delay': 5})
+        first_version = store.version()
+        self.assertIsNotNone(first_version)
+
+        other = SettingsSection('db', DbSettingStore('warmup', session_factory=sessionmaker(bind=engine)),
+                                self.schema, check_interval=0)
+        self.assertEqual(other.value('delay'), 5)
+
+        other.update({'delay': 7})
+        self.assertNotEqual(store.version(), first_version)
+        self.assertEqual(section.value('delay'), 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
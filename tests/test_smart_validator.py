@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для ожидания результатов валидации через Future
+"""
+
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import utils.smart_validator_service as svs
+from utils.smart_validator_service import (
+    SmartValidatorService, ValidationPriority, AccountStatus, validate_async, validate_before_use
+)
+
+
+class FakeSession:
+    def query(self, model):
+        return self
+
+    def filter_by(self, id):
+        self.account_id = id
+        return self
+
+    def first(self):
+        return SimpleNamespace(id=self.account_id, username=f"user{self.account_id}")
+
+    def close(self):
+        pass
+
+
+class TestValidationFutures(unittest.TestCase):
+    """Тесты для single-flight ожидания проверок"""
+
+    def setUp(self):
+        self.service = SmartValidatorService()
+        self.patches = [
+            mock.patch.object(svs, '_smart_validator_instance', self.service),
+            mock.patch.object(svs, 'get_session', FakeSession),
+            mock.patch.object(svs, 'update_instagram_account', lambda *args, **kwargs: None),
+            mock.patch.object(svs.random, 'uniform', lambda a, b: 0),
+        ]
+        for patcher in self.patches:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in reversed(self.patches):
+            patcher.stop()
+        self.service.stop()
+
+    def test_concurrent_requests_share_one_check(self):
+        """Параллельные запросы по одному аккаунту получают одну Future"""
+        first = self.service.request_validation(1, ValidationPriority.NORMAL)
+        second = self.service.request_validation(1, ValidationPriority.LOW)
+
+        self.assertIs(first, second)
+        self.assertEqual(self.service.check_queue.qsize(), 1)
+        self.assertEqual(self.service.get_stats()['pending_waiters'], 1)
+
+    def test_waiter_woken_when_check_finishes(self):
+        """Ожидающий просыпается сразу по окончании проверки, без опроса"""
+        self.service._quick_check = lambda account: True
+        results = {}
+
+        def wait():
+            started = time.time()
+            results['valid'] = validate_before_use(7, ValidationPriority.CRITICAL, timeout=5)
+            results['waited'] = time.time() - started
+
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        time.sleep(0.1)
+        self.service._check_account(7)
+        waiter.join(timeout=5)
+
+        self.assertTrue(results['valid'])
+        self.assertLess(results['waited'], 1.0)
+        self.assertEqual(self.service.get_account_status(7), AccountStatus.VALID)
+        self.assertIsNone(self.service.get_pending_validation(7))
+
+    def test_invalid_account_resolved_after_recovery(self):
+        """Невалидный аккаунт остается в ожидании до конца восстановления"""
+        self.service._quick_check = lambda account: False
+        self.service._attempt_recovery = lambda account: False
+
+        future = validate_async(3, ValidationPriority.CRITICAL)
+        self.service._check_account(3)
+        self.assertFalse(future.done())
+
+        self.service._recover_account(3)
+        self.assertTrue(future.done())
+        self.assertFalse(future.result())
+        self.assertEqual(self.service.get_account_status(3), AccountStatus.COOLDOWN)
+
+    def test_non_critical_request_does_not_block(self):
+        """Некритическая проверка неизвестного аккаунта не занимает вызывающий поток"""
+        started = time.time()
+        self.assertFalse(validate_before_use(11, ValidationPriority.HIGH))
+        self.assertLess(time.time() - started, 0.5)
+        self.assertIsNotNone(self.service.get_pending_validation(11))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для трассировки этапов публикации
+"""
+
+import time
+import unittest
+
+from utils.stage_trace import (
+    StageTrace, start_trace, suspend_trace, finish_trace, get_current_trace,
+    mark_stage, trace_stage, traced, set_trace_type, aggregate_traces
+)
+
+
+class TestStageTrace(unittest.TestCase):
+    """Тесты для этапов, вложенных интервалов и агрегации"""
+
+    def tearDown(self):
+        trace = get_current_trace()
+        if trace is not None:
+            finish_trace(trace)
+
+    def test_stages_and_nested_spans(self):
+        """Этапы идут последовательно, интервалы менеджеров вложены в publish"""
+
+        class Manager:
+            @traced('login')
+            def login(self):
+                return 'ok'
+
+        trace = start_trace(1)
+        set_trace_type('photo')
+        mark_stage('load_task')
+        mark_stage('publish')
+        self.assertEqual(Manager().login(), 'ok')
+        with trace_stage('upload'):
+            time.sleep(0.01)
+        compact = finish_trace(trace)
+
+        self.assertIsNone(get_current_trace())
+        self.assertEqual(compact['type'], 'photo')
+        names = [(span[0], span[3]) for span in compact['spans']]
+        self.assertEqual(names, [('load_task', 0), ('login', 1), ('upload', 1), ('publish', 0)])
+        durations = {span[0]: span[2] for span in compact['spans']}
+        self.assertGreaterEqual(durations['publish'], durations['upload'])
+        self.assertGreaterEqual(durations['upload'], 10)
+        self.assertGreaterEqual(compact['total_ms'], durations['publish'])
+
+    def test_noop_without_trace(self):
+        """Без активной трассы вызовы ничего не записывают"""
+        self.assertIsNone(get_current_trace())
+        mark_stage('publish')
+        with trace_stage('upload') as trace:
+            self.assertIsNone(trace)
+        self.assertEqual(traced('login')(lambda: 5)(), 5)
+
+    def test_deferred_task_continues_trace(self):
+        """Отложенная задача продолжает трассу с интервалом validation_wait"""
+        trace = start_trace(42, 'reel')
+        mark_stage('validation')
+        suspend_trace(trace)
+        self.assertIsNone(get_current_trace())
+
+        resumed = start_trace(42)
+        self.assertIs(resumed, trace)
+        mark_stage('publish')
+        compact = finish_trace(resumed)
+        self.assertEqual([span[0] for span in compact['spans']], ['validation', 'validation_wait', 'publish'])
+
+    def test_aggregate_percentiles(self):
+        """Перцентили считаются по типам задач, повторные этапы складываются"""
+        traces = []
+        for i in range(1, 101):
+            trace = StageTrace(i, 'photo')
+            trace.spans = [['upload', 0, float(i), 1], ['upload', i, 1.0, 1], ['publish', 0, i + 10.0, 0]]
+            trace.ended = trace.started + (i + 10) / 1000
+            traces.append(trace.to_compact())
+        traces.append({'v': 1, 'type': 'story', 'total_ms': 5.0, 'spans': [['publish', 0, 4.0, 0]]})
+        traces.append({'v': 99, 'spans': []})
+
+        stats = aggregate_traces(traces)
+        self.assertEqual(set(stats), {'photo', 'story'})
+        upload = stats['photo']['upload']
+        self.assertEqual(upload['count'], 100)
+        self.assertEqual(upload['p50_ms'], 52.0)
+        self.assertEqual(upload['p95_ms'], 96.0)
+        self.assertEqual(upload['max_ms'], 101.0)
+        self.assertEqual(stats['photo']['total']['p99_ms'], 109.0)
+        self.assertEqual(stats['story']['publish']['count'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для профиля и бюджета времени запуска
+"""
+
+import os
+import sys
+import time
+import subprocess
+import unittest
+
+from utils.lazy_imports import lazy_import
+from utils.startup_profile import (
+    StartupTimer, parse_importtime, aggregate_by_package, format_import_report,
+    STARTUP_IMPORT_BUDGET, LAZY_HEAVY_MODULES
+)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_IMPORTTIME = """import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     sqlalchemy.sql
+import time:       300 |        400 |   sqlalchemy
+import time:        50 |        450 | database.db_manager
+import time:       200 |        200 | telegram
+"""
+
+
+class TestStartupProfile(unittest.TestCase):
+    """Тесты для StartupTimer и разбора -X importtime"""
+
+    def test_parse_and_rank_importtime(self):
+        """Вывод -X importtime разбирается и ранжируется по пакетам"""
+        records = parse_importtime(SAMPLE_IMPORTTIME)
+        self.assertEqual([r.module for r in records],
+                         ['sqlalchemy.sql', 'sqlalchemy', 'database.db_manager', 'telegram'])
+        self.assertEqual(records[0].depth, 2)
+
+        packages = aggregate_by_package(records)
+        self.assertEqual(packages[0], ('sqlalchemy', 400, 2))
+
+        report = format_import_report(records, top=3)
+        self.assertIn("Импорт: 0.00с", report)
+        self.assertLess(report.index('database.db_manager'), report.index('telegram'))
+
+    def test_parallel_init_isolates_errors(self):
+        """Подсистемы стартуют параллельно, ошибка одной не мешает остальным"""
+        timer = StartupTimer()
+
+        def broken():
+            raise RuntimeError("no module")
+
+        started = time.perf_counter()
+        errors = timer.run_parallel({
+            'slow_a': lambda: time.sleep(0.2),
+            'slow_b': lambda: time.sleep(0.2),
+            'broken': broken,
+        })
+
+        self.assertLess(time.perf_counter() - started, 0.35)
+        self.assertIsNone(errors['slow_a'])
+        self.assertIsInstance(errors['broken'], RuntimeError)
+        self.assertIn("broken", timer.report())
+
+    def test_lazy_import_defers_loading(self):
+        """Модуль загружается только при первом обращении к атрибуту"""
+        sys.modules.pop('wave', None)
+        wave = lazy_import('wave')
+        self.assertNotIn('wave', sys.modules)
+        self.assertFalse(wave.is_loaded)
+
+        self.assertTrue(callable(wave.open))
+        self.assertIn('wave', sys.modules)
+        self.assertTrue(wave.is_loaded)
+
+    def test_main_import_budget(self):
+        """Импорт main укладывается в бюджет и не тянет тяжелые зависимости"""
+        code = (
+            "import time, sys; started = time.perf_counter(); import main; "
+            "elapsed = time.perf_counter() - started; "
+            f"heavy = [m for m in {LAZY_HEAVY_MODULES!r} if m in sys.modules]; "
+            "print('STARTUP', elapsed, ','.join(heavy), sep='|')"
+        )
+        result = subprocess.run([sys.executable, '-c', code], cwd=ROOT_DIR,
+                                capture_output=True, text=True, timeout=300)
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+
+        line = [l for l in result.stdout.splitlines() if l.startswith('STARTUP|')][-1]
+        _, elapsed, heavy = line.split('|')
+        self.assertLess(float(elapsed), STARTUP_IMPORT_BUDGET)
+        self.assertEqual(heavy, '')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для конвейерной загрузки медиа
+"""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from instagrapi.exceptions import AlbumConfigureError, AlbumUnknownFormat
+
+from instagram.upload_pipeline import run_pipeline
+
+
+class TestRunPipeline(unittest.TestCase):
+    """Тесты для run_pipeline"""
+
+    def test_results_keep_order_and_stages_overlap(self):
+        """Подготовка следующего элемента идет во время загрузки текущего"""
+        def prepare(item):
+            time.sleep(0.05)
+            return item * 10
+
+        def upload(prepared):
+            time.sleep(0.05)
+            return prepared + 1
+
+        results, timings = run_pipeline([1, 2, 3, 4], prepare, upload)
+
+        self.assertEqual(results, [11, 21, 31, 41])
+        self.assertEqual(len(timings.items), 4)
+        self.assertGreater(timings.overlap_saved, 0.08)
+        self.assertLess(timings.total_time, timings.prepare_time + timings.upload_time)
+
+    def test_in_flight_is_bounded(self):
+        """Одновременно подготовлено не более max_in_flight элементов"""
+        lock = threading.Lock()
+        state = {'in_flight': 0, 'peak': 0}
+
+        def prepare(item):
+            with lock:
+                state['in_flight'] += 1
+                state['peak'] = max(state['peak'], state['in_flight'])
+            return item
+
+        def upload(prepared):
+            time.sleep(0.02)
+            return prepared
+
+        def cleanup(prepared):
+            with lock:
+                state['in_flight'] -= 1
+
+        run_pipeline(list(range(8)), prepare, upload, max_in_flight=2, cleanup=cleanup)
+        self.assertLessEqual(state['peak'], 2)
+        self.assertEqual(state['in_flight'], 0)
+
+    def test_error_stops_pipeline_and_cleans_up(self):
+        """Ошибка загрузки прерывает конвейер, подготовленные элементы очищаются"""
+        cleaned = []
+
+        def upload(prepared):
+            if prepared == 1:
+                raise RuntimeError("upload failed")
+            return prepared
+
+        with self.assertRaises(RuntimeError):
+            run_pipeline([0, 1, 2, 3], lambda item: item, upload, cleanup=cleaned.append)
+        self.assertIn(1, cleaned)
+
+    def test_errors_collected_when_not_stopping(self):
+        """При stop_on_error=False ошибки попадают в результаты"""
+        def prepare(item):
+            if item == 2:
+                raise ValueError("bad item")
+            return item
+
+        results, _ = run_pipeline([1, 2, 3], prepare, lambda p: p, stop_on_error=False)
+        self.assertEqual(results[0], 1)
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(results[2], 3)
+
+
+class TestAlbumUploadPipelined(unittest.TestCase):
+    """Тесты для конвейерной загрузки альбома"""
+
+    def setUp(self):
+        from PIL import Image
+        from instagram.post_manager import PostManager
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.photo = os.path.join(self.tmpdir.name, 'photo.jpg')
+        Image.new('RGB', (100, 100)).save(self.photo, 'JPEG')
+        self.client = mock.Mock(last_json={'message': 'Transcode not finished yet.', 'status': 'fail'})
+        self.client.photo_rupload.return_value = ('upload1', 100, 100)
+        self.manager = PostManager.__new__(PostManager)
+        self.manager.instagram = SimpleNamespace(client=self.client)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_unfinished_transcode_raises(self):
+        """Незаконченное перекодирование - AlbumConfigureError, как в instagrapi"""
+        self.client.album_configure.side_effect = Exception('Transcode not finished yet.')
+        with mock.patch('instagram.post_manager.time.sleep'):
+            with self.assertRaises(AlbumConfigureError):
+                self.manager._album_upload_pipelined([self.photo, self.photo], 'caption')
+        self.assertEqual(self.client.album_configure.call_count, 50)
+
+    def test_rejects_formats_instagrapi_does_not_accept(self):
+        """Видео не в .mp4 отклоняется до загрузки первого элемента"""
+        with self.assertRaises(AlbumUnknownFormat):
+            self.manager._album_upload_pipelined([self.photo, 'clip.mov'], 'caption')
+        self.client.photo_rupload.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для фабрики приложения веб-API
+"""
+
+import os
+import sys
+import subprocess
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestWebAppFactory(unittest.TestCase):
+    """Тесты для create_app"""
+
+    def test_import_has_no_side_effects(self):
+        """Импорт web_api не применяет патчи instagrapi и не создает приложение"""
+        code = (
+            "import sys, web_api; "
+            "print('instagrapi' in sys.modules, 'instagram.deep_patch' in sys.modules, hasattr(web_api, 'app'))"
+        )
+        result = subprocess.run([sys.executable, '-c', code], cwd=ROOT_DIR,
+                                capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip().splitlines()[-1], 'False False False')
+
+    def test_gunicorn_config_derives_threads(self):
+        """Конфиг Gunicorn: один воркер по умолчанию, потоки от числа ядер"""
+        config = {}
+        with open(os.path.join(ROOT_DIR, 'gunicorn.conf.py'), encoding='utf-8') as f:
+            exec(compile(f.read(), 'gunicorn.conf.py', 'exec'), config)
+
+        self.assertEqual(config['worker_class'], 'gthread')
+        self.assertGreaterEqual(config['threads'], 8)
+        self.assertLessEqual(config['threads'], 64)
+        self.assertTrue(callable(config['post_worker_init']))
+        self.assertTrue(callable(config['worker_exit']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для слоя ответов веб-API
+"""
+
+import os
+import gzip
+import json
+import shutil
+import tempfile
+import unittest
+
+from flask import Flask, jsonify
+from sqlalchemy import create_engine, Column, Integer, String
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from utils import web_response
+from utils.web_response import DataVersions, build_dashboard_assets, send_dashboard_file
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = 'items'
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+
+class TestWebResponse(unittest.TestCase):
+    """Тесты для сжатия, ETag и ассетов дашборда"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.calls = 0
+
+        app = Flask(__name__)
+        web_response.init_app(app)
+
+        @app.route('/items')
+        @web_response.conditional('items')
+        def items():
+            self.calls += 1
+            return jsonify({'data': ['x' * 50] * 100})
+
+        @app.route('/<path:filename>')
+        def static_files(filename):
+            return send_dashboard_file(self.tmp_dir, filename)
+
+        self.client = app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_gzip_negotiation(self):
+        """Большой JSON сжимается, если клиент принимает gzip"""
+        plain = self.client.get('/items')
+        self.assertNotIn('Content-Encoding', plain.headers)
+
+        response = self.client.get('/items', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(json.loads(gzip.decompress(response.data)), plain.get_json())
+
+    def test_not_modified_until_commit(self):
+        """Неизмененный список отдается как 304 без вызова view"""
+        first = self.client.get('/items')
+        etag = first.headers['ETag']
+
+        second = self.client.get('/items', headers={'If-None-Match': etag})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(self.calls, 1)
+
+        web_response.get_data_versions().bump('items')
+        third = self.client.get('/items', headers={'If-None-Match': etag})
+        self.assertEqual(third.status_code, 200)
+        self.assertEqual(self.calls, 2)
+
+    def test_versions_follow_commits(self):
+        """Версия таблицы растет после коммита и не меняется после отката"""
+        versions = DataVersions()
+        engine = create_engine('sqlite://')
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        versions.install(Session)
+
+        session = Session()
+        session.add(Item(name='a'))
+        session.flush()
+        self.assertEqual(versions.get('items'), (0,))
+        session.commit()
+        self.assertEqual(versions.get('items'), (1,))
+
+        session.add(Item(name='b'))
+        session.flush()
+        session.rollback()
+        self.assertEqual(versions.get('items'), (1,))
+        session.close()
+
+    def test_dashboard_build_and_serving(self):
+        """Сборка переписывает ссылки на ассеты с хешем и отдает сжатые копии"""
+        os.makedirs(os.path.join(self.tmp_dir, 'js'))
+        with open(os.path.join(self.tmp_dir, 'js', 'app.js'), 'w') as f:
+            f.write('console.log("dashboard");\n' * 100)
+        with open(os.path.join(self.tmp_dir, 'index.html'), 'w') as f:
+            f.write('<html><script src="js/app.js"></script></html>')
+
+        manifest = build_dashboard_assets(self.tmp_dir)
+        fingerprinted = manifest['assets']['js/app.js']
+        self.assertRegex(fingerprinted, r'^js/app\.[0-9a-f]{10}\.js$')
+
+        page = self.client.get('/index.html')
+        self.assertIn(fingerprinted, page.get_data(as_text=True))
+        self.assertEqual(page.headers['Cache-Control'], 'no-cache')
+        page.close()
+
+        asset = self.client.get('/' + fingerprinted, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(asset.headers['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', asset.headers['Cache-Control'])
+        self.assertTrue(gzip.decompress(asset.data).startswith(b'console.log'))
+        asset.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,7 +4,6 @@
 """
 
 import asyncio
-import time
 import logging
 import threading
 from datetime import datetime, timedelta
@@ -15,6 +14,7 @@ from database.db_manager import get_session, get_instagram_accounts, update_inst
 from database.models import InstagramAccount
 from instagram.client import get_instagram_client
 from instagram.email_utils import get_code_from_generic_email
+from utils.background_runtime import get_background_runtime
 
 logger = logging.getLogger(__name__)
 
@@ -40,7 +40,7 @@ class AccountValidatorService:
         self.max_threads = max_threads
         self.auto_repair = auto_repair
         self.is_running = False
-        self._thread = None
+        self._consecutive_errors = 0
         self._executor = ThreadPoolExecutor(max_workers=max_threads)
         self._last_check_results = {}
         
@@ -53,69 +53,61 @@ class AccountValidatorService:
             return
         
         self.is_running = True
-        self._thread = threading.Thread(target=self._run_background_loop, daemon=True)
-        self._thread.start()
+        # Начальная задержка перед первой проверкой - 2 минуты, далее минимум 30 минут.
+        # Обход всех аккаунтов с паузами идет часами - в пуле долгих задач
+        logger.info("⏳ Первая проверка через 120 секунд...")
+        get_background_runtime().every(
+            'account_validator', max(self.check_interval, 1800), self._run_check,
+            initial_delay=120, long_running=True
+        )
         logger.info("✅ Фоновый сервис проверки аккаунтов запущен")
     
     def stop(self):
         """Остановка сервиса"""
         self.is_running = False
-        if self._thread:
-            self._thread.join(timeout=5)
+        get_background_runtime().cancel('account_validator')
         self._executor.shutdown(wait=True)
         logger.info("🛑 Фоновый сервис проверки аккаунтов остановлен")
     
-    def _run_background_loop(self):
-        """Основной цикл фоновой проверки"""
-        # Начальная задержка перед первой проверкой
-        initial_delay = 120  # 2 минуты задержка при старте
-        logger.info(f"⏳ Ожидание {initial_delay} секунд перед первой проверкой...")
-        time.sleep(initial_delay)
-        
-        consecutive_errors = 0
+    def _run_check(self):
+        """Одна фоновая проверка (задача фоновой среды)"""
         max_consecutive_errors = 3
         
-        while self.is_running:
-            try:
-                # Выполняем проверку
-                logger.info("🔍 Начинаем проверку валидности аккаунтов...")
-                results = self._check_all_accounts()
-                
-                # Сохраняем результаты
-                self._last_check_results = results
-                
-                # Логируем результаты
-                valid_count = len(results.get('valid', []))
-                invalid_count = len(results.get('invalid', []))
-                repaired_count = len(results.get('repaired', []))
-                
-                logger.info(
-                    f"✅ Проверка завершена: "
-                    f"валидных: {valid_count}, "
-                    f"невалидных: {invalid_count}, "
-                    f"восстановлено: {repaired_count}"
-                )
-                
-                # Сбрасываем счетчик ошибок при успешной проверке
-                consecutive_errors = 0
-                
-                # Ждем до следующей проверки (минимум 30 минут)
-                actual_interval = max(self.check_interval, 1800)  # Минимум 30 минут
-                logger.info(f"⏰ Следующая проверка через {actual_interval // 60} минут")
-                time.sleep(actual_interval)
-                
-            except Exception as e:
-                consecutive_errors += 1
-                logger.error(f"❌ Ошибка в фоновом цикле проверки (#{consecutive_errors}): {e}")
-                
-                # Увеличиваем задержку при повторных ошибках
-                if consecutive_errors >= max_consecutive_errors:
-                    error_delay = 600  # 10 минут при множественных ошибках
-                    logger.warning(f"⚠️ Множественные ошибки, увеличиваем задержку до {error_delay // 60} минут")
-                else:
-                    error_delay = 120  # 2 минуты при единичных ошибках
-                
-                time.sleep(error_delay)
+        try:
+            # Выполняем проверку
+            logger.info("🔍 Начинаем проверку валидности аккаунтов...")
+            results = self._check_all_accounts()
+            
+            # Сохраняем результаты
+            self._last_check_results = results
+            
+            # Логируем результаты
+            valid_count = len(results.get('valid', []))
+            invalid_count = len(results.get('invalid', []))
+            repaired_count = len(results.get('repaired', []))
+            
+            logger.info(
+                f"✅ Проверка завершена: "
+                f"валидных: {valid_count}, "
+                f"невалидных: {invalid_count}, "
+                f"восстановлено: {repaired_count}"
+            )
+            
+            # Сбрасываем счетчик ошибок при успешной проверке
+            self._consecutive_errors = 0
+            
+        except Exception as e:
+            self._consecutive_errors += 1
+            logger.error(f"❌ Ошибка в фоновой проверке (#{self._consecutive_errors}): {e}")
+            
+            # Увеличиваем задержку при повторных ошибках
+            if self._consecutive_errors >= max_consecutive_errors:
+                error_delay = 600  # 10 минут при множественных ошибках
+                logger.warning(f"⚠️ Множественные ошибки, увеличиваем задержку до {error_delay // 60} минут")
+            else:
+                error_delay = 120  # 2 минуты при единичных ошибках
+            
+            get_background_runtime().reschedule('account_validator', error_delay)
     
     def _check_all_accounts(self) -> Dict[str, List]:
         """Проверка всех аккаунтов"""
@@ -164,7 +156,9 @@ class AccountValidatorService:
                         import random
                         delay = random.randint(30, 60)  # Случайная задержка 30-60 секунд
                         logger.debug(f"⏳ Ожидание {delay} секунд перед следующей проверкой...")
-                        time.sleep(delay)
+                        if get_background_runtime().wait(delay):
+                            logger.info("🛑 Проверка аккаунтов прервана остановкой")
+                            break
                         
                 except Exception as e:
                     logger.error(f"Ошибка при проверке {account.username}: {e}")
@@ -0,0 +1,542 @@
+# -*- coding: utf-8 -*-
+"""
+Background Runtime - Единая среда выполнения фоновых задач
+
+Раньше каждая подсистема запускала свой поток с циклом sleep: планировщик
+schedule, мониторы нагрузки, периодические проверки валидаторов, очистки
+lazy-фабрики, IMAP пула и оптимизатора ротации, история метрик, слежение
+за настройками. Каждый такой поток просыпался по своему таймеру, и почти
+ни один нельзя было корректно остановить.
+
+Здесь все периодические задачи живут в одном планировщике:
+
+- один поток ждет ближайшего срока (без опроса по таймеру); вместе с
+  наступившей задачей запускаются задачи, срок которых наступит в пределах
+  COALESCE_WINDOW, - за одно пробуждение
+- задачи выполняются в ограниченном пуле потоков; долгие задачи (обход
+  всех аккаунтов с паузами между ними) - в отдельном пуле, чтобы не
+  занимать потоки коротких задач вроде запланированных публикаций
+- расписания: каждые N секунд (с джиттером), cron-выражение, однократно
+- защита от наложения: если прошлый запуск еще идет, очередной пропускается
+  (запуски считаются по имени задачи, поэтому переживают ее замену)
+- время выполнения по задачам - гистограмма background_job_seconds
+- shutdown() перестает запускать задачи, ждет текущие (задачи могут
+  прерывать ожидание через wait()) и вызывает хуки остановки подсистем
+
+Очереди с потребителями (очередь публикаций, очереди проверки валидатора)
+остаются отдельными потоками: они ждут задания, а не таймер.
+"""
+
+import heapq
+import random
+import logging
+import threading
+import time
+import concurrent.futures
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from utils.metrics import get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+# Размер пула выполнения фоновых задач
+DEFAULT_MAX_WORKERS = 4
+
+# Размер отдельного пула для долгих задач (long_running=True)
+DEFAULT_LONG_MAX_WORKERS = 2
+
+# Задачи со сроком в пределах окна (с) запускаются за одно пробуждение
+COALESCE_WINDOW = 0.5
+
+# Джиттер периодических задач по умолчанию (доля интервала)
+DEFAULT_JITTER = 0.1
+
+_job_seconds = get_metrics_registry().histogram(
+    'background_job_seconds', 'Время выполнения фоновых задач',
+    labelnames=('job', 'outcome'),
+    buckets=(0.001, 0.01, 0.1, 0.5, 1.0, 5.0, 30.0, 60.0, 300.0, 1800.0)
+)
+
+
+# ----------------------------------------------------------------------
+# Расписания
+# ----------------------------------------------------------------------
+
+class IntervalSchedule:
+    """Каждые interval секунд со случайным отклонением ±jitter·interval"""
+
+    def __init__(self, interval: float, jitter: float = DEFAULT_JITTER, initial_delay: Optional[float] = None):
+        if interval <= 0:
+            raise ValueError("Интервал должен быть положительным")
+        self.interval = interval
+        self.jitter = jitter
+        self.initial_delay = initial_delay
+
+    def first_run(self, now: float) -> float:
+        if self.initial_delay is not None:
+            return now + self.initial_delay
+        return self.next_run(now)
+
+    def next_run(self, now: float) -> Optional[float]:
+        spread = self.interval * self.jitter
+        return now + self.interval + (random.uniform(-spread, spread) if spread else 0.0)
+
+    def describe(self) -> str:
+        return f"every {self.interval:g}s"
+
+
+class OnceSchedule:
+    """Однократный запуск через delay секунд"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    def first_run(self, now: float) -> float:
+        return now + self.delay
+
+    def next_run(self, now: float) -> Optional[float]:
+        return None
+
+    def describe(self) -> str:
+        return f"once after {self.delay:g}s"
+
+
+class CronSchedule:
+    """
+    Cron-выражение из 5 полей: минута час день месяц день_недели
+
+    Поддерживаются *, */n, a-b, a-b/n и списки через запятую;
+    день недели 0-6, где 0 - воскресенье (7 тоже воскресенье).
+    """
+
+    FIELDS = (('minute', 0, 59), ('hour', 0, 23), ('day', 1, 31), ('month', 1, 12), ('weekday', 0, 6))
+
+    def __init__(self, expression: str, jitter: float = 0.0):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron-выражение должно содержать 5 полей: {expression!r}")
+        self.expression = expression
+        self.jitter = jitter
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse(part, low, high) for part, (_, low, high) in zip(parts, self.FIELDS)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        self._any_day = parts[2] == '*'
+        self._any_weekday = parts[4] == '*'
+
+    @staticmethod
+    def _parse(part: str, low: int, high: int) -> Set[int]:
+        values: Set[int] = set()
+        for item in part.split(','):
+            step = 1
+            if '/' in item:
+                item, step_text = item.split('/', 1)
+                step = int(step_text)
+            if item == '*':
+                start, end = low, high
+            elif '-' in item:
+                start, end = (int(value) for value in item.split('-', 1))
+            else:
+                start = end = int(item)
+                if step != 1:
+                    end = high
+            # День недели допускает 7 как воскресенье
+            upper = 7 if (low, high) == (0, 6) else high
+            if start < low or end > upper or start > end or step < 1:
+                raise ValueError(f"Недопустимое значение cron: {part!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment: datetime) -> bool:
+        weekday = (moment.weekday() + 1) % 7
+        day_ok = moment.day in self.days
+        weekday_ok = weekday in self.weekdays
+        # Как в cron: если ограничены оба поля, достаточно совпадения одного
+        if not self._any_day and not self._any_weekday:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, moment: datetime) -> datetime:
+        """Ближайшее время запуска строго после moment"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                year, month = (candidate.year + 1, 1) if candidate.month == 12 else (candidate.year, candidate.month + 1)
+                candidate = candidate.replace(year=year, month=month, day=1, hour=0, minute=0)
+            elif not self._day_matches(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+            elif candidate.hour not in self.hours:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron-выражение не срабатывает: {self.expression!r}")
+
+    def first_run(self, now: float) -> float:
+        return self.next_run(now)
+
+    def next_run(self, now: float) -> Optional[float]:
+        moment = self.next_after(datetime.fromtimestamp(now)).timestamp()
+        return moment + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def describe(self) -> str:
+        return f"cron {self.expression}"
+
+
+# ----------------------------------------------------------------------
+# Задачи и среда выполнения
+# ----------------------------------------------------------------------
+
+@dataclass
+class BackgroundJob:
+    """Зарегистрированная фоновая задача"""
+    name: str
+    func: Callable[..., Any]
+    schedule: Any
+    args: Tuple[Any, ...] = ()
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    allow_overlap: bool = False
+    long_running: bool = False
+    next_run: Optional[float] = None
+    runs: int = 0
+    failures: int = 0
+    skipped_overlap: int = 0
+    last_started: Optional[float] = None
+    last_duration: Optional[float] = None
+    last_error: Optional[str] = None
+    generation: int = 0
+
+    def to_dict(self, running: int = 0) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'schedule': self.schedule.describe(),
+            'long_running': self.long_running,
+            'next_run': self.next_run,
+            'running': running,
+            'runs': self.runs,
+            'failures': self.failures,
+            'skipped_overlap': self.skipped_overlap,
+            'last_started': self.last_started,
+            'last_duration': round(self.last_duration, 3) if self.last_duration is not None else None,
+            'last_error': self.last_error,
+        }
+
+
+class BackgroundRuntime:
+    """Планировщик периодических задач с общим пулом и корректной остановкой"""
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, name: str = 'background',
+                 long_max_workers: int = DEFAULT_LONG_MAX_WORKERS):
+        self.name = name
+        self.max_workers = max_workers
+        self.long_max_workers = long_max_workers
+        self._jobs: Dict[str, BackgroundJob] = {}
+        # Текущие запуски по имени задачи (не по объекту: задачу могут заменить во время запуска)
+        self._running: Dict[str, int] = {}
+        self._heap: List[Tuple[float, int, str, int]] = []
+        self._sequence = 0
+        self._cond = threading.Condition()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._long_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._inflight: Set[concurrent.futures.Future] = set()
+        self._shutdown_hooks: List[Tuple[str, Callable[[], Any]]] = []
+        self.stats = {'wakeups': 0, 'dispatched': 0, 'skipped_overlap': 0, 'failures': 0}
+
+    # ------------------------------------------------------------------
+    # Регистрация задач
+    # ------------------------------------------------------------------
+
+    def add_job(self, name: str, func: Callable[..., Any], schedule, args: Tuple[Any, ...] = (),
+                kwargs: Optional[Dict[str, Any]] = None, allow_overlap: bool = False,
+                long_running: bool = False) -> BackgroundJob:
+        """
+        Зарегистрировать задачу (задача с тем же именем заменяется)
+
+        Args:
+            long_running: Задача идет минуты и часы - выполнять в отдельном пуле
+        """
+        if self._stopping.is_set():
+            raise RuntimeError("Фоновая среда остановлена")
+        with self._cond:
+            old = self._jobs.get(name)
+            job = BackgroundJob(name, func, schedule, tuple(args), dict(kwargs or {}), allow_overlap, long_running)
+            if old is not None:
+                job.generation = old.generation + 1
+            self._jobs[name] = job
+            self._schedule_locked(job, schedule.first_run(time.time()))
+            self._ensure_started_locked()
+            self._cond.notify()
+        logger.debug(f"⏱️ Фоновая задача {name}: {schedule.describe()}")
+        return job
+
+    def every(self, name: str, interval: float, func: Callable[..., Any], *args,
+              jitter: float = DEFAULT_JITTER, initial_delay: Optional[float] = None,
+              allow_overlap: bool = False, long_running: bool = False, **kwargs) -> BackgroundJob:
+        """Запускать func каждые interval секунд"""
+        return self.add_job(name, func, IntervalSchedule(interval, jitter, initial_delay),
+                            args, kwargs, allow_overlap, long_running)
+
+    def cron(self, name: str, expression: str, func: Callable[..., Any], *args,
+             jitter: float = 0.0, allow_overlap: bool = False, long_running: bool = False,
+             **kwargs) -> BackgroundJob:
+        """Запускать func по cron-выражению (местное время)"""
+        return self.add_job(name, func, CronSchedule(expression, jitter), args, kwargs,
+                            allow_overlap, long_running)
+
+    def once(self, name: str, delay: float, func: Callable[..., Any], *args, **kwargs) -> BackgroundJob:
+        """Запустить func один раз через delay секунд"""
+        return self.add_job(name, func, OnceSchedule(delay), args, kwargs)
+
+    def cancel(self, name: str) -> bool:
+        """Снять задачу с расписания (текущий запуск доработает)"""
+        with self._cond:
+            job = self._jobs.pop(name, None)
+            if job is None:
+                return False
+            job.generation += 1
+            job.next_run = None
+            self._cond.notify()
+        return True
+
+    def reschedule(self, name: str, delay: float) -> bool:
+        """Перенести следующий запуск задачи на delay секунд от текущего момента"""
+        with self._cond:
+            job = self._jobs.get(name)
+            if job is None:
+                return False
+            job.generation += 1
+            self._schedule_locked(job, time.time() + delay)
+            self._cond.notify()
+        return True
+
+    def run_now(self, name: str) -> bool:
+        """Запустить задачу вне расписания"""
+        return self.reschedule(name, 0)
+
+    def has_job(self, name: str) -> bool:
+        with self._cond:
+            return name in self._jobs
+
+    def add_shutdown_hook(self, name: str, hook: Callable[[], Any]):
+        """Вызвать hook при остановке, после завершения текущих задач"""
+        with self._cond:
+            self._shutdown_hooks = [item for item in self._shutdown_hooks if item[0] != name]
+            self._shutdown_hooks.append((name, hook))
+
+    # ------------------------------------------------------------------
+    # Ожидание внутри задач
+    # ------------------------------------------------------------------
+
+    @property
+    def stopping(self) -> bool:
+        return self._stopping.is_set()
+
+    def wait(self, seconds: float) -> bool:
+        """Пауза внутри задачи; True, если среда останавливается и задаче пора выйти"""
+        return self._stopping.wait(seconds)
+
+    # ------------------------------------------------------------------
+    # Планировщик
+    # ------------------------------------------------------------------
+
+    def _schedule_locked(self, job: BackgroundJob, when: Optional[float]):
+        job.next_run = when
+        if when is None:
+            return
+        self._sequence += 1
+        heapq.heappush(self._heap, (when, self._sequence, job.name, job.generation))
+
+    def _ensure_started_locked(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix=self.name
+        )
+        self._long_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.long_max_workers, thread_name_prefix=f'{self.name}-long'
+        )
+        self._thread = threading.Thread(target=self._loop, name=f'{self.name}-scheduler', daemon=True)
+        self._thread.start()
+        logger.info(f"⏱️ Фоновая среда запущена (пул: {self.max_workers}, долгие задачи: {self.long_max_workers})")
+
+    def _loop(self):
+        with self._cond:
+            while not self._stopping.is_set():
+                now = time.time()
+                # Отбрасываем устаревшие записи (задача отменена или перенесена)
+                while self._heap and self._is_stale(self._heap[0]):
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = self._heap[0][0] - now
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+
+                self.stats['wakeups'] += 1
+                due = []
+                while self._heap and self._heap[0][0] <= now + COALESCE_WINDOW:
+                    due.append(heapq.heappop(self._heap))
+                for entry in due:
+                    if not self._is_stale(entry):
+                        # Следующий срок считаем от планового времени, а не от пробуждения
+                        self._dispatch_locked(self._jobs[entry[2]], max(now, entry[0]))
+
+    def _is_stale(self, entry) -> bool:
+        job = self._jobs.get(entry[2])
+        return job is None or job.generation != entry[3]
+
+    def _dispatch_locked(self, job: BackgroundJob, now: float):
+        self._schedule_locked(job, job.schedule.next_run(now))
+        if self._running.get(job.name) and not job.allow_overlap:
+            job.skipped_overlap += 1
+            self.stats['skipped_overlap'] += 1
+            logger.debug(f"⏭️ Фоновая задача {job.name} еще выполняется, запуск пропущен")
+            return
+        if job.next_run is None:
+            self._jobs.pop(job.name, None)
+        self._running[job.name] = self._running.get(job.name, 0) + 1
+        self.stats['dispatched'] += 1
+        executor = self._long_executor if job.long_running else self._executor
+        future = executor.submit(self._run_job, job)
+        self._inflight.add(future)
+        future.add_done_callback(self._job_done)
+
+    def _job_done(self, future):
+        with self._cond:
+            self._inflight.discard(future)
+            self._cond.notify_all()
+
+    def _run_job(self, job: BackgroundJob):
+        started = time.perf_counter()
+        job.last_started = time.time()
+        outcome = 'success'
+        try:
+            job.func(*job.args, **job.kwargs)
+            job.last_error = None
+        except Exception as e:
+            outcome = 'error'
+            job.failures += 1
+            job.last_error = str(e)
+            self.stats['failures'] += 1
+            logger.error(f"❌ Ошибка фоновой задачи {job.name}: {e}", exc_info=True)
+        finally:
+            duration = time.perf_counter() - started
+            job.last_duration = duration
+            job.runs += 1
+            with self._cond:
+                remaining = self._running.get(job.name, 0) - 1
+                if remaining > 0:
+                    self._running[job.name] = remaining
+                else:
+                    self._running.pop(job.name, None)
+            _job_seconds.labels(job=job.name, outcome=outcome).observe(duration)
+
+    # ------------------------------------------------------------------
+    # Остановка и статистика
+    # ------------------------------------------------------------------
+
+    def shutdown(self, timeout: float = 30.0) -> bool:
+        """
+        Остановить планировщик, дождаться текущих задач и вызвать хуки остановки
+
+        Returns:
+            True, если все задачи завершились за timeout
+        """
+        with self._cond:
+            if self._stopping.is_set():
+                return True
+            self._stopping.set()
+            self._cond.notify_all()
+            inflight = len(self._inflight)
+        logger.info(f"🛑 Остановка фоновой среды: выполняется задач - {inflight}")
+
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._inflight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            drained = not self._inflight
+            hooks = list(self._shutdown_hooks)
+
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        for executor in (self._executor, self._long_executor):
+            if executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+        for name, hook in reversed(hooks):
+            try:
+                hook()
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка хука остановки {name}: {e}")
+
+        if drained:
+            logger.info("✅ Фоновая среда остановлена")
+        else:
+            logger.warning("⚠️ Фоновая среда остановлена, не все задачи успели завершиться")
+        return drained
+
+    def get_jobs(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            return [job.to_dict(self._running.get(job.name, 0))
+                    for job in sorted(self._jobs.values(), key=lambda j: j.name)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                **self.stats,
+                'jobs': len(self._jobs),
+                'running': sum(self._running.values()),
+                'inflight': len(self._inflight),
+                'max_workers': self.max_workers,
+                'long_max_workers': self.long_max_workers,
+                'stopping': self._stopping.is_set(),
+            }
+
+
+# Глобальный экземпляр
+_runtime: Optional[BackgroundRuntime] = None
+_runtime_lock = threading.Lock()
+
+
+def get_background_runtime() -> BackgroundRuntime:
+    """Получить глобальную фоновую среду (поток планировщика стартует с первой задачей)"""
+    global _runtime
+    if _runtime is None:
+        with _runtime_lock:
+            if _runtime is None:
+                _runtime = BackgroundRuntime()
+    return _runtime
+
+
+def shutdown_background_runtime(timeout: float = 30.0) -> bool:
+    """Корректно остановить глобальную фоновую среду"""
+    if _runtime is None:
+        return True
+    return _runtime.shutdown(timeout)
+
+
+def _collect_metrics(output):
+    """Статистика фоновой среды для реестра"""
+    if _runtime is None:
+        return
+    stats = _runtime.get_stats()
+    output.gauge('background_jobs', stats['jobs'], 'Зарегистрированных фоновых задач')
+    output.gauge('background_jobs_running', stats['running'], 'Выполняющихся фоновых задач')
+    output.counter('background_scheduler_wakeups', stats['wakeups'], 'Пробуждений планировщика')
+    for job in _runtime.get_jobs():
+        output.counter('background_job_skipped_overlap', job['skipped_overlap'],
+                       'Пропущено запусков из-за наложения', job=job['name'])
+
+
+get_metrics_registry().register_collector('background_runtime', _collect_metrics)
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+Batch Tracker - Учет прогресса пакетов задач публикации
+
+Индекс task_id -> batch_id дает поиск пакета за O(1), счетчики обновляются
+напрямую по результату process_task без повторного чтения задачи из БД.
+Состояние сохраняется в data/task_batches.json, поэтому итоговый отчет
+по пакету приходит и после перезапуска.
+
+Файл общий для процессов бота и веб-API: пакеты регистрируют оба, а
+/api/posts/batches читает веб-процесс. Поэтому перед чтением и записью
+файл перечитывается, если его изменил другой процесс (по mtime и размеру):
+чужие пакеты добавляются, прогресс объединяется, пакеты, завершенные в
+другом процессе, удаляются.
+"""
+
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from config import DATA_DIR
+from utils.event_bus import publish_event
+
+logger = logging.getLogger(__name__)
+
+BATCHES_FILE = os.path.join(str(DATA_DIR), 'task_batches.json')
+
+# Незавершенные пакеты старше этого срока при загрузке отбрасываются
+BATCH_TTL_SECONDS = 24 * 3600
+
+
+@dataclass
+class TaskBatch:
+    """Пакет задач одного запроса пользователя"""
+    batch_id: str
+    chat_id: int
+    task_ids: List[int]
+    created_at: float = field(default_factory=time.time)
+    completed_tasks: Set[int] = field(default_factory=set)
+    failed_tasks: Set[int] = field(default_factory=set)
+
+    @property
+    def total(self) -> int:
+        return len(self.task_ids)
+
+    @property
+    def finished(self) -> int:
+        return len(self.completed_tasks) + len(self.failed_tasks)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.finished >= self.total
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data['completed_tasks'] = sorted(self.completed_tasks)
+        data['failed_tasks'] = sorted(self.failed_tasks)
+        return data
+
+    def merge(self, other: 'TaskBatch'):
+        """Добавить результаты, учтенные в другом процессе (успех важнее неудачи)"""
+        self.completed_tasks |= other.completed_tasks
+        self.failed_tasks = (self.failed_tasks | other.failed_tasks) - self.completed_tasks
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TaskBatch':
+        return cls(
+            batch_id=data['batch_id'],
+            chat_id=data['chat_id'],
+            task_ids=list(data['task_ids']),
+            created_at=data.get('created_at', time.time()),
+            completed_tasks=set(data.get('completed_tasks', [])),
+            failed_tasks=set(data.get('failed_tasks', [])),
+        )
+
+    def progress(self) -> Dict[str, Any]:
+        """Прогресс пакета для API"""
+        return {
+            'batch_id': self.batch_id,
+            'chat_id': self.chat_id,
+            'total': self.total,
+            'completed': len(self.completed_tasks),
+            'failed': len(self.failed_tasks),
+            'pending': self.total - self.finished,
+            'percent': round(self.finished / self.total * 100, 1) if self.total else 100.0,
+            'created_at': self.created_at,
+            'elapsed': round(time.time() - self.created_at, 1),
+        }
+
+
+class BatchTracker:
+    """Активные пакеты задач с индексом task_id -> batch_id"""
+
+    def __init__(self, path: Optional[str] = BATCHES_FILE):
+        """
+        Args:
+            path: Файл для сохранения состояния (None - только в памяти)
+        """
+        self.path = path
+        self._batches: Dict[str, TaskBatch] = {}
+        self._task_index: Dict[int, str] = {}
+        # Объекты бота не сериализуются, живут только в памяти процесса
+        self._bots: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        # Версия файла при последнем чтении и пакеты, которые в нем были
+        self._file_version: Optional[Tuple[int, int]] = None
+        self._file_batch_ids: Set[str] = set()
+        # Завершенные здесь пакеты, которые еще лежат в файле
+        self._removed: Set[str] = set()
+        self.stats = {'reloads': 0}
+        with self._lock:
+            self._sync()
+        if self._batches:
+            logger.info(f"📦 Восстановлено активных пакетов задач: {len(self._batches)}")
+
+    def register(self, task_ids: List[int], chat_id: int, bot=None) -> Optional[str]:
+        """Зарегистрировать пакет, вернуть его ID"""
+        if not task_ids:
+            return None
+
+        with self._lock:
+            self._sync()
+            batch_id = f"{chat_id}_{int(time.time())}"
+            suffix = 1
+            while batch_id in self._batches:
+                suffix += 1
+                batch_id = f"{chat_id}_{int(time.time())}_{suffix}"
+
+            batch = TaskBatch(batch_id=batch_id, chat_id=chat_id, task_ids=list(task_ids))
+            self._batches[batch_id] = batch
+            for task_id in batch.task_ids:
+                self._task_index[task_id] = batch_id
+            if bot is not None:
+                self._bots[batch_id] = bot
+            self._save()
+            progress = batch.progress()
+        publish_event('batch.progress', finished=False, **progress)
+        return batch_id
+
+    def record(self, task_id: int, success: bool) -> Optional[TaskBatch]:
+        """
+        Учесть результат задачи
+
+        Returns:
+            Пакет, если эта задача его завершила (пакет удаляется из активных)
+        """
+        with self._lock:
+            self._sync()
+            batch_id = self._task_index.get(task_id)
+            if batch_id is None:
+                return None
+            batch = self._batches[batch_id]
+
+            if success:
+                batch.failed_tasks.discard(task_id)
+                batch.completed_tasks.add(task_id)
+            else:
+                batch.completed_tasks.discard(task_id)
+                batch.failed_tasks.add(task_id)
+
+            if batch.is_finished:
+                self._remove(batch_id)
+            self._save()
+            progress = batch.progress()
+        publish_event('batch.progress', finished=batch.is_finished, **progress)
+        return batch if batch.is_finished else None
+
+    def get_batch_for_task(self, task_id: int) -> Optional[TaskBatch]:
+        with self._lock:
+            self._sync()
+            batch_id = self._task_index.get(task_id)
+            return self._batches.get(batch_id) if batch_id else None
+
+    def get_bot(self, batch_id: str):
+        with self._lock:
+            return self._bots.get(batch_id)
+
+    def pop_bot(self, batch_id: str):
+        with self._lock:
+            return self._bots.pop(batch_id, None)
+
+    def get_progress(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._sync()
+            batch = self._batches.get(batch_id)
+            return batch.progress() if batch else None
+
+    def list_progress(self, chat_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Прогресс всех активных пакетов (опционально одного чата)"""
+        with self._lock:
+            self._sync()
+            return [
+                batch.progress() for batch in self._batches.values()
+                if chat_id is None or batch.chat_id == chat_id
+            ]
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._sync()
+            return len(self._batches)
+
+    def _remove(self, batch_id: str):
+        batch = self._batches.pop(batch_id, None)
+        if batch:
+            self._removed.add(batch_id)
+            for task_id in batch.task_ids:
+                if self._task_index.get(task_id) == batch_id:
+                    del self._task_index[task_id]
+
+    # ---------- сохранение ----------
+
+    def _stat_file(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read_file(self) -> Optional[Dict[str, TaskBatch]]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Не удалось загрузить пакеты задач из {self.path}: {e}")
+            return None
+
+        now = time.time()
+        batches = {}
+        for item in raw.get('batches', []):
+            batch = TaskBatch.from_dict(item)
+            if now - batch.created_at > BATCH_TTL_SECONDS or batch.is_finished:
+                continue
+            batches[batch.batch_id] = batch
+        return batches
+
+    def _sync(self):
+        """Объединить состояние с файлом, если его изменил другой процесс (под self._lock)"""
+        if not self.path:
+            return
+        version = self._stat_file()
+        if version is None or version == self._file_version:
+            return
+        stored = self._read_file()
+        if stored is None:
+            return
+        if self._file_version is not None:
+            self.stats['reloads'] += 1
+
+        for batch_id, batch in stored.items():
+            local = self._batches.get(batch_id)
+            if local is not None:
+                local.merge(batch)
+                if local.is_finished:
+                    self._remove(batch_id)
+            elif batch_id not in self._removed:
+                self._batches[batch_id] = batch
+                for task_id in batch.task_ids:
+                    self._task_index[task_id] = batch_id
+
+        # Пакет был в файле, а теперь его нет - его завершил другой процесс
+        for batch_id in list(self._batches):
+            if batch_id in self._file_batch_ids and batch_id not in stored:
+                self._remove(batch_id)
+                self._bots.pop(batch_id, None)
+
+        self._removed &= set(stored)
+        self._file_batch_ids = set(stored)
+        self._file_version = version
+
+    def _save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path) or '.'
+        try:
+            # Не затираем пакеты, записанные другим процессом после нашего чтения
+            self._sync()
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.task_batches.', suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'batches': [b.to_dict() for b in self._batches.values()]}, f)
+            os.replace(tmp_path, self.path)
+            self._file_version = self._stat_file()
+            self._file_batch_ids = set(self._batches)
+            self._removed.clear()
+        except OSError as e:
+            logger.warning(f"⚠️ Не удалось сохранить пакеты задач: {e}")
+
+
+# Глобальный экземпляр
+_batch_tracker: Optional[BatchTracker] = None
+_batch_tracker_lock = threading.Lock()
+
+
+def get_batch_tracker() -> BatchTracker:
+    """Получить глобальный трекер пакетов задач"""
+    global _batch_tracker
+    if _batch_tracker is None:
+        with _batch_tracker_lock:
+            if _batch_tracker is None:
+                _batch_tracker = BatchTracker()
+    return _batch_tracker
@@ -10,6 +10,9 @@ from typing import Dict, List, Optional
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 
+from utils.memory_accounting import get_item_mb, ACTIVE_CLIENTS_GROUP, DEFAULT_ACTIVE_CLIENT_MB
+from utils.background_runtime import get_background_runtime
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -19,7 +22,10 @@ class ClientMetrics:
     created_at: float = field(default_factory=time.time)
     last_activity: float = field(default_factory=time.time)
     requests_count: int = 0
-    memory_usage_mb: float = 4.0  # Примерное потребление памяти
+    # Средний размер клиента пула по последнему замеру (до замера - оценка)
+    memory_usage_mb: float = field(
+        default_factory=lambda: get_item_mb(ACTIVE_CLIENTS_GROUP, DEFAULT_ACTIVE_CLIENT_MB)
+    )
     is_active: bool = True
 
 class ClientRotationOptimizer:
@@ -58,9 +64,8 @@ class ClientRotationOptimizer:
         }
         
         # Фоновая очистка
-        self._cleanup_thread = None
         self._shutdown = False
-        self._start_cleanup_thread()
+        self._start_cleanup_job()
     
     def register_client_access(self, client_id: str) -> bool:
         """
@@ -154,22 +159,12 @@ class ClientRotationOptimizer:
         
         return False
     
-    def _start_cleanup_thread(self):
-        """Запускает фоновый поток очистки"""
-        if self._cleanup_thread is not None:
-            return
-        
-        def cleanup_worker():
-            while not self._shutdown:
-                try:
-                    self._cleanup_inactive_clients()
-                    time.sleep(self.cleanup_interval)
-                except Exception as e:
-                    logger.error(f"Ошибка в cleanup потоке: {e}")
-        
-        self._cleanup_thread = threading.Thread(target=cleanup_worker, daemon=True)
-        self._cleanup_thread.start()
-        logger.info("🧹 Запущен поток автоочистки клиентов")
+    def _start_cleanup_job(self):
+        """Регистрирует автоочистку клиентов в фоновой среде"""
+        get_background_runtime().every(
+            'client_rotation_cleanup', self.cleanup_interval, self._cleanup_inactive_clients, initial_delay=0
+        )
+        logger.info("🧹 Запущена автоочистка клиентов")
     
     def _cleanup_inactive_clients(self):
         """Очищает неактивные клиенты"""
@@ -185,9 +180,10 @@ class ClientRotationOptimizer:
             memory_freed = 0.0
             
             for client_id in clients_to_remove:
+                client_mb = self.client_metrics[client_id].memory_usage_mb
                 if self.rotate_client(client_id):
                     cleaned_count += 1
-                    memory_freed += 4.0  # Примерно 4MB на клиент
+                    memory_freed += client_mb
             
             if cleaned_count > 0:
                 logger.info(f"🧹 Автоочистка: удалено {cleaned_count} клиентов, "
@@ -199,7 +195,7 @@ class ClientRotationOptimizer:
         """Возвращает статистику оптимизации"""
         with self._lock:
             current_active = len(self.client_metrics)
-            total_memory_usage = current_active * 4.0  # MB
+            total_memory_usage = current_active * get_item_mb(ACTIVE_CLIENTS_GROUP, DEFAULT_ACTIVE_CLIENT_MB)
             
             return {
                 'active_clients': current_active,
@@ -236,13 +232,14 @@ class ClientRotationOptimizer:
         """Принудительная очистка всех неактивных клиентов"""
         logger.info("🧹 Запуск принудительной очистки...")
         
+        client_mb = get_item_mb(ACTIVE_CLIENTS_GROUP, DEFAULT_ACTIVE_CLIENT_MB)
         before_count = len(self.client_metrics)
-        before_memory = before_count * 4.0
+        before_memory = before_count * client_mb
         
         self._cleanup_inactive_clients()
         
         after_count = len(self.client_metrics)
-        after_memory = after_count * 4.0
+        after_memory = after_count * client_mb
         
         cleaned = before_count - after_count
         memory_freed = before_memory - after_memory
@@ -264,9 +261,7 @@ class ClientRotationOptimizer:
         """Завершение работы оптимизатора"""
         logger.info("🔄 Завершение работы оптимизатора ротации...")
         self._shutdown = True
-        
-        if self._cleanup_thread:
-            self._cleanup_thread.join(timeout=5)
+        get_background_runtime().cancel('client_rotation_cleanup')
 
 # Глобальный экземпляр оптимизатора
 _rotation_optimizer = None
@@ -2,8 +2,6 @@ import os
 import random
 import logging
 from PIL import Image, ImageEnhance, ImageFilter, ImageOps
-import cv2
-import numpy as np
 from typing import List, Tuple, Optional, Union
 import tempfile
 import json
@@ -11,6 +9,13 @@ import re
 from datetime import datetime, timedelta
 import piexif
 
+from utils.media_metadata import get_media_metadata
+from utils.lazy_imports import lazy_import
+
+# OpenCV и numpy загружаются при первой обработке видео, а не при импорте
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
 logger = logging.getLogger(__name__)
 
 class ContentUniquifier:
@@ -168,13 +173,20 @@ class ContentUniquifier:
     def uniquify_video(self, video_path: str, content_type: str) -> str:
         """Уникализация видео"""
         try:
+            # Параметры видео берем из кэша метаданных (без повторного разбора заголовков)
+            meta = get_media_metadata(video_path)
+            
             # Открываем видео
             cap = cv2.VideoCapture(video_path)
             
-            # Получаем параметры видео
-            fps = int(cap.get(cv2.CAP_PROP_FPS))
-            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            if meta and meta.width and meta.height:
+                fps = int(meta.fps)
+                width = meta.width
+                height = meta.height
+            else:
+                fps = int(cap.get(cv2.CAP_PROP_FPS))
+                width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+                height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
             
             # Создаем выходной файл
             output_path = self._get_unique_output_path(video_path)
@@ -7,6 +7,11 @@ import math
 from typing import Dict, NamedTuple
 from dataclasses import dataclass
 
+from utils.memory_accounting import (
+    get_item_mb, ACTIVE_CLIENTS_GROUP, SLEEPING_CLIENTS_GROUP,
+    DEFAULT_ACTIVE_CLIENT_MB, DEFAULT_SLEEPING_CLIENT_MB
+)
+
 @dataclass
 class ServerSpecs:
     """Характеристики сервера"""
@@ -32,8 +37,9 @@ class CostCalculator:
     
     def __init__(self):
         # Базовые характеристики нагрузки на аккаунт
-        self.base_memory_per_client = 4.0  # MB
-        self.sleeping_memory_per_client = 0.8  # MB (спящий режим)
+        # Размер клиента по замеру пула в этом процессе (вне бота - оценка)
+        self.base_memory_per_client = get_item_mb(ACTIVE_CLIENTS_GROUP, DEFAULT_ACTIVE_CLIENT_MB)  # MB
+        self.sleeping_memory_per_client = get_item_mb(SLEEPING_CLIENTS_GROUP, DEFAULT_SLEEPING_CLIENT_MB)  # MB (спящий режим)
         self.requests_per_active_account = 10  # запросов/мин
         self.cpu_per_request = 0.002  # секунд CPU на запрос
         
@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+"""
+Error Aggregator - Сводка ошибок по отпечаткам
+
+Раньше обработчик ошибок Telegram на каждую ошибку дописывал str(update)
+в telegram_errors.log прямо в потоке dispatcher: файл рос за счет одних
+и тех же повторяющихся ошибок, а найти в нем главные было трудно.
+
+Здесь ошибки группируются по отпечатку:
+
+- отпечаток - тип исключения и нормализованный стек (модуль:функция
+  каждого кадра, без номеров строк и путей), а для исключений без стека -
+  сообщение с замененными числами, id и строками в кавычках
+- по отпечатку хранятся счетчик, первое и последнее появление, последнее
+  сообщение, стек и несколько последних примеров данных (update)
+- запись в память O(1); файл сводки (ERROR_AGGREGATE_FILE, JSON)
+  перезаписывается фоновой задачей не чаще раза в flush_interval секунд
+  и при остановке, поэтому размер файла зависит только от числа разных
+  ошибок, а не от их количества
+- ошибки учитывает процесс бота, а веб-API только читает сводку: перед
+  чтением файл перечитывается, если его изменил другой процесс (по mtime)
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+import traceback
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from config import ERROR_AGGREGATE_FILE
+from utils.metrics import get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+# Пауза между изменением сводки и записью файла (с)
+FLUSH_INTERVAL = 30
+
+# Разных ошибок в сводке; сверх этого вытесняются давно не повторявшиеся
+MAX_FINGERPRINTS = 500
+
+# Примеров данных на отпечаток и длина одного примера
+SAMPLES_PER_FINGERPRINT = 3
+MAX_SAMPLE_LENGTH = 2000
+
+# Кадров стека в отпечатке и в сохраненном стеке
+MAX_FRAMES = 30
+
+_HEX_RE = re.compile(r"\b0x[0-9a-fA-F]+\b|\b[0-9a-fA-F]{16,}\b")
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+_QUOTED_RE = re.compile(r"'[^']*'|\"[^\"]*\"")
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_message(message: str) -> str:
+    """Сообщение без изменчивых частей: чисел, адресов, значений в кавычках"""
+    message = _QUOTED_RE.sub('?', message)
+    message = _HEX_RE.sub('<hex>', message)
+    message = _NUMBER_RE.sub('N', message)
+    return _WS_RE.sub(' ', message).strip()[:300]
+
+
+def stack_frames(error: BaseException) -> List[str]:
+    """Кадры стека исключения в виде 'модуль:функция' (от внешнего к месту ошибки)"""
+    frames = []
+    for frame in traceback.extract_tb(error.__traceback__)[-MAX_FRAMES:]:
+        module = os.path.splitext(os.path.basename(frame.filename))[0]
+        frames.append(f"{module}:{frame.name}")
+    return frames
+
+
+def fingerprint_error(error: BaseException) -> str:
+    """Отпечаток ошибки: тип и нормализованный стек (или сообщение, если стека нет)"""
+    error_type = f"{type(error).__module__}.{type(error).__qualname__}"
+    frames = stack_frames(error)
+    key = '\n'.join([error_type, *frames]) if frames else f"{error_type}\n{normalize_message(str(error))}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+
+@dataclass
+class ErrorRecord:
+    """Сводка по одному отпечатку"""
+    fingerprint: str
+    error_type: str
+    message: str
+    frames: List[str]
+    source: str
+    count: int = 0
+    first_seen: float = 0.0
+    last_seen: float = 0.0
+    traceback: str = ''
+    samples: Deque[str] = field(default_factory=lambda: deque(maxlen=SAMPLES_PER_FINGERPRINT))
+
+    def to_dict(self, details: bool = False) -> Dict[str, Any]:
+        data = {
+            'fingerprint': self.fingerprint,
+            'type': self.error_type,
+            'message': self.message,
+            'source': self.source,
+            'count': self.count,
+            'first_seen': datetime.fromtimestamp(self.first_seen).isoformat(timespec='seconds'),
+            'last_seen': datetime.fromtimestamp(self.last_seen).isoformat(timespec='seconds'),
+            'where': self.frames[-1] if self.frames else None,
+        }
+        if details:
+            data['frames'] = list(self.frames)
+            data['traceback'] = self.traceback
+            data['samples'] = list(self.samples)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ErrorRecord':
+        record = cls(
+            fingerprint=data['fingerprint'],
+            error_type=data['type'],
+            message=data.get('message', ''),
+            frames=list(data.get('frames') or []),
+            source=data.get('source', ''),
+            count=data.get('count', 0),
+            first_seen=datetime.fromisoformat(data['first_seen']).timestamp(),
+            last_seen=datetime.fromisoformat(data['last_seen']).timestamp(),
+            traceback=data.get('traceback', ''),
+        )
+        record.samples.extend(data.get('samples') or [])
+        return record
+
+
+class ErrorAggregator:
+    """Сводка ошибок по отпечаткам с отложенной записью на диск"""
+
+    def __init__(self, path=ERROR_AGGREGATE_FILE, flush_interval: float = FLUSH_INTERVAL,
+                 max_fingerprints: int = MAX_FINGERPRINTS, schedule_flush: bool = True):
+        self.path = str(path) if path else None
+        self.flush_interval = flush_interval
+        self.max_fingerprints = max_fingerprints
+        self.schedule_flush = schedule_flush
+        self._records: Dict[str, ErrorRecord] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._flush_pending = False
+        self._file_mtime = None
+        self.stats = {'recorded': 0, 'evicted': 0, 'flushes': 0, 'flush_errors': 0, 'reloads': 0}
+        self.source_counts: Counter = Counter()
+        self._load()
+
+    # ------------------------------------------------------------------
+    # Запись
+    # ------------------------------------------------------------------
+
+    def record(self, error: BaseException, payload: Any = None, source: str = 'telegram') -> str:
+        """
+        Учесть ошибку
+
+        Returns:
+            Отпечаток ошибки
+        """
+        fingerprint = fingerprint_error(error)
+        now = time.time()
+        sample = None
+        if payload is not None:
+            sample = str(payload)[:MAX_SAMPLE_LENGTH]
+
+        with self._lock:
+            record = self._records.get(fingerprint)
+            if record is None:
+                record = ErrorRecord(
+                    fingerprint=fingerprint,
+                    error_type=f"{type(error).__module__}.{type(error).__qualname__}",
+                    message=str(error)[:500],
+                    frames=stack_frames(error),
+                    source=source,
+                    first_seen=now,
+                    last_seen=now,
+                    traceback=''.join(traceback.format_exception(type(error), error, error.__traceback__))[-8000:],
+                )
+                self._records[fingerprint] = record
+                if len(self._records) > self.max_fingerprints:
+                    self._evict_locked(keep=fingerprint)
+            record.count += 1
+            record.last_seen = now
+            record.message = str(error)[:500]
+            if sample is not None:
+                record.samples.append(sample)
+            self.stats['recorded'] += 1
+            self.source_counts[source] += 1
+            self._dirty = True
+            schedule = self.schedule_flush and not self._flush_pending
+            if schedule:
+                self._flush_pending = True
+
+        if schedule:
+            self._schedule_flush()
+        return fingerprint
+
+    def is_new(self, fingerprint: str) -> bool:
+        """Ошибка с этим отпечатком встретилась впервые"""
+        with self._lock:
+            record = self._records.get(fingerprint)
+            return record is not None and record.count == 1
+
+    def _evict_locked(self, keep: str):
+        oldest = min(
+            (record for record in self._records.values() if record.fingerprint != keep),
+            key=lambda record: record.last_seen
+        )
+        del self._records[oldest.fingerprint]
+        self.stats['evicted'] += 1
+
+    def _schedule_flush(self):
+        from utils.background_runtime import get_background_runtime
+        try:
+            runtime = get_background_runtime()
+            runtime.once('error_aggregator_flush', self.flush_interval, self.flush)
+            runtime.add_shutdown_hook('error_aggregator', self.flush)
+        except RuntimeError:
+            # Фоновая среда уже остановлена - пишем сразу
+            self.flush()
+
+    # ------------------------------------------------------------------
+    # Файл сводки
+    # ------------------------------------------------------------------
+
+    def flush(self) -> bool:
+        """Записать сводку в файл, если она изменилась"""
+        with self._lock:
+            self._flush_pending = False
+            if not self._dirty or not self.path:
+                return False
+            data = {
+                'saved_at': datetime.now().isoformat(timespec='seconds'),
+                'errors': [record.to_dict(details=True) for record in self._records.values()],
+            }
+            self._dirty = False
+
+        try:
+            directory = os.path.dirname(self.path) or '.'
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.errors-', suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+            with self._lock:
+                self._file_mtime = self._stat_mtime()
+            self.stats['flushes'] += 1
+            return True
+        except Exception as e:
+            self.stats['flush_errors'] += 1
+            with self._lock:
+                self._dirty = True
+            logger.warning(f"⚠️ Не удалось сохранить сводку ошибок: {e}")
+            return False
+
+    def _stat_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns if self.path else None
+        except OSError:
+            return None
+
+    def _load(self) -> bool:
+        mtime = self._stat_mtime()
+        if mtime is None:
+            return False
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            records = {}
+            for item in data.get('errors', []):
+                record = ErrorRecord.from_dict(item)
+                records[record.fingerprint] = record
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось загрузить сводку ошибок {self.path}: {e}")
+            return False
+        with self._lock:
+            self._records = records
+            self._file_mtime = mtime
+        return True
+
+    def _refresh(self):
+        """Перечитать файл, если его записал другой процесс (несохраненные ошибки не теряем)"""
+        mtime = self._stat_mtime()
+        with self._lock:
+            if mtime is None or mtime == self._file_mtime or self._dirty:
+                return
+        if self._load():
+            self.stats['reloads'] += 1
+
+    # ------------------------------------------------------------------
+    # Чтение
+    # ------------------------------------------------------------------
+
+    def top(self, limit: int = 10, sort: str = 'count', since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Самые частые (sort='count') или самые свежие (sort='last_seen') ошибки
+
+        Args:
+            since: Только ошибки, повторявшиеся после этого времени (timestamp)
+        """
+        if sort not in ('count', 'last_seen'):
+            raise ValueError(f"Неизвестная сортировка: {sort}")
+        self._refresh()
+        with self._lock:
+            records = [record for record in self._records.values() if since is None or record.last_seen >= since]
+            records.sort(key=lambda record: getattr(record, sort), reverse=True)
+            return [record.to_dict() for record in records[:limit]]
+
+    def get(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Подробности по отпечатку (можно указать начало отпечатка)"""
+        self._refresh()
+        with self._lock:
+            record = self._records.get(fingerprint)
+            if record is None:
+                matches = [item for key, item in self._records.items() if key.startswith(fingerprint)]
+                record = matches[0] if len(matches) == 1 else None
+            return record.to_dict(details=True) if record else None
+
+    def clear(self, fingerprint: Optional[str] = None) -> int:
+        """Удалить отпечаток или всю сводку; возвращает число удаленных"""
+        self._refresh()
+        with self._lock:
+            if fingerprint is None:
+                removed = len(self._records)
+                self._records.clear()
+            else:
+                removed = 1 if self._records.pop(fingerprint, None) else 0
+            self._dirty = self._dirty or bool(removed)
+        if removed:
+            self.flush()
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        self._refresh()
+        with self._lock:
+            return {
+                **self.stats,
+                'fingerprints': len(self._records),
+                'occurrences': sum(record.count for record in self._records.values()),
+                'sources': dict(self.source_counts),
+                'path': self.path,
+            }
+
+
+# Глобальный экземпляр
+_error_aggregator: Optional[ErrorAggregator] = None
+_error_aggregator_lock = threading.Lock()
+
+
+def get_error_aggregator() -> ErrorAggregator:
+    """Получить глобальную сводку ошибок"""
+    global _error_aggregator
+    if _error_aggregator is None:
+        with _error_aggregator_lock:
+            if _error_aggregator is None:
+                _error_aggregator = ErrorAggregator()
+    return _error_aggregator
+
+
+def record_error(error: BaseException, payload: Any = None, source: str = 'telegram') -> str:
+    """Учесть ошибку в глобальной сводке"""
+    return get_error_aggregator().record(error, payload, source)
+
+
+def _collect_metrics(output):
+    """Сводка ошибок для реестра"""
+    if _error_aggregator is None:
+        return
+    stats = _error_aggregator.get_stats()
+    output.gauge('error_fingerprints', stats['fingerprints'], 'Разных ошибок в сводке')
+    for source, count in stats['sources'].items():
+        output.counter('errors_recorded', count, 'Ошибок учтено с запуска', source=source)
+
+
+get_metrics_registry().register_collector('error_aggregator', _collect_metrics)
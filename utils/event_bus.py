@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Event Bus - Шина событий о состоянии задач внутри процесса
+
+Очередь публикаций, валидатор и фоновые задачи веб-API публикуют изменения
+состояния, а веб-дашборд получает их через SSE (/api/events) вместо опроса БД.
+Последние события хранятся в кольцевом буфере, поэтому переподключившийся
+клиент досылает пропущенное по Last-Event-ID.
+
+ID события в потоке - "<запуск>-<номер>": счетчик живет в памяти и после
+перезапуска сервера начинается заново, поэтому ID с чужим запуском или
+номером больше текущего означает, что клиент пропустил неизвестно что, -
+он получает reset и перечитывает состояние целиком.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних событий хранится для досылки
+EVENT_BUFFER_SIZE = 1000
+
+# Интервал комментария-heartbeat в потоке SSE (секунды)
+HEARTBEAT_INTERVAL = 15.0
+
+
+@dataclass
+class Event:
+    """Событие шины"""
+    event_id: int
+    topic: str
+    data: Dict[str, Any]
+    timestamp: float
+
+    def matches(self, topics: Optional[Iterable[str]]) -> bool:
+        """Подходит ли событие под фильтр: 'task' включает 'task.status', 'task.progress'"""
+        if not topics:
+            return True
+        return any(self.topic == t or self.topic.startswith(t + '.') for t in topics)
+
+    def to_sse(self, boot_id: str) -> str:
+        payload = json.dumps({'topic': self.topic, 'data': self.data, 'timestamp': self.timestamp},
+                             ensure_ascii=False, default=str)
+        return f"id: {boot_id}-{self.event_id}\nevent: {self.topic}\ndata: {payload}\n\n"
+
+
+class EventBus:
+    """Публикация событий и раздача подписчикам"""
+
+    def __init__(self, buffer_size: int = EVENT_BUFFER_SIZE):
+        self._events: Deque[Event] = deque(maxlen=buffer_size)
+        self._last_id = 0
+        # Метка запуска в ID событий: номера после перезапуска начинаются заново
+        self.boot_id = f"{int(time.time()):x}{os.getpid():x}"
+        self._cond = threading.Condition()
+        self._subscribers = 0
+        self.stats = {'published': 0, 'delivered': 0, 'resumed': 0, 'resets': 0}
+
+    def publish(self, topic: str, **data) -> int:
+        """
+        Опубликовать событие
+
+        Args:
+            topic: Тема вида 'task.status', 'job.progress', 'validation.status'
+            **data: Данные события (сериализуются в JSON)
+
+        Returns:
+            ID события
+        """
+        with self._cond:
+            self._last_id += 1
+            self._events.append(Event(self._last_id, topic, data, time.time()))
+            self.stats['published'] += 1
+            self._cond.notify_all()
+            return self._last_id
+
+    @property
+    def last_event_id(self) -> int:
+        return self._last_id
+
+    def events_since(self, last_event_id: int, topics: Optional[List[str]] = None) -> Optional[List[Event]]:
+        """
+        События после указанного ID
+
+        Returns:
+            Список событий или None, если часть событий уже вытеснена из буфера
+        """
+        with self._cond:
+            return self._since_locked(last_event_id, topics)
+
+    def parse_event_id(self, value: Union[int, str, None]) -> Tuple[Optional[int], bool]:
+        """
+        Разобрать Last-Event-ID клиента
+
+        Returns:
+            (номер события, известен ли он этому запуску); (None, True) - ID нет
+        """
+        if value is None or value == '':
+            return None, True
+        boot_id, _, number = str(value).rpartition('-')
+        event_id = int(number)
+        if boot_id and boot_id != self.boot_id:
+            return event_id, False
+        with self._cond:
+            return event_id, event_id <= self._last_id
+
+    def _since_locked(self, last_event_id: int, topics: Optional[List[str]]) -> Optional[List[Event]]:
+        if self._events and last_event_id < self._events[0].event_id - 1:
+            return None
+        return [e for e in self._events if e.event_id > last_event_id and e.matches(topics)]
+
+    def stream(self, topics: Optional[List[str]] = None, last_event_id: Union[int, str, None] = None,
+               heartbeat: float = HEARTBEAT_INTERVAL, stop: Optional[threading.Event] = None) -> Iterator[str]:
+        """
+        Поток SSE для одного клиента
+
+        Args:
+            topics: Фильтр тем (None - все)
+            last_event_id: ID последнего полученного события (досылка после переподключения);
+                ID прошлого запуска сервера или из будущего дает reset
+            heartbeat: Интервал heartbeat-комментариев
+            stop: Событие для завершения потока (в тестах и при остановке сервера)
+        """
+        try:
+            resume_id, known = self.parse_event_id(last_event_id)
+        except ValueError:
+            resume_id, known = None, True
+        with self._cond:
+            self._subscribers += 1
+            cursor = self._last_id if resume_id is None or not known else resume_id
+        try:
+            yield f"retry: 3000\n\n"
+            if not known:
+                # Сервер перезапущен: номера клиента относятся к другому счетчику
+                self.stats['resets'] += 1
+                yield f"id: {self.boot_id}-{cursor}\nevent: reset\ndata: {{}}\n\n"
+            elif resume_id is not None:
+                self.stats['resumed'] += 1
+
+            while stop is None or not stop.is_set():
+                notified = True
+                with self._cond:
+                    pending = self._since_locked(cursor, topics)
+                    if pending == []:
+                        # Все события до последнего клиенту не нужны - ждем новые
+                        cursor = self._last_id
+                        notified = self._cond.wait(timeout=heartbeat)
+
+                if pending is None:
+                    # Клиент отстал сильнее буфера - пусть перечитает состояние целиком
+                    self.stats['resets'] += 1
+                    cursor = self._last_id
+                    yield f"id: {self.boot_id}-{cursor}\nevent: reset\ndata: {{}}\n\n"
+                elif pending:
+                    for event in pending:
+                        self.stats['delivered'] += 1
+                        yield event.to_sse(self.boot_id)
+                    cursor = pending[-1].event_id
+                elif not notified:
+                    yield ": heartbeat\n\n"
+        finally:
+            with self._cond:
+                self._subscribers -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                **self.stats,
+                'subscribers': self._subscribers,
+                'buffered': len(self._events),
+                'last_event_id': self._last_id,
+                'boot_id': self.boot_id,
+            }
+
+
+# Глобальный экземпляр
+_event_bus = EventBus()
+
+
+def get_event_bus() -> EventBus:
+    """Получить глобальную шину событий"""
+    return _event_bus
+
+
+def publish_event(topic: str, **data) -> Optional[int]:
+    """Опубликовать событие; ошибки шины не должны ломать вызывающий код"""
+    try:
+        return _event_bus.publish(topic, **data)
+    except Exception as e:
+        logger.debug(f"Не удалось опубликовать событие {topic}: {e}")
+        return None
@@ -1,21 +1,125 @@
+import io
 import logging
 import os
 from PIL import Image
 import uuid
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 from config import MEDIA_DIR
 
 logger = logging.getLogger(__name__)
 
-def split_image_for_mosaic(image_path, rows=2, cols=3):
+# Instagram хранит фото не шире 1080 px - больше декодировать и кодировать незачем
+INSTAGRAM_MAX_SIDE = 1080
+
+# Границы качества JPEG при подборе под лимит размера
+MIN_QUALITY = 30
+MAX_QUALITY = 95
+
+# Форматы, у которых параметр quality влияет на размер
+QUALITY_FORMATS = ('JPEG', 'WEBP')
+
+
+def _open_decoded(image_path, target_size=None):
+    """
+    Открывает и декодирует изображение один раз.
+    Для больших JPEG включает draft-режим: декодер сразу уменьшает картинку
+    в 2/4/8 раз, но не меньше target_size.
+    """
+    img = Image.open(image_path)
+
+    if target_size and img.format == 'JPEG':
+        width, height = img.size
+        if width >= target_size[0] * 2 and height >= target_size[1] * 2:
+            img.draft('RGB', target_size)
+            logger.debug(f"Draft-декодирование {image_path}: {width}x{height} -> {img.size}")
+
+    img.load()
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    return img
+
+
+def _save_to_buffer(img, img_format, quality):
+    buffer = io.BytesIO()
+    if img_format in QUALITY_FORMATS:
+        img.save(buffer, format=img_format, quality=quality)
+    else:
+        img.save(buffer, format=img_format)
+    return buffer
+
+
+def encode_to_budget(img, max_size_kb=None, img_format='JPEG', quality=MAX_QUALITY):
+    """
+    Кодирует изображение в памяти так, чтобы уложиться в max_size_kb.
+    Качество подбирается бинарным поиском, без записи промежуточных файлов на диск.
+
+    Returns:
+        Tuple[io.BytesIO, int]: буфер с результатом и использованное качество
+    """
+    buffer = _save_to_buffer(img, img_format, quality)
+    if not max_size_kb or buffer.tell() <= max_size_kb * 1024:
+        buffer.seek(0)
+        return buffer, quality
+
+    if img_format in QUALITY_FORMATS:
+        # Ищем максимальное качество, при котором файл укладывается в лимит
+        best = None
+        low, high = MIN_QUALITY, quality - 1
+        while low <= high:
+            mid = (low + high) // 2
+            candidate = _save_to_buffer(img, img_format, mid)
+            if candidate.tell() <= max_size_kb * 1024:
+                best = (candidate, mid)
+                low = mid + 1
+            else:
+                high = mid - 1
+
+        if best:
+            best[0].seek(0)
+            return best
+
+    # Даже минимальное качество не помогло - уменьшаем размер изображения
+    width, height = img.size
+    ratio = 0.9
+    while ratio > 0.5:
+        resized = img.resize((int(width * ratio), int(height * ratio)), Image.LANCZOS)
+        buffer = _save_to_buffer(resized, img_format, 80)
+        if buffer.tell() <= max_size_kb * 1024:
+            buffer.seek(0)
+            return buffer, 80
+        ratio -= 0.1
+
+    buffer.seek(0)
+    return buffer, 80
+
+
+def split_image_for_mosaic(image_path, rows=2, cols=3, max_size_kb=None, as_buffers=False, max_workers=None):
     """
     Разделяет изображение на части для мозаики в Instagram
     По умолчанию делит на 6 частей (2 ряда по 3 колонки)
+
+    Изображение декодируется один раз, части кодируются параллельно.
+
+    Args:
+        image_path: Путь к исходному изображению
+        rows, cols: Сетка мозаики
+        max_size_kb: Лимит размера каждой части (качество подбирается автоматически)
+        as_buffers: Вернуть части как io.BytesIO вместо файлов на диске
+        max_workers: Количество потоков кодирования (по умолчанию - по числу частей)
+
+    Returns:
+        Список путей к частям (или буферов при as_buffers=True) в порядке строк
     """
     try:
-        # Открываем изображение
-        img = Image.open(image_path)
+        # Размер части в исходном изображении нужен до декодирования для draft-режима
+        with Image.open(image_path) as probe:
+            src_width, src_height = probe.size
+        target_size = (min(src_width, INSTAGRAM_MAX_SIDE * cols), min(src_height, INSTAGRAM_MAX_SIDE * rows))
+
+        # Декодируем один раз
+        img = _open_decoded(image_path, target_size)
 
         # Получаем размеры изображения
         width, height = img.size
@@ -24,39 +128,37 @@ def split_image_for_mosaic(image_path, rows=2, cols=3):
         part_width = width // cols
         part_height = height // rows
 
-        # Создаем директорию для частей, если её нет
-        output_dir = Path(MEDIA_DIR) / "mosaic_parts"
-        os.makedirs(output_dir, exist_ok=True)
-
         # Генерируем уникальный идентификатор для этого набора частей
         unique_id = uuid.uuid4().hex[:8]
 
-        # Список путей к созданным частям
-        part_paths = []
-
-        # Разрезаем изображение на части
-        for row in range(rows):
-            for col in range(cols):
-                # Вычисляем координаты для вырезания части
-                left = col * part_width
-                upper = row * part_height
-                right = left + part_width
-                lower = upper + part_height
-
-                # Вырезаем часть
-                part = img.crop((left, upper, right, lower))
-
-                # Сохраняем часть
-                part_filename = f"mosaic_{unique_id}_r{row}_c{col}.jpg"
-                part_path = output_dir / part_filename
-                part.save(part_path, quality=95)
-
-                # Добавляем путь в список
-                part_paths.append(str(part_path))
-
-                logger.info(f"Создана часть мозаики: {part_path}")
-
-        return part_paths
+        output_dir = None
+        if not as_buffers:
+            # Создаем директорию для частей, если её нет
+            output_dir = Path(MEDIA_DIR) / "mosaic_parts"
+            os.makedirs(output_dir, exist_ok=True)
+
+        def encode_part(row, col):
+            # Вычисляем координаты для вырезания части
+            left = col * part_width
+            upper = row * part_height
+            part = img.crop((left, upper, left + part_width, upper + part_height))
+
+            if max(part.size) > INSTAGRAM_MAX_SIDE:
+                part.thumbnail((INSTAGRAM_MAX_SIDE, INSTAGRAM_MAX_SIDE), Image.LANCZOS)
+
+            buffer, quality = encode_to_budget(part, max_size_kb, 'JPEG', MAX_QUALITY)
+            if as_buffers:
+                return buffer
+
+            part_path = output_dir / f"mosaic_{unique_id}_r{row}_c{col}.jpg"
+            with open(part_path, 'wb') as f:
+                f.write(buffer.getbuffer())
+            logger.info(f"Создана часть мозаики: {part_path} (качество {quality}%)")
+            return str(part_path)
+
+        cells = [(row, col) for row in range(rows) for col in range(cols)]
+        with ThreadPoolExecutor(max_workers=max_workers or len(cells)) as executor:
+            return list(executor.map(lambda cell: encode_part(*cell), cells))
     except Exception as e:
         logger.error(f"Ошибка при разделении изображения на части: {e}")
         return []
@@ -70,7 +172,9 @@ def optimize_image(image_path, max_size_kb=1024):
         img = Image.open(image_path)
 
         # Сохраняем оригинальный формат
-        img_format = img.format
+        img_format = img.format or 'JPEG'
+        if img_format in QUALITY_FORMATS and img.mode != 'RGB':
+            img = img.convert('RGB')
 
         # Создаем путь для оптимизированного изображения
         filename = os.path.basename(image_path)
@@ -78,46 +182,19 @@ def optimize_image(image_path, max_size_kb=1024):
         os.makedirs(output_dir, exist_ok=True)
         optimized_path = output_dir / f"opt_{filename}"
 
-        # Начальное качество
-        quality = 95
-
-        # Сохраняем с постепенным уменьшением качества, пока не достигнем нужного размера
-        while quality > 30:  # Минимальное качество 30%
-            img.save(optimized_path, format=img_format, quality=quality)
+        # Подбираем качество в памяти и пишем на диск один раз
+        buffer, quality = encode_to_budget(img, max_size_kb, img_format, MAX_QUALITY)
+        file_size_kb = buffer.getbuffer().nbytes / 1024
 
-            # Проверяем размер файла
-            file_size_kb = os.path.getsize(optimized_path) / 1024
+        if file_size_kb > max_size_kb:
+            logger.warning(f"Не удалось оптимизировать изображение до {max_size_kb} KB: {image_path}")
+            return image_path
 
-            if file_size_kb <= max_size_kb:
-                logger.info(f"Изображение оптимизировано: {optimized_path} ({file_size_kb:.2f} KB, качество {quality}%)")
-                return str(optimized_path)
+        with open(optimized_path, 'wb') as f:
+            f.write(buffer.getbuffer())
 
-            # Уменьшаем качество
-            quality -= 5
-
-        # Если не удалось достичь нужного размера, пробуем изменить размер изображения
-        width, height = img.size
-        ratio = 0.9  # Уменьшаем на 10%
-
-        while ratio > 0.5:  # Минимальный размер 50% от оригинала
-            new_width = int(width * ratio)
-            new_height = int(height * ratio)
-            resized_img = img.resize((new_width, new_height), Image.LANCZOS)
-
-            resized_img.save(optimized_path, format=img_format, quality=80)
-
-            # Проверяем размер файла
-            file_size_kb = os.path.getsize(optimized_path) / 1024
-
-            if file_size_kb <= max_size_kb:
-                logger.info(f"Изображение изменено и оптимизировано: {optimized_path} ({file_size_kb:.2f} KB, {new_width}x{new_height})")
-                return str(optimized_path)
-
-            # Уменьшаем размер
-            ratio -= 0.1
-
-        logger.warning(f"Не удалось оптимизировать изображение до {max_size_kb} KB: {image_path}")
-        return image_path
+        logger.info(f"Изображение оптимизировано: {optimized_path} ({file_size_kb:.2f} KB, качество {quality}%)")
+        return str(optimized_path)
     except Exception as e:
         logger.error(f"Ошибка при оптимизации изображения: {e}")
-        return image_path
\ No newline at end of file
+        return image_path
@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+"""
+Job Manager - Фоновые задачи веб-API
+
+Долгие операции эндпоинтов (массовое добавление аккаунтов, проверка прокси,
+обновление профилей, повторные входы) выполняются как задачи:
+- submit() сразу возвращает задачу с ID
+- Общий ограниченный пул потоков: всплеск запросов встает в очередь
+- Прогресс, отмена, хранение результата с TTL
+"""
+
+import os
+import time
+import uuid
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from utils.event_bus import publish_event
+
+logger = logging.getLogger(__name__)
+
+# Сколько задач выполняется одновременно и сколько может ждать в очереди
+JOB_MAX_WORKERS = int(os.getenv("WEB_JOBS_MAX_WORKERS", "4"))
+JOB_MAX_QUEUED = int(os.getenv("WEB_JOBS_MAX_QUEUED", "100"))
+
+# Сколько хранится результат завершенной задачи
+JOB_RESULT_TTL = int(os.getenv("WEB_JOBS_RESULT_TTL", "3600"))
+
+# Предел параллельности внутри одной задачи (JobContext.map)
+JOB_MAX_PARALLEL = 5
+
+# Не чаще одного события прогресса за этот интервал на задачу
+JOB_PROGRESS_EVENT_INTERVAL = 0.5
+
+
+class JobStatus:
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Задача отменена пользователем"""
+
+
+class JobQueueFull(Exception):
+    """Очередь задач переполнена"""
+
+
+@dataclass
+class Job:
+    """Фоновая задача веб-API"""
+    job_id: str
+    kind: str
+    params: Dict[str, Any] = field(default_factory=dict)
+    status: str = JobStatus.QUEUED
+    total: int = 0
+    done: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    message: str = ''
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    cancel_requested: bool = False
+    _event: threading.Event = field(default_factory=threading.Event, repr=False)
+    _future: Optional[concurrent.futures.Future] = field(default=None, repr=False)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in JobStatus.FINISHED
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Дождаться завершения задачи"""
+        return self._event.wait(timeout)
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        data = {
+            'job_id': self.job_id,
+            'kind': self.kind,
+            'params': self.params,
+            'status': self.status,
+            'progress': {
+                'total': self.total,
+                'done': self.done,
+                'succeeded': self.succeeded,
+                'failed': self.failed,
+                'percent': round(self.done / self.total * 100, 1) if self.total else None,
+            },
+            'message': self.message,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'cancel_requested': self.cancel_requested,
+        }
+        if include_result:
+            data['result'] = self.result
+        return data
+
+
+class JobContext:
+    """Интерфейс задачи для функции-исполнителя"""
+
+    def __init__(self, job: Job, lock: threading.Lock):
+        self._job = job
+        self._lock = lock
+        self._last_event_at = 0.0
+
+    @property
+    def job_id(self) -> str:
+        return self._job.job_id
+
+    @property
+    def cancelled(self) -> bool:
+        return self._job.cancel_requested
+
+    def check_cancelled(self):
+        """Прервать выполнение, если задачу отменили"""
+        if self._job.cancel_requested:
+            raise JobCancelled()
+
+    def set_total(self, total: int):
+        with self._lock:
+            self._job.total = total
+
+    def advance(self, success: bool = True, message: Optional[str] = None):
+        """Отметить обработку одного элемента"""
+        with self._lock:
+            self._job.done += 1
+            if success:
+                self._job.succeeded += 1
+            else:
+                self._job.failed += 1
+            if message is not None:
+                self._job.message = message
+        self._publish_progress(force=self._job.done >= self._job.total)
+
+    def update(self, message: str):
+        with self._lock:
+            self._job.message = message
+        self._publish_progress(force=True)
+
+    def _publish_progress(self, force: bool = False):
+        now = time.time()
+        if not force and now - self._last_event_at < JOB_PROGRESS_EVENT_INTERVAL:
+            return
+        self._last_event_at = now
+        with self._lock:
+            data = self._job.to_dict(include_result=False)
+        publish_event('job.progress', **data)
+
+    def map(self, fn: Callable[[Any], Any], items: Iterable[Any], parallel: int = 1,
+            delay: float = 0.0) -> List[Any]:
+        """
+        Обработать элементы с учетом прогресса и отмены
+
+        Результат fn, приводимый к False, или исключение считаются ошибкой.
+        Для элементов, не обработанных из-за отмены, в результате остается None.
+
+        Args:
+            fn: Функция обработки одного элемента
+            items: Элементы
+            parallel: Потоков внутри задачи (не больше JOB_MAX_PARALLEL)
+            delay: Пауза перед запуском каждого следующего элемента
+        """
+        items = list(items)
+        self.set_total(len(items))
+        parallel = max(1, min(parallel, JOB_MAX_PARALLEL))
+        results: List[Any] = [None] * len(items)
+
+        def run(index):
+            if self.cancelled:
+                return
+            try:
+                results[index] = fn(items[index])
+                self.advance(bool(results[index]))
+            except Exception as e:
+                logger.error(f"❌ Ошибка в задаче {self.job_id} на элементе {index + 1}: {e}")
+                results[index] = e
+                self.advance(False)
+
+        if parallel == 1:
+            for index in range(len(items)):
+                self.check_cancelled()
+                if index and delay:
+                    time.sleep(delay)
+                run(index)
+        else:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=parallel) as executor:
+                for index in range(len(items)):
+                    if self.cancelled:
+                        break
+                    if index and delay:
+                        time.sleep(delay)
+                    executor.submit(run, index)
+        self.check_cancelled()
+        return results
+
+    @staticmethod
+    def run_async(coro):
+        """Выполнить корутину в собственном цикле событий потока задачи"""
+        loop = asyncio.new_event_loop()
+        try:
+            asyncio.set_event_loop(loop)
+            return loop.run_until_complete(coro)
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+
+class JobManager:
+    """Очередь фоновых задач с общим пулом потоков"""
+
+    def __init__(self, max_workers: int = JOB_MAX_WORKERS,
+                 max_queued: int = JOB_MAX_QUEUED,
+                 result_ttl: float = JOB_RESULT_TTL):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='web-job'
+        )
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self.stats = {'submitted': 0, 'rejected': 0, 'completed': 0, 'failed': 0, 'cancelled': 0}
+
+    def submit(self, kind: str, fn: Callable[..., Any], *args,
+               params: Optional[Dict[str, Any]] = None, **kwargs) -> Job:
+        """
+        Поставить задачу в очередь
+
+        Args:
+            kind: Тип задачи (для фильтрации в списке)
+            fn: Исполнитель, первым аргументом получает JobContext
+            params: Краткое описание параметров для отображения
+
+        Raises:
+            JobQueueFull: Если в очереди слишком много задач
+        """
+        self._cleanup()
+        with self._lock:
+            queued = sum(1 for job in self._jobs.values() if job.status == JobStatus.QUEUED)
+            if queued >= self.max_queued:
+                self.stats['rejected'] += 1
+                raise JobQueueFull(f"В очереди уже {queued} задач, попробуйте позже")
+
+            job = Job(job_id=uuid.uuid4().hex[:12], kind=kind, params=params or {})
+            self._jobs[job.job_id] = job
+            self.stats['submitted'] += 1
+            job._future = self._executor.submit(self._run, job, fn, args, kwargs)
+
+        logger.info(f"📥 Задача {kind} {job.job_id} поставлена в очередь")
+        self._publish(job)
+        return job
+
+    def _run(self, job: Job, fn, args, kwargs):
+        with self._lock:
+            if job.cancel_requested:
+                self._finish(job, JobStatus.CANCELLED)
+                return
+            job.status = JobStatus.RUNNING
+            job.started_at = time.time()
+        self._publish(job)
+
+        try:
+            result = fn(JobContext(job, self._lock), *args, **kwargs)
+        except JobCancelled:
+            with self._lock:
+                self._finish(job, JobStatus.CANCELLED)
+            logger.info(f"⏹️ Задача {job.kind} {job.job_id} отменена")
+        except Exception as e:
+            with self._lock:
+                job.error = str(e)
+                self._finish(job, JobStatus.FAILED)
+            logger.error(f"❌ Задача {job.kind} {job.job_id} завершилась с ошибкой: {e}")
+        else:
+            with self._lock:
+                job.result = result
+                self._finish(job, JobStatus.CANCELLED if job.cancel_requested else JobStatus.COMPLETED)
+            logger.info(f"✅ Задача {job.kind} {job.job_id} выполнена за {job.finished_at - job.started_at:.1f}с")
+
+    def _finish(self, job: Job, status: str):
+        """Завершить задачу (вызывается под self._lock)"""
+        job.status = status
+        job.finished_at = time.time()
+        self.stats[status] += 1
+        job._event.set()
+        publish_event('job.status', **job.to_dict(include_result=False))
+
+    @staticmethod
+    def _publish(job: Job):
+        publish_event('job.status', **job.to_dict(include_result=False))
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._cleanup()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self, kind: Optional[str] = None, status: Optional[str] = None) -> List[Job]:
+        """Задачи, новые первыми"""
+        self._cleanup()
+        with self._lock:
+            jobs = [
+                job for job in self._jobs.values()
+                if (kind is None or job.kind == kind) and (status is None or job.status == status)
+            ]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Отменить задачу: ожидающая снимается сразу, выполняющаяся - на ближайшей проверке"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.is_finished:
+                return job
+            job.cancel_requested = True
+            if job.status == JobStatus.QUEUED and job._future is not None and job._future.cancel():
+                self._finish(job, JobStatus.CANCELLED)
+        return job
+
+    def _cleanup(self):
+        now = time.time()
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.is_finished and now - job.finished_at > self.result_ttl
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_status: Dict[str, int] = {}
+            for job in self._jobs.values():
+                by_status[job.status] = by_status.get(job.status, 0) + 1
+            return {
+                **self.stats,
+                'max_workers': self.max_workers,
+                'max_queued': self.max_queued,
+                'jobs': by_status,
+            }
+
+    def shutdown(self, wait: bool = False):
+        with self._lock:
+            for job in self._jobs.values():
+                if not job.is_finished:
+                    job.cancel_requested = True
+        self._executor.shutdown(wait=wait)
+
+
+# Глобальный экземпляр
+_job_manager: Optional[JobManager] = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Получить глобальный менеджер фоновых задач"""
+    global _job_manager
+    if _job_manager is None:
+        with _job_manager_lock:
+            if _job_manager is None:
+                _job_manager = JobManager()
+    return _job_manager
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Lazy Imports - Отложенный импорт тяжелых необязательных зависимостей
+
+OpenCV, numpy, moviepy и aiohttp нужны только при обработке медиа и
+отправке писем, но при импорте модулей верхнего уровня они добавляли
+сотни миллисекунд к запуску бота. lazy_import() возвращает заглушку
+модуля, которая импортирует настоящий модуль при первом обращении
+к атрибуту.
+"""
+
+import importlib
+import importlib.util
+import threading
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Модуль, загружаемый при первом обращении к атрибуту"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_lazy_module'] = None
+        self.__dict__['_lazy_lock'] = threading.Lock()
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            with self.__dict__['_lazy_lock']:
+                module = self.__dict__['_lazy_module']
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.__dict__['_lazy_module'] is not None
+
+
+def lazy_import(name: str) -> LazyModule:
+    """
+    Отложенный импорт модуля
+
+    Использование:
+        cv2 = lazy_import('cv2')   # ничего не импортируется
+        cv2.imread(path)           # импорт при первом вызове
+    """
+    return LazyModule(name)
+
+
+def module_available(name: str) -> bool:
+    """Установлен ли модуль (без его импорта)"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
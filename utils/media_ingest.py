@@ -0,0 +1,447 @@
+# -*- coding: utf-8 -*-
+"""
+Media Ingest - Потоковый прием медиа из Telegram
+
+Обеспечивает:
+- Скачивание файла на диск чанками, без буферизации всего файла в памяти
+- Подсчет SHA-256, определение MIME по сигнатуре и размеров кадра в том же проходе
+- Длительность MP4/MOV из атома mvhd по мере прохождения потока
+- Ограничения по размеру и длительности (загрузка прерывается сразу при превышении)
+- Ограничение числа одновременных скачиваний для всех пользователей
+"""
+
+import os
+import time
+import uuid
+import struct
+import hashlib
+import logging
+import tempfile
+import threading
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional, Sequence
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+MAX_CONCURRENT_DOWNLOADS = int(os.getenv("MEDIA_INGEST_MAX_CONCURRENT", "4"))
+
+# Лимиты Instagram
+MAX_PHOTO_SIZE = 30 * 1024 * 1024  # 30 MB
+MAX_VIDEO_SIZE = 650 * 1024 * 1024  # 650 MB
+MAX_REELS_DURATION = 90  # секунд
+MAX_STORY_VIDEO_DURATION = 60  # секунд
+
+# Сколько байт начала файла держать для разбора заголовков
+_HEAD_BYTES = 64 * 1024
+# moov больше этого размера не буферизуем (длительность определит кэш метаданных)
+_MAX_MOOV_BYTES = 8 * 1024 * 1024
+
+_MIME_EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+    'video/mp4': '.mp4',
+    'video/quicktime': '.mov',
+    'video/x-matroska': '.mkv',
+    'video/webm': '.webm',
+    'video/x-msvideo': '.avi',
+}
+
+
+# Бренды ISO-BMFF (ftyp): фото HEIF/AVIF и видео MP4/MOV
+_HEIF_BRANDS = {b'heic', b'heix', b'heim', b'heis', b'hevc', b'hevx', b'mif1', b'msf1'}
+_AVIF_BRANDS = {b'avif', b'avis'}
+_MP4_BRANDS = (b'isom', b'iso', b'mp4', b'avc1', b'M4V ', b'M4VH', b'M4VP', b'f4v ', b'dash')
+
+# Распознаются, но не принимаются: Instagram и обработка фото ждут JPEG/PNG/WebP
+_UNSUPPORTED_MIMES = {
+    'image/heic': "Фото HEIC не поддерживается - отправьте JPEG или PNG",
+    'image/avif': "Фото AVIF не поддерживается - отправьте JPEG или PNG",
+}
+
+
+class MediaIngestError(Exception):
+    """Файл отклонен при приеме; текст можно показать пользователю"""
+
+
+@dataclass
+class IngestedMedia:
+    """Запись о принятом медиафайле"""
+    path: str
+    media_type: str  # 'PHOTO' | 'VIDEO'
+    mime_type: str
+    sha256: str
+    file_size: int
+    width: int = 0
+    height: int = 0
+    duration: float = 0.0
+    file_id: Optional[str] = None
+    elapsed: float = 0.0
+
+    @property
+    def extension(self) -> str:
+        return _MIME_EXTENSIONS.get(self.mime_type, os.path.splitext(self.path)[1])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def sniff_mime(head: bytes) -> Optional[str]:
+    """MIME-тип по сигнатуре первых байт файла"""
+    if head[:3] == b'\xff\xd8\xff':
+        return 'image/jpeg'
+    if head[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'image/png'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head[:4] == b'RIFF' and head[8:12] == b'AVI ':
+        return 'video/x-msvideo'
+    if head[4:8] == b'ftyp':
+        brand = head[8:12]
+        if brand in _HEIF_BRANDS:
+            return 'image/heic'
+        if brand in _AVIF_BRANDS:
+            return 'image/avif'
+        if brand == b'qt  ':
+            return 'video/quicktime'
+        if brand.startswith(_MP4_BRANDS):
+            return 'video/mp4'
+        return None
+    if head[:4] == b'\x1a\x45\xdf\xa3':
+        return 'video/webm' if b'webm' in head[:64] else 'video/x-matroska'
+    return None
+
+
+def _image_size(mime: str, head: bytes):
+    """Размеры изображения из заголовка (без декодирования)"""
+    try:
+        if mime == 'image/png' and len(head) >= 24:
+            return struct.unpack('>II', head[16:24])
+        if mime == 'image/jpeg':
+            pos = 2
+            while pos + 9 < len(head):
+                if head[pos] != 0xFF:
+                    pos += 1
+                    continue
+                marker = head[pos + 1]
+                if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+                    pos += 1 if marker == 0xFF else 2
+                    continue
+                length = struct.unpack('>H', head[pos + 2:pos + 4])[0]
+                if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                    height, width = struct.unpack('>HH', head[pos + 5:pos + 9])
+                    return width, height
+                pos += 2 + length
+    except struct.error:
+        pass
+    return 0, 0
+
+
+class _Mp4DurationScanner:
+    """
+    Следит за атомами верхнего уровня MP4/MOV по мере прохождения потока
+    и извлекает длительность из moov/mvhd, не перечитывая файл
+    """
+
+    def __init__(self):
+        self.duration: Optional[float] = None
+        self._buf = bytearray()
+        self._skip = 0  # сколько байт текущего атома еще пропустить
+        self._moov_size = 0  # сколько байт moov собрать (0 - не собираем)
+        self._done = False
+
+    def feed(self, data: bytes):
+        if self._done:
+            return
+        self._buf += data
+        while not self._done:
+            if self._skip:
+                dropped = min(self._skip, len(self._buf))
+                del self._buf[:dropped]
+                self._skip -= dropped
+                if self._skip:
+                    return
+                continue
+
+            if self._moov_size:
+                if len(self._buf) < self._moov_size:
+                    return
+                self._parse_moov(bytes(self._buf[:self._moov_size]))
+                self._done = True
+                self._buf = bytearray()
+                return
+
+            if len(self._buf) < 8:
+                return
+            size, box_type = struct.unpack('>I4s', self._buf[:8])
+            header_len = 8
+            if size == 1:
+                if len(self._buf) < 16:
+                    return
+                size = struct.unpack('>Q', self._buf[8:16])[0]
+                header_len = 16
+            if size < header_len:
+                # size == 0 (атом до конца файла) или мусор - дальше не разбираем
+                self._done = True
+                return
+            del self._buf[:header_len]
+
+            if box_type == b'moov':
+                if size - header_len > _MAX_MOOV_BYTES:
+                    self._done = True
+                    return
+                self._moov_size = size - header_len
+            else:
+                self._skip = size - header_len
+
+    def _parse_moov(self, moov: bytes):
+        pos = 0
+        while pos + 8 <= len(moov):
+            size, box_type = struct.unpack('>I4s', moov[pos:pos + 8])
+            if size < 8:
+                return
+            if box_type == b'mvhd':
+                body = moov[pos + 8:pos + size]
+                version = body[0]
+                if version == 1:
+                    timescale, duration = struct.unpack('>IQ', body[20:32])
+                else:
+                    timescale, duration = struct.unpack('>II', body[12:20])
+                if timescale:
+                    self.duration = duration / timescale
+                return
+            pos += size
+
+
+class _IngestStats:
+    """Счетчики приема медиа"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {
+            'downloads': 0,
+            'rejected': 0,
+            'failed': 0,
+            'bytes': 0,
+            'download_time': 0.0,
+            'wait_time': 0.0,
+            'active': 0,
+            'peak_active': 0,
+        }
+
+    def add(self, **deltas):
+        with self.lock:
+            for key, value in deltas.items():
+                self.values[key] += value
+            self.values['peak_active'] = max(self.values['peak_active'], self.values['active'])
+
+
+_stats = _IngestStats()
+_download_slots = threading.BoundedSemaphore(MAX_CONCURRENT_DOWNLOADS)
+
+
+def get_ingest_stats() -> dict:
+    """Статистика приема медиа"""
+    with _stats.lock:
+        stats = dict(_stats.values)
+    stats['max_concurrent'] = MAX_CONCURRENT_DOWNLOADS
+    stats['throughput_bps'] = round(stats['bytes'] / stats['download_time'], 1) if stats['download_time'] else 0.0
+    return stats
+
+
+def _iter_file_chunks(tg_file, timeout: float):
+    """Поток байт файла Telegram: локальный Bot API сервер или HTTP"""
+    file_path = tg_file.file_path or ''
+    if file_path and os.path.isfile(file_path):
+        with open(file_path, 'rb') as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        return
+
+    with requests.get(tg_file._get_encoded_url(), stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(CHUNK_SIZE):
+            if chunk:
+                yield chunk
+
+
+def ingest_stream(chunks, dest_path: Optional[str] = None,
+                  dest_dir: Optional[str] = None,
+                  max_size: Optional[int] = None,
+                  max_duration: Optional[float] = None,
+                  allowed_types: Sequence[str] = ('PHOTO', 'VIDEO')) -> IngestedMedia:
+    """
+    Записать поток байт на диск, проверяя его в том же проходе
+
+    Args:
+        chunks: Итератор байтовых чанков
+        dest_path: Путь к итоговому файлу (по умолчанию - уникальное имя с расширением по MIME)
+        dest_dir: Каталог для файла, если dest_path не задан (по умолчанию - временный)
+        max_size: Лимит размера в байтах (по умолчанию - лимит Instagram для типа)
+        max_duration: Лимит длительности видео в секундах
+        allowed_types: Разрешенные типы медиа
+
+    Returns:
+        IngestedMedia
+
+    Raises:
+        MediaIngestError: файл не прошел проверки (частичный файл удаляется)
+    """
+    started = time.time()
+    digest = hashlib.sha256()
+    head = bytearray()
+    mime = None
+    media_type = None
+    mp4 = None
+    size = 0
+
+    directory = os.path.dirname(dest_path) if dest_path else (dest_dir or tempfile.gettempdir())
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    part_path = os.path.join(directory, f".ingest_{uuid.uuid4().hex}.part")
+
+    try:
+        with open(part_path, 'wb') as out:
+            for chunk in chunks:
+                size += len(chunk)
+                if len(head) < _HEAD_BYTES:
+                    head += chunk[:_HEAD_BYTES - len(head)]
+
+                if mime is None and len(head) >= 16:
+                    mime = sniff_mime(bytes(head))
+                    if mime is None:
+                        raise MediaIngestError("Неподдерживаемый формат файла")
+                    if mime in _UNSUPPORTED_MIMES:
+                        raise MediaIngestError(_UNSUPPORTED_MIMES[mime])
+                    media_type = 'VIDEO' if mime.startswith('video/') else 'PHOTO'
+                    if media_type not in allowed_types:
+                        raise MediaIngestError(
+                            "Ожидается видео" if 'VIDEO' in allowed_types else "Ожидается изображение"
+                        )
+                    if max_size is None:
+                        max_size = MAX_VIDEO_SIZE if media_type == 'VIDEO' else MAX_PHOTO_SIZE
+                    if mime in ('video/mp4', 'video/quicktime'):
+                        mp4 = _Mp4DurationScanner()
+                        # До определения MIME пришло не больше head - передаем его целиком
+                        mp4.feed(bytes(head[:size - len(chunk)]))
+
+                if max_size and size > max_size:
+                    raise MediaIngestError(f"Файл слишком большой (максимум {max_size // (1024 * 1024)} MB)")
+
+                if mp4 is not None:
+                    mp4.feed(chunk)
+                    if max_duration and mp4.duration and mp4.duration > max_duration:
+                        raise MediaIngestError(
+                            f"Видео слишком длинное ({mp4.duration:.0f} сек, максимум {max_duration:.0f} сек)"
+                        )
+
+                digest.update(chunk)
+                out.write(chunk)
+
+        if mime is None:
+            mime = sniff_mime(bytes(head))
+            if mime is None:
+                raise MediaIngestError("Неподдерживаемый формат файла")
+            if mime in _UNSUPPORTED_MIMES:
+                raise MediaIngestError(_UNSUPPORTED_MIMES[mime])
+            media_type = 'VIDEO' if mime.startswith('video/') else 'PHOTO'
+            if media_type not in allowed_types:
+                raise MediaIngestError("Неподдерживаемый тип медиа")
+
+        sha256 = digest.hexdigest()
+        if not dest_path:
+            dest_path = os.path.join(
+                directory, f"{media_type.lower()}_{uuid.uuid4().hex[:8]}{_MIME_EXTENSIONS.get(mime, '')}"
+            )
+        os.replace(part_path, dest_path)
+    except BaseException:
+        try:
+            os.remove(part_path)
+        except OSError:
+            pass
+        raise
+
+    media = IngestedMedia(
+        path=dest_path,
+        media_type=media_type,
+        mime_type=mime,
+        sha256=sha256,
+        file_size=size,
+        elapsed=time.time() - started
+    )
+    if media_type == 'PHOTO':
+        media.width, media.height = _image_size(mime, bytes(head))
+    elif mp4 is not None and mp4.duration:
+        media.duration = mp4.duration
+    return media
+
+
+def ingest_telegram_media(bot, media_file, dest_path: Optional[str] = None,
+                          dest_dir: Optional[str] = None,
+                          max_size: Optional[int] = None,
+                          max_duration: Optional[float] = None,
+                          allowed_types: Sequence[str] = ('PHOTO', 'VIDEO'),
+                          timeout: float = 120) -> IngestedMedia:
+    """
+    Скачать медиа из сообщения Telegram через ingest_stream
+
+    Args:
+        bot: telegram.Bot (context.bot)
+        media_file: PhotoSize / Video / Document / Animation из сообщения
+        dest_path, dest_dir, max_size, max_duration, allowed_types: см. ingest_stream
+        timeout: Таймаут HTTP-запроса
+
+    Returns:
+        IngestedMedia
+
+    Raises:
+        MediaIngestError: файл не прошел проверки
+    """
+    # Проверки по данным Telegram - до скачивания
+    declared_size = getattr(media_file, 'file_size', None)
+    if max_size and declared_size and declared_size > max_size:
+        _stats.add(rejected=1)
+        raise MediaIngestError(f"Файл слишком большой (максимум {max_size // (1024 * 1024)} MB)")
+    declared_duration = getattr(media_file, 'duration', None)
+    if max_duration and declared_duration and declared_duration > max_duration:
+        _stats.add(rejected=1)
+        raise MediaIngestError(
+            f"Видео слишком длинное ({declared_duration} сек, максимум {max_duration:.0f} сек)"
+        )
+
+    wait_started = time.time()
+    with _download_slots:
+        _stats.add(active=1, wait_time=time.time() - wait_started)
+        try:
+            tg_file = bot.get_file(media_file.file_id)
+            media = ingest_stream(
+                _iter_file_chunks(tg_file, timeout),
+                dest_path=dest_path,
+                dest_dir=dest_dir,
+                max_size=max_size,
+                max_duration=max_duration,
+                allowed_types=allowed_types
+            )
+        except MediaIngestError:
+            _stats.add(active=-1, rejected=1)
+            raise
+        except Exception:
+            _stats.add(active=-1, failed=1)
+            raise
+
+    media.file_id = media_file.file_id
+    if not media.duration and declared_duration:
+        media.duration = float(declared_duration)
+    if not media.width and getattr(media_file, 'width', None):
+        media.width, media.height = media_file.width, media_file.height
+    _stats.add(active=-1, downloads=1, bytes=media.file_size, download_time=media.elapsed)
+
+    logger.info(f"📥 Принят файл {os.path.basename(media.path)}: {media.mime_type}, "
+                f"{media.file_size / 1024:.0f} KB за {media.elapsed:.2f}с")
+    return media
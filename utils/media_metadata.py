@@ -0,0 +1,420 @@
+# -*- coding: utf-8 -*-
+"""
+Media Metadata Cache - Кэш метаданных и обложек медиафайлов
+
+Обеспечивает:
+- Однократный разбор контейнера при загрузке (размеры, длительность, FPS, кодек, поворот)
+- Индекс ключевых кадров (если доступен ffprobe)
+- Обложки на стандартных отметках времени, сохраненные рядом с файлом
+- Хранение результатов в sidecar-файле <media>.meta.json
+- O(1) доступ к метаданным из памяти без повторного открытия файла
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+import subprocess
+from dataclasses import dataclass, field, asdict
+from typing import Optional, Dict, List, Any
+
+from utils.memory_accounting import register_memory_group
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv', '.m4v', '.webm')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+# Стандартные отметки (в секундах) для обложек, снимаемых при загрузке
+STANDARD_POSTER_OFFSETS = (0.0, 1.0, 3.0)
+
+META_SUFFIX = '.meta.json'
+POSTERS_SUFFIX = '.posters'
+
+# Кодеки, которые Instagram принимает без перекодирования
+H264_CODECS = ('avc1', 'h264', 'x264')
+
+
+@dataclass
+class MediaMetadata:
+    """Метаданные одного медиафайла"""
+    path: str
+    media_type: str = 'video'  # 'video' | 'image'
+    width: int = 0
+    height: int = 0
+    duration: float = 0.0
+    fps: float = 0.0
+    frame_count: int = 0
+    codec: str = ''
+    rotation: int = 0
+    file_size: int = 0
+    mtime: float = 0.0
+    keyframes: List[float] = field(default_factory=list)
+    posters: Dict[str, str] = field(default_factory=dict)  # "1.000" -> путь к jpg
+    probed_at: float = 0.0
+
+    @property
+    def aspect_ratio(self) -> float:
+        """Соотношение сторон с учетом поворота"""
+        width, height = self.display_size
+        return width / height if height else 0.0
+
+    @property
+    def display_size(self):
+        """Размеры кадра так, как его увидит зритель"""
+        if self.rotation in (90, 270):
+            return self.height, self.width
+        return self.width, self.height
+
+    @property
+    def is_h264(self) -> bool:
+        return self.codec.lower() in H264_CODECS
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'MediaMetadata':
+        known = {k: v for k, v in data.items() if k in cls.__dataclass_fields__}
+        return cls(**known)
+
+
+def _poster_key(offset: float) -> str:
+    """Ключ обложки: секунды с точностью до миллисекунды"""
+    return f"{max(0.0, float(offset)):.3f}"
+
+
+class MediaMetadataCache:
+    """Кэш метаданных медиафайлов с хранением рядом с файлом"""
+
+    def __init__(self, max_entries: int = 2000,
+                 poster_offsets=STANDARD_POSTER_OFFSETS,
+                 probe_keyframes: bool = True):
+        self.max_entries = max_entries
+        self.poster_offsets = tuple(poster_offsets)
+        self.probe_keyframes = probe_keyframes
+
+        self._entries: Dict[str, MediaMetadata] = {}
+        self._lock = threading.RLock()
+        self._path_locks: Dict[str, threading.Lock] = {}
+
+        self.stats = {
+            'hits': 0,
+            'sidecar_loads': 0,
+            'probes': 0,
+            'probe_errors': 0,
+            'posters_served': 0,
+            'posters_extracted': 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Публичный API
+    # ------------------------------------------------------------------
+
+    def get(self, path: str) -> Optional[MediaMetadata]:
+        """
+        Получить метаданные файла. Контейнер открывается только если
+        ни в памяти, ни в sidecar-файле нет актуальной записи.
+        """
+        if not path or not os.path.exists(path):
+            return None
+
+        key = os.path.abspath(path)
+        st = os.stat(key)
+
+        with self._lock:
+            meta = self._entries.get(key)
+            if meta and self._is_fresh(meta, st):
+                self.stats['hits'] += 1
+                return meta
+            path_lock = self._path_locks.setdefault(key, threading.Lock())
+
+        # Один разбор на файл даже при конкурентных вызовах
+        with path_lock:
+            with self._lock:
+                meta = self._entries.get(key)
+                if meta and self._is_fresh(meta, st):
+                    self.stats['hits'] += 1
+                    return meta
+
+            meta = self._load_sidecar(key, st)
+            if meta is None:
+                meta = self._probe(key, st)
+            if meta is not None:
+                self._remember(key, meta)
+            return meta
+
+    def probe(self, path: str) -> Optional[MediaMetadata]:
+        """Разбор при загрузке медиа (то же, что get, но с понятным именем для ingest)"""
+        return self.get(path)
+
+    def get_thumbnail(self, path: str, offset: float = 0.0) -> Optional[str]:
+        """
+        Путь к обложке на заданной секунде. Стандартные обложки создаются при
+        разборе, остальные - один раз по запросу и сохраняются в метаданных.
+        """
+        meta = self.get(path)
+        if meta is None or meta.media_type != 'video':
+            return None
+
+        if meta.duration > 0:
+            offset = min(max(0.0, offset), meta.duration)
+        key = _poster_key(offset)
+
+        poster = meta.posters.get(key)
+        if poster and os.path.exists(poster):
+            with self._lock:
+                self.stats['posters_served'] += 1
+            return poster
+
+        extracted = self._extract_posters(meta, [offset])
+        poster = extracted.get(key)
+        if poster:
+            with self._lock:
+                meta.posters[key] = poster
+            self._save_sidecar(meta)
+        return poster
+
+    def invalidate(self, path: str, remove_files: bool = False):
+        """Сбросить кэш для файла (и при необходимости удалить sidecar и обложки)"""
+        key = os.path.abspath(path)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._path_locks.pop(key, None)
+
+        if remove_files:
+            try:
+                if os.path.exists(key + META_SUFFIX):
+                    os.remove(key + META_SUFFIX)
+                shutil.rmtree(key + POSTERS_SUFFIX, ignore_errors=True)
+            except Exception as e:
+                logger.debug(f"Не удалось удалить метаданные {key}: {e}")
+
+    def get_stats(self) -> dict:
+        """Статистика кэша"""
+        with self._lock:
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+            }
+
+    # ------------------------------------------------------------------
+    # Внутренние методы
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _is_fresh(meta: MediaMetadata, st: os.stat_result) -> bool:
+        return meta.file_size == st.st_size and meta.mtime == st.st_mtime
+
+    def _remember(self, key: str, meta: MediaMetadata):
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                # Вытесняем самую старую запись
+                oldest = min(self._entries, key=lambda k: self._entries[k].probed_at)
+                self._entries.pop(oldest, None)
+                self._path_locks.pop(oldest, None)
+            self._entries[key] = meta
+
+    def _load_sidecar(self, key: str, st: os.stat_result) -> Optional[MediaMetadata]:
+        sidecar = key + META_SUFFIX
+        if not os.path.exists(sidecar):
+            return None
+        try:
+            with open(sidecar, 'r', encoding='utf-8') as f:
+                meta = MediaMetadata.from_dict(json.load(f))
+            if not self._is_fresh(meta, st):
+                return None
+            meta.path = key
+            with self._lock:
+                self.stats['sidecar_loads'] += 1
+            return meta
+        except Exception as e:
+            logger.debug(f"Sidecar метаданных поврежден {sidecar}: {e}")
+            return None
+
+    def _save_sidecar(self, meta: MediaMetadata):
+        sidecar = meta.path + META_SUFFIX
+        tmp_path = sidecar + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(meta.to_dict(), f, ensure_ascii=False)
+            os.replace(tmp_path, sidecar)
+        except Exception as e:
+            logger.debug(f"Не удалось сохранить метаданные {sidecar}: {e}")
+
+    def _probe(self, key: str, st: os.stat_result) -> Optional[MediaMetadata]:
+        ext = os.path.splitext(key)[1].lower()
+        meta = MediaMetadata(path=key, file_size=st.st_size, mtime=st.st_mtime, probed_at=time.time())
+
+        try:
+            if ext in IMAGE_EXTENSIONS:
+                meta.media_type = 'image'
+                self._probe_image(meta)
+            else:
+                meta.media_type = 'video'
+                self._probe_video(meta)
+        except Exception as e:
+            with self._lock:
+                self.stats['probe_errors'] += 1
+            logger.warning(f"Не удалось разобрать медиафайл {key}: {e}")
+            return None
+
+        with self._lock:
+            self.stats['probes'] += 1
+
+        self._save_sidecar(meta)
+        logger.debug(f"📐 Метаданные {os.path.basename(key)}: {meta.width}x{meta.height}, "
+                     f"{meta.duration:.2f}с, {meta.fps:.2f} fps, {meta.codec or '?'}")
+        return meta
+
+    def _probe_image(self, meta: MediaMetadata):
+        from PIL import Image
+
+        # Image.open читает только заголовок
+        with Image.open(meta.path) as img:
+            meta.width, meta.height = img.size
+            meta.codec = (img.format or '').lower()
+            try:
+                orientation = img.getexif().get(0x0112)
+                meta.rotation = {3: 180, 6: 270, 8: 90}.get(orientation, 0)
+            except Exception:
+                pass
+
+    def _probe_video(self, meta: MediaMetadata):
+        import cv2
+
+        cap = cv2.VideoCapture(meta.path)
+        if not cap.isOpened():
+            raise ValueError("не удалось открыть видео")
+
+        try:
+            meta.width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            meta.height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            meta.fps = float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
+            meta.frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+            if meta.fps > 0 and meta.frame_count > 0:
+                meta.duration = meta.frame_count / meta.fps
+
+            fourcc = int(cap.get(cv2.CAP_PROP_FOURCC) or 0)
+            if fourcc:
+                meta.codec = ''.join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4)).strip('\x00 ').lower()
+
+            if hasattr(cv2, 'CAP_PROP_ORIENTATION_META'):
+                meta.rotation = int(cap.get(cv2.CAP_PROP_ORIENTATION_META) or 0) % 360
+        finally:
+            cap.release()
+
+        if self.probe_keyframes:
+            meta.keyframes = self._probe_keyframes(meta.path)
+
+        offsets = [o for o in self.poster_offsets if meta.duration <= 0 or o <= meta.duration]
+        meta.posters = self._extract_posters(meta, offsets or [0.0])
+
+    @staticmethod
+    def _probe_keyframes(path: str) -> List[float]:
+        """Временные метки ключевых кадров через ffprobe (если установлен)"""
+        ffprobe = shutil.which('ffprobe')
+        if not ffprobe:
+            return []
+        try:
+            result = subprocess.run(
+                [ffprobe, '-v', 'error', '-select_streams', 'v:0', '-skip_frame', 'nokey',
+                 '-show_entries', 'frame=pts_time', '-of', 'csv=p=0', path],
+                capture_output=True, text=True, timeout=30
+            )
+            keyframes = []
+            for line in result.stdout.splitlines():
+                line = line.strip().strip(',')
+                if line:
+                    try:
+                        keyframes.append(round(float(line), 3))
+                    except ValueError:
+                        continue
+            return keyframes
+        except Exception as e:
+            logger.debug(f"ffprobe не смог построить индекс ключевых кадров: {e}")
+            return []
+
+    def _extract_posters(self, meta: MediaMetadata, offsets: List[float]) -> Dict[str, str]:
+        """Извлечь кадры на отметках offsets за одно открытие файла"""
+        import cv2
+
+        posters_dir = meta.path + POSTERS_SUFFIX
+        os.makedirs(posters_dir, exist_ok=True)
+        fps = meta.fps if meta.fps > 0 else 30
+
+        posters = {}
+        cap = cv2.VideoCapture(meta.path)
+        if not cap.isOpened():
+            return posters
+        try:
+            for offset in sorted(offsets):
+                key = _poster_key(offset)
+                frame_number = int(float(offset) * fps)
+                if meta.frame_count:
+                    frame_number = min(frame_number, meta.frame_count - 1)
+                cap.set(cv2.CAP_PROP_POS_FRAMES, max(0, frame_number))
+                ret, frame = cap.read()
+                if not ret:
+                    logger.debug(f"Не удалось извлечь кадр на {offset}с из {meta.path}")
+                    continue
+                poster_path = os.path.join(posters_dir, f"{key}.jpg")
+                cv2.imwrite(poster_path, frame)
+                posters[key] = poster_path
+        finally:
+            cap.release()
+
+        with self._lock:
+            self.stats['posters_extracted'] += len(posters)
+        return posters
+
+
+# Глобальный экземпляр кэша
+_metadata_cache: Optional[MediaMetadataCache] = None
+_metadata_cache_lock = threading.Lock()
+
+
+def get_media_metadata_cache() -> MediaMetadataCache:
+    """Получить глобальный кэш метаданных медиа"""
+    global _metadata_cache
+    if _metadata_cache is None:
+        with _metadata_cache_lock:
+            if _metadata_cache is None:
+                _metadata_cache = MediaMetadataCache()
+    return _metadata_cache
+
+
+def get_media_metadata(path: str) -> Optional[MediaMetadata]:
+    """Удобная функция: метаданные файла из глобального кэша"""
+    return get_media_metadata_cache().get(path)
+
+
+def get_media_thumbnail(path: str, offset: float = 0.0) -> Optional[str]:
+    """Удобная функция: обложка видео на заданной секунде"""
+    return get_media_metadata_cache().get_thumbnail(path, offset)
+
+
+def remove_media_file(path: str) -> bool:
+    """
+    Удалить медиафайл вместе с sidecar метаданных и каталогом обложек
+
+    Returns:
+        True, если файл был удален
+    """
+    if not path:
+        return False
+    get_media_metadata_cache().invalidate(path, remove_files=True)
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+register_memory_group(
+    'media_metadata_cache',
+    lambda: list(_metadata_cache._entries.values()) if _metadata_cache else []
+)
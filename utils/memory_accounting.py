@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+"""
+Memory Accounting - Измеренное потребление памяти вместо констант
+
+Пул клиентов, оптимизатор ротации и калькуляторы стоимости считали память
+как «4 МБ на активного клиента, 0.8 МБ на спящего». Здесь эти числа
+измеряются:
+
+- RSS/USS процесса и его дочерних процессов через psutil (USS - память,
+  которая освободится при завершении процесса; читается из smaps, поэтому
+  кэшируется на PROCESS_SAMPLE_TTL секунд)
+- приблизительный размер графа объектов для зарегистрированных групп
+  (клиенты пула, кэши): обход gc.get_referents с общим множеством
+  просмотренных объектов, так что общие объекты учитываются один раз;
+  модули, классы, функции, логгеры, потоки и объекты SQLAlchemy не обходятся
+- tracemalloc по запросу: базовый снимок и разница по traceback
+
+Замеры групп дорогие и выполняются не чаще GROUP_MEASURE_TTL секунд
+(при съеме метрик или по команде администратора); get_item_mb() отдает
+последний замер без нового обхода.
+"""
+
+import gc
+import os
+import sys
+import time
+import types
+import logging
+import threading
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from utils.metrics import get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    psutil = None
+    PSUTIL_AVAILABLE = False
+
+MB = 1024 * 1024
+
+# Оценки размера клиента Instagram (МБ), пока нет замера пула
+DEFAULT_ACTIVE_CLIENT_MB = 4.0
+DEFAULT_SLEEPING_CLIENT_MB = 0.8
+
+# Группы замера клиентов пула
+ACTIVE_CLIENTS_GROUP = 'client_pool_active'
+SLEEPING_CLIENTS_GROUP = 'client_pool_sleeping'
+
+# Как часто (с) повторять дорогие замеры
+PROCESS_SAMPLE_TTL = 5
+GROUP_MEASURE_TTL = 60
+
+# Предел объектов при обходе одной группы
+MAX_GRAPH_OBJECTS = 500_000
+
+# Глубина traceback для tracemalloc
+TRACEMALLOC_FRAMES = 10
+
+# Не обходим общие для всего процесса объекты
+_SKIP_TYPES = (
+    type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+    types.MethodType, types.CodeType, types.FrameType, logging.Logger,
+    logging.Handler, threading.Thread,
+)
+_SKIP_MODULE_PREFIXES = ('sqlalchemy', 'logging', 'threading')
+
+
+def _is_shared(obj) -> bool:
+    if isinstance(obj, _SKIP_TYPES):
+        return True
+    module = getattr(type(obj), '__module__', None) or ''
+    return module.startswith(_SKIP_MODULE_PREFIXES)
+
+
+def deep_sizeof(root: Any, seen: Optional[Set[int]] = None,
+                max_objects: int = MAX_GRAPH_OBJECTS) -> Tuple[int, int, bool]:
+    """
+    Приблизительный размер графа объектов, достижимых из root
+
+    Args:
+        seen: id уже учтенных объектов (общий для нескольких корней).
+            Действителен, только пока все измеренные корни живы: id
+            освобожденного объекта может достаться новому, и тот будет
+            пропущен как уже учтенный
+
+    Returns:
+        (байт, объектов, обход прерван по max_objects)
+    """
+    if seen is None:
+        seen = set()
+    total = 0
+    count = 0
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        obj_id = id(obj)
+        if obj_id in seen:
+            continue
+        seen.add(obj_id)
+        if obj is not root and _is_shared(obj):
+            continue
+        try:
+            total += sys.getsizeof(obj)
+        except TypeError:
+            continue
+        count += 1
+        if count >= max_objects:
+            return total, count, True
+        stack.extend(gc.get_referents(obj))
+    return total, count, False
+
+
+@dataclass
+class GroupMeasurement:
+    """Замер группы объектов"""
+    name: str
+    items: int
+    bytes: int
+    objects: int
+    truncated: bool
+    measured_at: float
+    duration_ms: float
+
+    @property
+    def item_bytes(self) -> float:
+        return self.bytes / self.items if self.items else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'items': self.items,
+            'mb': round(self.bytes / MB, 3),
+            'item_mb': round(self.item_bytes / MB, 4),
+            'objects': self.objects,
+            'truncated': self.truncated,
+            'measured_at': self.measured_at,
+            'duration_ms': round(self.duration_ms, 1),
+        }
+
+
+class MemoryAccounting:
+    """Замеры памяти процесса, групп объектов и tracemalloc"""
+
+    def __init__(self, group_ttl: float = GROUP_MEASURE_TTL, process_ttl: float = PROCESS_SAMPLE_TTL):
+        self.group_ttl = group_ttl
+        self.process_ttl = process_ttl
+        self._groups: Dict[str, Callable[[], Iterable[Any]]] = {}
+        self._measurements: Dict[str, GroupMeasurement] = {}
+        self._process_sample: Optional[Dict[str, Any]] = None
+        self._process_sampled_at = 0.0
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+        self._measure_lock = threading.Lock()
+        self.stats = {'group_measurements': 0, 'process_samples': 0, 'snapshots': 0}
+
+    # ------------------------------------------------------------------
+    # Группы объектов
+    # ------------------------------------------------------------------
+
+    def register(self, name: str, items: Callable[[], Iterable[Any]]):
+        """Зарегистрировать группу: items() возвращает объекты группы (например, клиентов)"""
+        with self._lock:
+            self._groups[name] = items
+
+    def unregister(self, name: str):
+        with self._lock:
+            self._groups.pop(name, None)
+            self._measurements.pop(name, None)
+
+    def measure(self, name: Optional[str] = None, force: bool = False) -> Dict[str, GroupMeasurement]:
+        """
+        Замерить группы (все или одну); свежие замеры не повторяются, если не force
+
+        Группы обходятся с общим множеством просмотренных объектов: объект,
+        общий для двух групп, учитывается в первой
+        """
+        with self._lock:
+            groups = dict(self._groups) if name is None else {name: self._groups[name]}
+
+        with self._measure_lock:
+            now = time.time()
+            stale = {
+                group_name: getter for group_name, getter in groups.items()
+                if force or group_name not in self._measurements
+                or now - self._measurements[group_name].measured_at >= self.group_ttl
+            }
+            seen: Set[int] = set()
+            for group_name, getter in stale.items():
+                started = time.perf_counter()
+                try:
+                    items = list(getter() or ())
+                except Exception as e:
+                    logger.warning(f"⚠️ Не удалось получить объекты группы {group_name}: {e}")
+                    continue
+                total = objects = 0
+                truncated = False
+                for item in items:
+                    size, count, item_truncated = deep_sizeof(item, seen, MAX_GRAPH_OBJECTS - objects)
+                    total += size
+                    objects += count
+                    if item_truncated:
+                        truncated = True
+                        break
+                measurement = GroupMeasurement(
+                    group_name, len(items), total, objects, truncated,
+                    time.time(), (time.perf_counter() - started) * 1000
+                )
+                with self._lock:
+                    self._measurements[group_name] = measurement
+                    self.stats['group_measurements'] += 1
+                logger.debug(f"📏 {group_name}: {len(items)} шт, {total / MB:.2f}MB за {measurement.duration_ms:.0f}мс")
+
+        with self._lock:
+            return {key: self._measurements[key] for key in groups if key in self._measurements}
+
+    def get_measurement(self, name: str) -> Optional[GroupMeasurement]:
+        """Последний замер группы (без нового обхода)"""
+        with self._lock:
+            return self._measurements.get(name)
+
+    def get_item_mb(self, name: str, default: float) -> float:
+        """Средний размер объекта группы по последнему замеру (или default, если замера нет)"""
+        measurement = self.get_measurement(name)
+        if measurement is None or not measurement.items:
+            return default
+        return measurement.item_bytes / MB
+
+    # ------------------------------------------------------------------
+    # Процесс
+    # ------------------------------------------------------------------
+
+    def sample_process(self, force: bool = False) -> Dict[str, Any]:
+        """RSS/USS текущего процесса и суммарный RSS дочерних процессов"""
+        now = time.time()
+        with self._lock:
+            if not force and self._process_sample and now - self._process_sampled_at < self.process_ttl:
+                return self._process_sample
+
+        sample: Dict[str, Any] = {'pid': os.getpid(), 'rss_mb': None, 'uss_mb': None,
+                                  'children': 0, 'children_rss_mb': 0.0}
+        if PSUTIL_AVAILABLE:
+            process = psutil.Process()
+            try:
+                info = process.memory_full_info()
+                sample['rss_mb'] = round(info.rss / MB, 2)
+                sample['uss_mb'] = round(info.uss / MB, 2)
+            except (psutil.AccessDenied, AttributeError):
+                sample['rss_mb'] = round(process.memory_info().rss / MB, 2)
+            for child in process.children(recursive=True):
+                try:
+                    sample['children_rss_mb'] += child.memory_info().rss / MB
+                    sample['children'] += 1
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+            sample['children_rss_mb'] = round(sample['children_rss_mb'], 2)
+        else:
+            import resource
+            # ru_maxrss - пиковое значение (КБ в Linux)
+            sample['rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)
+
+        with self._lock:
+            self._process_sample = sample
+            self._process_sampled_at = now
+            self.stats['process_samples'] += 1
+        return sample
+
+    # ------------------------------------------------------------------
+    # tracemalloc
+    # ------------------------------------------------------------------
+
+    def start_tracing(self, frames: int = TRACEMALLOC_FRAMES) -> bool:
+        """Включить tracemalloc и снять базовый снимок (False, если уже включен)"""
+        if tracemalloc.is_tracing():
+            return False
+        tracemalloc.start(frames)
+        with self._lock:
+            self._baseline = tracemalloc.take_snapshot()
+            self.stats['snapshots'] += 1
+        logger.info(f"🧠 tracemalloc включен ({frames} кадров)")
+        return True
+
+    def stop_tracing(self):
+        """Выключить tracemalloc и освободить снимки"""
+        with self._lock:
+            self._baseline = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("🧠 tracemalloc выключен")
+
+    def is_tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def snapshot_diff(self, limit: int = 10, rebase: bool = False) -> List[Dict[str, Any]]:
+        """
+        Рост памяти с базового снимка по traceback, крупные первыми
+
+        Args:
+            rebase: сделать текущий снимок новым базовым
+        """
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc не включен")
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        with self._lock:
+            baseline = self._baseline
+            if rebase or baseline is None:
+                self._baseline = snapshot
+            self.stats['snapshots'] += 1
+        if baseline is None:
+            return []
+
+        diffs = snapshot.compare_to(baseline, 'traceback')
+        return [
+            {
+                'size_diff_kb': round(diff.size_diff / 1024, 1),
+                'size_kb': round(diff.size / 1024, 1),
+                'count_diff': diff.count_diff,
+                'traceback': [f"{frame.filename}:{frame.lineno}" for frame in diff.traceback],
+            }
+            for diff in diffs[:limit]
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            measurements = {name: m.to_dict() for name, m in self._measurements.items()}
+            stats = dict(self.stats)
+        traced = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else None
+        return {
+            'process': self.sample_process(),
+            'groups': measurements,
+            'tracemalloc': {
+                'tracing': traced is not None,
+                'current_mb': round(traced[0] / MB, 2) if traced else None,
+                'peak_mb': round(traced[1] / MB, 2) if traced else None,
+            },
+            'stats': stats,
+        }
+
+
+# Глобальный экземпляр
+_memory_accounting = MemoryAccounting()
+
+
+def get_memory_accounting() -> MemoryAccounting:
+    """Получить глобальный учет памяти"""
+    return _memory_accounting
+
+
+def register_memory_group(name: str, items: Callable[[], Iterable[Any]]):
+    """Зарегистрировать группу объектов для замера размера"""
+    _memory_accounting.register(name, items)
+
+
+def get_item_mb(name: str, default: float) -> float:
+    """Измеренный средний размер объекта группы (МБ) или default"""
+    return _memory_accounting.get_item_mb(name, default)
+
+
+def _collect_metrics(output):
+    """Память процесса и групп (замер групп не чаще GROUP_MEASURE_TTL)"""
+    process = _memory_accounting.sample_process()
+    if process['rss_mb'] is not None:
+        output.gauge('process_resident_memory_bytes', int(process['rss_mb'] * MB), 'RSS процесса')
+    if process['uss_mb'] is not None:
+        output.gauge('process_unique_memory_bytes', int(process['uss_mb'] * MB), 'USS процесса')
+    output.gauge('process_children_resident_memory_bytes', int(process['children_rss_mb'] * MB),
+                 'Суммарный RSS дочерних процессов')
+    for name, measurement in _memory_accounting.measure().items():
+        output.gauge('memory_group_bytes', measurement.bytes, 'Размер графа объектов группы', group=name)
+        output.gauge('memory_group_items', measurement.items, 'Объектов в группе', group=name)
+    if tracemalloc.is_tracing():
+        output.gauge('tracemalloc_traced_bytes', tracemalloc.get_traced_memory()[0],
+                     'Память, отслеживаемая tracemalloc')
+
+
+get_metrics_registry().register_collector('memory', _collect_metrics)
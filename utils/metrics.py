@@ -0,0 +1,500 @@
+# -*- coding: utf-8 -*-
+"""
+Metrics - Единый реестр метрик (счетчики, gauge, гистограммы)
+
+У каждой подсистемы свой get_stats в своем формате, и ничто их не
+собирало вместе и не хранило историю. Реестр объединяет два способа
+публикации:
+
+- на горячих путях подсистема пишет в Counter/Histogram; запись идет
+  в ячейку текущего потока без блокировки, блокировка берется только
+  при первой записи потока и при чтении
+- уже существующую статистику подсистема отдает коллектором, который
+  вызывается только при съеме метрик (register_collector)
+
+Экспозиция: render_prometheus() для /metrics, snapshot() для сводки
+в боте и MetricsHistory для истории с интервалом.
+"""
+
+import os
+import math
+import bisect
+import time
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Границы гистограмм по умолчанию (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# История снимков: интервал (секунды) и глубина
+METRICS_HISTORY_INTERVAL = float(os.getenv("METRICS_HISTORY_INTERVAL", "60"))
+METRICS_HISTORY_SIZE = int(os.getenv("METRICS_HISTORY_SIZE", "180"))
+
+LabelValues = Tuple[str, ...]
+
+
+class _ThreadCells:
+    """Значения по потокам: поток пишет только в свою ячейку, чтение суммирует"""
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._cells: List[Tuple[threading.Thread, List[float]]] = []
+        self._retired = [0.0] * size
+        self._lock = threading.Lock()
+
+    def cell(self) -> List[float]:
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = [0.0] * self._size
+            with self._lock:
+                self._cells.append((threading.current_thread(), cell))
+            self._local.cell = cell
+            return cell
+
+    def totals(self) -> List[float]:
+        with self._lock:
+            # Ячейки завершившихся потоков больше не меняются - сворачиваем их
+            alive = []
+            for thread, cell in self._cells:
+                if thread.is_alive():
+                    alive.append((thread, cell))
+                else:
+                    for i, value in enumerate(cell):
+                        self._retired[i] += value
+            self._cells = alive
+            totals = list(self._retired)
+            for _, cell in alive:
+                for i, value in enumerate(cell):
+                    totals[i] += value
+            return totals
+
+
+class _CounterChild:
+    def __init__(self):
+        self._cells = _ThreadCells(1)
+
+    def inc(self, amount: float = 1.0):
+        self._cells.cell()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return self._cells.totals()[0]
+
+
+class _GaugeChild:
+    def __init__(self):
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        self._value = value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set_function(self, function: Callable[[], float]):
+        """Значение вычисляется при съеме метрик"""
+        self._function = function
+
+    @property
+    def value(self) -> float:
+        if self._function is not None:
+            return float(self._function())
+        return self._value
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        # [по корзинам..., +Inf, сумма, количество]
+        self._cells = _ThreadCells(len(self.buckets) + 3)
+
+    def observe(self, value: float):
+        cell = self._cells.cell()
+        # Первая граница >= value; за последней границей - корзина +Inf
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    def time(self):
+        return _Timer(self)
+
+    def totals(self) -> Tuple[List[float], float, float]:
+        """(накопительные количества по корзинам вкл. +Inf, сумма, количество)"""
+        values = self._cells.totals()
+        cumulative, running = [], 0.0
+        for count in values[:len(self.buckets) + 1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, values[-2], values[-1]
+
+
+class _Timer:
+    """Контекстный менеджер: время блока в гистограмму"""
+
+    def __init__(self, histogram: _HistogramChild):
+        self._histogram = histogram
+        self._started = 0.0
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._histogram.observe(time.perf_counter() - self._started)
+        return False
+
+
+class _Metric:
+    """Метрика с метками; дочерние значения создаются один раз на набор меток"""
+
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, Any] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values, **kwargs):
+        if kwargs:
+            values = tuple(str(kwargs[name]) for name in self.labelnames)
+        else:
+            values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}: ожидаются метки {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name}: нужно указать метки {self.labelnames}")
+        return self._children[()]
+
+    def children(self) -> List[Tuple[Dict[str, str], Any]]:
+        with self._lock:
+            items = list(self._children.items())
+        return [(dict(zip(self.labelnames, values)), child) for values, child in items]
+
+
+class Counter(_Metric):
+    """Монотонный счетчик"""
+
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def samples(self):
+        for labels, child in self.children():
+            yield '_total' if not self.name.endswith('_total') else '', labels, child.value
+
+
+class Gauge(_Metric):
+    """Текущее значение"""
+
+    type_name = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default().dec(amount)
+
+    def set_function(self, function: Callable[[], float]):
+        self._default().set_function(function)
+
+    def samples(self):
+        for labels, child in self.children():
+            try:
+                yield '', labels, child.value
+            except Exception as e:
+                logger.debug(f"Не удалось получить значение {self.name}: {e}")
+
+
+class Histogram(_Metric):
+    """Распределение значений по корзинам"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def samples(self):
+        for labels, child in self.children():
+            cumulative, total, count = child.totals()
+            for bound, value in zip(self.buckets + (math.inf,), cumulative):
+                yield '_bucket', {**labels, 'le': _format_bound(bound)}, value
+            yield '_sum', labels, total
+            yield '_count', labels, count
+
+
+@dataclass
+class MetricFamily:
+    """Метрика при съеме: имя, тип, описание и значения"""
+    name: str
+    type: str
+    documentation: str = ''
+    samples: List[Tuple[str, Dict[str, str], float]] = field(default_factory=list)
+
+
+class CollectorOutput:
+    """Куда коллектор подсистемы пишет значения при съеме метрик"""
+
+    def __init__(self):
+        self.families: Dict[str, MetricFamily] = {}
+
+    def _add(self, metric_type: str, name: str, value, documentation: str, labels: Dict[str, Any]):
+        if value is None:
+            return
+        family = self.families.get(name)
+        if family is None:
+            family = self.families[name] = MetricFamily(name, metric_type, documentation)
+        suffix = '_total' if metric_type == 'counter' and not name.endswith('_total') else ''
+        family.samples.append((suffix, {k: str(v) for k, v in labels.items()}, float(value)))
+
+    def counter(self, name: str, value, documentation: str = '', **labels):
+        self._add('counter', name, value, documentation, labels)
+
+    def gauge(self, name: str, value, documentation: str = '', **labels):
+        self._add('gauge', name, value, documentation, labels)
+
+
+class MetricsRegistry:
+    """Реестр метрик и коллекторов подсистем"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: Dict[str, Callable[[CollectorOutput], None]] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Метрика {name} уже зарегистрирована с другим типом или метками")
+            return metric
+
+    def counter(self, name: str, documentation: str = '', labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str = '', labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str = '', labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def register_collector(self, name: str, collector: Callable[[CollectorOutput], None]):
+        """Коллектор вызывается при каждом съеме метрик; повторная регистрация заменяет его"""
+        with self._lock:
+            self._collectors[name] = collector
+
+    def unregister_collector(self, name: str):
+        with self._lock:
+            self._collectors.pop(name, None)
+
+    def collect(self) -> List[MetricFamily]:
+        """Все метрики: зарегистрированные и от коллекторов"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.items())
+
+        families = [
+            MetricFamily(m.name, m.type_name, m.documentation, list(m.samples()))
+            for m in metrics
+        ]
+
+        output = CollectorOutput()
+        for name, collector in collectors:
+            try:
+                collector(output)
+                output.gauge('metrics_collector_up', 1, 'Коллектор подсистемы отработал без ошибок', collector=name)
+            except Exception as e:
+                logger.debug(f"Ошибка коллектора метрик {name}: {e}")
+                output.gauge('metrics_collector_up', 0, 'Коллектор подсистемы отработал без ошибок', collector=name)
+        families.extend(output.families.values())
+        return sorted(families, key=lambda family: family.name)
+
+    def render_prometheus(self) -> str:
+        """Текстовый формат Prometheus 0.0.4"""
+        lines = []
+        for family in self.collect():
+            if family.documentation:
+                lines.append(f"# HELP {family.name} {_escape_help(family.documentation)}")
+            lines.append(f"# TYPE {family.name} {family.type}")
+            for suffix, labels, value in family.samples:
+                lines.append(f"{family.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> Dict[str, float]:
+        """Плоский снимок {имя{метки}: значение}; у гистограмм только _sum и _count"""
+        result = {}
+        for family in self.collect():
+            for suffix, labels, value in family.samples:
+                if suffix == '_bucket':
+                    continue
+                result[f"{family.name}{suffix}{_format_labels(labels)}"] = value
+        return result
+
+
+class MetricsHistory:
+    """Снимки реестра с интервалом для расчета скоростей и сводок"""
+
+    def __init__(self, registry: MetricsRegistry, interval: float = METRICS_HISTORY_INTERVAL,
+                 size: int = METRICS_HISTORY_SIZE):
+        self.registry = registry
+        self.interval = interval
+        self.samples: Deque[Tuple[float, Dict[str, float]]] = deque(maxlen=size)
+        self._started = False
+        self._lock = threading.Lock()
+
+    def record(self) -> Dict[str, float]:
+        snapshot = self.registry.snapshot()
+        with self._lock:
+            self.samples.append((time.time(), snapshot))
+        return snapshot
+
+    def start(self):
+        # Импорт здесь: фоновая среда сама регистрирует метрики в этом модуле
+        from utils.background_runtime import get_background_runtime
+        if self._started:
+            return
+        self._started = True
+        get_background_runtime().every('metrics_history', self.interval, self.record, jitter=0, initial_delay=0)
+        logger.info(f"📈 История метрик: снимок каждые {self.interval:.0f}с")
+
+    def stop(self):
+        from utils.background_runtime import get_background_runtime
+        if self._started:
+            self._started = False
+            get_background_runtime().cancel('metrics_history')
+
+    def rates(self, window: float = 300) -> Dict[str, float]:
+        """Скорость роста (в секунду) по ключам снимка за последние window секунд"""
+        with self._lock:
+            if not self.samples:
+                return {}
+            latest_time, latest = self.samples[-1]
+            base_time, base = self.samples[0]
+            for sample_time, sample in self.samples:
+                if latest_time - sample_time <= window:
+                    base_time, base = sample_time, sample
+                    break
+        elapsed = latest_time - base_time
+        if elapsed <= 0:
+            return {}
+        return {key: (value - base[key]) / elapsed for key, value in latest.items() if key in base}
+
+
+def _format_bound(bound: float) -> str:
+    return '+Inf' if bound == math.inf else repr(float(bound))
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_help(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    parts = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+# Глобальные экземпляры
+_registry = MetricsRegistry()
+_history = MetricsHistory(_registry)
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Получить глобальный реестр метрик"""
+    return _registry
+
+
+def get_metrics_history() -> MetricsHistory:
+    """Получить глобальную историю метрик"""
+    return _history
+
+
+def start_metrics_history():
+    """Запустить сохранение снимков метрик"""
+    _history.start()
+
+
+def stop_metrics_history():
+    """Остановить сохранение снимков метрик"""
+    _history.stop()
+
+
+def collect_stats(output: CollectorOutput, prefix: str, stats: Dict[str, Any],
+                  counters: Iterable[str] = (), gauges: Iterable[str] = (), **labels):
+    """Переложить числовые поля словаря get_stats() в метрики коллектора"""
+    for key in counters:
+        if isinstance(stats.get(key), (int, float)):
+            output.counter(f"{prefix}_{key}", stats[key], **labels)
+    for key in gauges:
+        if isinstance(stats.get(key), (int, float)):
+            output.gauge(f"{prefix}_{key}", stats[key], **labels)
+
+
+def percentile(sorted_values: Sequence[float], percent: float) -> float:
+    """Перцентиль отсортированной выборки по ближайшему рангу (0.0 для пустой)"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
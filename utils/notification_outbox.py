@@ -0,0 +1,428 @@
+# -*- coding: utf-8 -*-
+"""
+Notification Outbox - Очередь Telegram уведомлений из фоновых задач
+
+Фоновые потоки не отправляют сообщения сами, а кладут их в outbox:
+- Уведомления с одинаковым ключом в одном чате объединяются в одно сообщение,
+  а уже отправленная сводка дополняется через edit_message_text
+- Отправитель соблюдает общий лимит и лимит на чат, учитывает retry_after
+- Недоставленные сообщения сохраняются в data/notification_outbox.json
+- Собирается статистика задержки доставки
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import tempfile
+import threading
+from collections import deque
+from dataclasses import dataclass, field, asdict
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from telegram.error import RetryAfter, TimedOut, NetworkError, BadRequest, Unauthorized, ChatMigrated
+
+from config import DATA_DIR
+from utils.metrics import percentile
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_FILE = os.path.join(str(DATA_DIR), 'notification_outbox.json')
+
+# Лимиты Telegram: ~30 сообщений в секунду всего и ~1 в секунду на чат
+GLOBAL_RATE_PER_SECOND = 25
+PER_CHAT_INTERVAL = 1.0
+
+# Сколько ждем новых событий перед отправкой сводки и сколько дополняем уже отправленную
+COALESCE_DELAY = 2.0
+SUMMARY_EDIT_WINDOW = 60.0
+
+MAX_ATTEMPTS = 5
+MAX_MESSAGE_LENGTH = 4096
+LATENCY_SAMPLES = 1000
+
+
+@dataclass
+class Notification:
+    """Сообщение в очереди на отправку"""
+    chat_id: int
+    items: List[str]
+    key: Optional[str] = None
+    parse_mode: Optional[str] = None
+    reply_markup: Optional[str] = None  # JSON, как его принимает Bot API
+    notification_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    created_at: float = field(default_factory=time.time)
+    not_before: float = 0.0
+    attempts: int = 0
+
+    def render(self, prefix: List[str] = None) -> str:
+        """Текст сообщения: одно событие как есть, несколько - сводкой"""
+        items = (prefix or []) + self.items
+        if len(items) == 1:
+            return items[0][:MAX_MESSAGE_LENGTH]
+
+        header = f"📬 Уведомлений: {len(items)}\n\n"
+        parts, length = [], len(header)
+        for index, item in enumerate(items):
+            block = item + "\n\n"
+            if length + len(block) > MAX_MESSAGE_LENGTH - 40:
+                parts.append(f"… и еще {len(items) - index}")
+                break
+            parts.append(block)
+            length += len(block)
+        return (header + ''.join(parts)).strip()[:MAX_MESSAGE_LENGTH]
+
+
+@dataclass
+class _SentSummary:
+    """Отправленная сводка, которую еще можно дополнить"""
+    message_id: int
+    items: List[str]
+    sent_at: float
+
+
+class NotificationOutbox:
+    """Очередь уведомлений с объединением и ограничением скорости"""
+
+    def __init__(self, bot=None, path: Optional[str] = OUTBOX_FILE,
+                 global_rate: float = GLOBAL_RATE_PER_SECOND,
+                 per_chat_interval: float = PER_CHAT_INTERVAL,
+                 coalesce_delay: float = COALESCE_DELAY):
+        """
+        Args:
+            bot: Бот по умолчанию (для сообщений, восстановленных после перезапуска)
+            path: Файл для недоставленных сообщений (None - только в памяти)
+            global_rate: Сообщений в секунду на всех
+            per_chat_interval: Минимальный интервал между сообщениями в один чат
+            coalesce_delay: Задержка отправки сообщений с ключом для объединения
+        """
+        self.bot = bot
+        self.path = path
+        self.global_interval = 1.0 / global_rate if global_rate else 0.0
+        self.per_chat_interval = per_chat_interval
+        self.coalesce_delay = coalesce_delay
+
+        self._pending: Dict[str, Notification] = {}
+        self._by_key: Dict[Tuple[int, str], str] = {}
+        self._summaries: Dict[Tuple[int, str], _SentSummary] = {}
+        self._chat_next_at: Dict[int, float] = {}
+        self._global_next_at = 0.0
+
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.stats = {
+            'enqueued': 0,
+            'coalesced': 0,
+            'sent': 0,
+            'edited': 0,
+            'retries': 0,
+            'rate_limited': 0,
+            'dropped': 0,
+        }
+
+        self._load()
+
+    # ---------- постановка в очередь ----------
+
+    def enqueue(self, chat_id: int, text: str, key: Optional[str] = None,
+                bot=None, reply_markup=None, parse_mode: Optional[str] = None) -> str:
+        """
+        Поставить уведомление в очередь
+
+        Args:
+            chat_id: Чат получателя
+            text: Текст события
+            key: Ключ объединения (события с одним ключом в чате идут одним сообщением)
+            bot: Бот для отправки (запоминается как бот по умолчанию)
+            reply_markup: Клавиатура (объект telegram или JSON)
+            parse_mode: Режим разметки
+
+        Returns:
+            ID уведомления в очереди
+        """
+        if bot is not None and self.bot is None:
+            self.bot = bot
+        if reply_markup is not None and hasattr(reply_markup, 'to_json'):
+            reply_markup = reply_markup.to_json()
+
+        with self._cond:
+            self.stats['enqueued'] += 1
+
+            if key is not None:
+                existing_id = self._by_key.get((chat_id, key))
+                existing = self._pending.get(existing_id) if existing_id else None
+                if existing is not None and existing.parse_mode == parse_mode:
+                    existing.items.append(text)
+                    if reply_markup is not None:
+                        existing.reply_markup = reply_markup
+                    self.stats['coalesced'] += 1
+                    self._save()
+                    return existing.notification_id
+
+            notification = Notification(
+                chat_id=chat_id,
+                items=[text],
+                key=key,
+                parse_mode=parse_mode,
+                reply_markup=reply_markup,
+            )
+            if key is not None:
+                notification.not_before = notification.created_at + self.coalesce_delay
+                self._by_key[(chat_id, key)] = notification.notification_id
+            self._pending[notification.notification_id] = notification
+            self._save()
+            self._cond.notify()
+            return notification.notification_id
+
+    # ---------- отправка ----------
+
+    def start(self):
+        """Запустить поток отправки"""
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='notification-outbox', daemon=True)
+            self._thread.start()
+        logger.info("📬 Запущена очередь Telegram уведомлений")
+
+    def stop(self, timeout: float = 5.0):
+        """Остановить поток отправки (недоставленное остается в файле)"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                notification, wait = self._next_due(time.time())
+                if notification is None:
+                    self._cond.wait(timeout=wait)
+                    continue
+                self._take(notification)
+
+            self._deliver(notification)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Отправить все сообщения в текущем потоке, не дожидаясь задержек объединения"""
+        deadline = time.time() + timeout
+        with self._cond:
+            for notification in self._pending.values():
+                notification.not_before = 0.0
+        while time.time() < deadline:
+            with self._cond:
+                if not self._pending:
+                    return True
+                notification, wait = self._next_due(time.time())
+                if notification is not None:
+                    self._take(notification)
+            if notification is None:
+                time.sleep(min(wait, max(0.0, deadline - time.time())))
+            else:
+                self._deliver(notification)
+        return not self._pending
+
+    def _next_due(self, now: float) -> Tuple[Optional[Notification], float]:
+        """Первое сообщение, которое можно отправить сейчас, и сколько ждать иначе"""
+        wait = 1.0
+        if now < self._global_next_at:
+            return None, self._global_next_at - now
+        # Сообщения одного чата уходят в порядке постановки в очередь
+        blocked_chats = set()
+        for notification in self._pending.values():
+            if notification.chat_id in blocked_chats:
+                continue
+            ready_at = max(notification.not_before, self._chat_next_at.get(notification.chat_id, 0.0))
+            if ready_at <= now:
+                return notification, 0.0
+            blocked_chats.add(notification.chat_id)
+            wait = min(wait, ready_at - now)
+        return None, wait
+
+    def _take(self, notification: Notification):
+        self._pending.pop(notification.notification_id, None)
+        if notification.key is not None:
+            group = (notification.chat_id, notification.key)
+            if self._by_key.get(group) == notification.notification_id:
+                del self._by_key[group]
+
+    def _deliver(self, notification: Notification):
+        bot = self.bot
+        now = time.time()
+        with self._cond:
+            self._global_next_at = max(self._global_next_at, now) + self.global_interval
+            self._chat_next_at[notification.chat_id] = now + self.per_chat_interval
+
+        if bot is None:
+            # Восстановленные сообщения ждут, пока кто-нибудь передаст бота
+            notification.not_before = now + 5.0
+            self._requeue(notification)
+            return
+
+        try:
+            self._send(bot, notification)
+        except RetryAfter as e:
+            with self._cond:
+                self.stats['rate_limited'] += 1
+                self._chat_next_at[notification.chat_id] = time.time() + float(e.retry_after)
+            logger.warning(f"⏳ Telegram просит подождать {e.retry_after}с перед отправкой в чат {notification.chat_id}")
+            self._requeue(notification)
+        except ChatMigrated as e:
+            notification.chat_id = e.new_chat_id
+            self._requeue(notification)
+        except (BadRequest, Unauthorized) as e:
+            self._drop(notification, str(e))
+        except (TimedOut, NetworkError) as e:
+            self._retry(notification, delay=2 ** notification.attempts, reason=str(e))
+        except Exception as e:
+            self._retry(notification, delay=2 ** notification.attempts, reason=str(e))
+        else:
+            latency = time.time() - notification.created_at
+            with self._cond:
+                self._latencies.append(latency)
+                self._save()
+
+    def _send(self, bot, notification: Notification):
+        """Отправить сообщение или дополнить недавнюю сводку"""
+        group = (notification.chat_id, notification.key) if notification.key is not None else None
+        now = time.time()
+        with self._cond:
+            for stale in [g for g, s in self._summaries.items() if now - s.sent_at > SUMMARY_EDIT_WINDOW]:
+                del self._summaries[stale]
+            summary = self._summaries.get(group) if group else None
+
+        if summary is not None:
+            try:
+                bot.edit_message_text(
+                    notification.render(prefix=summary.items),
+                    chat_id=notification.chat_id,
+                    message_id=summary.message_id,
+                    parse_mode=notification.parse_mode,
+                    reply_markup=notification.reply_markup,
+                )
+                summary.items = summary.items + notification.items
+                self.stats['edited'] += 1
+                return
+            except BadRequest as e:
+                # Сообщение удалено или не изменилось - отправляем новое
+                logger.debug(f"Не удалось дополнить сводку в чате {notification.chat_id}: {e}")
+
+        message = bot.send_message(
+            notification.chat_id,
+            notification.render(),
+            parse_mode=notification.parse_mode,
+            reply_markup=notification.reply_markup,
+        )
+        self.stats['sent'] += 1
+        if group is not None:
+            message_id = getattr(message, 'message_id', None)
+            if message_id is not None:
+                self._summaries[group] = _SentSummary(message_id, list(notification.items), now)
+
+    def _requeue(self, notification: Notification):
+        with self._cond:
+            self._pending[notification.notification_id] = notification
+            if notification.key is not None:
+                self._by_key.setdefault((notification.chat_id, notification.key), notification.notification_id)
+            self._save()
+            self._cond.notify()
+
+    def _retry(self, notification: Notification, delay: float, reason: str):
+        notification.attempts += 1
+        if notification.attempts >= MAX_ATTEMPTS:
+            self._drop(notification, reason)
+            return
+        self.stats['retries'] += 1
+        notification.not_before = time.time() + delay
+        logger.warning(f"🔁 Повтор отправки уведомления в чат {notification.chat_id} через {delay:.0f}с: {reason}")
+        self._requeue(notification)
+
+    def _drop(self, notification: Notification, reason: str):
+        with self._cond:
+            self.stats['dropped'] += 1
+            self._save()
+        logger.error(f"❌ Уведомление в чат {notification.chat_id} не доставлено ({len(notification.items)} событий): {reason}")
+
+    # ---------- сохранение ----------
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Не удалось загрузить очередь уведомлений из {self.path}: {e}")
+            return
+
+        for item in raw.get('pending', []):
+            notification = Notification(**item)
+            self._pending[notification.notification_id] = notification
+            if notification.key is not None:
+                self._by_key[(notification.chat_id, notification.key)] = notification.notification_id
+        if self._pending:
+            logger.info(f"📬 Восстановлено недоставленных уведомлений: {len(self._pending)}")
+
+    def _save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path) or '.'
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.notification_outbox.', suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'pending': [asdict(n) for n in self._pending.values()]}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"⚠️ Не удалось сохранить очередь уведомлений: {e}")
+
+    # ---------- статистика ----------
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            latencies = sorted(self._latencies)
+            stats = dict(self.stats)
+            stats['pending'] = len(self._pending)
+            stats['pending_events'] = sum(len(n.items) for n in self._pending.values())
+        if latencies:
+            stats['latency_avg'] = round(sum(latencies) / len(latencies), 3)
+            stats['latency_p95'] = round(percentile(latencies, 95), 3)
+            stats['latency_max'] = round(latencies[-1], 3)
+        else:
+            stats['latency_avg'] = stats['latency_p95'] = stats['latency_max'] = 0.0
+        return stats
+
+
+# Глобальный экземпляр
+_outbox: Optional[NotificationOutbox] = None
+_outbox_lock = threading.Lock()
+
+
+def get_notification_outbox() -> NotificationOutbox:
+    """Получить глобальную очередь уведомлений (поток отправки запускается при первом вызове)"""
+    global _outbox
+    if _outbox is None:
+        with _outbox_lock:
+            if _outbox is None:
+                _outbox = NotificationOutbox()
+                _outbox.start()
+    return _outbox
+
+
+def notify(bot, chat_id: int, text: str, key: Optional[str] = None,
+           reply_markup=None, parse_mode: Optional[str] = None) -> Optional[str]:
+    """Поставить уведомление в очередь; без чата ничего не делает"""
+    if not chat_id:
+        return None
+    return get_notification_outbox().enqueue(
+        chat_id, text, key=key, bot=bot, reply_markup=reply_markup, parse_mode=parse_mode
+    )
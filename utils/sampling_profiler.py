@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+Sampling Profiler - Профилировщик по выборкам стеков для работающего процесса
+
+Когда бот начинает тормозить под нагрузкой, перезапуск с подробными логами
+уже не покажет, где теряется время. Профилировщик запускается по запросу
+администратора на N секунд и не требует перезапуска:
+
+- отдельный поток каждые interval секунд снимает стеки всех потоков
+  через sys._current_frames() (сигналы в Python обрабатываются только
+  главным потоком, поэтому выборка идет из потока, а не по SIGPROF)
+- потоки группируются по ролям по имени: очередь публикаций, валидатор,
+  dispatcher и воркеры Telegram, веб-сервер
+- результат - свернутые стеки (формат flamegraph.pl / speedscope),
+  топ функций по собственному и полному времени и топ по ролям потоков
+
+Одновременно выполняется только одно профилирование.
+"""
+
+import os
+import sys
+import time
+import logging
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Интервал выборки (с) и пределы длительности профилирования
+DEFAULT_INTERVAL = 0.01
+MIN_INTERVAL = 0.001
+MAX_DURATION = 120
+
+# Глубина стека, дальше кадры отбрасываются со стороны корня
+MAX_STACK_DEPTH = 64
+
+# Роль потока по подстроке в имени (проверяются по порядку)
+THREAD_ROLES = (
+    ('task_queue', 'task_queue'),
+    ('validator', 'validator'),
+    (':dispatcher', 'telegram_dispatcher'),
+    (':worker', 'telegram_worker'),
+    (':updater', 'telegram_updater'),
+    ('Bot:', 'telegram'),
+    ('web-job', 'jobs'),
+    ('background', 'background'),
+    ('waitress', 'web'),
+    ('werkzeug', 'web'),
+    ('MainThread', 'main'),
+)
+
+
+# Ожидание в этих функциях не нагружает процессор и по умолчанию не учитывается.
+# Вызовы C-функций (time.sleep и т.п.) кадров не имеют и относятся к вызывающей функции
+IDLE_FUNCTIONS = frozenset({
+    'threading:Condition.wait',
+    'threading:Event.wait',
+    'threading:Thread._wait_for_tstate_lock',
+    'queue:Queue.get',
+    'selectors:EpollSelector.select',
+    'selectors:PollSelector.select',
+    'selectors:SelectSelector.select',
+    'socket:socket.accept',
+    'socket:SocketIO.readinto',
+    'ssl:SSLSocket.read',
+    'ssl:SSLSocket.recv_into',
+})
+
+
+class ProfilerBusyError(RuntimeError):
+    """Профилирование уже выполняется"""
+
+
+def thread_role(name: str) -> str:
+    """Роль потока по его имени"""
+    for marker, role in THREAD_ROLES:
+        if marker in name:
+            return role
+    return 'other'
+
+
+_code_labels: Dict[Any, str] = {}
+
+
+def _frame_label(code) -> str:
+    label = _code_labels.get(code)
+    if label is None:
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+        label = f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+        _code_labels[code] = label
+    return label
+
+
+@dataclass
+class ProfileResult:
+    """Результат профилирования"""
+    duration: float
+    interval: float
+    samples: int = 0
+    stacks: Counter = field(default_factory=Counter)
+    thread_names: Dict[str, Set[str]] = field(default_factory=dict)
+
+    def collapsed(self) -> str:
+        """Свернутые стеки: 'роль;корень;...;лист количество' на строку"""
+        return '\n'.join(
+            f"{';'.join(stack)} {count}"
+            for stack, count in sorted(self.stacks.items(), key=lambda item: -item[1])
+        )
+
+    def role_samples(self) -> Dict[str, int]:
+        totals = Counter()
+        for stack, count in self.stacks.items():
+            totals[stack[0]] += count
+        return dict(totals.most_common())
+
+    def top_self(self, limit: int = 20, role: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Функции, в которых поток находился в момент выборки"""
+        totals = Counter()
+        for stack, count in self.stacks.items():
+            if len(stack) > 1 and (role is None or stack[0] == role):
+                totals[stack[-1]] += count
+        return self._top(totals, limit)
+
+    def top_total(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Функции, присутствующие в стеке (с вложенными вызовами)"""
+        totals = Counter()
+        for stack, count in self.stacks.items():
+            for label in set(stack[1:]):
+                totals[label] += count
+        return self._top(totals, limit)
+
+    def _top(self, totals: Counter, limit: int) -> List[Dict[str, Any]]:
+        all_samples = sum(self.stacks.values()) or 1
+        return [
+            {
+                'function': label,
+                'samples': count,
+                'percent': round(count * 100 / all_samples, 1),
+                'seconds': round(count * self.interval, 3),
+            }
+            for label, count in totals.most_common(limit)
+        ]
+
+    def to_dict(self, limit: int = 20, include_collapsed: bool = True) -> Dict[str, Any]:
+        roles = self.role_samples()
+        result = {
+            'duration': round(self.duration, 3),
+            'interval': self.interval,
+            'samples': self.samples,
+            'top_self': self.top_self(limit),
+            'top_total': self.top_total(limit),
+            'threads': {
+                role: {
+                    'samples': count,
+                    'names': sorted(self.thread_names.get(role, ())),
+                    'top_self': self.top_self(5, role=role),
+                }
+                for role, count in roles.items()
+            },
+        }
+        if include_collapsed:
+            result['collapsed'] = self.collapsed()
+        return result
+
+
+class SamplingProfiler:
+    """Выборка стеков всех потоков процесса"""
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, max_depth: int = MAX_STACK_DEPTH,
+                 include_idle: bool = False):
+        self.interval = max(interval, MIN_INTERVAL)
+        self.max_depth = max_depth
+        self.include_idle = include_idle
+
+    def _stack(self, frame) -> List[str]:
+        labels = []
+        while frame is not None and len(labels) < self.max_depth:
+            labels.append(_frame_label(frame.f_code))
+            frame = frame.f_back
+        labels.reverse()
+        return labels
+
+    def sample(self, result: ProfileResult, names: Dict[int, str], skip: Set[int]):
+        """Одна выборка стеков всех потоков"""
+        for ident, frame in sys._current_frames().items():
+            if ident in skip:
+                continue
+            name = names.get(ident)
+            if name is None:
+                names.update((thread.ident, thread.name) for thread in threading.enumerate())
+                name = names.get(ident, f'thread-{ident}')
+            stack = self._stack(frame)
+            if not self.include_idle and stack and stack[-1] in IDLE_FUNCTIONS:
+                continue
+            role = thread_role(name)
+            result.stacks[(role, *stack)] += 1
+            result.thread_names.setdefault(role, set()).add(name)
+        result.samples += 1
+
+    def run(self, duration: float) -> ProfileResult:
+        """Профилировать процесс duration секунд (блокирует вызывающий поток)"""
+        duration = min(max(duration, self.interval), MAX_DURATION)
+        result = ProfileResult(duration=0.0, interval=self.interval)
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        skip = {threading.get_ident()}
+
+        started = time.perf_counter()
+        deadline = started + duration
+        next_sample = started
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            if now < next_sample:
+                time.sleep(next_sample - now)
+            # Идентификаторы завершенных потоков могут переиспользоваться
+            if result.samples % 100 == 0:
+                names.update((thread.ident, thread.name) for thread in threading.enumerate())
+            self.sample(result, names, skip)
+            next_sample += self.interval
+            # Если выборка не успевает за интервалом, не пытаемся нагнать
+            if next_sample < time.perf_counter():
+                next_sample = time.perf_counter() + self.interval
+        result.duration = time.perf_counter() - started
+        return result
+
+
+_profile_lock = threading.Lock()
+_last_result: Optional[ProfileResult] = None
+
+
+def run_profile(duration: float, interval: float = DEFAULT_INTERVAL,
+                include_idle: bool = False) -> ProfileResult:
+    """
+    Профилировать процесс (одновременно только одно профилирование)
+
+    Raises:
+        ProfilerBusyError: если профилирование уже выполняется
+    """
+    global _last_result
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusyError("Профилирование уже выполняется")
+    try:
+        logger.info(f"🔬 Профилирование процесса на {duration:.0f}с (интервал {interval * 1000:.0f}мс)")
+        result = SamplingProfiler(interval, include_idle=include_idle).run(duration)
+        _last_result = result
+        logger.info(f"🔬 Профилирование завершено: {result.samples} выборок, {sum(result.stacks.values())} стеков")
+        return result
+    finally:
+        _profile_lock.release()
+
+
+def is_profiling() -> bool:
+    return _profile_lock.locked()
+
+
+def get_last_profile() -> Optional[ProfileResult]:
+    """Результат последнего профилирования"""
+    return _last_result
@@ -1,7 +1,5 @@
 import logging
-import time
 import threading
-import schedule
 import datetime
 import random
 import os
@@ -13,6 +11,8 @@ from instagram.reels_manager import ReelsManager
 from database.db_manager import get_scheduled_tasks
 from utils.task_queue import add_task_to_queue
 from instagram.client import Client
+from utils.background_runtime import get_background_runtime
+from database.publish_archive import archive_publish_tasks
 
 logger = logging.getLogger(__name__)
 
@@ -87,6 +87,7 @@ def refresh_account_sessions():
     """Периодическое обновление сессий аккаунтов"""
     try:
         logger.info("Запуск обновления сессий аккаунтов")
+        runtime = get_background_runtime()
         accounts = get_all_accounts()
 
         for account in accounts:
@@ -111,7 +112,9 @@ def refresh_account_sessions():
                     logger.warning(f"Не удалось загрузить сессию для аккаунта {account.username}")
 
                 # Добавляем случайную задержку между обновлениями аккаунтов
-                time.sleep(random.uniform(5, 15))
+                if runtime.wait(random.uniform(5, 15)):
+                    logger.info("Обновление сессий прервано остановкой бота")
+                    return
 
             except Exception as e:
                 logger.error(f"Ошибка при обновлении сессии аккаунта {account.username}: {e}")
@@ -120,27 +123,28 @@ def refresh_account_sessions():
     except Exception as e:
         logger.error(f"Ошибка в процессе обновления сессий аккаунтов: {e}")
 
-def start_scheduler():
-    """Запуск планировщика задач"""
+def start_scheduler(bot=None):
+    """Регистрация задач планировщика в фоновой среде (не блокирует)"""
     try:
-        # Получаем бота для отправки уведомлений
-        from telegram.ext import Updater
-        from config import TELEGRAM_TOKEN
+        if bot is None:
+            # Получаем бота для отправки уведомлений
+            from telegram.ext import Updater
+            from config import TELEGRAM_TOKEN
 
-        updater = Updater(TELEGRAM_TOKEN, use_context=True)
-        bot = updater.bot
+            bot = Updater(TELEGRAM_TOKEN, use_context=True).bot
+
+        runtime = get_background_runtime()
 
         # Проверяем запланированные задачи каждую минуту
-        schedule.every(1).minutes.do(check_scheduled_tasks, bot=bot)
+        runtime.every('scheduled_tasks', 60, check_scheduled_tasks, bot=bot, jitter=0)
 
-        # Обновляем сессии аккаунтов каждые 12 часов
-        schedule.every(12).hours.do(refresh_account_sessions)
+        # Обновляем сессии аккаунтов каждые 12 часов. Обход идет с паузами между
+        # аккаунтами, поэтому в пуле долгих задач - scheduled_tasks не ждет его
+        runtime.every('refresh_account_sessions', 12 * 3600, refresh_account_sessions, long_running=True)
 
-        logger.info("Планировщик задач запущен")
+        # Переносим старые завершенные задачи публикации в архив по ночам
+        runtime.cron('publish_archive', '30 3 * * *', archive_publish_tasks, long_running=True)
 
-        # Бесконечный цикл для выполнения запланированных задач
-        while True:
-            schedule.run_pending()
-            time.sleep(10)  # Пауза между проверками
+        logger.info("Планировщик задач запущен")
     except Exception as e:
-        logger.error(f"Ошибка в планировщике задач: {e}")
\ No newline at end of file
+        logger.error(f"Ошибка в планировщике задач: {e}")
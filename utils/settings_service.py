@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+"""
+Settings Service - Типизированные настройки с кешем в памяти
+
+Раньше настройки прогрева читались из JSON-файла на каждый запрос веб-API,
+а обработчики прогрева по интересам перечитывали и переписывали файл
+целиком. Теперь каждый раздел настроек:
+
+- описан схемой (значения по умолчанию и типы), неизвестные ключи сохраняются
+- держится в памяти; изменения файла или строки таблицы settings
+  (mtime / updated_at) замечаются не чаще раза в SETTINGS_CHECK_INTERVAL
+- сохраняется атомарно (временный файл + os.replace)
+- уведомляет подписчиков, поэтому долгоживущим воркерам не нужно
+  перечитывать файлы в своих циклах
+"""
+
+import os
+import copy
+import json
+import time
+import logging
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from config import BASE_DIR
+from utils.event_bus import publish_event
+from utils.background_runtime import get_background_runtime
+
+logger = logging.getLogger(__name__)
+
+# Как часто проверять, не изменился ли источник настроек (секунды)
+SETTINGS_CHECK_INTERVAL = float(os.getenv("SETTINGS_CHECK_INTERVAL", "2.0"))
+
+WARMUP_SETTINGS_FILE = os.path.join(str(BASE_DIR), 'warmup_settings.json')
+INTEREST_WARMUP_SETTINGS_FILE = os.path.join(str(BASE_DIR), 'interest_warmup_settings.json')
+
+
+class SettingsValidationError(ValueError):
+    """Значение настройки не соответствует схеме"""
+
+
+@dataclass(frozen=True)
+class SettingField:
+    """Описание одной настройки; тип по умолчанию берется из default"""
+    default: Any
+    type: Optional[type] = None
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+
+    @property
+    def value_type(self) -> type:
+        return self.type or type(self.default)
+
+    def coerce(self, name: str, value: Any) -> Any:
+        value_type = self.value_type
+        try:
+            if value_type is bool and isinstance(value, str):
+                value = value.strip().lower() in ('1', 'true', 'yes', 'on', 'да')
+            elif not isinstance(value, value_type) or (value_type is int and isinstance(value, bool)):
+                value = value_type(value)
+        except (TypeError, ValueError):
+            raise SettingsValidationError(
+                f"{name}: ожидается {value_type.__name__}, получено {value!r}"
+            )
+        if self.min_value is not None and value < self.min_value:
+            raise SettingsValidationError(f"{name}: значение {value} меньше {self.min_value}")
+        if self.max_value is not None and value > self.max_value:
+            raise SettingsValidationError(f"{name}: значение {value} больше {self.max_value}")
+        return value
+
+
+class SettingsSchema:
+    """Набор типизированных полей раздела настроек"""
+
+    def __init__(self, fields: Dict[str, SettingField]):
+        self.fields = fields
+
+    def defaults(self) -> Dict[str, Any]:
+        return {name: copy.deepcopy(field.default) for name, field in self.fields.items()}
+
+    def validate(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Дополнить значениями по умолчанию и привести типы"""
+        if not isinstance(data, dict):
+            raise SettingsValidationError("Настройки должны быть объектом")
+        result = self.defaults()
+        for name, value in data.items():
+            field = self.fields.get(name)
+            result[name] = field.coerce(name, value) if field else value
+        return result
+
+
+WARMUP_SETTINGS_SCHEMA = SettingsSchema({
+    'minPostsPerDay': SettingField(1, min_value=0),
+    'maxPostsPerDay': SettingField(3, min_value=0),
+    'minStoriesPerDay': SettingField(2, min_value=0),
+    'maxStoriesPerDay': SettingField(5, min_value=0),
+    'minFollowsPerDay': SettingField(10, min_value=0),
+    'maxFollowsPerDay': SettingField(30, min_value=0),
+    'minLikesPerDay': SettingField(20, min_value=0),
+    'maxLikesPerDay': SettingField(50, min_value=0),
+    'minCommentsPerDay': SettingField(5, min_value=0),
+    'maxCommentsPerDay': SettingField(15, min_value=0),
+    'actionDelay': SettingField(30, min_value=0),
+    'sessionDuration': SettingField(120, min_value=0),
+    'nightPauseStart': SettingField('23:00'),
+    'nightPauseEnd': SettingField('07:00'),
+})
+
+
+class JsonFileStore:
+    """Раздел настроек в JSON-файле; версия - (mtime, размер)"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def version(self) -> Optional[Any]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def save(self, data: Dict[str, Any]):
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.settings.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+
+class DbSettingStore:
+    """Раздел настроек в таблице settings (JSON в value); версия - updated_at"""
+
+    def __init__(self, key: str, session_factory: Optional[Callable] = None, description: str = None):
+        self.key = key
+        self.description = description
+        self._session_factory = session_factory
+
+    def _session(self):
+        if self._session_factory is None:
+            from database.db_manager import get_session
+            self._session_factory = get_session
+        return self._session_factory()
+
+    def version(self) -> Optional[Any]:
+        from database.models import Setting
+        session = self._session()
+        try:
+            row = session.query(Setting.id, Setting.updated_at).filter(Setting.key == self.key).first()
+            return (row[0], row[1]) if row else None
+        finally:
+            session.close()
+
+    def load(self) -> Dict[str, Any]:
+        from database.models import Setting
+        session = self._session()
+        try:
+            row = session.query(Setting.value).filter(Setting.key == self.key).first()
+            return json.loads(row[0]) if row and row[0] else {}
+        finally:
+            session.close()
+
+    def save(self, data: Dict[str, Any]):
+        from database.models import Setting
+        session = self._session()
+        try:
+            setting = session.query(Setting).filter(Setting.key == self.key).first()
+            if setting is None:
+                setting = Setting(key=self.key, description=self.description)
+                session.add(setting)
+            setting.value = json.dumps(data, ensure_ascii=False)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+
+class SettingsSection:
+    """Раздел настроек: кеш, проверка изменений источника и подписчики"""
+
+    def __init__(self, name: str, store, schema: Optional[SettingsSchema] = None,
+                 check_interval: float = SETTINGS_CHECK_INTERVAL):
+        self.name = name
+        self.store = store
+        self.schema = schema
+        self.check_interval = check_interval
+
+        self._data: Optional[Dict[str, Any]] = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+        self._subscribers: List[Callable[[Dict[str, Any]], None]] = []
+
+        self.stats = {
+            'reads': 0,
+            'loads': 0,
+            'writes': 0,
+            'external_changes': 0,
+            'errors': 0,
+        }
+
+    def _validate(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        if self.schema:
+            return self.schema.validate(data)
+        if not isinstance(data, dict):
+            raise SettingsValidationError("Настройки должны быть объектом")
+        return data
+
+    def refresh(self, force: bool = False) -> bool:
+        """Перечитать источник, если он изменился; True - данные обновились"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._data is not None and now - self._checked_at < self.check_interval:
+                return False
+            self._checked_at = now
+
+            try:
+                version = self.store.version()
+                if self._data is not None and version == self._version:
+                    return False
+                data = self._validate(self.store.load() if version is not None else {})
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.warning(f"⚠️ Не удалось загрузить настройки {self.name}: {e}")
+                if self._data is None:
+                    self._data = self._validate({}) if self.schema else {}
+                return False
+
+            changed = self._data is not None
+            self._data = data
+            self._version = version
+            self.stats['loads'] += 1
+            if changed:
+                self.stats['external_changes'] += 1
+                snapshot = copy.deepcopy(data)
+
+        if changed:
+            logger.info(f"🔄 Настройки {self.name} изменены извне")
+            self._notify(snapshot)
+        return changed
+
+    def get(self) -> Dict[str, Any]:
+        """Копия текущих настроек (из кеша)"""
+        self.refresh()
+        with self._lock:
+            self.stats['reads'] += 1
+            return copy.deepcopy(self._data)
+
+    def value(self, key: str, default: Any = None) -> Any:
+        self.refresh()
+        with self._lock:
+            self.stats['reads'] += 1
+            return copy.deepcopy(self._data.get(key, default))
+
+    def exists(self) -> bool:
+        """Сохранялись ли настройки хотя бы раз"""
+        self.refresh()
+        with self._lock:
+            return self._version is not None
+
+    def replace(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Заменить раздел целиком и сохранить"""
+        with self._lock:
+            snapshot = self._write_locked(copy.deepcopy(data))
+        self._notify(snapshot)
+        return copy.deepcopy(snapshot)
+
+    def update(self, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Изменить отдельные ключи верхнего уровня и сохранить"""
+        self.refresh(force=True)
+        with self._lock:
+            data = copy.deepcopy(self._data)
+            data.update(copy.deepcopy(changes))
+            snapshot = self._write_locked(data)
+        self._notify(snapshot)
+        return copy.deepcopy(snapshot)
+
+    def _write_locked(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        validated = self._validate(data)
+        self.store.save(validated)
+        self._data = validated
+        self._version = self.store.version()
+        self._checked_at = time.monotonic()
+        self.stats['writes'] += 1
+        return copy.deepcopy(validated)
+
+    def subscribe(self, callback: Callable[[Dict[str, Any]], None]) -> Callable[[], None]:
+        """Подписаться на изменения; возвращает функцию отписки"""
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def _notify(self, data: Dict[str, Any]):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(copy.deepcopy(data))
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"❌ Ошибка подписчика настроек {self.name}: {e}")
+        publish_event('settings', section=self.name)
+
+
+class SettingsService:
+    """Реестр разделов настроек и фоновая проверка внешних изменений"""
+
+    def __init__(self, watch_interval: float = SETTINGS_CHECK_INTERVAL):
+        self.watch_interval = watch_interval
+        self._sections: Dict[str, SettingsSection] = {}
+        self._lock = threading.Lock()
+        self._watching = False
+
+    def register(self, name: str, store, schema: Optional[SettingsSchema] = None) -> SettingsSection:
+        with self._lock:
+            section = self._sections.get(name)
+            if section is None:
+                section = SettingsSection(name, store, schema, check_interval=self.watch_interval)
+                self._sections[name] = section
+            return section
+
+    def section(self, name: str) -> SettingsSection:
+        try:
+            return self._sections[name]
+        except KeyError:
+            raise KeyError(f"Неизвестный раздел настроек: {name}")
+
+    def get(self, name: str) -> Dict[str, Any]:
+        return self.section(name).get()
+
+    def update(self, name: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+        return self.section(name).update(changes)
+
+    def replace(self, name: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        return self.section(name).replace(data)
+
+    def subscribe(self, name: str, callback: Callable[[Dict[str, Any]], None]) -> Callable[[], None]:
+        """
+        Подписаться на изменения раздела
+
+        Изменения файла другим процессом подписчик получит от фоновой
+        проверки, которая регистрируется при первой подписке.
+        """
+        unsubscribe = self.section(name).subscribe(callback)
+        self.start_watcher()
+        return unsubscribe
+
+    def start_watcher(self):
+        with self._lock:
+            if self._watching:
+                return
+            self._watching = True
+        get_background_runtime().every('settings_watcher', self.watch_interval, self._watch_tick, jitter=0)
+
+    def stop_watcher(self):
+        with self._lock:
+            self._watching = False
+        get_background_runtime().cancel('settings_watcher')
+
+    def _watch_tick(self):
+        for section in list(self._sections.values()):
+            if section.has_subscribers:
+                section.refresh()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {name: dict(section.stats) for name, section in self._sections.items()}
+
+
+# Глобальный экземпляр
+_settings_service: Optional[SettingsService] = None
+_settings_service_lock = threading.Lock()
+
+
+def get_settings_service() -> SettingsService:
+    """Получить глобальный сервис настроек"""
+    global _settings_service
+    if _settings_service is None:
+        with _settings_service_lock:
+            if _settings_service is None:
+                service = SettingsService()
+                service.register('warmup', JsonFileStore(WARMUP_SETTINGS_FILE), WARMUP_SETTINGS_SCHEMA)
+                # {telegram user_id: настройки прогрева по интересам}
+                service.register('interest_warmup', JsonFileStore(INTEREST_WARMUP_SETTINGS_FILE))
+                _settings_service = service
+    return _settings_service
@@ -10,7 +10,7 @@ import threading
 import queue
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple, Set
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, Future, CancelledError, TimeoutError as FutureTimeoutError
 from dataclasses import dataclass
 from enum import Enum
 import random
@@ -18,6 +18,8 @@ import random
 from database.db_manager import get_session, get_instagram_accounts, update_instagram_account
 from database.models import InstagramAccount
 from instagram.client import get_instagram_client
+from utils.event_bus import publish_event
+from utils.background_runtime import get_background_runtime
 
 logger = logging.getLogger(__name__)
 
@@ -94,13 +96,16 @@ class SmartValidatorService:
         self.active_checks: Set[int] = set()
         self.active_recoveries: Set[int] = set()
         
+        # Ожидающие результата: одна Future на аккаунт для всех вызывающих (single-flight)
+        self._waiters: Dict[int, Future] = {}
+        self.waiter_stats = {'requests': 0, 'joined': 0, 'resolved': 0}
+        
         # Потоки и исполнители
         self.is_running = False
         self._check_thread = None
         self._recovery_thread = None
-        self._monitor_thread = None
-        self._check_executor = ThreadPoolExecutor(max_workers=max_concurrent_checks)
-        self._recovery_executor = ThreadPoolExecutor(max_workers=max_concurrent_recoveries)
+        self._check_executor = ThreadPoolExecutor(max_workers=max_concurrent_checks, thread_name_prefix='validator_check')
+        self._recovery_executor = ThreadPoolExecutor(max_workers=max_concurrent_recoveries, thread_name_prefix='validator_recovery')
         
         # Блокировки
         self._status_lock = threading.Lock()
@@ -126,58 +131,107 @@ class SmartValidatorService:
         self.is_running = True
         
         # Запускаем потоки
-        self._check_thread = threading.Thread(target=self._check_worker, daemon=True)
-        self._recovery_thread = threading.Thread(target=self._recovery_worker, daemon=True)
-        self._monitor_thread = threading.Thread(target=self._monitor_system, daemon=True)
+        self._check_thread = threading.Thread(target=self._check_worker, name='validator_check_worker', daemon=True)
+        self._recovery_thread = threading.Thread(target=self._recovery_worker, name='validator_recovery_worker', daemon=True)
         
         self._check_thread.start()
         self._recovery_thread.start()
-        self._monitor_thread.start()
         
-        # Запускаем периодическую проверку
-        threading.Thread(target=self._periodic_check, daemon=True).start()
+        # Мониторинг нагрузки и периодическая проверка - задачи фоновой среды
+        runtime = get_background_runtime()
+        runtime.every('validator_monitor', 10, self._monitor_system, initial_delay=0)
+        runtime.every('validator_periodic_check', self.check_interval, self._periodic_check)
         
         logger.info("✅ Умный валидатор запущен")
     
     def stop(self):
         """Остановка сервиса"""
         self.is_running = False
+        runtime = get_background_runtime()
+        runtime.cancel('validator_monitor')
+        runtime.cancel('validator_periodic_check')
+        with self._status_lock:
+            waiters, self._waiters = list(self._waiters.values()), {}
+        for future in waiters:
+            future.cancel()
         self._check_executor.shutdown(wait=True)
         self._recovery_executor.shutdown(wait=True)
         logger.info("🛑 Умный валидатор остановлен")
     
-    def request_validation(self, account_id: int, priority: ValidationPriority = ValidationPriority.NORMAL):
+    def request_validation(self, account_id: int,
+                           priority: ValidationPriority = ValidationPriority.NORMAL) -> Future:
         """
         Запросить валидацию аккаунта
         
         Args:
             account_id: ID аккаунта
             priority: Приоритет проверки
+            
+        Returns:
+            Future с итоговым AccountStatus. Параллельные запросы по одному
+            аккаунту получают одну и ту же Future; она завершается, когда
+            проверка (и восстановление, если оно понадобилось) закончена.
         """
         with self._status_lock:
             task = self.account_statuses.get(account_id)
+            waiter = self._waiters.get(account_id)
+            self.waiter_stats['requests'] += 1
             
-            # Если аккаунт уже проверяется или восстанавливается
+            # Если аккаунт уже проверяется или восстанавливается - присоединяемся
             if task and task.status in [AccountStatus.CHECKING, AccountStatus.RECOVERING]:
                 logger.debug(f"Аккаунт {account_id} уже обрабатывается")
-                return
+                self.waiter_stats['joined'] += 1
+                return self._get_waiter(account_id)
             
             # Если аккаунт в cooldown после неудачного восстановления
             if task and task.status == AccountStatus.COOLDOWN:
                 if task.next_check and datetime.now() < task.next_check:
                     logger.debug(f"Аккаунт {account_id} в cooldown до {task.next_check}")
-                    return
+                    return self._completed(AccountStatus.COOLDOWN)
             
             # Создаем или обновляем задачу
             if not task:
                 task = ValidationTask(account_id=account_id, priority=priority)
                 self.account_statuses[account_id] = task
+            elif waiter and priority.value >= task.priority.value:
+                # Проверка уже в очереди с не меньшим приоритетом
+                self.waiter_stats['joined'] += 1
+                return waiter
             else:
-                task.priority = min(task.priority, priority)  # Повышаем приоритет
+                task.priority = min(task.priority, priority, key=lambda p: p.value)  # Повышаем приоритет
             
             # Добавляем в очередь проверки
             self.check_queue.put((priority.value, account_id))
             logger.debug(f"Добавлена проверка аккаунта {account_id} с приоритетом {priority.name}")
+            return self._get_waiter(account_id)
+    
+    def get_pending_validation(self, account_id: int) -> Optional[Future]:
+        """Future текущей проверки аккаунта (None, если проверка не идет)"""
+        with self._status_lock:
+            return self._waiters.get(account_id)
+    
+    def _get_waiter(self, account_id: int) -> Future:
+        """Future ожидания для аккаунта (вызывается под _status_lock)"""
+        waiter = self._waiters.get(account_id)
+        if waiter is None:
+            waiter = Future()
+            self._waiters[account_id] = waiter
+        return waiter
+    
+    def _resolve(self, account_id: int, status: AccountStatus):
+        """Разбудить всех, кто ждет результат проверки аккаунта"""
+        with self._status_lock:
+            waiter = self._waiters.pop(account_id, None)
+            if waiter is not None:
+                self.waiter_stats['resolved'] += 1
+        if waiter is not None and not waiter.done():
+            waiter.set_result(status)
+    
+    @staticmethod
+    def _completed(status: AccountStatus) -> Future:
+        future = Future()
+        future.set_result(status)
+        return future
     
     def get_account_status(self, account_id: int) -> Optional[AccountStatus]:
         """Получить статус аккаунта"""
@@ -262,6 +316,8 @@ class SmartValidatorService:
     
     def _check_account(self, account_id: int):
         """Проверка одного аккаунта"""
+        # Итоговый статус для ожидающих; None - результат будет после восстановления
+        resolved_status = AccountStatus.INVALID
         try:
             # Обновляем статус
             with self._status_lock:
@@ -274,7 +330,7 @@ class SmartValidatorService:
                         if time_since_check < 7200:  # 🔄 Не чаще раза в 2 часа (было 5 мин)
                             logger.debug(f"Пропускаем проверку @{account_id}, прошло только {time_since_check:.0f} сек")
                             task.status = AccountStatus.VALID  # Предполагаем что все ок
-                            self.active_checks.discard(account_id)
+                            resolved_status = AccountStatus.VALID
                             return
             
             # Добавляем случайную задержку для предотвращения одновременных проверок
@@ -287,6 +343,8 @@ class SmartValidatorService:
             
             if not account:
                 logger.error(f"Аккаунт {account_id} не найден")
+                with self._status_lock:
+                    self.account_statuses[account_id].status = AccountStatus.INVALID
                 return
             
             logger.info(f"🔍 Быстрая проверка @{account.username}")
@@ -302,9 +360,11 @@ class SmartValidatorService:
                 if is_valid:
                     task.status = AccountStatus.VALID
                     task.retry_count = 0
+                    resolved_status = AccountStatus.VALID
                     logger.info(f"✅ @{account.username} валиден")
                 else:
                     task.status = AccountStatus.INVALID
+                    resolved_status = None
                     # Добавляем в очередь восстановления с приоритетом
                     self.recovery_queue.put((task.priority.value, account_id))
                     logger.warning(f"❌ @{account.username} невалиден, добавлен в очередь восстановления")
@@ -317,17 +377,26 @@ class SmartValidatorService:
             )
             
             # Уведомляем об изменении статуса
+            publish_event('validation.status', account_id=account_id,
+                          status=(AccountStatus.VALID if is_valid else AccountStatus.INVALID).value)
             if self.on_status_change:
                 self.on_status_change(account_id, AccountStatus.VALID if is_valid else AccountStatus.INVALID)
             
         except Exception as e:
             logger.error(f"Ошибка при проверке аккаунта {account_id}: {e}")
+            with self._status_lock:
+                task = self.account_statuses.get(account_id)
+                if task and task.status == AccountStatus.CHECKING:
+                    task.status = AccountStatus.INVALID
         finally:
             with self._status_lock:
                 self.active_checks.discard(account_id)
+            if resolved_status is not None:
+                self._resolve(account_id, resolved_status)
     
     def _recover_account(self, account_id: int):
         """Восстановление одного аккаунта"""
+        resolved_status = AccountStatus.FAILED
         try:
             # Обновляем статус
             with self._status_lock:
@@ -366,6 +435,7 @@ class SmartValidatorService:
                         task.status = AccountStatus.COOLDOWN
                         task.next_check = datetime.now() + timedelta(seconds=self.recovery_cooldown)
                         logger.warning(f"⏳ @{account.username} в cooldown до {task.next_check}")
+                resolved_status = task.status
             
             # Обновляем БД
             update_instagram_account(
@@ -376,6 +446,7 @@ class SmartValidatorService:
             )
             
             # Уведомляем об изменении статуса
+            publish_event('validation.status', account_id=account_id, status=task.status.value)
             if self.on_status_change:
                 self.on_status_change(account_id, task.status)
             
@@ -384,6 +455,7 @@ class SmartValidatorService:
         finally:
             with self._status_lock:
                 self.active_recoveries.discard(account_id)
+            self._resolve(account_id, resolved_status)
     
     def _quick_check(self, account: InstagramAccount) -> bool:
         """
@@ -526,71 +598,59 @@ class SmartValidatorService:
             return False
     
     def _monitor_system(self):
-        """Мониторинг нагрузки системы"""
-        while self.is_running:
-            try:
-                import psutil
-                
-                # Получаем информацию о системе
-                cpu_percent = psutil.cpu_percent(interval=1)
-                memory_percent = psutil.virtual_memory().percent
-                
-                with self._load_lock:
-                    self.system_load.cpu_usage = cpu_percent
-                    self.system_load.memory_usage = memory_percent
-                
-                # Логируем если высокая нагрузка
-                if self.system_load.is_high_load:
-                    logger.warning(
-                        f"⚠️ Высокая нагрузка: CPU {cpu_percent}%, RAM {memory_percent}%, "
-                        f"проверок: {len(self.active_checks)}, восстановлений: {len(self.active_recoveries)}"
-                    )
-                
-                time.sleep(10)  # Проверяем каждые 10 секунд
-                
-            except Exception as e:
-                logger.error(f"Ошибка мониторинга: {e}")
-                time.sleep(30)
+        """Замер нагрузки системы (задача фоновой среды, каждые 10 секунд)"""
+        import psutil
+        
+        # Загрузка CPU с прошлого замера, без блокирующего ожидания
+        cpu_percent = psutil.cpu_percent(interval=None)
+        memory_percent = psutil.virtual_memory().percent
+        
+        with self._load_lock:
+            self.system_load.cpu_usage = cpu_percent
+            self.system_load.memory_usage = memory_percent
+        
+        # Логируем если высокая нагрузка
+        if self.system_load.is_high_load:
+            logger.warning(
+                f"⚠️ Высокая нагрузка: CPU {cpu_percent}%, RAM {memory_percent}%, "
+                f"проверок: {len(self.active_checks)}, восстановлений: {len(self.active_recoveries)}"
+            )
     
     def _periodic_check(self):
-        """Периодическая проверка всех аккаунтов"""
-        while self.is_running:
-            try:
-                time.sleep(self.check_interval)
-                
-                if self.system_load.is_high_load:
-                    logger.info("⏸️ Пропускаем периодическую проверку из-за высокой нагрузки")
-                    continue
-                
-                logger.info("🔄 Запуск периодической проверки")
-                
-                # Получаем все аккаунты
-                accounts = get_instagram_accounts()
-                
-                for account in accounts:
-                    # 🔄 НЕ проверяем активные аккаунты слишком часто
-                    if account.is_active and account.status == 'active':
-                        # Для активных аккаунтов - проверка раз в сутки максимум
-                        with self._status_lock:
-                            task = self.account_statuses.get(account.id)
-                            if task and task.last_check:
-                                time_since_check = (datetime.now() - task.last_check).total_seconds()
-                                if time_since_check < 86400:  # 24 часа для активных
-                                    continue
-                    else:
-                        # Проверяем когда последний раз проверяли неактивные
-                        with self._status_lock:
-                            task = self.account_statuses.get(account.id)
-                            if task and task.last_check:
-                                time_since_check = (datetime.now() - task.last_check).total_seconds()
-                                if time_since_check < 10800:  # 3 часа для неактивных
-                                    continue
-                    
-                    # Добавляем в очередь с низким приоритетом
-                    self.request_validation(account.id, ValidationPriority.LOW)
-                
-            except Exception as e:
-                logger.error(f"Ошибка периодической проверки: {e}")
+        """Периодическая проверка всех аккаунтов (задача фоновой среды)"""
+        if not self.is_running:
+            return
+        
+        if self.system_load.is_high_load:
+            logger.info("⏸️ Пропускаем периодическую проверку из-за высокой нагрузки")
+            return
+        
+        logger.info("🔄 Запуск периодической проверки")
+        
+        # Получаем все аккаунты
+        accounts = get_instagram_accounts()
+        
+        for account in accounts:
+            # 🔄 НЕ проверяем активные аккаунты слишком часто
+            if account.is_active and account.status == 'active':
+                # Для активных аккаунтов - проверка раз в сутки максимум
+                with self._status_lock:
+                    task = self.account_statuses.get(account.id)
+                    if task and task.last_check:
+                        time_since_check = (datetime.now() - task.last_check).total_seconds()
+                        if time_since_check < 86400:  # 24 часа для активных
+                            continue
+            else:
+                # Проверяем когда последний раз проверяли неактивные
+                with self._status_lock:
+                    task = self.account_statuses.get(account.id)
+                    if task and task.last_check:
+                        time_since_check = (datetime.now() - task.last_check).total_seconds()
+                        if time_since_check < 10800:  # 3 часа для неактивных
+                            continue
+            
+            # Добавляем в очередь с низким приоритетом
+            self.request_validation(account.id, ValidationPriority.LOW)
     
     def get_stats(self) -> Dict:
         """Получить статистику работы"""
@@ -609,6 +669,8 @@ class SmartValidatorService:
                 'active_recoveries': len(self.active_recoveries),
                 'check_queue_size': self.check_queue.qsize(),
                 'recovery_queue_size': self.recovery_queue.qsize(),
+                'pending_waiters': len(self._waiters),
+                'waiters': dict(self.waiter_stats),
                 'system_load': {
                     'cpu': self.system_load.cpu_usage,
                     'memory': self.system_load.memory_usage,
@@ -629,40 +691,71 @@ def get_smart_validator() -> SmartValidatorService:
                 _smart_validator_instance = SmartValidatorService()
     return _smart_validator_instance
 
-def validate_before_use(account_id: int, priority: ValidationPriority = ValidationPriority.HIGH) -> bool:
+# Сколько ждать уже идущую проверку и запрошенную критическую проверку
+IN_PROGRESS_WAIT_SECONDS = 10
+CRITICAL_WAIT_SECONDS = 30
+
+
+def validate_async(account_id: int, priority: ValidationPriority = ValidationPriority.HIGH) -> Future:
     """
-    Проверить аккаунт перед использованием
+    Запросить готовность аккаунта без блокировки
     
     Returns:
-        True если аккаунт валиден и готов к использованию
+        Future[bool]: завершена сразу, если ответ известен (VALID / FAILED / COOLDOWN),
+        иначе - по окончании проверки, общей для всех вызывающих
     """
     validator = get_smart_validator()
-    
-    # Проверяем текущий статус
     status = validator.get_account_status(account_id)
     
-    # Если валиден - используем
+    result = Future()
     if status == AccountStatus.VALID:
-        return True
+        result.set_result(True)
+        return result
     
-    # Если проверяется или восстанавливается - ждем немного
-    if status in [AccountStatus.CHECKING, AccountStatus.RECOVERING]:
-        for _ in range(10):  # Ждем до 10 секунд
-            time.sleep(1)
-            status = validator.get_account_status(account_id)
-            if status == AccountStatus.VALID:
-                return True
-            elif status not in [AccountStatus.CHECKING, AccountStatus.RECOVERING]:
-                break
+    if status in [AccountStatus.CHECKING, AccountStatus.RECOVERING, None, AccountStatus.INVALID]:
+        status_future = validator.request_validation(account_id, priority)
+    else:
+        result.set_result(False)
+        return result
+    
+    def _forward(future: Future):
+        if future.cancelled():
+            result.cancel()
+        else:
+            result.set_result(future.result() == AccountStatus.VALID)
+    
+    status_future.add_done_callback(_forward)
+    return result
+
+
+def validate_before_use(account_id: int, priority: ValidationPriority = ValidationPriority.HIGH,
+                        timeout: Optional[float] = None) -> bool:
+    """
+    Проверить аккаунт перед использованием
+    
+    Args:
+        account_id: ID аккаунта
+        priority: Приоритет проверки
+        timeout: Сколько ждать результат (по умолчанию 10 сек для уже идущей проверки,
+                 30 сек для новой критической; некритическая новая проверка не ждется)
     
-    # Если невалиден или неизвестен - запрашиваем проверку
-    if status in [None, AccountStatus.INVALID]:
-        validator.request_validation(account_id, priority)
-        # Для критических задач ждем результат
+    Returns:
+        True если аккаунт валиден и готов к использованию
+    """
+    validator = get_smart_validator()
+    in_progress = validator.get_account_status(account_id) in [AccountStatus.CHECKING, AccountStatus.RECOVERING]
+    
+    future = validate_async(account_id, priority)
+    if timeout is None:
         if priority == ValidationPriority.CRITICAL:
-            for _ in range(30):  # Ждем до 30 секунд
-                time.sleep(1)
-                if validator.is_account_valid(account_id):
-                    return True
+            timeout = CRITICAL_WAIT_SECONDS
+        elif in_progress:
+            timeout = IN_PROGRESS_WAIT_SECONDS
+        else:
+            timeout = 0
     
-    return False 
\ No newline at end of file
+    # Ожидающий поток спит на условии Future и просыпается сразу по окончании проверки
+    try:
+        return future.result(timeout=timeout)
+    except (FutureTimeoutError, CancelledError):
+        return False
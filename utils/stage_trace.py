@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Stage Trace - Трассировка этапов публикации по задачам
+
+Общий таймер задачи (task_queue_task_seconds) не показывает, куда ушло
+время: проверку аккаунта, задержку, уникализацию, логин, загрузку или
+configure. Здесь у каждой задачи есть легкая трасса:
+
+- process_task отмечает последовательные этапы через mark_stage()
+- менеджеры публикации открывают вложенные интервалы trace_stage()
+  и @traced (логин, загрузка, configure)
+- трасса текущей задачи живет в thread-local, поэтому без активной
+  трассы все вызовы ничего не делают
+- задача, отложенная до проверки аккаунта, продолжает ту же трассу
+  после возврата в очередь (интервал validation_wait)
+
+Готовая трасса сохраняется в options задачи в компактном виде
+{'v': 1, 'type': ..., 'total_ms': ..., 'spans': [[имя, старт_мс, мс, глубина], ...]},
+а aggregate_traces() считает по ним перцентили этапов по типам задач.
+"""
+
+import time
+import logging
+import threading
+import functools
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from utils.metrics import get_metrics_registry, percentile
+
+logger = logging.getLogger(__name__)
+
+TRACE_VERSION = 1
+
+# Сколько отложенных трасс хранить и как долго (с) ждать возврата задачи
+MAX_SUSPENDED_TRACES = 1000
+SUSPENDED_TRACE_TTL = 3600
+
+_stage_seconds = get_metrics_registry().histogram(
+    'publish_stage_seconds', 'Время этапов публикации',
+    labelnames=('stage', 'task_type'),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+)
+
+_local = threading.local()
+_suspended: Dict[Any, Tuple[float, 'StageTrace']] = {}
+_suspended_lock = threading.Lock()
+
+
+class StageTrace:
+    """Интервалы этапов одной задачи"""
+
+    def __init__(self, task_id, task_type: Optional[str] = None):
+        self.task_id = task_id
+        self.task_type = task_type
+        self.started = time.perf_counter()
+        self.spans: List[List[Any]] = []
+        self._stage: Optional[Tuple[str, float]] = None
+        self._depth = 0
+        self.ended: Optional[float] = None
+
+    def _offset_ms(self, moment: float) -> float:
+        return round((moment - self.started) * 1000, 1)
+
+    def add_span(self, name: str, start: float, end: float, depth: int = 0):
+        """Записать готовый интервал (perf_counter начала и конца)"""
+        self.spans.append([name, self._offset_ms(start), round((end - start) * 1000, 1), depth])
+
+    def stage(self, name: Optional[str]):
+        """Завершить текущий этап и начать следующий (None - только завершить)"""
+        now = time.perf_counter()
+        if self._stage is not None:
+            stage_name, stage_start = self._stage
+            self.add_span(stage_name, stage_start, now)
+        self._stage = (name, now) if name else None
+
+    @contextmanager
+    def span(self, name: str):
+        """Вложенный интервал внутри текущего этапа"""
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add_span(name, start, time.perf_counter(), self._depth)
+            self._depth -= 1
+
+    def finish(self) -> Dict[str, Any]:
+        """Закрыть последний этап, записать гистограммы и вернуть компактную трассу"""
+        self.stage(None)
+        if self.ended is None:
+            self.ended = time.perf_counter()
+            task_type = self.task_type or 'unknown'
+            for name, seconds in self.durations().items():
+                _stage_seconds.labels(stage=name, task_type=task_type).observe(seconds)
+        return self.to_compact()
+
+    def durations(self) -> Dict[str, float]:
+        """Суммарное время (с) по имени этапа: повторные интервалы складываются"""
+        totals: Dict[str, float] = {}
+        for name, _, duration_ms, _ in self.spans:
+            totals[name] = totals.get(name, 0.0) + duration_ms / 1000
+        return totals
+
+    def to_compact(self) -> Dict[str, Any]:
+        return {
+            'v': TRACE_VERSION,
+            'type': self.task_type,
+            'total_ms': self._offset_ms(self.ended or time.perf_counter()),
+            'spans': [list(span) for span in self.spans],
+        }
+
+
+def get_current_trace() -> Optional[StageTrace]:
+    """Трасса задачи, выполняемой в текущем потоке"""
+    return getattr(_local, 'trace', None)
+
+
+def start_trace(task_id, task_type: Optional[str] = None) -> StageTrace:
+    """Начать трассу задачи в текущем потоке (или продолжить отложенную)"""
+    with _suspended_lock:
+        suspended = _suspended.pop(task_id, None)
+    if suspended is not None:
+        suspended_at, trace = suspended
+        trace.add_span('validation_wait', suspended_at, time.perf_counter())
+    else:
+        trace = StageTrace(task_id, task_type)
+    _local.trace = trace
+    return trace
+
+
+def suspend_trace(trace: StageTrace):
+    """Отложить трассу до возврата задачи в очередь"""
+    trace.stage(None)
+    now = time.perf_counter()
+    with _suspended_lock:
+        expired = [key for key, (moment, _) in _suspended.items() if now - moment > SUSPENDED_TRACE_TTL]
+        for key in expired:
+            _suspended.pop(key, None)
+        if len(_suspended) >= MAX_SUSPENDED_TRACES:
+            _suspended.pop(next(iter(_suspended)), None)
+        _suspended[trace.task_id] = (now, trace)
+    _local.trace = None
+
+
+def finish_trace(trace: StageTrace) -> Dict[str, Any]:
+    """Завершить трассу и отвязать ее от потока"""
+    if get_current_trace() is trace:
+        _local.trace = None
+    return trace.finish()
+
+
+def set_trace_type(task_type):
+    """Указать тип задачи, когда он стал известен"""
+    trace = get_current_trace()
+    if trace is not None:
+        trace.task_type = getattr(task_type, 'value', task_type)
+
+
+def mark_stage(name: Optional[str]):
+    """Последовательный этап текущей задачи (без трассы ничего не делает)"""
+    trace = get_current_trace()
+    if trace is not None:
+        trace.stage(name)
+
+
+@contextmanager
+def trace_stage(name: str):
+    """Вложенный интервал текущей задачи (без трассы ничего не делает)"""
+    trace = get_current_trace()
+    if trace is None:
+        yield None
+        return
+    with trace.span(name):
+        yield trace
+
+
+def traced(name: str):
+    """Декоратор: вызов функции записывается вложенным интервалом"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if get_current_trace() is None:
+                return func(*args, **kwargs)
+            with trace_stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def aggregate_traces(traces: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Перцентили этапов по типам задач
+
+    Returns:
+        {тип: {этап: {'count', 'avg_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'}}},
+        этап 'total' - полное время задачи
+    """
+    samples: Dict[str, Dict[str, List[float]]] = {}
+    for trace in traces:
+        if not isinstance(trace, dict) or trace.get('v') != TRACE_VERSION:
+            continue
+        by_stage = samples.setdefault(trace.get('type') or 'unknown', {})
+        totals: Dict[str, float] = {}
+        for name, _, duration_ms, _ in trace.get('spans', []):
+            totals[name] = totals.get(name, 0.0) + duration_ms
+        totals['total'] = trace.get('total_ms', 0.0)
+        for name, value in totals.items():
+            by_stage.setdefault(name, []).append(value)
+
+    result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for task_type, by_stage in samples.items():
+        result[task_type] = {}
+        for name, values in by_stage.items():
+            values.sort()
+            result[task_type][name] = {
+                'count': len(values),
+                'avg_ms': round(sum(values) / len(values), 1),
+                'p50_ms': percentile(values, 50),
+                'p95_ms': percentile(values, 95),
+                'p99_ms': percentile(values, 99),
+                'max_ms': values[-1],
+            }
+    return result
+
+
+def get_suspended_count() -> int:
+    with _suspended_lock:
+        return len(_suspended)
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Startup Profile - Профиль времени запуска бота и веб-API
+
+- Разбор вывода `python -X importtime` в ранжированную таблицу
+- Замер фаз запуска и параллельная инициализация независимых подсистем
+
+    python -m utils.startup_profile main --top 30
+    python -m utils.startup_profile web_api
+"""
+
+import os
+import re
+import sys
+import time
+import logging
+import argparse
+import threading
+import subprocess
+import concurrent.futures
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Бюджет времени импорта главных модулей (секунды), проверяется тестом
+STARTUP_IMPORT_BUDGET = float(os.getenv("STARTUP_IMPORT_BUDGET", "4.0"))
+
+# Тяжелые зависимости, которые не должны загружаться при запуске
+LAZY_HEAVY_MODULES = ('cv2', 'numpy', 'moviepy', 'pandas', 'aiohttp')
+
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+@dataclass
+class ImportRecord:
+    """Одна строка вывода -X importtime (время в микросекундах)"""
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+    @property
+    def package(self) -> str:
+        return self.module.split('.')[0]
+
+
+def parse_importtime(text: str) -> List[ImportRecord]:
+    """Разобрать вывод `python -X importtime`"""
+    records = []
+    for line in text.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            records.append(ImportRecord(
+                module=match.group(4),
+                self_us=int(match.group(1)),
+                cumulative_us=int(match.group(2)),
+                depth=len(match.group(3)) // 2,
+            ))
+    return records
+
+
+def aggregate_by_package(records: List[ImportRecord]) -> List[Tuple[str, int, int]]:
+    """Собственное время по пакетам верхнего уровня: [(пакет, мкс, модулей)]"""
+    packages: Dict[str, List[int]] = {}
+    for record in records:
+        item = packages.setdefault(record.package, [0, 0])
+        item[0] += record.self_us
+        item[1] += 1
+    return sorted(((name, us, count) for name, (us, count) in packages.items()),
+                  key=lambda item: -item[1])
+
+
+def format_import_report(records: List[ImportRecord], top: int = 25) -> str:
+    """Таблица: самые дорогие модули (с вложенными) и пакеты (собственное время)"""
+    root_total = sum(r.cumulative_us for r in records if r.depth == 0)
+
+    lines = [f"⏱️ Импорт: {root_total / 1e6:.2f}с, модулей: {len(records)}", ""]
+    lines.append(f"{'Модуль':<52} {'с вложенными':>12} {'собственное':>12}")
+    for record in sorted(records, key=lambda r: -r.cumulative_us)[:top]:
+        name = '  ' * min(record.depth, 6) + record.module
+        lines.append(f"{name[:52]:<52} {record.cumulative_us / 1000:>10.1f}мс {record.self_us / 1000:>10.1f}мс")
+
+    lines += ["", f"{'Пакет':<32} {'собственное':>12} {'доля':>7} {'модулей':>8}"]
+    for name, us, count in aggregate_by_package(records)[:top]:
+        share = us / root_total * 100 if root_total else 0.0
+        lines.append(f"{name[:32]:<32} {us / 1000:>10.1f}мс {share:>6.1f}% {count:>8}")
+    return '\n'.join(lines)
+
+
+def profile_imports(module: str = 'main', cwd: Optional[str] = None,
+                    python: str = sys.executable, timeout: float = 300) -> List[ImportRecord]:
+    """Импортировать модуль в отдельном процессе с -X importtime"""
+    result = subprocess.run(
+        [python, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=cwd, capture_output=True, text=True, timeout=timeout
+    )
+    if result.returncode != 0:
+        tail = result.stderr.strip().splitlines()[-1:] or ['']
+        raise RuntimeError(f"Импорт {module} завершился с ошибкой: {tail[0]}")
+    return parse_importtime(result.stderr)
+
+
+class StartupTimer:
+    """Фазы запуска процесса и параллельная инициализация подсистем"""
+
+    def __init__(self, started: Optional[float] = None):
+        """
+        Args:
+            started: time.perf_counter() в начале запуска (до тяжелых импортов)
+        """
+        self.started = started if started is not None else time.perf_counter()
+        self.phases: List[Tuple[str, float, Optional[str]]] = []
+        self.milestones: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @contextmanager
+    def phase(self, name: str):
+        """Замерить фазу; ошибка пробрасывается дальше"""
+        started = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            with self._lock:
+                self.phases.append((name, time.perf_counter() - started, error))
+
+    def mark(self, name: str) -> float:
+        """Отметить момент запуска (секунды с начала)"""
+        elapsed = self.elapsed
+        with self._lock:
+            self.milestones[name] = elapsed
+        return elapsed
+
+    def run_parallel(self, tasks: Dict[str, Callable[[], object]],
+                     max_workers: Optional[int] = None) -> Dict[str, Optional[Exception]]:
+        """
+        Инициализировать независимые подсистемы параллельно
+
+        Ошибка одной подсистемы логируется и не мешает остальным.
+
+        Returns:
+            {имя: исключение или None}
+        """
+        def run(name, fn):
+            try:
+                with self.phase(name):
+                    fn()
+                return None
+            except Exception as e:
+                logger.error(f"❌ Ошибка инициализации {name}: {e}")
+                return e
+
+        errors: Dict[str, Optional[Exception]] = {}
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers or len(tasks) or 1, thread_name_prefix='startup'
+        ) as executor:
+            futures = {name: executor.submit(run, name, fn) for name, fn in tasks.items()}
+            for name, future in futures.items():
+                errors[name] = future.result()
+        return errors
+
+    def run_parallel_async(self, tasks: Dict[str, Callable[[], object]],
+                           on_done: Optional[Callable[[Dict[str, Optional[Exception]]], None]] = None
+                           ) -> threading.Thread:
+        """run_parallel в фоновом потоке: вызывающий код не ждет прогрева подсистем"""
+        def run():
+            errors = self.run_parallel(tasks)
+            self.mark('subsystems_ready')
+            if on_done:
+                on_done(errors)
+
+        thread = threading.Thread(target=run, name='startup-init', daemon=True)
+        thread.start()
+        return thread
+
+    def report(self) -> str:
+        with self._lock:
+            phases = list(self.phases)
+            milestones = dict(self.milestones)
+
+        lines = ["⏱️ Запуск:"]
+        for name, elapsed in sorted(milestones.items(), key=lambda item: item[1]):
+            lines.append(f"  {name}: {elapsed:.2f}с от старта")
+        for name, duration, error in sorted(phases, key=lambda item: -item[1]):
+            status = f" ❌ {error}" if error else ""
+            lines.append(f"  • {name}: {duration * 1000:.0f}мс{status}")
+        return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Профиль времени импорта')
+    parser.add_argument('module', nargs='?', default='main', help='Модуль для импорта (main, web_api)')
+    parser.add_argument('--top', type=int, default=25)
+    args = parser.parse_args()
+
+    records = profile_imports(args.module)
+    print(format_import_report(records, top=args.top))
+
+    loaded = {r.module for r in records}
+    heavy = [name for name in LAZY_HEAVY_MODULES if name in loaded]
+    if heavy:
+        print(f"\n⚠️ При импорте {args.module} загружаются тяжелые модули: {', '.join(heavy)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -20,6 +20,8 @@ from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from enum import Enum
 
+from utils.metrics import get_metrics_registry
+
 logger = logging.getLogger(__name__)
 
 class SamplingStrategy(Enum):
@@ -375,6 +377,16 @@ def init_structured_logging(configs: Optional[Dict[str, SamplingConfig]] = None)
     
     logger.info("📝 Structured Logging инициализировано с несколькими логгерами")
 
+def _collect_metrics(output):
+    """Счетчики сэмплинга всех логгеров для реестра метрик"""
+    for name, logger_instance in list(_loggers.items()):
+        stats = logger_instance.stats
+        output.counter('structured_logs', stats.total_logs, 'Логов передано в логгер', logger=name)
+        output.counter('structured_logs_sampled', stats.sampled_logs, 'Логов записано', logger=name)
+        output.counter('structured_logs_discarded', stats.discarded_logs, 'Логов отброшено сэмплингом', logger=name)
+
+get_metrics_registry().register_collector('structured_logger', _collect_metrics)
+
 # Автоматическая инициализация с умными настройками
 init_structured_logging()
 
@@ -11,6 +11,9 @@ import threading
 from typing import Dict, Tuple, List
 from dataclasses import dataclass
 
+from utils.metrics import get_metrics_registry
+from utils.background_runtime import get_background_runtime
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -49,7 +52,7 @@ class SystemResourceMonitor:
     
     def __init__(self, hardware_profile: str = "macbook"):
         self.is_monitoring = False
-        self.monitor_thread = None
+        self.last_status_log = 0.0
         self.current_metrics = None
         self.metrics_lock = threading.Lock()
         self.hardware_profile = hardware_profile
@@ -554,47 +557,37 @@ class SystemResourceMonitor:
         }
     
     def start_monitoring(self, interval: float = 10.0):
-        """Запускает мониторинг в отдельном потоке"""
+        """Запускает периодический сбор метрик в фоновой среде"""
         if self.is_monitoring:
             return
         
         self.is_monitoring = True
-        self.monitor_thread = threading.Thread(
-            target=self._monitor_loop,
-            args=(interval,),
-            daemon=True
-        )
-        self.monitor_thread.start()
+        get_background_runtime().every('system_monitor', interval, self._monitor_tick, initial_delay=0)
         logger.info(f"🖥️ Запущен мониторинг системных ресурсов (профиль: {self.hardware_profile})")
     
     def stop_monitoring(self):
         """Останавливает мониторинг"""
         self.is_monitoring = False
-        if self.monitor_thread:
-            self.monitor_thread.join(timeout=5.0)
+        get_background_runtime().cancel('system_monitor')
         logger.info("🖥️ Мониторинг системных ресурсов остановлен")
     
-    def _monitor_loop(self, interval: float):
-        """Основной цикл мониторинга"""
-        while self.is_monitoring:
-            try:
-                metrics = self.get_system_metrics()
-                if metrics:
-                    with self.metrics_lock:
-                        self.current_metrics = metrics
-                    
-                    # Логируем каждые 60 секунд
-                    if int(time.time()) % 60 == 0:
-                        status = self.get_system_status()
-                        logger.info(f"🖥️ {status['message']} | "
-                                  f"CPU: {status['metrics']['cpu']} | "
-                                  f"RAM: {status['metrics']['memory']} | "
-                                  f"Temp: {status['metrics']['temperature']}")
-                
-                time.sleep(interval)
-            except Exception as e:
-                logger.error(f"Ошибка в цикле мониторинга: {e}")
-                time.sleep(interval)
+    def _monitor_tick(self):
+        """Один сбор метрик"""
+        metrics = self.get_system_metrics()
+        if not metrics:
+            return
+        with self.metrics_lock:
+            self.current_metrics = metrics
+        
+        # Логируем раз в 60 секунд
+        now = time.time()
+        if now - self.last_status_log >= 60:
+            self.last_status_log = now
+            status = self.get_system_status()
+            logger.info(f"🖥️ {status['message']} | "
+                      f"CPU: {status['metrics']['cpu']} | "
+                      f"RAM: {status['metrics']['memory']} | "
+                      f"Temp: {status['metrics']['temperature']}")
 
 # Глобальный экземпляр монитора
 system_monitor = SystemResourceMonitor()
@@ -693,4 +686,20 @@ def force_adaptive_protection(reduction_level: int):
     """Принудительно устанавливает уровень адаптивной защиты"""
     system_monitor.adaptive_reduction_level = max(0, min(100, reduction_level))
     system_monitor.last_adaptation_time = time.time()
-    logger.info(f"⚡ Принудительно установлен уровень адаптивной защиты: {reduction_level}%") 
\ No newline at end of file
+    logger.info(f"⚡ Принудительно установлен уровень адаптивной защиты: {reduction_level}%")
+
+def _collect_metrics(output):
+    """Последние снятые метрики системы (без нового замера CPU)"""
+    with system_monitor.metrics_lock:
+        metrics = system_monitor.current_metrics
+    output.gauge('system_adaptive_reduction_percent', system_monitor.adaptive_reduction_level,
+                 'Уровень адаптивного снижения нагрузки')
+    if metrics is None:
+        return
+    output.gauge('system_cpu_percent', metrics.cpu_percent, 'Загрузка CPU')
+    output.gauge('system_memory_percent', metrics.memory_percent, 'Использование RAM')
+    output.gauge('system_load_average', metrics.load_average, 'Load average за 1 минуту')
+    if metrics.temperature > 0:
+        output.gauge('system_temperature_celsius', metrics.temperature, 'Температура CPU')
+
+get_metrics_registry().register_collector('system_monitor', _collect_metrics)
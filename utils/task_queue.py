@@ -10,7 +10,7 @@ import json
 import os
 from typing import List
 
-from database.db_manager import update_publish_task_status, get_publish_task, update_task_status
+from database.db_manager import update_publish_task_status, get_publish_task, update_task_status, update_publish_task_options
 from database.models import TaskStatus, TaskType
 from instagram.post_manager import PostManager
 from instagram.reels_manager import ReelsManager
@@ -18,6 +18,12 @@ from instagram.story_manager import StoryManager
 from instagram.client_patch import add_account_to_cache
 from utils.content_uniquifier import uniquify_for_publication
 from utils.system_monitor import get_adaptive_limits  # Добавляем импорт крутой системы мониторинга
+from utils.batch_tracker import get_batch_tracker
+from utils.notification_outbox import notify, get_notification_outbox
+from utils.event_bus import publish_event
+from utils.metrics import get_metrics_registry
+from utils.background_runtime import get_background_runtime
+from utils.stage_trace import start_trace, suspend_trace, finish_trace, mark_stage, set_trace_type
 
 logger = logging.getLogger(__name__)
 
@@ -30,10 +36,64 @@ task_results = {}
 # Пул потоков для параллельного выполнения задач
 # Теперь количество потоков будет динамически адаптироваться под нагрузку
 MAX_WORKERS = 50  # Максимальное количество потоков (при минимальной нагрузке)
-executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS)
+executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='task_queue')
+
+# Ключ объединения уведомлений о результатах публикаций в одном чате
+PUBLISH_RESULT_KEY = 'publish_result'
+
+# Задачи, ожидающие результата валидации аккаунта вне пула потоков: task_id -> дедлайн
+VALIDATION_WAIT_TIMEOUT = 30
+_validation_deadlines = {}
+_validation_lock = threading.Lock()
+
+# Время обработки задачи по исходу: success, failed, deferred (ждет валидации), error
+_task_seconds = get_metrics_registry().histogram(
+    'task_queue_task_seconds', 'Время обработки задачи публикации', labelnames=('outcome',)
+)
+
+def set_task_status(task_id, status, **kwargs):
+    """Обновляет статус задачи в БД и публикует событие для веб-дашборда"""
+    result = update_publish_task_status(task_id, status, **kwargs)
+    publish_event(
+        'task.status',
+        task_id=task_id,
+        status=status.value if hasattr(status, 'value') else status,
+        error_message=kwargs.get('error_message'),
+        media_id=kwargs.get('media_id')
+    )
+    return result
+
+def _defer_until_validated(task_id, chat_id, bot, validation):
+    """
+    Освобождает поток пула, пока идет проверка аккаунта: задача вернется
+    в очередь, когда Future валидации завершится или истечет таймаут.
+    
+    Returns:
+        False, если таймаут ожидания уже истек
+    """
+    with _validation_lock:
+        deadline = _validation_deadlines.setdefault(task_id, time.time() + VALIDATION_WAIT_TIMEOUT)
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        with _validation_lock:
+            _validation_deadlines.pop(task_id, None)
+        return False
 
-# Глобальная переменная для хранения активных пакетов задач
-active_task_batches = {}
+    requeue_lock = threading.Lock()
+    state = {'requeued': False}
+    timer_name = f'task_queue_validation_{task_id}'
+
+    def requeue(_=None):
+        with requeue_lock:
+            if state['requeued']:
+                return
+            state['requeued'] = True
+        get_background_runtime().cancel(timer_name)
+        task_queue.put((task_id, chat_id, bot))
+
+    get_background_runtime().once(timer_name, remaining, requeue)
+    validation.add_done_callback(requeue)
+    return True
 
 def get_task_adaptive_limits():
     """Получает адаптивные лимиты на основе крутой системной нагрузки"""
@@ -86,6 +146,7 @@ def process_task(task_id, chat_id, bot):
     """Обрабатывает задачу публикации"""
     try:
         # Проверяем перегрузку системы перед началом задачи
+        mark_stage('overload_check')
         if check_system_overload():
             logger.warning(f"⏸️ Задача #{task_id} отложена из-за критической перегрузки системы")
             time.sleep(30)  # Ждем 30 секунд при перегрузке (было 60)
@@ -93,14 +154,17 @@ def process_task(task_id, chat_id, bot):
             # Повторно проверяем после ожидания
             if check_system_overload():
                 logger.error(f"🚨 Система все еще критически перегружена, отменяем задачу #{task_id}")
-                update_publish_task_status(task_id, TaskStatus.FAILED, error_message="Критическая перегрузка системы")
+                set_task_status(task_id, TaskStatus.FAILED, error_message="Критическая перегрузка системы")
+                check_and_send_batch_report(task_id, chat_id, bot, success=False)
                 return False
         
         # Получаем задачу из БД
+        mark_stage('load_task')
         task_data = get_publish_task(task_id)
         if not task_data:
             logger.error(f"Задача #{task_id} не найдена")
             return False
+        set_trace_type(task_data['task_type'])
 
         # Если chat_id не передан, используем user_id из задачи
         if not chat_id and task_data.get('user_id'):
@@ -110,26 +174,35 @@ def process_task(task_id, chat_id, bot):
         logger.info(f"🚀 Начинаю обработку задачи #{task_id} для аккаунта {task_data['account_username']}")
         
         # Проверяем валидность аккаунта перед использованием
-        from utils.smart_validator_service import validate_before_use, ValidationPriority
+        from utils.smart_validator_service import validate_async, ValidationPriority
         
         logger.info(f"🔍 Проверка валидности аккаунта @{task_data['account_username']} перед публикацией")
         
-        if not validate_before_use(task_data['account_id'], ValidationPriority.CRITICAL):
+        mark_stage('validation')
+        validation = validate_async(task_data['account_id'], ValidationPriority.CRITICAL)
+        if not validation.done() and _defer_until_validated(task_id, chat_id, bot, validation):
+            logger.info(f"⏳ Задача #{task_id} ждет проверки аккаунта @{task_data['account_username']} вне пула потоков")
+            return None
+        
+        with _validation_lock:
+            _validation_deadlines.pop(task_id, None)
+        
+        is_valid = validation.done() and not validation.cancelled() and validation.result()
+        if not is_valid:
             logger.warning(f"❌ Аккаунт @{task_data['account_username']} невалиден или не готов")
-            update_publish_task_status(task_id, TaskStatus.FAILED, error_message="Аккаунт невалиден или требует восстановления")
+            set_task_status(task_id, TaskStatus.FAILED, error_message="Аккаунт невалиден или требует восстановления")
             
             # Отправляем уведомление об ошибке
             if bot and chat_id:
-                try:
-                    bot.send_message(
-                        chat_id,
-                        f"❌ Не удалось выполнить публикацию!\n"
-                        f"Аккаунт: @{task_data['account_username']}\n"
-                        f"Причина: Аккаунт невалиден или требует восстановления"
-                    )
-                except:
-                    pass
+                notify(
+                    bot, chat_id,
+                    f"❌ Не удалось выполнить публикацию!\n"
+                    f"Аккаунт: @{task_data['account_username']}\n"
+                    f"Причина: Аккаунт невалиден или требует восстановления",
+                    key=PUBLISH_RESULT_KEY
+                )
             
+            check_and_send_batch_report(task_id, chat_id, bot, success=False)
             return False
         
         logger.info(f"✅ Аккаунт @{task_data['account_username']} валиден, продолжаем публикацию")
@@ -143,7 +216,7 @@ def process_task(task_id, chat_id, bot):
         )
         
         # Обновляем статус задачи
-        update_publish_task_status(task_id, TaskStatus.PROCESSING)
+        set_task_status(task_id, TaskStatus.PROCESSING)
 
         # Получаем адаптивную задержку на основе крутой системы мониторинга
         _, adaptive_delay, system_limits = get_task_adaptive_limits()
@@ -153,7 +226,9 @@ def process_task(task_id, chat_id, bot):
         total_delay = base_delay + (adaptive_delay * 0.1)  # Добавляем 10% от системной задержки
         
         logger.info(f"⏳ Адаптивная задержка {total_delay:.2f} секунд (базовая: {base_delay:.2f}с, системная: {adaptive_delay:.1f}с) | Уровень: {system_limits.description}")
+        mark_stage('delay')
         time.sleep(total_delay)
+        mark_stage('prepare')
 
         # Определяем тип задачи и выполняем соответствующее действие
         task_type = task_data['task_type']
@@ -236,6 +311,7 @@ def process_task(task_id, chat_id, bot):
             (task_type == TaskType.VIDEO and is_video and any(key in options for key in ['hide_from_feed', 'usertags', 'music_track']))
         )
         
+        mark_stage('publish')
         if is_reels:
             # Для видео используем ReelsManager
             logger.info(f"📹 Используем ReelsManager для публикации видео/рилс")
@@ -294,7 +370,8 @@ def process_task(task_id, chat_id, bot):
                 usertags=reels_data['usertags'],
                 location=reels_data['location'],
                 hashtags=reels_data['hashtags'],
-                cover_time=reels_data['cover_time']
+                cover_time=reels_data['cover_time'],
+                task_id=task_id
             )
             
             # ReelsManager возвращает кортеж (success, media_id_or_error)
@@ -434,6 +511,12 @@ def process_task(task_id, chat_id, bot):
                 success = result
                 media_id = None
 
+        # Сохраняем тайминги этапов конвейерной загрузки в задаче
+        mark_stage('finalize')
+        stage_timings = getattr(manager, 'last_stage_timings', None)
+        if stage_timings:
+            update_publish_task_options(task_id, stage_timings=stage_timings)
+
         # Обновляем статус задачи в зависимости от результата
         if success:
             # media_id уже должен быть извлечен из кортежа выше
@@ -441,7 +524,7 @@ def process_task(task_id, chat_id, bot):
             if media_id is not None:
                 media_id = str(media_id)
             
-            update_publish_task_status(task_id, TaskStatus.COMPLETED, media_id=media_id)
+            set_task_status(task_id, TaskStatus.COMPLETED, media_id=media_id)
             logger.info(f"✅ Задача #{task_id} успешно выполнена")
             
             # Отправляем уведомление в Telegram если есть бот
@@ -462,149 +545,147 @@ def process_task(task_id, chat_id, bot):
                     # Определяем тип контента для уведомления
                     content_type = "Reels" if task_type == TaskType.VIDEO or task_type == 'reel' else str(task_type).title()
                     
-                    bot.send_message(
-                        chat_id,
+                    notify(
+                        bot, chat_id,
                         f"✅ Публикация успешно завершена!\n"
                         f"Аккаунт: @{task_data['account_username']}\n"
                         f"Тип: {content_type}\n"
-                        f"Ссылка: {media_url}"
+                        f"Ссылка: {media_url}",
+                        key=PUBLISH_RESULT_KEY
                     )
                 except Exception as e:
                     logger.error(f"Ошибка при отправке уведомления: {e}")
         else:
             error_msg = f"Не удалось опубликовать контент"
-            update_publish_task_status(task_id, TaskStatus.FAILED, error_message=error_msg)
+            set_task_status(task_id, TaskStatus.FAILED, error_message=error_msg)
             logger.error(f"❌ Задача #{task_id} завершилась с ошибкой")
             
             # Отправляем уведомление об ошибке
             if bot and chat_id:
-                try:
-                    bot.send_message(
-                        chat_id,
-                        f"❌ Ошибка публикации!\n"
-                        f"Аккаунт: @{task_data['account_username']}\n"
-                        f"Ошибка: {error_msg}"
-                    )
-                except Exception as e:
-                    logger.error(f"Ошибка при отправке уведомления: {e}")
+                notify(
+                    bot, chat_id,
+                    f"❌ Ошибка публикации!\n"
+                    f"Аккаунт: @{task_data['account_username']}\n"
+                    f"Ошибка: {error_msg}",
+                    key=PUBLISH_RESULT_KEY
+                )
 
         # Проверяем, нужно ли отправить итоговый отчет
-        check_and_send_batch_report(task_id, chat_id, bot)
+        check_and_send_batch_report(task_id, chat_id, bot, success=bool(success))
 
         return success
 
     except Exception as e:
         logger.error(f"Ошибка при выполнении задачи #{task_id}: {e}")
         logger.error(f"Traceback:\n{traceback.format_exc()}")
-        update_publish_task_status(task_id, TaskStatus.FAILED, str(e))
+        set_task_status(task_id, TaskStatus.FAILED, error_message=str(e))
         
         # Отправляем уведомление об ошибке
         if bot and chat_id:
-            bot.send_message(
-                chat_id,
-                f"❌ Критическая ошибка при выполнении задачи #{task_id}:\n{str(e)}"
+            notify(
+                bot, chat_id,
+                f"❌ Критическая ошибка при выполнении задачи #{task_id}:\n{str(e)}",
+                key=PUBLISH_RESULT_KEY
             )
         
         # Проверяем, нужно ли отправить итоговый отчет
-        check_and_send_batch_report(task_id, chat_id, bot)
+        check_and_send_batch_report(task_id, chat_id, bot, success=False)
         
         return False
 
 def register_task_batch(task_ids: List[int], chat_id: int, bot):
     """Регистрирует пакет задач для отправки итогового отчета"""
-    if not task_ids:
+    batch_id = get_batch_tracker().register(task_ids, chat_id, bot)
+    if batch_id:
+        logger.info(f"📦 Зарегистрирован пакет задач {batch_id}: {len(task_ids)} задач")
+    return batch_id
+
+def check_and_send_batch_report(task_id: int, chat_id: int, bot, success: bool):
+    """Учитывает результат задачи в пакете и отправляет итоговый отчет, если пакет завершен"""
+    tracker = get_batch_tracker()
+    batch = tracker.record(task_id, success)
+    if batch is None:
         return
-        
-    batch_id = f"{chat_id}_{int(time.time())}"
-    active_task_batches[batch_id] = {
-        'task_ids': task_ids,
-        'chat_id': chat_id,
-        'bot': bot,
-        'completed_tasks': set(),
-        'failed_tasks': set(),
-        'created_at': time.time()
-    }
-    
-    logger.info(f"📦 Зарегистрирован пакет задач {batch_id}: {len(task_ids)} задач")
 
-def check_and_send_batch_report(task_id: int, chat_id: int, bot):
-    """Проверяет завершение пакета задач и отправляет итоговый отчет"""
+    # После перезапуска бот пакета не сохранен - используем бот задачи
+    bot = tracker.pop_bot(batch.batch_id) or bot
+    chat_id = batch.chat_id or chat_id
     if not chat_id or not bot:
+        logger.warning(f"📦 Пакет {batch.batch_id} завершен, но отчет отправить некому")
         return
+
+    total_tasks = batch.total
+    completed_count = len(batch.completed_tasks)
+    failed_count = len(batch.failed_tasks)
+
+    # Все задачи завершены, отправляем итоговый отчет
+    try:
+        from telegram import InlineKeyboardButton, InlineKeyboardMarkup
         
-    # Ищем пакет, содержащий эту задачу
-    batch_to_update = None
-    for batch_id, batch_data in active_task_batches.items():
-        if task_id in batch_data['task_ids'] and batch_data['chat_id'] == chat_id:
-            batch_to_update = batch_id
-            break
-    
-    if not batch_to_update:
-        return
+        report_message = f"📊 **Итоговый отчет о публикации**\n\n"
+        report_message += f"📋 Всего задач: {total_tasks}\n"
+        report_message += f"✅ Успешно: {completed_count}\n"
+        report_message += f"❌ Ошибок: {failed_count}\n\n"
         
-    batch_data = active_task_batches[batch_to_update]
-    
-    # Получаем статус задачи
-    task_data = get_publish_task(task_id)
-    if not task_data:
-        return
+        if completed_count > 0:
+            report_message += f"🎉 Успешно опубликовано в {completed_count} аккаунтах!\n"
         
-    # Обновляем статус задачи в пакете
-    if task_data['status'] == TaskStatus.COMPLETED:
-        batch_data['completed_tasks'].add(task_id)
-    elif task_data['status'] == TaskStatus.FAILED:
-        batch_data['failed_tasks'].add(task_id)
-    
-    # Проверяем, завершены ли все задачи
-    total_tasks = len(batch_data['task_ids'])
-    completed_count = len(batch_data['completed_tasks'])
-    failed_count = len(batch_data['failed_tasks'])
-    finished_count = completed_count + failed_count
-    
-    if finished_count >= total_tasks:
-        # Все задачи завершены, отправляем итоговый отчет
-        try:
-            from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-            
-            report_message = f"📊 **Итоговый отчет о публикации**\n\n"
-            report_message += f"📋 Всего задач: {total_tasks}\n"
-            report_message += f"✅ Успешно: {completed_count}\n"
-            report_message += f"❌ Ошибок: {failed_count}\n\n"
-            
-            if completed_count > 0:
-                report_message += f"🎉 Успешно опубликовано в {completed_count} аккаунтах!\n"
-            
-            if failed_count > 0:
-                report_message += f"⚠️ Ошибки в {failed_count} аккаунтах\n"
-            
-            # Добавляем процент успешности
-            success_rate = (completed_count / total_tasks) * 100
-            report_message += f"📈 Успешность: {success_rate:.1f}%\n\n"
-            
-            # Добавляем время выполнения
-            execution_time = time.time() - batch_data['created_at']
-            report_message += f"⏱️ Время выполнения: {execution_time:.1f} секунд"
-            
-            # Создаем кнопки для навигации
-            keyboard = [
-                [InlineKeyboardButton("📊 История публикаций", callback_data="publication_history")],
-                [InlineKeyboardButton("🔙 Главное меню", callback_data="main_menu")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            bot.send_message(
-                chat_id,
-                report_message,
-                reply_markup=reply_markup
-            )
-            
-            logger.info(f"📊 Отправлен итоговый отчет для пакета {batch_to_update}: {completed_count}/{total_tasks} успешно")
-            
-        except Exception as e:
-            logger.error(f"Ошибка при отправке итогового отчета: {e}")
+        if failed_count > 0:
+            report_message += f"⚠️ Ошибки в {failed_count} аккаунтах\n"
+        
+        # Добавляем процент успешности
+        success_rate = (completed_count / total_tasks) * 100
+        report_message += f"📈 Успешность: {success_rate:.1f}%\n\n"
+        
+        # Добавляем время выполнения
+        execution_time = time.time() - batch.created_at
+        report_message += f"⏱️ Время выполнения: {execution_time:.1f} секунд"
+        
+        # Создаем кнопки для навигации
+        keyboard = [
+            [InlineKeyboardButton("📊 История публикаций", callback_data="publication_history")],
+            [InlineKeyboardButton("🔙 Главное меню", callback_data="main_menu")]
+        ]
+        reply_markup = InlineKeyboardMarkup(keyboard)
         
-        # Удаляем завершенный пакет
-        del active_task_batches[batch_to_update]
+        notify(bot, chat_id, report_message, reply_markup=reply_markup)
+        
+        logger.info(f"📊 Поставлен в очередь итоговый отчет для пакета {batch.batch_id}: {completed_count}/{total_tasks} успешно")
+        
+    except Exception as e:
+        logger.error(f"Ошибка при отправке итогового отчета: {e}")
+
+def get_batch_progress(batch_id: str = None, chat_id: int = None):
+    """Возвращает прогресс пакета (или список активных пакетов)"""
+    tracker = get_batch_tracker()
+    if batch_id:
+        return tracker.get_progress(batch_id)
+    return tracker.list_progress(chat_id)
+
+def _run_task(task_id, chat_id, bot):
+    """process_task с замером времени для метрик и трассой этапов"""
+    started = time.perf_counter()
+    outcome = 'error'
+    trace = start_trace(task_id)
+    try:
+        result = process_task(task_id, chat_id, bot)
+        outcome = 'deferred' if result is None else ('success' if result else 'failed')
+        return result
+    finally:
+        _task_seconds.labels(outcome=outcome).observe(time.perf_counter() - started)
+        if outcome == 'deferred':
+            suspend_trace(trace)
+        else:
+            _save_trace(task_id, finish_trace(trace))
+
+def _save_trace(task_id, trace):
+    """Сохраняет компактную трассу этапов в options задачи"""
+    if not trace['spans']:
+        return
+    try:
+        update_publish_task_options(task_id, trace=trace)
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось сохранить трассу этапов задачи #{task_id}: {e}")
 
 def task_worker():
     """Функция-обработчик очереди задач с адаптивным управлением нагрузкой"""
@@ -674,7 +755,7 @@ def task_worker():
                     task_id, chat_id, bot = task
 
                     # Запускаем задачу в пуле потоков
-                    future = executor.submit(process_task, task_id, chat_id, bot)
+                    future = executor.submit(_run_task, task_id, chat_id, bot)
                     futures[future] = (task_id, chat_id)
 
                     # Отмечаем задачу как взятую из очереди
@@ -702,14 +783,18 @@ def start_task_queue():
     global worker_thread
 
     if worker_thread is None or not worker_thread.is_alive():
-        worker_thread = threading.Thread(target=task_worker, daemon=True)
+        worker_thread = threading.Thread(target=task_worker, name='task_queue_worker', daemon=True)
         worker_thread.start()
         logger.info("Запущен поток обработки очереди задач")
     else:
         logger.info("Поток обработки очереди задач уже запущен")
 
-def stop_task_queue():
-    """Останавливает обработчик очереди задач"""
+def stop_task_queue(wait=False):
+    """Останавливает обработчик очереди задач
+
+    Args:
+        wait: Дождаться завершения публикаций, которые уже выполняются
+    """
     global worker_thread, executor
 
     if worker_thread and worker_thread.is_alive():
@@ -717,10 +802,10 @@ def stop_task_queue():
         worker_thread.join(timeout=5.0)
 
         # Завершаем пул потоков
-        executor.shutdown(wait=False)
+        executor.shutdown(wait=wait)
 
         # Создаем новый пул потоков для следующего запуска
-        executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='task_queue')
 
         logger.info("Поток обработки очереди задач остановлен")
 
@@ -741,18 +826,15 @@ def add_task_to_queue(task_id, chat_id=None, bot=None, delay_seconds=0):
             return False
 
         # Обновляем статус задачи
-        update_publish_task_status(task_id, TaskStatus.PROCESSING)
+        set_task_status(task_id, TaskStatus.PROCESSING)
 
         if delay_seconds > 0:
-            # Если нужна задержка, добавляем задачу с таймером
+            # Если нужна задержка, добавляем задачу по таймеру фоновой среды
             def delayed_add():
-                time.sleep(delay_seconds)
                 task_queue.put((task_id, chat_id, bot))
                 logger.info(f"Задача #{task_id} добавлена в очередь после задержки {delay_seconds}с")
             
-            # Запускаем в отдельном потоке
-            delay_thread = threading.Thread(target=delayed_add, daemon=True)
-            delay_thread.start()
+            get_background_runtime().once(f'task_queue_delay_{task_id}', delay_seconds, delayed_add)
             logger.info(f"Задача #{task_id} запланирована с задержкой {delay_seconds} секунд")
         else:
             # Добавляем задачу в очередь немедленно
@@ -795,6 +877,9 @@ def get_queue_stats():
             'queue_size': task_queue.qsize(),
             'max_workers': MAX_WORKERS,
             'current_max_workers': adaptive_workers,
+            'awaiting_validation': len(_validation_deadlines),
+            'active_batches': len(get_batch_tracker()),
+            'notifications': get_notification_outbox().get_stats(),
             'system_delay': system_delay,
             'load_level': system_limits.description,
             'is_overloaded': check_system_overload(),
@@ -812,4 +897,13 @@ def get_queue_stats():
             'is_overloaded': False,
             'timeout_multiplier': 1.0,
             'batch_size': 1
-        }
\ No newline at end of file
+        }
+
+def _collect_metrics(output):
+    """Состояние очереди для реестра метрик (без опроса системного монитора)"""
+    output.gauge('task_queue_size', task_queue.qsize(), 'Задач в очереди')
+    output.gauge('task_queue_awaiting_validation', len(_validation_deadlines), 'Задач ждут проверки аккаунта')
+    output.gauge('task_queue_active_batches', len(get_batch_tracker()), 'Незавершенных пакетов задач')
+    output.gauge('task_queue_max_workers', MAX_WORKERS, 'Максимум потоков обработки')
+
+get_metrics_registry().register_collector('task_queue', _collect_metrics)
@@ -0,0 +1,419 @@
+# -*- coding: utf-8 -*-
+"""
+Web Response - Слой ответов веб-API
+
+- Сжатие gzip/brotli по Accept-Encoding для ответов больше порога
+- ETag списков по счетчикам версий таблиц: неизмененный список отдается
+  как 304 без запроса к БД
+- Сборка дашборда: ассеты с хешем в имени и заранее сжатые копии
+  (.gz/.br), отдаются с immutable-кешированием
+- Время обработки по эндпоинтам
+"""
+
+import os
+import re
+import gzip
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+import mimetypes
+import functools
+import posixpath
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from flask import Flask, request, g, make_response, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен, без него используется только gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Ответы меньше этого размера не сжимаются
+COMPRESS_MIN_SIZE = int(os.getenv("WEB_COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'text/javascript',
+    'text/html',
+    'text/css',
+    'text/plain',
+    'image/svg+xml',
+}
+
+# ETag учитывает только записи этого процесса; записи других процессов
+# (Telegram бот работает с той же БД) становятся видны не позже этого срока
+ETAG_MAX_AGE = int(os.getenv("WEB_ETAG_MAX_AGE", "30"))
+
+# Каталог сборки дашборда внутри web-dashboard и манифест ассетов
+DASHBOARD_DIST_DIR = 'dist'
+ASSETS_MANIFEST = 'manifest.json'
+FINGERPRINT_EXTENSIONS = {'.js', '.css', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico', '.woff', '.woff2'}
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def available_encodings() -> List[str]:
+    """Поддерживаемые кодировки в порядке предпочтения"""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def negotiate_encoding() -> Optional[str]:
+    """Лучшая кодировка, которую принимает клиент"""
+    return request.accept_encodings.best_match(available_encodings())
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+# =============================================================================
+# Версии данных для ETag
+# =============================================================================
+
+class DataVersions:
+    """Счетчики версий таблиц, увеличиваются при коммите изменений"""
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # После перезапуска все ETag становятся недействительными
+        self._boot_id = uuid.uuid4().hex[:8]
+        # Ключ в session.info, куда собираются измененные таблицы до коммита
+        self._info_key = f"changed_tables_{self._boot_id}"
+
+    def bump(self, *tables: str):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def get(self, *tables: str) -> Tuple[int, ...]:
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+    def etag(self, tables: Iterable[str], extra: str = '') -> str:
+        """ETag набора таблиц (extra - параметры запроса)"""
+        tables = tuple(tables)
+        window = int(time.time() // ETAG_MAX_AGE) if ETAG_MAX_AGE > 0 else 0
+        key = f"{self._boot_id}|{tables}|{self.get(*tables)}|{window}|{extra}"
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+    def install(self, session_class=None):
+        """Подписаться на коммиты сессий SQLAlchemy"""
+        from sqlalchemy import event
+        from sqlalchemy.orm import Session
+
+        session_class = session_class or Session
+        if event.contains(session_class, 'after_commit', self._after_commit):
+            return
+
+        event.listen(session_class, 'after_flush', self._after_flush)
+        event.listen(session_class, 'after_bulk_update', self._after_bulk)
+        event.listen(session_class, 'after_bulk_delete', self._after_bulk)
+        event.listen(session_class, 'after_commit', self._after_commit)
+        event.listen(session_class, 'after_rollback', self._after_rollback)
+
+    def _pending(self, session) -> set:
+        return session.info.setdefault(self._info_key, set())
+
+    def _after_flush(self, session, flush_context):
+        pending = self._pending(session)
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            table = getattr(obj, '__tablename__', None)
+            if table:
+                pending.add(table)
+
+    def _after_bulk(self, context):
+        mapper = getattr(context, 'mapper', None)
+        table = getattr(getattr(mapper, 'local_table', None), 'name', None)
+        if table:
+            self._pending(context.session).add(table)
+
+    def _after_commit(self, session):
+        # Версия растет только после коммита, иначе клиент закешировал бы
+        # старые данные под новым ETag
+        tables = session.info.pop(self._info_key, None)
+        if tables:
+            self.bump(*tables)
+
+    def _after_rollback(self, session):
+        session.info.pop(self._info_key, None)
+
+
+_data_versions = DataVersions()
+
+
+def get_data_versions() -> DataVersions:
+    """Получить глобальные счетчики версий таблиц"""
+    return _data_versions
+
+
+def conditional(*tables: str):
+    """
+    Декоратор GET-эндпоинта: ETag по версиям таблиц и 304 без вызова view
+
+    Args:
+        tables: Таблицы, от которых зависит ответ
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = _data_versions.etag(tables, request.full_path)
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+# =============================================================================
+# Время обработки и сжатие
+# =============================================================================
+
+class ResponseStats:
+    """Время обработки по эндпоинтам и экономия от сжатия"""
+
+    def __init__(self):
+        self._endpoints: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.stats = {'compressed': 0, 'bytes_before': 0, 'bytes_after': 0, 'not_modified': 0}
+
+    def record(self, endpoint: str, status: int, duration: float):
+        with self._lock:
+            item = self._endpoints.setdefault(endpoint, {
+                'count': 0, 'errors': 0, 'not_modified': 0, 'total_time': 0.0, 'max_time': 0.0
+            })
+            item['count'] += 1
+            item['total_time'] += duration
+            item['max_time'] = max(item['max_time'], duration)
+            if status >= 500:
+                item['errors'] += 1
+            elif status == 304:
+                item['not_modified'] += 1
+                self.stats['not_modified'] += 1
+
+    def record_compression(self, before: int, after: int):
+        with self._lock:
+            self.stats['compressed'] += 1
+            self.stats['bytes_before'] += before
+            self.stats['bytes_after'] += after
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            endpoints = {
+                name: {
+                    'count': item['count'],
+                    'errors': item['errors'],
+                    'not_modified': item['not_modified'],
+                    'avg_ms': round(item['total_time'] / item['count'] * 1000, 1),
+                    'max_ms': round(item['max_time'] * 1000, 1),
+                }
+                for name, item in self._endpoints.items()
+            }
+            return {
+                **self.stats,
+                'encodings': available_encodings(),
+                'endpoints': dict(sorted(endpoints.items(), key=lambda kv: -kv[1]['avg_ms'] * kv[1]['count'])),
+            }
+
+
+_response_stats = ResponseStats()
+
+
+def get_response_stats() -> ResponseStats:
+    """Получить глобальную статистику ответов"""
+    return _response_stats
+
+
+def _before_request():
+    g.request_started = time.perf_counter()
+
+
+def _after_request(response):
+    duration = time.perf_counter() - g.get('request_started', time.perf_counter())
+    rule = request.url_rule.rule if request.url_rule else '<unmatched>'
+    _response_stats.record(f"{request.method} {rule}", response.status_code, duration)
+    response.headers['Server-Timing'] = f"app;dur={duration * 1000:.1f}"
+    return _compress_response(response)
+
+
+def _compress_response(response):
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if not encoding:
+        return response
+
+    compressed = compress(data, encoding)
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    _response_stats.record_compression(len(data), len(compressed))
+    return response
+
+
+def init_app(app: Flask):
+    """Подключить сжатие, учет времени и отслеживание версий данных"""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    _data_versions.install()
+
+
+# =============================================================================
+# Ассеты дашборда
+# =============================================================================
+
+_ASSET_REF_RE = re.compile(r'''(\b(?:src|href)=)(["'])([^"'?#:]+)(\2)''')
+
+_manifest_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+
+def build_dashboard_assets(source_dir: str, dist_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Собрать дашборд: ассеты с хешем содержимого в имени, HTML со ссылками
+    на них и сжатые копии .gz/.br для всех текстовых файлов
+
+    Args:
+        source_dir: Каталог web-dashboard
+        dist_dir: Каталог сборки (по умолчанию source_dir/dist)
+
+    Returns:
+        Манифест {'assets': {исходный путь: путь с хешем}, 'built_at': ...}
+    """
+    dist_dir = dist_dir or os.path.join(source_dir, DASHBOARD_DIST_DIR)
+    if os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+    os.makedirs(dist_dir)
+
+    assets: Dict[str, str] = {}
+    pages: List[str] = []
+    for root, dirs, files in os.walk(source_dir):
+        if os.path.abspath(root) == os.path.abspath(source_dir) and DASHBOARD_DIST_DIR in dirs:
+            dirs.remove(DASHBOARD_DIST_DIR)
+        for name in files:
+            rel = posixpath.join(*os.path.relpath(os.path.join(root, name), source_dir).split(os.sep))
+            ext = os.path.splitext(name)[1].lower()
+            if ext == '.html':
+                pages.append(rel)
+            elif ext in FINGERPRINT_EXTENSIONS:
+                with open(os.path.join(source_dir, rel), 'rb') as f:
+                    content = f.read()
+                digest = hashlib.sha256(content).hexdigest()[:10]
+                stem, _ = posixpath.splitext(rel)
+                assets[rel] = f"{stem}.{digest}{ext}"
+                _write_asset(dist_dir, assets[rel], content)
+
+    for rel in pages:
+        with open(os.path.join(source_dir, rel), 'r', encoding='utf-8') as f:
+            html = f.read()
+        base = posixpath.dirname(rel)
+
+        def replace(match):
+            ref = match.group(3)
+            if ref.startswith('/'):
+                target = posixpath.normpath(ref.lstrip('/'))
+            else:
+                target = posixpath.normpath(posixpath.join(base, ref))
+            fingerprinted = assets.get(target)
+            if not fingerprinted:
+                return match.group(0)
+            new_ref = '/' + fingerprinted if ref.startswith('/') else posixpath.relpath(fingerprinted, base or '.')
+            return f"{match.group(1)}{match.group(2)}{new_ref}{match.group(4)}"
+
+        _write_asset(dist_dir, rel, _ASSET_REF_RE.sub(replace, html).encode('utf-8'))
+
+    manifest = {'assets': assets, 'built_at': time.time()}
+    with open(os.path.join(dist_dir, ASSETS_MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    logger.info(f"📦 Дашборд собран: {len(assets)} ассетов, {len(pages)} страниц -> {dist_dir}")
+    return manifest
+
+
+def _write_asset(dist_dir: str, rel: str, content: bytes):
+    path = os.path.join(dist_dir, *rel.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+
+    mimetype = mimetypes.guess_type(rel)[0]
+    if mimetype in COMPRESSIBLE_MIMETYPES and len(content) >= COMPRESS_MIN_SIZE:
+        for encoding, suffix in (('gzip', '.gz'), ('br', '.br')):
+            if encoding in available_encodings():
+                with open(path + suffix, 'wb') as f:
+                    f.write(compress(content, encoding))
+
+
+def _load_manifest(dist_dir: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(dist_dir, ASSETS_MANIFEST)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    cached = _manifest_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ Не удалось прочитать манифест ассетов {path}: {e}")
+        return None
+    manifest['fingerprinted'] = set(manifest.get('assets', {}).values())
+    _manifest_cache[path] = (mtime, manifest)
+    return manifest
+
+
+def send_dashboard_file(directory: str, filename: str):
+    """
+    Отдать файл дашборда
+
+    Если есть сборка (dist), файлы берутся из нее: ассеты с хешем кешируются
+    навсегда, для страниц клиент проверяет ETag. Сжатая копия отдается,
+    если клиент ее принимает.
+    """
+    dist_dir = os.path.join(directory, DASHBOARD_DIST_DIR)
+    manifest = _load_manifest(dist_dir)
+    base = dist_dir if manifest and os.path.isfile(os.path.join(dist_dir, filename)) else directory
+
+    mimetype = mimetypes.guess_type(filename)[0]
+    negotiable = base == dist_dir and mimetype in COMPRESSIBLE_MIMETYPES
+    encoding = negotiate_encoding() if negotiable else None
+    suffix = {'br': '.br', 'gzip': '.gz'}.get(encoding)
+
+    if suffix and os.path.isfile(os.path.join(dist_dir, filename + suffix)):
+        response = send_from_directory(dist_dir, filename + suffix, mimetype=mimetype)
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_from_directory(base, filename)
+    if negotiable:
+        response.vary.add('Accept-Encoding')
+
+    if manifest and base == dist_dir and filename in manifest['fingerprinted']:
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
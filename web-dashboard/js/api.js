@@ -709,6 +709,47 @@ api.deletePost = deletePost;
 api.getGroups = getGroups;
 api.getTaskStatus = getTaskStatus;
 
+// Подписка на изменения состояния через SSE (/api/events)
+// topics - фильтр тем ('task', 'job', 'batch', 'validation'), handler(topic, data)
+// Возвращает объект с close() и флагом connected; браузер сам переподключается
+// и передает Last-Event-ID, сервер досылает пропущенные события
+function subscribeEvents(topics, handler, onReset) {
+    const subscription = { connected: false, source: null, close() { if (this.source) this.source.close(); } };
+    if (typeof EventSource === 'undefined') {
+        return subscription;
+    }
+
+    const query = topics && topics.length ? `?topics=${encodeURIComponent(topics.join(','))}` : '';
+    const source = new EventSource(`${API_BASE_URL}/events${query}`);
+    subscription.source = source;
+
+    source.onopen = () => { subscription.connected = true; };
+    source.onerror = () => { subscription.connected = false; };
+    source.onmessage = () => {};
+
+    (topics && topics.length ? topics : ['task', 'job', 'batch', 'validation']).forEach(prefix => {
+        ['status', 'progress'].forEach(kind => {
+            source.addEventListener(`${prefix}.${kind}`, (event) => {
+                try {
+                    const payload = JSON.parse(event.data);
+                    handler(payload.topic, payload.data);
+                } catch (error) {
+                    console.error('Ошибка разбора события:', error);
+                }
+            });
+        });
+    });
+
+    // Клиент отстал сильнее буфера сервера - состояние нужно перечитать целиком
+    source.addEventListener('reset', () => {
+        if (typeof onReset === 'function') onReset();
+    });
+
+    return subscription;
+}
+
+api.subscribeEvents = subscribeEvents;
+
 async function getWarmupStats() {
     return {
         total_accounts: 0,
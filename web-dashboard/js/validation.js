@@ -4,18 +4,46 @@ let validationResults = {};
 let isValidating = false;
 let updateInterval = null;
 let checkingAccounts = new Set();
+let eventsSubscription = null;
 
 // Загрузка начальных данных
 document.addEventListener('DOMContentLoaded', () => {
     lucide.createIcons();
     loadAccounts();
     loadValidationStatus();
+    subscribeValidationEvents();
     startAutoUpdate();
 });
 
-// Автообновление каждые 5 секунд
+// Изменения статусов приходят через SSE, опрос остается запасным вариантом
+function subscribeValidationEvents() {
+    if (typeof subscribeEvents !== 'function') {
+        return;
+    }
+    eventsSubscription = subscribeEvents(['validation'], (topic, data) => {
+        const account = accounts.find(a => a.id === data.account_id);
+        if (data.status === 'checking' || data.status === 'recovering') {
+            checkingAccounts.add(data.account_id);
+        } else {
+            checkingAccounts.delete(data.account_id);
+            if (account) {
+                account.is_active = data.status === 'valid';
+            }
+        }
+        updateAccountsTable();
+        loadValidationStatus();
+    }, () => {
+        loadAccounts();
+        loadValidationStatus();
+    });
+}
+
+// Автообновление каждые 5 секунд, пока нет подключения к потоку событий
 function startAutoUpdate() {
     updateInterval = setInterval(() => {
+        if (eventsSubscription && eventsSubscription.connected) {
+            return;
+        }
         if (isValidating || checkingAccounts.size > 0) {
             loadValidationStatus();
             updateAccountsTable();
@@ -3,16 +3,22 @@
 
 """
 Web API для интеграции веб-дашборда с Instagram Telegram Bot
+
+Импорт модуля не имеет побочных эффектов: патчи instagrapi, инициализация БД
+и подключение обработчиков выполняются в create_app(). Для продакшена
+приложение создается в wsgi.py и запускается через Gunicorn (gunicorn.conf.py),
+`python web_api.py` запускает встроенный сервер для разработки.
 """
 
 import os
 import sys
 import json
+import hmac
 import logging
 import threading
 import concurrent.futures
 from datetime import datetime
-from flask import Flask, request, jsonify, send_from_directory, send_file
+from flask import Flask, Blueprint, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
 import requests
 import tempfile
@@ -20,13 +26,6 @@ import tempfile
 # Добавляем текущую директорию в путь Python
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# ВАЖНО: Импортируем monkey patch ПЕРВЫМ для применения патчей уникализации устройства
-from instagram.monkey_patch import *
-from instagram.deep_patch import apply_deep_patch
-
-# Применяем глубокий патч
-apply_deep_patch()
-
 # Импортируем модули проекта
 from database.db_manager import (
     init_db, get_instagram_accounts, add_instagram_account, add_instagram_account_without_login,
@@ -35,49 +34,158 @@ from database.db_manager import (
     assign_proxy_to_account, bulk_add_instagram_accounts
 )
 from database.models import InstagramAccount, Proxy
+from database.query_stats import get_query_stats
+from utils.metrics import get_metrics_registry, start_metrics_history, stop_metrics_history
+from utils.memory_accounting import get_memory_accounting
+from utils.background_runtime import get_background_runtime, shutdown_background_runtime
+from database.publish_archive import get_publish_archiver
+from utils.error_aggregator import get_error_aggregator
+from utils.media_metadata import remove_media_file
+
+# Сжатие ответов, ETag списков и время обработки по эндпоинтам
+from utils.web_response import init_app as init_web_response, conditional, send_dashboard_file, get_response_stats
+from utils.startup_profile import StartupTimer
+from utils.settings_service import get_settings_service, SettingsValidationError, WARMUP_SETTINGS_SCHEMA
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-# Проверяем доступность модулей Instagram
-try:
-    from instagram.client import test_instagram_login_with_proxy
-    INTEGRATION_AVAILABLE = True
-    logger.info("✅ Интегрированный сервис аккаунтов подключен")
-except ImportError as e:
-    INTEGRATION_AVAILABLE = False
-    logger.warning(f"⚠️ Интегрированный сервис недоступен: {e}")
-except Exception as e:
-    INTEGRATION_AVAILABLE = False
-    logger.warning(f"⚠️ Ошибка инициализации интегрированного сервиса: {e}")
-
-# Создаем Flask приложение
-app = Flask(__name__)
-CORS(app)  # Разрешаем CORS для всех доменов
-
-# Инициализируем базу данных
-init_db()
+DASHBOARD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web-dashboard')
+
+# Определяется в create_app() после применения патчей instagrapi
+INTEGRATION_AVAILABLE = False
+
+# Все маршруты регистрируются на blueprint, приложение собирает create_app()
+api = Blueprint('web_api', __name__)
+
+
+def _apply_instagram_patches():
+    """Патчи instagrapi: monkey patch должен примениться до импорта клиента"""
+    import instagram.monkey_patch  # noqa: F401 - патч применяется при импорте
+    from instagram.deep_patch import apply_deep_patch
+    apply_deep_patch()
+
+
+def _check_integration() -> bool:
+    """Проверяем доступность модулей Instagram"""
+    try:
+        from instagram.client import test_instagram_login_with_proxy  # noqa: F401
+        logger.info("✅ Интегрированный сервис аккаунтов подключен")
+        return True
+    except ImportError as e:
+        logger.warning(f"⚠️ Интегрированный сервис недоступен: {e}")
+    except Exception as e:
+        logger.warning(f"⚠️ Ошибка инициализации интегрированного сервиса: {e}")
+    return False
+
+
+def create_app() -> Flask:
+    """
+    Создать Flask приложение
+
+    Применяет патчи instagrapi, инициализирует БД и подключает маршруты.
+    Фоновые сервисы не запускаются - см. start_background_services().
+    """
+    global INTEGRATION_AVAILABLE
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    startup = StartupTimer()
+    with startup.phase('instagram_patches'):
+        _apply_instagram_patches()
+    with startup.phase('integration_check'):
+        INTEGRATION_AVAILABLE = _check_integration()
+
+    app = Flask(__name__)
+    CORS(app)  # Разрешаем CORS для всех доменов
+    init_web_response(app)
+
+    # Инициализируем базу данных
+    with startup.phase('database'):
+        init_db()
+
+    app.register_blueprint(api)
+    startup.mark('app_ready')
+    logger.info(startup.report())
+    return app
+
+
+def start_background_services():
+    """Запустить очередь публикаций и умный сервис проверки аккаунтов"""
+    from utils.task_queue import start_task_queue
+    start_task_queue()
+    start_metrics_history()
+    
+    try:
+        from utils.smart_validator_service import get_smart_validator
+        smart_validator = get_smart_validator()
+        smart_validator.start()
+        logger.info("✅ Умный сервис проверки аккаунтов запущен")
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось запустить умный сервис проверки аккаунтов: {e}")
+
+
+def stop_background_services():
+    """Остановить фоновые сервисы, дав завершиться текущим операциям"""
+    try:
+        from utils.smart_validator_service import get_smart_validator
+        get_smart_validator().stop()
+    except Exception as e:
+        logger.warning(f"⚠️ Ошибка остановки умного сервиса проверки: {e}")
+    
+    from utils.task_queue import stop_task_queue
+    stop_task_queue(wait=True)
+    get_job_manager().shutdown(wait=True)
+    stop_metrics_history()
+    shutdown_background_runtime(timeout=30)
+    logger.info("🛑 Фоновые сервисы остановлены")
+
+# Долгие операции выполняются как фоновые задачи с общим ограниченным пулом
+from utils.job_manager import get_job_manager, JobQueueFull, JobStatus
+from utils.event_bus import get_event_bus
+
+# Сколько синхронные эндпоинты ждут результата задачи, прежде чем вернуть job_id
+SYNC_JOB_WAIT_TIMEOUT = 600
+
+def _wants_async():
+    """Клиент просит не ждать результата фоновой задачи (?async=1)"""
+    return request.args.get('async', '').lower() in ('1', 'true', 'yes')
+
+def _job_accepted(job, message):
+    """Ответ для задачи, поставленной в очередь"""
+    return jsonify({
+        'success': True,
+        'message': message,
+        'processing': True,
+        'job_id': job.job_id,
+        'job': job.to_dict(include_result=False)
+    }), 202
+
+def _job_queue_full(e):
+    return jsonify({
+        'success': False,
+        'error': str(e)
+    }), 429
 
 # Статические файлы веб-дашборда
-@app.route('/')
+@api.route('/')
 def index():
     """Главная страница дашборда"""
-    return send_from_directory('web-dashboard', 'index.html')
+    return send_dashboard_file(DASHBOARD_DIR, 'index.html')
 
-@app.route('/<path:filename>')
+@api.route('/<path:filename>')
 def static_files(filename):
     """Статические файлы дашборда"""
-    return send_from_directory('web-dashboard', filename)
+    return send_dashboard_file(DASHBOARD_DIR, filename)
 
 # =============================================================================
 # API для работы с аккаунтами
 # =============================================================================
 
-@app.route('/api/accounts', methods=['GET'])
+@api.route('/api/accounts', methods=['GET'])
+@conditional('instagram_accounts', 'proxies')
 def get_accounts():
     """Получить список всех аккаунтов"""
     try:
@@ -124,7 +232,7 @@ def get_accounts():
             'error': str(e)
         }), 500
 
-@app.route('/api/accounts', methods=['POST'])
+@api.route('/api/accounts', methods=['POST'])
 def add_account():
     """Добавить новый аккаунт с полной интеграцией (асинхронно)"""
     try:
@@ -156,55 +264,34 @@ def add_account():
                 }), 400
         
         if INTEGRATION_AVAILABLE and (email and email_password):
-            # Если есть данные почты, запускаем полную интеграцию асинхронно
-            import threading
-            import asyncio
-            
-            def background_add_account():
+            # Если есть данные почты, запускаем полную интеграцию в фоновой задаче
+            def background_add_account(ctx, account_id):
                 """Фоновая обработка добавления аккаунта"""
-                try:
-                    # Создаем новый event loop для потока
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    
-                    async def run_add_account():
-                        logger.info(f"🔄 Фоновая обработка аккаунта {username} начата")
-                        
-                        # Простая обработка без старого сервиса
-                        success = True
-                        message = "Аккаунт обработан"
-                        account_data = None
-                        
-                        # Попытка входа в Instagram
-                        from instagram.client import test_instagram_login_with_proxy
-                        login_success = test_instagram_login_with_proxy(
-                            account_id=account.id,
-                            username=username,
-                            password=password,
-                            email=email,
-                            email_password=email_password
-                        )
-                        
-                        if login_success:
-                            logger.info(f"✅ Успешный вход в Instagram для {username}")
-                            # Активируем аккаунт
-                            from database.db_manager import update_instagram_account
-                            update_instagram_account(account.id, is_active=True)
-                            message = "Аккаунт успешно активирован"
-                        else:
-                            logger.warning(f"⚠️ Аккаунт {username} добавлен, но не удалось войти в Instagram")
-                            message = "Аккаунт добавлен, но не удалось войти в Instagram"
-                            success = False
-                        
-                        return success, message, account_data
-                    
-                    # Запускаем асинхронную обработку
-                    success, message, account_data = loop.run_until_complete(run_add_account())
-                    
-                except Exception as e:
-                    logger.error(f"❌ Ошибка в фоновой обработке аккаунта {username}: {e}")
-                finally:
-                    loop.close()
+                logger.info(f"🔄 Фоновая обработка аккаунта {username} начата")
+                ctx.set_total(1)
+                
+                # Попытка входа в Instagram
+                from instagram.client import test_instagram_login_with_proxy
+                login_success = test_instagram_login_with_proxy(
+                    account_id=account_id,
+                    username=username,
+                    password=password,
+                    email=email,
+                    email_password=email_password
+                )
+                
+                if login_success:
+                    logger.info(f"✅ Успешный вход в Instagram для {username}")
+                    # Активируем аккаунт
+                    from database.db_manager import update_instagram_account
+                    update_instagram_account(account_id, is_active=True)
+                    message = "Аккаунт успешно активирован"
+                else:
+                    logger.warning(f"⚠️ Аккаунт {username} добавлен, но не удалось войти в Instagram")
+                    message = "Аккаунт добавлен, но не удалось войти в Instagram"
+                
+                ctx.advance(bool(login_success), message)
+                return {'account_id': account_id, 'login_successful': bool(login_success), 'message': message}
             
             # Сначала добавляем аккаунт в БД синхронно для быстрого отображения
             account = add_instagram_account_without_login(
@@ -232,11 +319,17 @@ def add_account():
                 )
             
             # Запускаем полную обработку в фоновом режиме
-            thread = threading.Thread(target=background_add_account, daemon=True)
-            thread.start()
+            try:
+                job = get_job_manager().submit(
+                    'add_account', background_add_account, account.id,
+                    params={'account_id': account.id, 'username': username}
+                )
+            except JobQueueFull as e:
+                return _job_queue_full(e)
             
             return jsonify({
                 'success': True,
+                'job_id': job.job_id,
                 'data': {
                     'id': account.id,
                     'username': account.username,
@@ -315,7 +408,7 @@ def add_account():
             'error': str(e)
         }), 500
 
-@app.route('/api/accounts/bulk', methods=['POST'])
+@api.route('/api/accounts/bulk', methods=['POST'])
 def bulk_add_accounts():
     """Массовое добавление аккаунтов - простой подход на основе одинарного добавления"""
     try:
@@ -408,59 +501,41 @@ def bulk_add_accounts():
                 logger.error(f"❌ Ошибка при обработке аккаунта {username}: {e}")
                 return False
         
-        def background_bulk_add():
+        def background_bulk_add(ctx):
             """Фоновая обработка массового добавления"""
-            success_count = 0
-            failed_count = 0
-            
-            if parallel_threads == 1:
-                # Последовательная обработка
-                for i, account_data in enumerate(accounts_data):
-                    if process_single_account(account_data, i):
-                        success_count += 1
-                    else:
-                        failed_count += 1
-                    
-                    # Небольшая задержка между аккаунтами
-                    import time
-                    time.sleep(2)
-            else:
-                # Параллельная обработка
+            if parallel_threads > 1:
                 logger.info(f"🔄 Используем {parallel_threads} параллельных потоков")
-                
-                with concurrent.futures.ThreadPoolExecutor(max_workers=parallel_threads) as executor:
-                    # Создаем задачи для всех аккаунтов
-                    future_to_account = {
-                        executor.submit(process_single_account, account_data, i): (account_data, i) 
-                        for i, account_data in enumerate(accounts_data)
-                    }
-                    
-                    # Обрабатываем результаты по мере завершения
-                    for future in concurrent.futures.as_completed(future_to_account):
-                        account_data, account_index = future_to_account[future]
-                        try:
-                            if future.result():
-                                success_count += 1
-                            else:
-                                failed_count += 1
-                        except Exception as e:
-                            username = account_data.get('username', 'unknown')
-                            logger.error(f"❌ Ошибка в потоке для аккаунта {username}: {e}")
-                            failed_count += 1
+            
+            results = ctx.map(
+                lambda item: process_single_account(item[1], item[0]),
+                enumerate(accounts_data),
+                parallel=parallel_threads,
+                # Небольшая задержка между аккаунтами при последовательной обработке
+                delay=2 if parallel_threads == 1 else 0
+            )
+            success_count = sum(1 for result in results if result is True)
+            failed_count = len(results) - success_count
             
             logger.info(f"✅ Фоновая обработка завершена: {success_count} успешно, {failed_count} ошибок")
+            return {'success_count': success_count, 'failed_count': failed_count}
         
-        # Запускаем в отдельном потоке
-        thread = threading.Thread(target=background_bulk_add, daemon=True)
-        thread.start()
+        # Запускаем в фоновой задаче
+        try:
+            job = get_job_manager().submit(
+                'bulk_add_accounts', background_bulk_add,
+                params={'total_accounts': len(accounts_data), 'parallel_threads': parallel_threads}
+            )
+        except JobQueueFull as e:
+            return _job_queue_full(e)
         
-        logger.info(f"🔄 Фоновая обработка {len(accounts_data)} аккаунтов начата")
+        logger.info(f"🔄 Фоновая обработка {len(accounts_data)} аккаунтов поставлена в очередь (задача {job.job_id})")
         
         # Возвращаем немедленный ответ
         return jsonify({
             'success': True,
             'message': f'Начата обработка {len(accounts_data)} аккаунтов в {parallel_threads} потоке(ах). Процесс может занять несколько минут.',
             'processing': True,
+            'job_id': job.job_id,
             'total_accounts': len(accounts_data),
             'parallel_threads': parallel_threads
         })
@@ -472,7 +547,7 @@ def bulk_add_accounts():
             'error': str(e)
         }), 500
 
-@app.route('/api/accounts/<int:account_id>', methods=['PUT'])
+@api.route('/api/accounts/<int:account_id>', methods=['PUT'])
 def update_account(account_id):
     """Обновить аккаунт"""
     try:
@@ -510,7 +585,7 @@ def update_account(account_id):
             'error': str(e)
         }), 500
 
-@app.route('/api/accounts/<int:account_id>', methods=['DELETE'])
+@api.route('/api/accounts/<int:account_id>', methods=['DELETE'])
 def delete_account(account_id):
     """Удалить аккаунт"""
     try:
@@ -538,7 +613,8 @@ def delete_account(account_id):
 # API для работы с прокси
 # =============================================================================
 
-@app.route('/api/proxies', methods=['GET'])
+@api.route('/api/proxies', methods=['GET'])
+@conditional('proxies', 'instagram_accounts')
 def get_proxies_api():
     """Получить список всех прокси"""
     try:
@@ -583,7 +659,7 @@ def get_proxies_api():
             'error': str(e)
         }), 500
 
-@app.route('/api/proxies', methods=['POST'])
+@api.route('/api/proxies', methods=['POST'])
 def add_proxy_api():
     """Добавить новый прокси"""
     try:
@@ -634,7 +710,7 @@ def add_proxy_api():
             'error': str(e)
         }), 500
 
-@app.route('/api/accounts/<int:account_id>/proxy', methods=['POST'])
+@api.route('/api/accounts/<int:account_id>/proxy', methods=['POST'])
 def assign_proxy(account_id):
     """Назначить прокси аккаунту"""
     try:
@@ -666,7 +742,7 @@ def assign_proxy(account_id):
             'error': str(e)
         }), 500
 
-@app.route('/api/proxies/bulk', methods=['POST'])
+@api.route('/api/proxies/bulk', methods=['POST'])
 def bulk_add_proxies():
     """Массовое добавление прокси"""
     try:
@@ -757,7 +833,7 @@ def bulk_add_proxies():
             'error': str(e)
         }), 500
 
-@app.route('/api/proxies/<int:proxy_id>/check', methods=['POST'])
+@api.route('/api/proxies/<int:proxy_id>/check', methods=['POST'])
 def check_proxy_api(proxy_id):
     """Проверить отдельный прокси"""
     try:
@@ -847,11 +923,10 @@ def check_proxy_api(proxy_id):
             'error': str(e)
         }), 500
 
-@app.route('/api/proxies/check-all', methods=['POST'])
+@api.route('/api/proxies/check-all', methods=['POST'])
 def check_all_proxies():
     """Проверить все прокси"""
     try:
-        import concurrent.futures
         import time
         import random
         
@@ -963,14 +1038,10 @@ def check_all_proxies():
                     'error': f'Общая ошибка: {str(e)}'
                 }
         
-        # Проверяем прокси параллельно (снижаем до 3 потоков для стабильности)
-        results = []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-            future_to_proxy = {executor.submit(check_single_proxy, proxy): proxy for proxy in proxies}
-            
-            for future in concurrent.futures.as_completed(future_to_proxy):
-                result = future.result()
-                results.append(result)
+        def check_all(ctx):
+            # Проверяем прокси параллельно (снижаем до 3 потоков для стабильности)
+            def check_and_log(proxy):
+                result = check_single_proxy(proxy)
                 
                 # Более детальное логирование
                 if result['success']:
@@ -979,27 +1050,27 @@ def check_all_proxies():
                     logger.info(f"{status} Прокси {result['host']}:{result['port']}{username_info}")
                 else:
                     logger.warning(f"❌ Прокси {result['host']}:{result['port']}: {result['error']}")
-        
-        # Подсчитываем статистику
-        total = len(results)
-        active = len([r for r in results if r['is_active']])
-        inactive = total - active
-        
-        # Подсчитываем типы ошибок
-        error_types = {}
-        for result in results:
-            if not result['success'] and 'error' in result:
-                error_type = result['error'].split(':')[0]
-                error_types[error_type] = error_types.get(error_type, 0) + 1
-        
-        logger.info(f"✅ Проверка завершена: {total} всего, {active} активных, {inactive} неактивных")
-        if error_types:
-            logger.info(f"📊 Типы ошибок: {error_types}")
-        
-        return jsonify({
-            'success': True,
-            'message': f'Проверка завершена: {active} из {total} прокси активны',
-            'data': {
+                return result
+            
+            results = [r for r in ctx.map(check_and_log, proxies, parallel=3) if isinstance(r, dict)]
+            
+            # Подсчитываем статистику
+            total = len(results)
+            active = len([r for r in results if r['is_active']])
+            inactive = total - active
+            
+            # Подсчитываем типы ошибок
+            error_types = {}
+            for result in results:
+                if not result['success'] and 'error' in result:
+                    error_type = result['error'].split(':')[0]
+                    error_types[error_type] = error_types.get(error_type, 0) + 1
+            
+            logger.info(f"✅ Проверка завершена: {total} всего, {active} активных, {inactive} неактивных")
+            if error_types:
+                logger.info(f"📊 Типы ошибок: {error_types}")
+            
+            return {
                 'total': total,
                 'checked': total,
                 'active': active,
@@ -1008,6 +1079,24 @@ def check_all_proxies():
                 'results': results,
                 'checked_at': time.time()
             }
+        
+        try:
+            job = get_job_manager().submit('check_proxies', check_all, params={'total': len(proxies)})
+        except JobQueueFull as e:
+            return _job_queue_full(e)
+        
+        # Дашборд ждет результат в том же запросе; ?async=1 возвращает job_id сразу
+        if _wants_async() or not job.wait(SYNC_JOB_WAIT_TIMEOUT) or job.status != JobStatus.COMPLETED:
+            if job.status == JobStatus.FAILED:
+                raise RuntimeError(job.error)
+            return _job_accepted(job, f'Проверка {len(proxies)} прокси выполняется в фоне')
+        
+        data = job.result
+        return jsonify({
+            'success': True,
+            'message': f"Проверка завершена: {data['active']} из {data['total']} прокси активны",
+            'job_id': job.job_id,
+            'data': data
         })
         
     except Exception as e:
@@ -1017,7 +1106,7 @@ def check_all_proxies():
             'error': str(e)
         }), 500
 
-@app.route('/api/proxies/<int:proxy_id>', methods=['DELETE'])
+@api.route('/api/proxies/<int:proxy_id>', methods=['DELETE'])
 def delete_proxy_api(proxy_id):
     """Удалить прокси"""
     try:
@@ -1042,7 +1131,7 @@ def delete_proxy_api(proxy_id):
             'error': str(e)
         }), 500
 
-@app.route('/api/proxies/<int:proxy_id>', methods=['PUT'])
+@api.route('/api/proxies/<int:proxy_id>', methods=['PUT'])
 def update_proxy_api(proxy_id):
     """Обновить прокси"""
     try:
@@ -1085,7 +1174,7 @@ def update_proxy_api(proxy_id):
 # API для статистики
 # =============================================================================
 
-@app.route('/api/stats', methods=['GET'])
+@api.route('/api/stats', methods=['GET'])
 def get_stats():
     """Получить общую статистику"""
     try:
@@ -1131,7 +1220,7 @@ def get_stats():
 # API для статуса интеграции
 # =============================================================================
 
-@app.route('/api/integration/status', methods=['GET'])
+@api.route('/api/integration/status', methods=['GET'])
 def get_integration_status_api():
     """Получить статус интеграции систем"""
     try:
@@ -1162,7 +1251,7 @@ def get_integration_status_api():
             'error': str(e)
         }), 500
 
-@app.route('/api/accounts/<int:account_id>/retry', methods=['POST'])
+@api.route('/api/accounts/<int:account_id>/retry', methods=['POST'])
 def retry_account_login(account_id):
     """Повторная попытка входа с новым кодом верификации"""
     try:
@@ -1177,42 +1266,17 @@ def retry_account_login(account_id):
                 'error': 'Интегрированный сервис недоступен'
             }), 503
         
-        # Запускаем повторную попытку в фоновом режиме
-        import threading
-        import asyncio
-        
-        # Глобальная переменная для хранения результата
-        retry_result = {'completed': False, 'success': False, 'message': ''}
-        
-        def background_retry():
+        # Повторная попытка выполняется в фоновой задаче
+        def background_retry(ctx):
             """Фоновая обработка повторной попытки"""
-            try:
-                # Создаем новый event loop для потока
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                
-                async def run_retry():
-                    from account_integration_service import account_service
-                    return await account_service.retry_account_login_with_new_code(
-                        account_id, max_retries
-                    )
-                
-                # Запускаем асинхронную обработку
-                success, message = loop.run_until_complete(run_retry())
-                
-                retry_result['completed'] = True
-                retry_result['success'] = success
-                retry_result['message'] = message
-                
-                logger.info(f"✅ Фоновая повторная попытка завершена для аккаунта ID {account_id}: {message}")
-                
-            except Exception as e:
-                retry_result['completed'] = True
-                retry_result['success'] = False
-                retry_result['message'] = f"Ошибка: {str(e)}"
-                logger.error(f"❌ Ошибка в фоновой повторной попытке для аккаунта ID {account_id}: {e}")
-            finally:
-                loop.close()
+            from account_integration_service import account_service
+            ctx.set_total(1)
+            success, message = ctx.run_async(
+                account_service.retry_account_login_with_new_code(account_id, max_retries)
+            )
+            ctx.advance(bool(success), message)
+            logger.info(f"✅ Фоновая повторная попытка завершена для аккаунта ID {account_id}: {message}")
+            return {'success': success, 'message': message}
         
         # Получаем данные аккаунта для ответа
         account = get_instagram_account(account_id)
@@ -1229,13 +1293,19 @@ def retry_account_login(account_id):
                 'error': 'У аккаунта отсутствуют данные почты для получения кода верификации'
             }), 400
         
-        # Запускаем в отдельном потоке
-        thread = threading.Thread(target=background_retry, daemon=True)
-        thread.start()
+        # Запускаем в фоновой задаче
+        try:
+            job = get_job_manager().submit(
+                'retry_login', background_retry,
+                params={'account_id': account_id, 'max_retries': max_retries}
+            )
+        except JobQueueFull as e:
+            return _job_queue_full(e)
         
         return jsonify({
             'success': True,
             'message': f'Начата повторная попытка входа для аккаунта {account.username}. Процесс может занять несколько минут.',
+            'job_id': job.job_id,
             'data': {
                 'account_id': account_id,
                 'username': account.username,
@@ -1251,7 +1321,7 @@ def retry_account_login(account_id):
             'error': str(e)
         }), 500
 
-@app.route('/api/accounts/retry-bulk', methods=['POST'])
+@api.route('/api/accounts/retry-bulk', methods=['POST'])
 def retry_bulk_accounts():
     """Массовая повторная попытка входа для неудачных аккаунтов"""
     try:
@@ -1280,35 +1350,18 @@ def retry_bulk_accounts():
                 'error': 'Интегрированный сервис недоступен'
             }), 503
         
-        # Запускаем массовую повторную попытку в фоновом режиме
-        import threading
-        import asyncio
-        
-        def background_bulk_retry():
+        # Массовая повторная попытка выполняется в фоновой задаче
+        def background_bulk_retry(ctx, ids):
             """Фоновая обработка массовой повторной попытки"""
-            try:
-                # Создаем новый event loop для потока
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                
-                async def run_bulk_retry():
-                    from account_integration_service import account_service
-                    return await account_service.bulk_retry_failed_accounts(
-                        account_ids, max_retries_per_account
-                    )
-                
-                # Запускаем асинхронную обработку
-                results = loop.run_until_complete(run_bulk_retry())
-                
-                logger.info(f"✅ Массовая повторная попытка завершена: {len(results['success'])} успешно, {len(results['failed'])} ошибок")
-                
-                # Здесь можно добавить отправку уведомления
-                return results
-                
-            except Exception as e:
-                logger.error(f"❌ Ошибка в фоновой массовой повторной попытке: {e}")
-            finally:
-                loop.close()
+            from account_integration_service import account_service
+            ctx.set_total(len(ids))
+            results = ctx.run_async(
+                account_service.bulk_retry_failed_accounts(ids, max_retries_per_account)
+            )
+            ctx.update(f"{len(results['success'])} успешно, {len(results['failed'])} ошибок")
+            
+            logger.info(f"✅ Массовая повторная попытка завершена: {len(results['success'])} успешно, {len(results['failed'])} ошибок")
+            return results
         
         # Проверяем существование аккаунтов и их данные
         valid_accounts = []
@@ -1337,13 +1390,19 @@ def retry_bulk_accounts():
                 'invalid_accounts': invalid_accounts
             }), 400
         
-        # Запускаем в отдельном потоке
-        thread = threading.Thread(target=background_bulk_retry, daemon=True)
-        thread.start()
+        # Запускаем в фоновой задаче
+        try:
+            job = get_job_manager().submit(
+                'bulk_retry_login', background_bulk_retry, [acc['id'] for acc in valid_accounts],
+                params={'total': len(valid_accounts), 'max_retries_per_account': max_retries_per_account}
+            )
+        except JobQueueFull as e:
+            return _job_queue_full(e)
         
         return jsonify({
             'success': True,
             'message': f'Начата массовая повторная попытка для {len(valid_accounts)} аккаунтов. Процесс может занять длительное время.',
+            'job_id': job.job_id,
             'data': {
                 'valid_accounts': valid_accounts,
                 'invalid_accounts': invalid_accounts,
@@ -1364,7 +1423,7 @@ def retry_bulk_accounts():
 # API для публикации контента
 # =============================================================================
 
-@app.route('/api/posts', methods=['POST'])
+@api.route('/api/posts', methods=['POST'])
 def create_post():
     """Создать новый пост"""
     try:
@@ -1683,9 +1742,10 @@ def create_post():
             'error': str(e)
         }), 500
 
-@app.route('/api/posts', methods=['GET'])
+@api.route('/api/posts', methods=['GET'])
+@conditional('publish_tasks', 'instagram_accounts')
 def get_posts():
-    """Получить список задач публикации"""
+    """Получить список задач публикации (?include_archived=true - с архивом)"""
     try:
         from database.db_manager import get_session
         from database.models import PublishTask, InstagramAccount
@@ -1698,6 +1758,19 @@ def get_posts():
             joinedload(PublishTask.account)
         ).order_by(PublishTask.created_at.desc()).limit(100).all()
         
+        # Архив читаем только по запросу и только если живых задач не хватает
+        usernames = {}
+        if request.args.get('include_archived', 'false').lower() == 'true' and len(tasks) < 100:
+            for archived_task in get_publish_archiver().iter_archived():
+                tasks.append(archived_task)
+                if len(tasks) >= 100:
+                    break
+            archived_accounts = {task.account_id for task in tasks if getattr(task, 'archived', False)}
+            if archived_accounts:
+                usernames = dict(session.query(InstagramAccount.id, InstagramAccount.username).filter(
+                    InstagramAccount.id.in_(archived_accounts)
+                ).all())
+        
         posts_data = []
         for task in tasks:
             # Извлекаем дополнительные данные
@@ -1728,7 +1801,7 @@ def get_posts():
             posts_data.append({
                 'id': task.id,
                 'account_id': task.account_id,
-                'account_username': task.account.username if task.account else 'Unknown',
+                'account_username': task.account.username if task.account else usernames.get(task.account_id, 'Unknown'),
                 'task_type': task.task_type.value if task.task_type else 'unknown',
                 'post_type': post_type,
                 'status': task.status.value if task.status else 'unknown',
@@ -1740,7 +1813,8 @@ def get_posts():
                 'created_at': task.created_at.isoformat() if task.created_at else None,
                 'updated_at': task.updated_at.isoformat() if task.updated_at else None,
                 'batch_id': additional_data.get('batch_id'),
-                'batch_index': additional_data.get('batch_index')
+                'batch_index': additional_data.get('batch_index'),
+                'archived': getattr(task, 'archived', False)
             })
         
         session.close()
@@ -1758,7 +1832,47 @@ def get_posts():
             'error': str(e)
         }), 500
 
-@app.route('/api/posts/<int:task_id>', methods=['DELETE'])
+@api.route('/api/posts/daily', methods=['GET'])
+@conditional('publish_tasks', 'publish_daily_stats')
+def get_posts_daily():
+    """Завершенные и неудачные публикации по аккаунту, дню и типу (архив и текущие задачи)"""
+    try:
+        account_id = request.args.get('account_id', type=int)
+        days = min(max(request.args.get('days', 30, type=int), 1), 366)
+        return jsonify({
+            'success': True,
+            'data': get_publish_archiver().get_daily_stats(account_id=account_id, days=days)
+        })
+    except Exception as e:
+        logger.error(f"❌ Ошибка получения дневной статистики публикаций: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api.route('/api/admin/archive', methods=['GET', 'POST'])
+def publish_archive_api():
+    """Состояние архива задач публикации; POST - перенести старые задачи сейчас"""
+    denied = _check_admin_token()
+    if denied:
+        return denied
+    try:
+        archiver = get_publish_archiver()
+        data = archiver.get_stats()
+        if request.method == 'POST':
+            data['result'] = archiver.archive()
+        return jsonify({
+            'success': True,
+            'data': data
+        })
+    except Exception as e:
+        logger.error(f"❌ Ошибка архивации задач публикации: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api.route('/api/posts/<int:task_id>', methods=['DELETE'])
 def delete_post(task_id):
     """Удалить задачу публикации и сам пост из Instagram"""
     try:
@@ -1835,13 +1949,12 @@ def delete_post(task_id):
                     try:
                         media_paths = json.loads(task.media_path)
                         for path in media_paths:
-                            if os.path.exists(path):
-                                os.remove(path)
+                            remove_media_file(path)
                     except:
                         # Если не JSON, удаляем как обычный файл
-                        os.remove(task.media_path)
+                        remove_media_file(task.media_path)
                 else:
-                    os.remove(task.media_path)
+                    remove_media_file(task.media_path)
             except Exception as e:
                 logger.warning(f"Не удалось удалить медиафайл {task.media_path}: {e}")
         
@@ -1876,7 +1989,7 @@ def delete_post(task_id):
             'error': str(e)
         }), 500
 
-@app.route('/api/posts/task/<int:task_id>/status', methods=['GET'])
+@api.route('/api/posts/task/<int:task_id>/status', methods=['GET'])
 def get_task_status_api(task_id):
     """Получить статус задачи публикации"""
     try:
@@ -1901,7 +2014,341 @@ def get_task_status_api(task_id):
             'error': str(e)
         }), 500
 
-@app.route('/api/check-username', methods=['POST'])
+@api.route('/api/posts/batches', methods=['GET'])
+@api.route('/api/posts/batches/<batch_id>', methods=['GET'])
+def get_batch_progress_api(batch_id=None):
+    """Получить прогресс пакетов задач публикации"""
+    try:
+        from utils.task_queue import get_batch_progress
+        
+        chat_id = request.args.get('chat_id', type=int)
+        progress = get_batch_progress(batch_id, chat_id)
+        if batch_id and progress is None:
+            return jsonify({
+                'success': False,
+                'error': 'Пакет не найден или уже завершен'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'data': progress
+        })
+    
+    except Exception as e:
+        logger.error(f"Ошибка при получении прогресса пакетов: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api.route('/api/posts/stages', methods=['GET'])
+def get_publish_stages_api():
+    """Перцентили этапов публикации по типам задач (?limit=&task_type=)"""
+    try:
+        from database.db_manager import get_publish_task_traces
+        from database.models import TaskType
+        from utils.stage_trace import aggregate_traces
+
+        limit = min(request.args.get('limit', 500, type=int), 5000)
+        task_type = request.args.get('task_type')
+        if task_type:
+            try:
+                task_type = TaskType(task_type)
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'error': f'Неизвестный тип задачи: {task_type}'
+                }), 400
+
+        traces = get_publish_task_traces(limit=limit, task_type=task_type)
+        return jsonify({
+            'success': True,
+            'data': {
+                'tasks': len(traces),
+                'stages': aggregate_traces(trace for _, trace in traces)
+            }
+        })
+
+    except Exception as e:
+        logger.error(f"Ошибка при получении статистики этапов: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api.route('/api/posts/task/<int:task_id>/trace', methods=['GET'])
+def get_task_trace_api(task_id):
+    """Трасса этапов одной задачи публикации"""
+    try:
+        from database.db_manager import get_publish_task
+        
+        task = get_publish_task(task_id)
+        if not task:
+            return jsonify({
+                'success': False,
+                'error': 'Задача не найдена'
+            }), 404
+
+        options = task.get('options') or {}
+        if isinstance(options, str):
+            options = json.loads(options)
+        trace = options.get('trace')
+        if not trace:
+            return jsonify({
+                'success': False,
+                'error': 'Трасса для задачи не сохранена'
+            }), 404
+
+        return jsonify({
+            'success': True,
+            'data': trace
+        })
+
+    except Exception as e:
+        logger.error(f"Ошибка при получении трассы задачи: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api.route('/api/jobs', methods=['GET'])
+def list_jobs_api():
+    """Список фоновых задач (фильтры ?kind=&status=)"""
+    try:
+        jobs = get_job_manager().list(
+            kind=request.args.get('kind'),
+            status=request.args.get('status')
+        )
+        return jsonify({
+            'success': True,
+            'data': [job.to_dict(include_result=False) for job in jobs],
+            'stats': get_job_manager().get_stats()
+        })
+    
+    except Exception as e:
+        logger.error(f"Ошибка при получении списка задач: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_api(job_id):
+    """Статус, прогресс и результат фоновой задачи"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Задача не найдена или срок хранения результата истек'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'data': job.to_dict()
+    })
+
+@api.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job_api(job_id):
+    """Отменить фоновую задачу"""
+    job = get_job_manager().cancel(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Задача не найдена или срок хранения результата истек'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'data': job.to_dict(include_result=False)
+    })
+
+@api.route('/api/events', methods=['GET'])
+def events_stream_api():
+    """
+    Поток изменений состояния (Server-Sent Events)
+
+    ?topics=task,job,batch,validation - фильтр тем (по умолчанию все);
+    после переподключения пропущенные события досылаются по Last-Event-ID
+    """
+    topics = [t.strip() for t in request.args.get('topics', '').split(',') if t.strip()] or None
+    # Формат ID ("<запуск>-<номер>") разбирает шина; неверный ID - поток с текущего события
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    
+    return Response(
+        stream_with_context(get_event_bus().stream(topics, last_event_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@api.route('/api/web/stats', methods=['GET'])
+def web_stats_api():
+    """Время обработки по эндпоинтам и статистика сжатия"""
+    return jsonify({
+        'success': True,
+        'data': get_response_stats().get_stats()
+    })
+
+@api.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Метрики всех подсистем в текстовом формате Prometheus"""
+    return Response(
+        get_metrics_registry().render_prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+        headers={'Cache-Control': 'no-store'}
+    )
+
+def _check_admin_token():
+    """Проверяет токен служебных эндпоинтов; возвращает ответ с ошибкой или None"""
+    from config import WEB_ADMIN_TOKEN
+
+    if not WEB_ADMIN_TOKEN:
+        return jsonify({
+            'success': False,
+            'error': 'Служебные эндпоинты отключены (не задан WEB_ADMIN_TOKEN)'
+        }), 403
+    token = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(token.encode(), WEB_ADMIN_TOKEN.encode()):
+        return jsonify({
+            'success': False,
+            'error': 'Неверный токен администратора'
+        }), 401
+    return None
+
+# Профилирование из веб-запроса ограничено таймаутом воркера gunicorn (60с)
+WEB_PROFILE_MAX_SECONDS = 30
+
+@api.route('/api/admin/profile', methods=['POST'])
+def profile_process_api():
+    """Профилирование процесса веб-API на N секунд (?seconds=&interval_ms=&format=collapsed)"""
+    denied = _check_admin_token()
+    if denied:
+        return denied
+    try:
+        from utils.sampling_profiler import run_profile, ProfilerBusyError
+
+        seconds = min(max(request.args.get('seconds', 10, type=float), 1), WEB_PROFILE_MAX_SECONDS)
+        interval = request.args.get('interval_ms', 10, type=float) / 1000
+        include_idle = request.args.get('idle', 'false').lower() == 'true'
+        try:
+            result = run_profile(seconds, interval=interval, include_idle=include_idle)
+        except ProfilerBusyError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 409
+
+        if request.args.get('format') == 'collapsed':
+            return Response(result.collapsed(), content_type='text/plain; charset=utf-8')
+        return jsonify({
+            'success': True,
+            'data': result.to_dict(limit=request.args.get('limit', 20, type=int))
+        })
+    except Exception as e:
+        logger.error(f"❌ Ошибка профилирования: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api.route('/api/admin/memory', methods=['GET'])
+def memory_stats_api():
+    """Память процесса, размеры групп объектов и рост по tracemalloc (?diff=true)"""
+    denied = _check_admin_token()
+    if denied:
+        return denied
+    try:
+        accounting = get_memory_accounting()
+        accounting.measure(force=request.args.get('force', 'false').lower() == 'true')
+        data = accounting.get_stats()
+        if request.args.get('diff', 'false').lower() == 'true' and accounting.is_tracing():
+            data['diff'] = accounting.snapshot_diff(limit=min(request.args.get('limit', 20, type=int), 100))
+        return jsonify({
+            'success': True,
+            'data': data
+        })
+    except Exception as e:
+        logger.error(f"❌ Ошибка получения статистики памяти: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api.route('/api/admin/errors', methods=['GET'])
+def errors_api():
+    """Сводка ошибок по отпечаткам (?sort=count|last_seen, ?fingerprint=...)"""
+    denied = _check_admin_token()
+    if denied:
+        return denied
+    try:
+        aggregator = get_error_aggregator()
+        fingerprint = request.args.get('fingerprint')
+        if fingerprint:
+            error = aggregator.get(fingerprint)
+            if not error:
+                return jsonify({'success': False, 'error': 'Ошибка не найдена'}), 404
+            return jsonify({'success': True, 'data': error})
+        sort = request.args.get('sort', 'count')
+        if sort not in ('count', 'last_seen'):
+            return jsonify({'success': False, 'error': f'Неизвестная сортировка: {sort}'}), 400
+        return jsonify({
+            'success': True,
+            'data': {
+                'stats': aggregator.get_stats(),
+                'errors': aggregator.top(min(request.args.get('limit', 20, type=int), 200), sort=sort)
+            }
+        })
+    except Exception as e:
+        logger.error(f"❌ Ошибка получения сводки ошибок: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api.route('/api/background/jobs', methods=['GET'])
+def background_jobs_api():
+    """Фоновые задачи: расписание, запуски, ошибки и пропуски из-за наложения"""
+    try:
+        runtime = get_background_runtime()
+        return jsonify({
+            'success': True,
+            'data': {
+                'stats': runtime.get_stats(),
+                'jobs': runtime.get_jobs()
+            }
+        })
+    except Exception as e:
+        logger.error(f"❌ Ошибка получения фоновых задач: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api.route('/api/db/queries', methods=['GET'])
+def db_queries_api():
+    """Топ SQL-запросов по суммарному времени и журнал медленных запросов"""
+    try:
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+        sort = request.args.get('sort', 'total')
+        return jsonify({
+            'success': True,
+            'data': get_query_stats().get_stats(limit=limit, sort=sort)
+        })
+    except Exception as e:
+        logger.error(f"❌ Ошибка получения статистики запросов: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api.route('/api/events/stats', methods=['GET'])
+def events_stats_api():
+    """Статистика шины событий"""
+    return jsonify({
+        'success': True,
+        'data': get_event_bus().get_stats()
+    })
+
+@api.route('/api/check-username', methods=['POST'])
 def check_username():
     """Проверить доступность юзернейма в Instagram"""
     try:
@@ -2002,7 +2449,7 @@ def check_username():
             'error': str(e)
         }), 500
 
-@app.route('/api/profiles/update', methods=['POST'])
+@api.route('/api/profiles/update', methods=['POST'])
 def update_profiles():
     """Обновить профили для выбранных аккаунтов"""
     try:
@@ -2339,37 +2786,49 @@ def update_profiles():
                 })
                 logger.error(f"❌ Ошибка при обновлении аккаунта {account_id}: {e}")
         
-        # Обработка аккаунтов с использованием потоков
-        import concurrent.futures
-        import time
+        def process_item(item):
+            i, account_id = item
+            process_account(i, account_id)
+            return any(r['account_id'] == account_id for r in results['success'])
         
-        logger.info(f"🚀 Запуск обработки с {thread_count} потоками")
+        def update_all(ctx):
+            # Обработка аккаунтов с использованием потоков
+            logger.info(f"🚀 Запуск обработки с {thread_count} потоками")
+            try:
+                ctx.map(
+                    process_item, enumerate(account_ids),
+                    parallel=thread_count,
+                    # Добавляем задержку между запусками
+                    delay=action_delay / max(thread_count, 1)
+                )
+            finally:
+                # Удаляем временные файлы аватаров
+                for avatar_path in avatar_paths:
+                    if os.path.exists(avatar_path):
+                        try:
+                            os.remove(avatar_path)
+                        except:
+                            pass
+            return results
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=thread_count) as executor:
-            # Создаем задачи для каждого аккаунта
-            futures = []
-            for i, account_id in enumerate(account_ids):
-                # Добавляем задержку между запусками
-                if i > 0:
-                    time.sleep(action_delay / thread_count)
-                
-                future = executor.submit(process_account, i, account_id)
-                futures.append(future)
-            
-            # Ждем завершения всех задач
-            concurrent.futures.wait(futures)
+        try:
+            job = get_job_manager().submit(
+                'update_profiles', update_all,
+                params={'total': len(account_ids), 'thread_count': thread_count}
+            )
+        except JobQueueFull as e:
+            return _job_queue_full(e)
         
-        # Удаляем временные файлы аватаров
-        for avatar_path in avatar_paths:
-            if os.path.exists(avatar_path):
-                try:
-                    os.remove(avatar_path)
-                except:
-                    pass
+        # Дашборд ждет результат в том же запросе; ?async=1 возвращает job_id сразу
+        if _wants_async() or not job.wait(SYNC_JOB_WAIT_TIMEOUT) or job.status != JobStatus.COMPLETED:
+            if job.status == JobStatus.FAILED:
+                raise RuntimeError(job.error)
+            return _job_accepted(job, f'Обновление {len(account_ids)} профилей выполняется в фоне')
         
         return jsonify({
             'success': True,
             'message': f'Обновлено {len(results["success"])} из {len(account_ids)} аккаунтов',
+            'job_id': job.job_id,
             'results': results
         })
         
@@ -2380,7 +2839,7 @@ def update_profiles():
             'error': str(e)
         }), 500
 
-@app.route('/api/groups', methods=['GET'])
+@api.route('/api/groups', methods=['GET'])
 def get_groups():
     """Получить группы аккаунтов (заглушка для совместимости с фронтендом)"""
     try:
@@ -2421,7 +2880,7 @@ def get_groups():
 # Маршрут для медиа файлов
 # =============================================================================
 
-@app.route('/media/<path:filename>')
+@api.route('/media/<path:filename>')
 def serve_media(filename):
     """Обслуживание медиа файлов"""
     try:
@@ -2443,38 +2902,17 @@ def serve_media(filename):
         logger.error(f"Ошибка при обслуживании медиа файла {filename}: {e}")
         return '', 404
 
-@app.route('/api/warmup/settings', methods=['GET', 'POST'])
+@api.route('/api/warmup/settings', methods=['GET', 'POST'])
 def warmup_settings():
     """Получить или сохранить настройки прогрева"""
     try:
-        settings_file = 'warmup_settings.json'
+        section = get_settings_service().section('warmup')
         
         if request.method == 'GET':
-            # Читаем настройки из файла или возвращаем значения по умолчанию
-            if os.path.exists(settings_file):
-                with open(settings_file, 'r', encoding='utf-8') as f:
-                    settings = json.load(f)
-            else:
-                settings = {
-                    'minPostsPerDay': 1,
-                    'maxPostsPerDay': 3,
-                    'minStoriesPerDay': 2,
-                    'maxStoriesPerDay': 5,
-                    'minFollowsPerDay': 10,
-                    'maxFollowsPerDay': 30,
-                    'minLikesPerDay': 20,
-                    'maxLikesPerDay': 50,
-                    'minCommentsPerDay': 5,
-                    'maxCommentsPerDay': 15,
-                    'actionDelay': 30,
-                    'sessionDuration': 120,
-                    'nightPauseStart': '23:00',
-                    'nightPauseEnd': '07:00'
-                }
-            
+            # Настройки из кеша сервиса (значения по умолчанию, если файла нет)
             return jsonify({
                 'success': True,
-                'data': settings
+                'data': section.get()
             })
         
         else:  # POST
@@ -2489,22 +2927,7 @@ def warmup_settings():
                 }), 400
             
             # Преобразуем формат данных из фронтенда в простой формат для хранения
-            settings = {
-                'minPostsPerDay': 1,
-                'maxPostsPerDay': 3,
-                'minStoriesPerDay': 2,
-                'maxStoriesPerDay': 5,
-                'minFollowsPerDay': 10,
-                'maxFollowsPerDay': 30,
-                'minLikesPerDay': 20,
-                'maxLikesPerDay': 50,
-                'minCommentsPerDay': 5,
-                'maxCommentsPerDay': 15,
-                'actionDelay': 30,
-                'sessionDuration': 120,
-                'nightPauseStart': '23:00',
-                'nightPauseEnd': '07:00'
-            }
+            settings = WARMUP_SETTINGS_SCHEMA.defaults()
             
             # Извлекаем данные из структуры фронтенда
             if 'phases' in data:
@@ -2530,9 +2953,8 @@ def warmup_settings():
             # Сохраняем полные настройки для дальнейшего использования
             settings['full_settings'] = data
             
-            # Сохраняем в файл
-            with open(settings_file, 'w', encoding='utf-8') as f:
-                json.dump(settings, f, ensure_ascii=False, indent=2)
+            # Сохраняем атомарно; подписчики сервиса получат новые настройки
+            section.replace(settings)
             
             logger.info(f"✅ Настройки прогрева сохранены: {len(data.get('accounts', []))} аккаунтов")
             
@@ -2541,6 +2963,11 @@ def warmup_settings():
                 'message': 'Настройки успешно сохранены'
             })
     
+    except SettingsValidationError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         logger.error(f"❌ Ошибка в warmup_settings: {e}")
         return jsonify({
@@ -2548,7 +2975,7 @@ def warmup_settings():
             'error': str(e)
         }), 500
 
-@app.route('/api/warmup/start', methods=['POST'])
+@api.route('/api/warmup/start', methods=['POST'])
 def start_warmup():
     """Запустить прогрев для выбранных аккаунтов"""
     try:
@@ -2573,12 +3000,11 @@ def start_warmup():
             settings['target_accounts'] = target_accounts
             settings['unique_follows'] = unique_follows
         else:
-            # Загружаем настройки из файла
-            settings_file = 'warmup_settings.json'
-            if os.path.exists(settings_file):
-                with open(settings_file, 'r', encoding='utf-8') as f:
-                    settings = json.load(f)
-                logger.info(f"📋 Загружены настройки из файла")
+            # Берем сохраненные настройки из сервиса настроек
+            section = get_settings_service().section('warmup')
+            if section.exists():
+                settings = section.get()
+                logger.info(f"📋 Загружены сохраненные настройки")
                 # Добавляем настройки целевых аккаунтов
                 settings['target_accounts'] = target_accounts
                 settings['unique_follows'] = unique_follows
@@ -2676,7 +3102,7 @@ def start_warmup():
             'error': str(e)
         }), 500
 
-@app.route('/api/warmup/status', methods=['GET'])
+@api.route('/api/warmup/status', methods=['GET'])
 def get_warmup_status():
     """Получить статус прогрева аккаунтов"""
     try:
@@ -2748,7 +3174,7 @@ def get_warmup_status():
             'error': str(e)
         }), 500
 
-@app.route('/api/warmup/stop', methods=['POST'])
+@api.route('/api/warmup/stop', methods=['POST'])
 def stop_warmup():
     """Остановить прогрев для выбранных аккаунтов"""
     try:
@@ -2816,7 +3242,8 @@ def stop_warmup():
 # API для автоподписок
 # =============================================================================
 
-@app.route('/api/follow/tasks', methods=['GET'])
+@api.route('/api/follow/tasks', methods=['GET'])
+@conditional('follow_tasks', 'instagram_accounts')
 def get_follow_tasks():
     """Получить список задач автоподписок"""
     try:
@@ -2875,7 +3302,7 @@ def get_follow_tasks():
             'error': str(e)
         }), 500
 
-@app.route('/api/follow/tasks', methods=['POST'])
+@api.route('/api/follow/tasks', methods=['POST'])
 def create_follow_task():
     """Создать новую задачу автоподписки"""
     try:
@@ -3107,7 +3534,7 @@ def create_follow_task():
             'error': str(e)
         }), 500
 
-@app.route('/api/follow/tasks/<int:task_id>', methods=['PUT'])
+@api.route('/api/follow/tasks/<int:task_id>', methods=['PUT'])
 def update_follow_task_status(task_id):
     """Обновить статус задачи (пауза/возобновление/остановка)"""
     try:
@@ -3194,7 +3621,7 @@ def update_follow_task_status(task_id):
             'error': str(e)
         }), 500
 
-@app.route('/api/follow/tasks/<int:task_id>', methods=['DELETE'])
+@api.route('/api/follow/tasks/<int:task_id>', methods=['DELETE'])
 def delete_follow_task(task_id):
     """Удалить задачу автоподписки"""
     try:
@@ -3255,7 +3682,7 @@ def delete_follow_task(task_id):
             'error': str(e)
         }), 500
 
-@app.route('/api/follow/tasks/stop-all', methods=['POST'])
+@api.route('/api/follow/tasks/stop-all', methods=['POST'])
 def stop_all_follow_tasks():
     """Остановить все активные задачи автоподписок"""
     try:
@@ -3312,7 +3739,7 @@ def stop_all_follow_tasks():
             'error': str(e)
         }), 500
 
-@app.route('/api/follow/stats', methods=['GET'])
+@api.route('/api/follow/stats', methods=['GET'])
 def get_follow_stats():
     """Получить статистику автоподписок"""
     try:
@@ -3369,7 +3796,7 @@ def get_follow_stats():
 # API для валидации аккаунтов
 # =============================================================================
 
-@app.route('/api/accounts/validate', methods=['POST'])
+@api.route('/api/accounts/validate', methods=['POST'])
 def validate_accounts():
     """Запустить проверку валидности аккаунтов"""
     try:
@@ -3402,7 +3829,7 @@ def validate_accounts():
             'error': str(e)
         }), 500
 
-@app.route('/api/accounts/validate/status', methods=['GET'])
+@api.route('/api/accounts/validate/status', methods=['GET'])
 def get_validation_status():
     """Получить статус и результаты валидации"""
     try:
@@ -3438,7 +3865,7 @@ def get_validation_status():
             'error': str(e)
         }), 500
 
-@app.route('/api/accounts/validate/settings', methods=['PUT'])
+@api.route('/api/accounts/validate/settings', methods=['PUT'])
 def update_validation_settings():
     """Обновить настройки сервиса валидации"""
     try:
@@ -3474,7 +3901,7 @@ def update_validation_settings():
             'error': str(e)
         }), 500
 
-@app.route('/api/accounts/<int:account_id>/check', methods=['POST'])
+@api.route('/api/accounts/<int:account_id>/check', methods=['POST'])
 def check_single_account(account_id):
     """Проверить валидность одного аккаунта"""
     try:
@@ -3528,7 +3955,7 @@ def check_single_account(account_id):
             'error': str(e)
         }), 500
 
-@app.route('/api/accounts/validate/stop', methods=['POST'])
+@api.route('/api/accounts/validate/stop', methods=['POST'])
 def stop_validation():
     """Остановить сервис валидации"""
     try:
@@ -3554,25 +3981,16 @@ def stop_validation():
 # =============================================================================
 
 if __name__ == '__main__':
+    app = create_app()
     logger.info("Запуск Web API сервера...")
     
     # Проверяем, что директория веб-дашборда существует
-    if not os.path.exists('web-dashboard'):
+    if not os.path.exists(DASHBOARD_DIR):
         logger.error("Директория web-dashboard не найдена!")
         sys.exit(1)
     
-    # Запускаем обработчик очереди задач
-    from utils.task_queue import start_task_queue
-    start_task_queue()
-    
-    # Запускаем умный фоновый сервис проверки валидности аккаунтов
-    try:
-        from utils.smart_validator_service import get_smart_validator
-        smart_validator = get_smart_validator()
-        smart_validator.start()
-        logger.info("✅ Умный сервис проверки аккаунтов запущен")
-    except Exception as e:
-        logger.warning(f"⚠️ Не удалось запустить умный сервис проверки аккаунтов: {e}")
+    # Запускаем очередь публикаций и умный сервис проверки аккаунтов
+    start_background_services()
     
     # Запускаем сервер
     app.run(
@@ -3580,4 +3998,4 @@ if __name__ == '__main__':
         port=8080,
         debug=True,
         use_reloader=False  # Отключаем reloader чтобы избежать двойного запуска
-    ) 
\ No newline at end of file
+    )
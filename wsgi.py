@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""
+WSGI точка входа веб-API для продакшена
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+    uvicorn --interface asgi3 wsgi:asgi_app   (если установлен asgiref)
+
+Фоновые сервисы (очередь публикаций, умный валидатор) запускает
+gunicorn.conf.py в одном из воркеров.
+"""
+
+from web_api import create_app
+
+app = create_app()
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+    asgi_app = WsgiToAsgi(app)
+except ImportError:  # asgiref нужен только для запуска через Uvicorn
+    asgi_app = None